@@ -1,4 +1,5 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, make_response, session, send_file
+import base64
 import csv
 import io
 import logging
@@ -6,8 +7,11 @@ import os
 import hmac
 import traceback
 import secrets
+import threading
+import zlib
+from collections import OrderedDict
 from urllib.parse import urlparse, parse_qs
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import openpyxl
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
@@ -15,7 +19,7 @@ from google.auth.transport import requests as google_requests
 from dotenv import load_dotenv
 load_dotenv()
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from database import (init_database, get_all_teachers, add_material_request, get_material_requests, 
+from database import (init_database, get_all_teachers, add_material_requests_bulk, get_material_requests, 
                       get_requests_for_calendar, get_material_request_by_id, update_material_request, 
                       toggle_prepared_status, delete_material_request, update_room_type,
                       add_pending_modification, get_pending_modifications, get_requests_with_pending_modifications,
@@ -24,9 +28,17 @@ from database import (init_database, get_all_teachers, add_material_request, get
                       get_all_student_numbers, update_student_number, add_student_number, delete_student_number,
                       upsert_user, get_user_by_email, find_teacher_id_by_name,
                       pre_associate_teacher, get_all_users, add_teacher, delete_teacher,
-                      get_tp_templates, upsert_tp_template, get_tp_template_by_id)
+                      get_tp_templates, upsert_tp_template, get_tp_template_by_id, get_pool_stats,
+                      count_material_requests, iter_material_requests,
+                      expire_reference_cache, get_reference_cache_stats)
 from google_drive_service import extract_google_drive_id, validate_google_drive_image, get_image_info
-from planning_generator import generer_planning_excel, get_planning_data_for_editor, get_planning_data_for_editor_v2, build_course_data_entry
+from planning_generator import (generer_planning_excel, get_planning_data_for_editor, get_planning_data_for_editor_v2,
+                                build_course_data_entry, get_solution_cache, get_artifact_cache,
+                                generer_plannings_periode, generer_classeur_semaine, grille_jour, empreinte_classeur,
+                                empreinte_classeur_jour, empreinte_classeur_semaine,
+                                PLANNING_BATCH_MAX_DAYS, PLANNING_NON_CALCULE, PLANNING_FILL_CHIMIE,
+                                PLANNING_FILL_PHYSIQUE, PLANNING_FILL_COURS)
+from planning_jobs import PlanningJobError, register_job_kind, get_job_queue
 from database import get_db_connection
 import json
 
@@ -154,6 +166,7 @@ def _is_admin_only_route(path, method):
         '/api/get-planning',
         '/planning',
         '/api/generate-planning',
+        '/api/planning-jobs',
     )
     return any(path.startswith(prefix) for prefix in admin_prefixes)
 
@@ -210,6 +223,12 @@ def handle_encoding_errors():
         pass
 
 
+@app.before_request
+def refresh_reference_cache():
+    """Les tables de référence modifiées par un autre worker sont relues dès cette requête."""
+    expire_reference_cache()
+
+
 @app.before_request
 def enforce_authentication():
     """Force l'authentification Google pour toute route non publique."""
@@ -481,74 +500,314 @@ def planning():
     """Page Générateur de Planning pour voir les demandes d'un jour"""
     return render_template('planning.html')
 
-@app.route('/api/generate-planning', methods=['POST'])
+# Vue HTML du planning : fragment de grille rendu par (date, vue), réutilisé
+# tant que le contenu de la grille (empreinte_classeur) ne change pas
+PLANNING_VIEW_CACHE_SIZE = 60
+_planning_view_fragments = OrderedDict()
+_planning_view_lock = threading.Lock()
+
+
+def _planning_view_fragment(date_str, vue, grille):
+    """HTML de la grille (_planning_grid.html), depuis le cache des fragments si elle n'a pas changé."""
+    empreinte = empreinte_classeur([(vue, grille)])
+    with _planning_view_lock:
+        entree = _planning_view_fragments.get((date_str, vue))
+        if entree and entree[0] == empreinte:
+            _planning_view_fragments.move_to_end((date_str, vue))
+            return entree[1]
+    fragment = render_template('_planning_grid.html', grille=grille, vue=vue)
+    with _planning_view_lock:
+        _planning_view_fragments[(date_str, vue)] = (empreinte, fragment)
+        _planning_view_fragments.move_to_end((date_str, vue))
+        while len(_planning_view_fragments) > PLANNING_VIEW_CACHE_SIZE:
+            _planning_view_fragments.popitem(last=False)
+    return fragment
+
+
+@app.route('/planning/view')
+def planning_view():
+    """Planning d'un jour en HTML, imprimable (affichage du couloir) : mêmes
+    grilles que les feuilles Planning_Techniciens et Affichage du classeur.
+    Paramètres : date (YYYY-MM-DD, aujourd'hui par défaut), vue
+    ('techniciens' par défaut ou 'affichage'), resoudre (1 : lancer
+    l'optimiseur si besoin). Affectation du planning enregistré, sinon du
+    cache de solutions (grille_jour) : sans resoudre, un jour pas encore
+    calculé propose de lancer le calcul au lieu de le faire."""
+    date_str = request.args.get('date') or datetime.now().strftime('%Y-%m-%d')
+    vue = 'affichage' if request.args.get('vue') == 'affichage' else 'techniciens'
+    resoudre = request.args.get('resoudre') == '1'
+    context = {
+        'date': date_str,
+        'date_label': date_str,
+        'vue': vue,
+        'couleurs': {'chimie': PLANNING_FILL_CHIMIE, 'physique': PLANNING_FILL_PHYSIQUE, 'cours': PLANNING_FILL_COURS},
+        'source': None,
+        'error': None,
+        'pending': False,
+        'fragment': '',
+    }
+    try:
+        context['date_label'] = datetime.strptime(date_str, '%Y-%m-%d').strftime('%d/%m/%Y')
+    except ValueError:
+        context['error'] = 'Format de date invalide (YYYY-MM-DD)'
+        return render_template('planning_view.html', **context), 400
+    try:
+        ok, grille, source = grille_jour(date_str, resoudre=resoudre)
+    except Exception as e:
+        logging.error(f"Erreur vue du planning: {e}")
+        ok, grille, source = False, 'Erreur lors du calcul du planning', None
+    if not ok and grille == PLANNING_NON_CALCULE:
+        context['error'] = grille
+        context['pending'] = True
+        return render_template('planning_view.html', **context)
+    if not ok:
+        context['error'] = grille
+        return render_template('planning_view.html', **context), 404
+    context['source'] = source
+    context['fragment'] = _planning_view_fragment(date_str, vue, grille)
+    return render_template('planning_view.html', **context)
+
+
+def _set_solver_headers(response, solver_stats):
+    """Statistiques de l'optimiseur d'un téléchargement de planning (en-têtes X-Planning-Solver*)."""
+    if not solver_stats:
+        return
+    response.headers['X-Planning-Solver-Status'] = str(solver_stats.get('status'))
+    response.headers['X-Planning-Solver-Engine'] = str(solver_stats.get('engine'))
+    response.headers['X-Planning-Solver'] = json.dumps(solver_stats, separators=(',', ':'))
+
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _conditional_response(etag, last_modified=None):
+    """Réponse à une demande conditionnelle sur un classeur, évaluée avant de
+    le générer ; None s'il faut l'envoyer (demande non conditionnelle,
+    classeur modifié ou rien à planifier).
+    etag() : ETag du classeur (empreinte_classeur_jour...), appelé seulement
+    si la demande est conditionnelle. If-None-Match qui le contient : 304
+    en GET / HEAD, 412 pour les autres méthodes (RFC 7232). Sans
+    If-None-Match, If-Modified-Since n'est lu qu'en GET / HEAD, avec
+    last_modified ou la date du classeur en cache."""
+    if not (request.if_none_match or request.if_modified_since):
+        return None
+    etag = etag()
+    if etag is None:
+        return None
+    safe = request.method in ('GET', 'HEAD')
+    if request.if_none_match:
+        if not request.if_none_match.contains_weak(etag):
+            return None
+        status = 304 if safe else 412
+    else:
+        since = request.if_modified_since
+        if not safe or since is None:
+            return None
+        if last_modified is None:
+            entree = get_artifact_cache().get(etag)
+            if entree is None:
+                return None
+            last_modified = entree[1]
+        if int(last_modified) > since.timestamp():
+            return None
+        status = 304
+    response = Response(status=status)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _xlsx_response(workbook, filename, artifact=None):
+    """Téléchargement d'un classeur Excel (buffer en mémoire ou octets),
+    envoyé sans passer par un fichier.
+    artifact ({'etag', 'last_modified', 'source'}, voir classeur_planning) :
+    en-têtes ETag (faible) et Last-Modified ; les demandes conditionnelles
+    sont traitées avant la génération (_conditional_response)."""
+    if isinstance(workbook, (bytes, bytearray)):
+        workbook = io.BytesIO(workbook)
+    workbook.seek(0)
+    response = send_file(workbook, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename,
+                         conditional=False, etag=False)
+    if artifact:
+        response.set_etag(artifact['etag'], weak=True)
+        response.last_modified = datetime.fromtimestamp(int(artifact['last_modified']), timezone.utc)
+        # Toujours revalidé : le même jour change dès qu'une demande change
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.headers['X-Planning-Artifact'] = artifact.get('source', '')
+    return response
+
+
+def _planning_filename(date_str):
+    """Nom du classeur téléchargé pour un jour : planning_LUNDI_04-03-2030.xlsx."""
+    try:
+        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+        # datetime.weekday(): Lundi=0 .. Dimanche=6
+        day_names = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+        day_name = day_names[date_obj.weekday()]
+        formatted_date = date_obj.strftime('%d-%m-%Y')
+        return f"planning_{day_name.upper()}_{formatted_date}.xlsx"
+    except (TypeError, ValueError):
+        return f"planning_{date_str}.xlsx"
+
+
+@app.route('/api/generate-planning', methods=['GET', 'POST'])
 def generate_planning():
-    """Generate Excel planning for a specific date using OR-Tools optimization"""
+    """Generate Excel planning for a specific date using OR-Tools optimization.
+    JSON (ou paramètres d'URL en GET) : {"date": "YYYY-MM-DD", "profile":
+    profil de l'optimiseur (optionnel)} ; statistiques de la résolution dans
+    l'en-tête X-Planning-Solver. ETag / Last-Modified du classeur, calculés
+    depuis les entrées : une demande conditionnelle sur un classeur inchangé
+    reçoit 304 (412 en POST) sans résolution ni rendu ; sinon un classeur
+    déjà rendu pour les mêmes entrées est repris du cache."""
     try:
-        data = request.get_json()
+        data = request.args if request.method == 'GET' else request.get_json(silent=True)
         if not data or 'date' not in data:
             return jsonify({'error': 'Date manquante'}), 400
         
         date_str = data['date']
+        conditional = _conditional_response(lambda: empreinte_classeur_jour(date_str, profil=data.get('profile')))
+        if conditional is not None:
+            return conditional
         
         # Use the existing planning generator
-        success, result = generer_planning_excel(date_str)
+        solver_stats, artifact = {}, {}
+        success, result = generer_planning_excel(date_str, profil=data.get('profile'), statistiques=solver_stats,
+                                                 artefact=artifact)
         
         if not success:
             return jsonify({'error': result}), 404
         
-        # Resolve generated file path from result
-        file_path = None
-        try:
-            # Case 1: function returns the filename directly
-            if isinstance(result, str) and result.lower().endswith('.xlsx'):
-                file_path = result
-            # Case 2: function returned a message string (legacy)
-            elif isinstance(result, str) and "Planning généré:" in result:
-                file_path = result.split("Planning généré: ")[1].split(" (")[0]
-            else:
-                return jsonify({'error': "Format de réponse inattendu lors de la génération du fichier"}), 500
-        except Exception as _e:
-            return jsonify({'error': 'Erreur lors de l\'extraction du nom de fichier'}), 500
-        
-        # Read the generated file and return it
-        try:
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
-        except FileNotFoundError:
-            return jsonify({'error': f'Fichier généré non trouvé: {file_path}'}), 500
-        
-        # Create response
-        response = make_response(file_content)
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        
-        # Create filename based on date
-        from datetime import datetime
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            # datetime.weekday(): Lundi=0 .. Dimanche=6
-            day_names = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
-            day_name = day_names[date_obj.weekday()]
-            formatted_date = date_obj.strftime('%d-%m-%Y')
-            filename = f"planning_{day_name.upper()}_{formatted_date}.xlsx"
-        except:
-            filename = f"planning_{date_str}.xlsx"
-        
-        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-        
-        # Clean up the temporary file
-        import os
-        try:
-            os.remove(file_path)
-        except:
-            pass
-        
+        # Classeur généré en mémoire (io.BytesIO) ou repris du cache des classeurs
+        response = _xlsx_response(result, _planning_filename(date_str), artifact)
+        _set_solver_headers(response, solver_stats)
         return response
         
     except Exception as e:
         logging.error(f"Erreur génération planning: {e}")
         return api_error('Erreur lors de la génération du planning', e)
 
+def _failed_and_empty_days(days):
+    """(jours en échec, jours sans demande) d'un planning de plusieurs jours :
+    un jour sans demande n'est pas un échec du planning."""
+    failed = [d['date'] for d in days if not d['success'] and not d.get('empty')]
+    empty = [d['date'] for d in days if not d['success'] and d.get('empty')]
+    return failed, empty
+
+
+def _set_days_headers(response, days):
+    """En-têtes X-Planning-Failed-Days et X-Planning-Empty-Days (jours sans demande)."""
+    failed, empty = _failed_and_empty_days(days)
+    response.headers['X-Planning-Failed-Days'] = ','.join(failed)
+    response.headers['X-Planning-Empty-Days'] = ','.join(empty)
+
+
+@app.route('/api/generate-planning/batch', methods=['POST'])
+def generate_planning_batch():
+    """Planning de chaque jour ouvré d'une période, jours résolus en parallèle.
+
+    JSON : {"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD", "format": "json" | "xlsx",
+    "profile": profil de l'optimiseur (optionnel)}.
+    format=json (défaut) : affectations et erreurs par jour, plus le classeur
+    combiné (deux feuilles par jour) encodé en base64. format=xlsx : le
+    classeur seul, les jours en échec dans l'en-tête X-Planning-Failed-Days
+    et les jours sans demande dans X-Planning-Empty-Days (failed_days et
+    empty_days en JSON). Un jour en échec n'interrompt pas les autres.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        start_date = data.get('start_date') or data.get('date')
+        end_date = data.get('end_date') or start_date
+        if not start_date:
+            return jsonify({'error': 'Date de début manquante'}), 400
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+            end = datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Format de date invalide (YYYY-MM-DD)'}), 400
+        if end < start:
+            return jsonify({'error': 'La date de fin précède la date de début'}), 400
+        if (end - start).days + 1 > PLANNING_BATCH_MAX_DAYS:
+            return jsonify({'error': f'Période limitée à {PLANNING_BATCH_MAX_DAYS} jours'}), 400
+
+        results, workbook = generer_plannings_periode(start_date, end_date, profil=data.get('profile'))
+        if not results:
+            return jsonify({'error': 'Aucun jour ouvré dans la période'}), 404
+
+        filename = f"planning_{start.strftime('%d-%m-%Y')}_{end.strftime('%d-%m-%Y')}.xlsx"
+        buffer = None
+        if workbook is not None:
+            buffer = io.BytesIO()
+            workbook.save(buffer)
+        failed_days, empty_days = _failed_and_empty_days(results)
+
+        if data.get('format') == 'xlsx':
+            if buffer is None:
+                return jsonify({'error': 'Aucun jour planifié', 'days': results}), 404
+            response = _xlsx_response(buffer, filename)
+            _set_days_headers(response, results)
+            return response
+
+        return jsonify({
+            'days': results,
+            'failed_days': failed_days,
+            'empty_days': empty_days,
+            'filename': filename if buffer is not None else None,
+            'workbook': base64.b64encode(buffer.getvalue()).decode('ascii') if buffer is not None else None,
+        })
+    except Exception as e:
+        logging.error(f"Erreur génération planning par période: {e}")
+        return api_error('Erreur lors de la génération des plannings', e)
+
+def _week_filename(days):
+    """Nom du classeur d'une semaine : planning_semaine_01-04-2030.xlsx (premier jour)."""
+    first = datetime.strptime(days[0]['date'], '%Y-%m-%d') if days else None
+    return f"planning_semaine_{first.strftime('%d-%m-%Y')}.xlsx" if first else "planning_semaine.xlsx"
+
+
+def _set_week_headers(response, days):
+    """Jours en échec, jours sans demande et origine de l'affectation de chaque
+    jour (planning_enregistre, cache, solveur)."""
+    _set_days_headers(response, days)
+    response.headers['X-Planning-Sources'] = ','.join(f"{d['date']}:{d['source']}" for d in days if d['success'])
+
+
+@app.route('/api/generate-planning/week', methods=['POST'])
+def generate_planning_week():
+    """Classeur de la semaine : feuilles Planning_Techniciens / Affichage de
+    chaque jour ouvré. Les jours déjà enregistrés ou en cache ne sont pas
+    recalculés ; les autres sont résolus en parallèle.
+
+    JSON : {"date": un jour de la semaine (YYYY-MM-DD), "profile": profil de
+    l'optimiseur (optionnel)}. Jours en échec dans l'en-tête
+    X-Planning-Failed-Days, jours sans demande dans X-Planning-Empty-Days,
+    origine des affectations dans X-Planning-Sources.
+    Réponse 412 si If-None-Match contient l'ETag du classeur (calculé avant
+    toute résolution).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        date_str = data.get('date')
+        if not date_str:
+            return jsonify({'error': 'Date manquante'}), 400
+        try:
+            datetime.strptime(date_str, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Format de date invalide (YYYY-MM-DD)'}), 400
+
+        conditional = _conditional_response(lambda: empreinte_classeur_semaine(date_str, data.get('profile')))
+        if conditional is not None:
+            return conditional
+        artifact = {}
+        days, buffer = generer_classeur_semaine(date_str, profil=data.get('profile'), artefact=artifact)
+        if buffer is None:
+            return jsonify({'error': 'Aucun jour planifié pour cette semaine', 'days': days}), 404
+        response = _xlsx_response(buffer, _week_filename(days), artifact)
+        _set_week_headers(response, days)
+        return response
+    except Exception as e:
+        logging.error(f"Erreur génération planning de la semaine: {e}")
+        return api_error('Erreur lors de la génération du planning de la semaine', e)
+
 @app.route('/')
 def index():
     """Home page with material request form"""
@@ -605,66 +864,83 @@ def api_replacement_teachers():
         for teacher in teachers
     ])
 
+# Taille de page maximale de /api/requests?limit=...
+REQUESTS_PAGE_MAX = 500
+
+
+def _request_list_filters(args):
+    """Filtres communs (liste, calendrier, export) lus dans la query string."""
+    status = args.get('status') or None
+    if status not in (None, 'prepared', 'not-prepared', 'modified'):
+        raise ValueError(f'Statut inconnu: {status}')
+    request_type = args.get('type') or None
+    if request_type not in (None, 'absent', 'no-material', 'normal'):
+        raise ValueError(f'Type inconnu: {request_type}')
+    prepared = args.get('prepared', '').strip().lower()
+    if prepared in ('true', '1'):
+        prepared = True
+    elif prepared in ('false', '0'):
+        prepared = False
+    elif prepared:
+        raise ValueError(f'Valeur de prepared invalide: {prepared}')
+    else:
+        prepared = None
+    return {'status': status, 'request_type': request_type, 'prepared': prepared}
+
+
+def _encode_requests_cursor(req):
+    """Curseur opaque = clé de tri (request_date, created_at, id) de la dernière ligne."""
+    key = json.dumps([req['request_date'], req['created_at'], req['id']])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_requests_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        request_date, created_at, request_id = json.loads(raw)
+        return request_date, created_at, int(request_id)
+    except Exception:
+        raise ValueError('Curseur de pagination invalide')
+
+
 @app.route('/api/requests', methods=['GET'])
 def api_get_requests():
-    """API endpoint to get material requests"""
+    """
+    API endpoint to get material requests.
+
+    Sans `limit` ni `cursor` : tableau JSON de toutes les demandes filtrées.
+    Avec `limit` (et `cursor` pour les pages suivantes) : page triée par
+    (request_date, created_at, id) sous la forme
+    {items, next_cursor, total, limit} ; `total` n'est calculé que pour la
+    première page (ou avec with_total=1).
+    """
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     teacher_id = request.args.get('teacher_id')
-
-    requests = get_material_requests(start_date, end_date, teacher_id)
-    # Compatibilité PostgreSQL/SQLite : transformer en liste de dicts
-    requests_list = []
-    for req in requests:
-        if isinstance(req, dict):
-            r = req
-        elif hasattr(req, '_fields'):  # namedtuple (rare)
-            r = req._asdict()
-        else:
-            # sqlite3.Row peut être converti en dict avec dict()
-            try:
-                r = dict(req)
-                # Ajouter teacher_name si manquant (dernière colonne)
-                if 'teacher_name' not in r and len(req.keys()) > 0:
-                    r['teacher_name'] = req[list(req.keys())[-1]]
-                print(f"🔍 SQLite Row converti: id={r.get('id')}, group_count={r.get('group_count')}, quantity={r.get('quantity')}")
-                requests_list.append(r)
-                continue
-            except (TypeError, AttributeError):
-                pass
-            # tuple (PostgreSQL sans row_factory)
-            # Ordre des colonnes : voir la requête SELECT
-            r = {
-                'id': req[0],
-                'teacher_id': req[1],
-                'request_date': req[2],
-                'horaire': req[3],
-                'class_name': req[4],
-                'material_description': req[5],
-                'quantity': req[6],
-                'selected_materials': req[7] if req[7] else '',
-                'computers_needed': req[8] if req[8] else 0,
-                'notes': req[9],
-                'prepared': req[10] if req[10] else False,
-                'modified': req[11] if req[11] else False,
-                'group_count': int(req[12]) if len(req) > 12 and req[12] is not None else 1,
-                'material_prof': req[13] if len(req) > 13 else '',
-                'request_name': req[14] if len(req) > 14 else '',
-                'room_type': req[15] if len(req) > 15 and req[15] else 'Mixte',
-                'image_url': req[16] if len(req) > 16 else None,
-                'exam': req[17] if len(req) > 17 else False,
-                'created_at': req[18] if len(req) > 18 else None,
-                'teacher_name': req[19] if len(req) > 19 else '',
-                'custom_duration': req[20] if len(req) > 20 else None
-            }
-            # Debug log
-            try:
-                if int(req[12]) != 1:
-                    print(f"🔍 Backend: Request #{req[0]} has group_count={req[12]} (type={type(req[12])})")
-            except Exception:
-                pass
-        requests_list.append(r)
-    return jsonify(requests_list)
+    cursor_token = request.args.get('cursor')
+    try:
+        filters = _request_list_filters(request.args)
+        after = _decode_requests_cursor(cursor_token) if cursor_token else None
+        limit = request.args.get('limit', type=int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not limit and not cursor_token:
+        return jsonify(get_material_requests(start_date, end_date, teacher_id, **filters))
+
+    limit = max(1, min(limit or 100, REQUESTS_PAGE_MAX))
+    # Une ligne de plus pour savoir s'il reste une page après celle-ci
+    rows = get_material_requests(start_date, end_date, teacher_id, limit=limit + 1, after=after, **filters)
+    items = rows[:limit]
+    total = None
+    if not cursor_token or request.args.get('with_total') == '1':
+        total = count_material_requests(start_date, end_date, teacher_id, **filters)
+    return jsonify({
+        'items': items,
+        'next_cursor': _encode_requests_cursor(items[-1]) if len(rows) > limit else None,
+        'total': total,
+        'limit': limit,
+    })
 
 @app.route('/api/calendar-events', methods=['GET'])
 def api_calendar_events():
@@ -673,71 +949,13 @@ def api_calendar_events():
     user = _get_current_user()
     if user and _is_teacher_scoped_user(user):
         teacher_id = user.get('teacher_id')
-    status_filter = request.args.get('status')
-    type_filter = request.args.get('type')
-    
-    # Get all requests with optional teacher filter
-    requests = get_material_requests(teacher_id=teacher_id)
-
-    # Compatibilité PostgreSQL/SQLite : transformer en dict si besoin
-    def to_dict(req):
-        if isinstance(req, dict):
-            return req
-        elif hasattr(req, '_fields'):
-            return req._asdict()
-        else:
-            return {
-                'id': req[0],
-                'teacher_id': req[1],
-                'request_date': req[2],
-                'horaire': req[3],
-                'class_name': req[4],
-                'material_description': req[5],
-                'quantity': req[6],
-                'selected_materials': req[7] if req[7] else '',
-                'computers_needed': req[8] if req[8] else 0,
-                'notes': req[9],
-                'prepared': req[10] if req[10] else False,
-                'modified': req[11] if req[11] else False,
-                'group_count': req[12] if len(req) > 12 else 1,
-                'material_prof': req[13] if len(req) > 13 else '',
-                'request_name': req[14] if len(req) > 14 else '',
-                'room_type': req[15] if len(req) > 15 and req[15] else 'Mixte',
-                'image_url': req[16] if len(req) > 16 else None,
-                'exam': req[17] if len(req) > 17 else False,
-                'created_at': req[18] if len(req) > 18 else None,
-                'teacher_name': req[-1]
-            }
+    try:
+        filters = _request_list_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    requests = [to_dict(req) for req in requests]
-
-    # Filter by status if needed
-    if status_filter:
-        filtered_requests = []
-        for req in requests:
-            prepared = req.get('prepared', False)
-            modified = req.get('modified', False)
-            if status_filter == 'prepared' and prepared:
-                filtered_requests.append(req)
-            elif status_filter == 'not-prepared' and not prepared:
-                filtered_requests.append(req)
-            elif status_filter == 'modified' and modified:
-                filtered_requests.append(req)
-        requests = filtered_requests
-
-    # Filter by type if needed
-    if type_filter:
-        filtered_requests = []
-        for req in requests:
-            selected_materials = req.get('selected_materials', '')
-            material_description = req.get('material_description', '')
-            if type_filter == 'absent' and selected_materials == 'Absent':
-                filtered_requests.append(req)
-            elif type_filter == 'no-material' and selected_materials == 'Pas besoin de matériel':
-                filtered_requests.append(req)
-            elif type_filter == 'normal' and selected_materials not in ['Absent', 'Pas besoin de matériel']:
-                filtered_requests.append(req)
-        requests = filtered_requests
+    # Filtres statut / type appliqués en SQL
+    requests = get_material_requests(teacher_id=teacher_id, **filters)
 
     events = []
     for req in requests:
@@ -825,131 +1043,129 @@ def api_add_request():
             labo_note = "Demande saisie par Labo"
             data['notes'] = f"{labo_note} | {existing_notes}" if existing_notes else labo_note
 
-        # Validation du délai de 2 jours ouvrés pour chaque date (sauf admin et labo)
-        if not _is_privileged_user():
-            from deadline_utils import is_request_deadline_respected, get_earliest_valid_date
+        for dh in data['days_horaires']:
+            if not dh.get('date'):
+                return jsonify({'error': 'Date manquante pour un des jours'}), 400
 
-            for dh in data['days_horaires']:
-                date = dh.get('date')
-                if not date:
-                    return jsonify({'error': 'Date manquante pour un des jours'}), 400
+        # Validation du délai de 2 jours ouvrés pour toutes les dates en une passe (sauf admin et labo)
+        if not _is_privileged_user():
+            from deadline_utils import check_request_deadlines, get_earliest_valid_date
 
-                validation = is_request_deadline_respected(date)
+            dates = [dh['date'] for dh in data['days_horaires']]
+            validations = check_request_deadlines(dates)
+            for date in dates:
+                validation = validations[date]
                 if not validation['valid']:
                     earliest_date = get_earliest_valid_date()
                     return jsonify({
                         'error': f'Délai insuffisant pour le {date}. {validation["message"]} Première date disponible: {earliest_date}'
                     }), 400
-        else:
-            for dh in data['days_horaires']:
-                if not dh.get('date'):
-                    return jsonify({'error': 'Date manquante pour un des jours'}), 400
 
-        # Ajout de chaque demande (jour/horaire)
-        request_ids = []
-        for dh in data['days_horaires']:
-            date = dh.get('date')
-            horaires = dh.get('horaires', [])
-            for horaire in horaires:
-                request_id = add_material_request(
-                    teacher_id=data['teacher_id'],
-                    request_date=date,
-                    horaire=horaire,
-                    class_name=data['class_name'],
-                    material_description=data['material_description'],
-                    quantity=data.get('quantity', 1),
-                    selected_materials=data.get('selected_materials', ''),
-                    computers_needed=data.get('computers_needed', 0),
-                    notes=data.get('notes', ''),
-                    group_count=data.get('group_count', data.get('quantity', 1)),
-                    material_prof=data.get('material_prof', ''),
-                    request_name=data.get('request_name', ''),
-                    image_url=data.get('image_url', ''),
-                    custom_duration=data.get('custom_duration')
-                )
-                request_ids.append(request_id)
-
-                # Sauvegarder comme template TP si c'est un vrai TP (pas absent/no_material/examen)
-                sm = data.get('selected_materials', '')
-                is_special = sm in ('Absent', 'Pas besoin de matériel', 'Examen')
-                if not is_special and data.get('request_name') and data.get('class_name'):
-                    try:
-                        upsert_tp_template(
-                            teacher_id=data['teacher_id'],
-                            level=data['class_name'],
-                            request_name=data['request_name'],
-                            material_description=data.get('material_description', ''),
-                            selected_materials=sm,
-                            material_prof=data.get('material_prof', ''),
-                            computers_needed=data.get('computers_needed', 0),
-                            group_count=data.get('group_count', data.get('quantity', 1)),
-                            notes=data.get('notes', ''),
-                            image_url=data.get('image_url', ''),
-                            room_type=data.get('room_type', 'Mixte')
-                        )
-                    except Exception:
-                        pass  # Echec silencieux : ne pas bloquer la création
+        # Sauvegarder comme template TP si c'est un vrai TP (pas absent/no_material/examen)
+        sm = data.get('selected_materials', '')
+        is_special = sm in ('Absent', 'Pas besoin de matériel', 'Examen')
+        template = None
+        if not is_special and data.get('request_name') and data.get('class_name'):
+            template = {
+                'teacher_id': data['teacher_id'],
+                'level': data['class_name'],
+                'request_name': data['request_name'],
+                'material_description': data.get('material_description', ''),
+                'selected_materials': sm,
+                'material_prof': data.get('material_prof', ''),
+                'computers_needed': data.get('computers_needed', 0),
+                'group_count': data.get('group_count', data.get('quantity', 1)),
+                'notes': data.get('notes', ''),
+                'image_url': data.get('image_url', ''),
+                'room_type': data.get('room_type', 'Mixte'),
+            }
+
+        # Toutes les demandes (jour/horaire) et le template en une transaction
+        slots = [
+            (dh['date'], horaire)
+            for dh in data['days_horaires']
+            for horaire in dh.get('horaires', [])
+        ]
+        request_ids = add_material_requests_bulk(
+            teacher_id=data['teacher_id'],
+            slots=slots,
+            class_name=data['class_name'],
+            material_description=data['material_description'],
+            quantity=data.get('quantity', 1),
+            selected_materials=sm,
+            computers_needed=data.get('computers_needed', 0),
+            notes=data.get('notes', ''),
+            group_count=data.get('group_count', data.get('quantity', 1)),
+            material_prof=data.get('material_prof', ''),
+            request_name=data.get('request_name', ''),
+            image_url=data.get('image_url', ''),
+            custom_duration=data.get('custom_duration'),
+            template=template
+        )
 
         return jsonify({'success': True, 'request_ids': request_ids}), 201
         
     except Exception as e:
         return api_error('Erreur lors de la création de la demande', e)
 
+# Le CSV exporté est envoyé par morceaux d'environ cette taille (caractères)
+CSV_EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_CSV_HEADER = [
+    'ID', 'Enseignant', 'Date demande', 'Horaire', 'Niveau',
+    'Matériel sélectionné', 'Ordinateurs', 'Description matériel',
+    'Nombre de groupes', 'Type de salle', 'Notes', 'Date création'
+]
+
+
+def _csv_chunks(header, rows):
+    """Écrit le CSV ligne par ligne et le rend par morceaux de CSV_EXPORT_CHUNK_SIZE."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def _gzip_chunks(chunks):
+    """Compresse au fil de l'eau une suite de morceaux texte (format .gz)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @app.route('/export/csv')
 def export_csv():
-    """Export material requests to CSV"""
+    """
+    Export material requests to CSV.
+
+    Le fichier est produit en flux (lecture par lots via iter_material_requests,
+    réponse HTTP chunked) : la mémoire du worker ne dépend pas du nombre de
+    demandes. Avec gzip=1, le CSV est envoyé compressé (.csv.gz).
+    """
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     teacher_id = request.args.get('teacher_id')
     user = _get_current_user()
     if user and _is_teacher_scoped_user(user):
         teacher_id = user.get('teacher_id')
-    
-    requests = get_material_requests(start_date, end_date, teacher_id)
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        'ID', 'Enseignant', 'Date demande', 'Horaire', 'Niveau',
-        'Matériel sélectionné', 'Ordinateurs', 'Description matériel',
-        'Nombre de groupes', 'Type de salle', 'Notes', 'Date création'
-    ])
-    
-    # Write data
-    for req in requests:
-        # Compatibilité PostgreSQL/SQLite : transformer en dict si besoin
-        if isinstance(req, dict):
-            r = req
-        elif hasattr(req, '_fields'):
-            r = req._asdict()
-        else:
-            r = {
-                'id': req[0],
-                'teacher_id': req[1],
-                'request_date': req[2],
-                'horaire': req[3],
-                'class_name': req[4],
-                'material_description': req[5],
-                'quantity': req[6],
-                'selected_materials': req[7] if req[7] else '',
-                'computers_needed': req[8] if req[8] else 0,
-                'notes': req[9],
-                'prepared': req[10] if req[10] else False,
-                'modified': req[11] if req[11] else False,
-                'group_count': req[12] if len(req) > 12 else 1,
-                'material_prof': req[13] if len(req) > 13 else '',
-                'request_name': req[14] if len(req) > 14 else '',
-                'room_type': req[15] if len(req) > 15 and req[15] else 'Mixte',
-                'image_url': req[16] if len(req) > 16 else None,
-                'exam': req[17] if len(req) > 17 else False,
-                'created_at': req[18] if len(req) > 18 else None,
-                'teacher_name': req[19] if len(req) > 19 else '',
-                'custom_duration': req[20] if len(req) > 20 else None
-            }
-        writer.writerow([
+    try:
+        filters = _request_list_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    use_gzip = request.args.get('gzip') in ('1', 'true')
+
+    requests = iter_material_requests(start_date, end_date, teacher_id, **filters)
+    rows = (
+        [
             r['id'],
             r['teacher_name'],
             r['request_date'],
@@ -962,14 +1178,20 @@ def export_csv():
             r['room_type'] if r['room_type'] else 'Mixte',
             r['notes'] if r['notes'] else '',
             r['created_at']
-        ])
-    
-    # Create response
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=demandes_materiel_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    
+        ]
+        for r in requests
+    )
+    chunks = _csv_chunks(EXPORT_CSV_HEADER, rows)
+
+    filename = f'demandes_materiel_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    if use_gzip:
+        response = Response(_gzip_chunks(chunks), mimetype='application/gzip')
+        filename += '.gz'
+    else:
+        response = Response(chunks, mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    # Pas de mise en tampon par un éventuel reverse proxy
+    response.headers['X-Accel-Buffering'] = 'no'
     return response
 
 @app.route('/requests')
@@ -1017,41 +1239,10 @@ def api_get_request_by_id(request_id):
     if not _is_owner_or_admin(request_data.get('teacher_id')):
         return jsonify({'error': 'Non autorisé'}), 403
 
-    # Compatibilité PostgreSQL/SQLite : transformer en dict si besoin
-    if isinstance(request_data, dict):
-        r = request_data
-    elif hasattr(request_data, '_fields'):
-        r = request_data._asdict()
-    else:
-        # tuple (ordre des colonnes comme dans SELECT)
-        r = {
-            'id': request_data[0],
-            'teacher_id': request_data[1],
-            'request_date': request_data[2],
-            'horaire': request_data[3],
-            'class_name': request_data[4],
-            'material_description': request_data[5],
-            'quantity': request_data[6],
-            'selected_materials': request_data[7] if request_data[7] else '',
-            'computers_needed': request_data[8] if request_data[8] else 0,
-            'notes': request_data[9],
-            'prepared': request_data[10] if request_data[10] else False,
-            'modified': request_data[11] if request_data[11] else False,
-            'group_count': int(request_data[12]) if len(request_data) > 12 and request_data[12] is not None else 1,
-            'material_prof': request_data[13] if len(request_data) > 13 else '',
-            'request_name': request_data[14] if len(request_data) > 14 else '',
-            'room_type': request_data[15] if len(request_data) > 15 and request_data[15] else 'Mixte',
-            'image_url': request_data[16] if len(request_data) > 16 else None,
-            'exam': request_data[17] if len(request_data) > 17 else False,
-            'created_at': request_data[18] if len(request_data) > 18 else None,
-            'teacher_name': request_data[-1]  # dernière colonne
-        }
-
     # Calcul du délai (jours ouvrés)
     from deadline_utils import is_request_deadline_respected
-    deadline_info = is_request_deadline_respected(r['request_date'])
-    r['deadline'] = deadline_info
-    return jsonify(r)
+    request_data['deadline'] = is_request_deadline_respected(request_data['request_date'])
+    return jsonify(request_data)
 
 @app.route('/api/requests/<int:request_id>', methods=['PUT'])
 def api_update_request(request_id):
@@ -1361,6 +1552,18 @@ def api_admin_debug_email_map():
     parsed = _parse_teacher_email_map()
     return jsonify({'raw_length': len(raw), 'parsed': parsed, 'keys': list(parsed.keys())})
 
+@app.route('/api/admin/db-stats')
+def api_admin_db_stats():
+    """Statistiques du pool de connexions, du cache de référence et des caches de solutions et de classeurs du planning du worker courant (admin/labo)."""
+    user = _get_current_user()
+    if not user or user.get('role') not in ('admin', 'labo'):
+        return jsonify({'error': 'Non autorisé'}), 403
+    stats = get_pool_stats()
+    stats['reference_cache'] = get_reference_cache_stats()
+    stats['planning_solution_cache'] = get_solution_cache().stats()
+    stats['planning_artifact_cache'] = get_artifact_cache().stats()
+    return jsonify(stats)
+
 @app.route('/admin/rooms')
 def view_rooms():
     """Room management page"""
@@ -1399,34 +1602,9 @@ def api_pending_modifications():
             else:
                 modifications = get_pending_modifications()
             
-            # Fonction helper pour normaliser les résultats (dict ou tuple)
-            def to_dict(mod):
-                if isinstance(mod, dict):
-                    return mod
-                elif hasattr(mod, '_asdict'):
-                    # NamedTuple
-                    return mod._asdict()
-                else:
-                    # Tuple classique - ordre des colonnes dans la requête SQL :
-                    # pm.id, pm.request_id, pm.field_name, pm.original_value, pm.new_value,
-                    # pm.created_at, pm.modified_by, mr.teacher_id, t.name as teacher_name, mr.request_name
-                    return {
-                        'id': mod[0],
-                        'request_id': mod[1],
-                        'field_name': mod[2],
-                        'original_value': mod[3],
-                        'new_value': mod[4],
-                        'created_at': mod[5],
-                        'modified_by': mod[6],
-                        'teacher_id': mod[7] if len(mod) > 7 else None,
-                        'teacher_name': mod[8] if len(mod) > 8 else '',
-                        'request_name': mod[9] if len(mod) > 9 else ''
-                    }
-            
             # Convert to list of dicts for JSON serialization
             modifications_list = []
-            for mod in modifications:
-                mod_dict = to_dict(mod)
+            for mod_dict in modifications:
                 modifications_list.append({
                     'id': mod_dict.get('id'),
                     'request_id': mod_dict.get('request_id'),
@@ -1720,26 +1898,8 @@ def api_get_working_days():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     try:
+        # Format: [{date (YYYY-MM-DD), is_working_day (bool), description}]
         config = get_working_days_config(start_date, end_date)
-        # Format: [{date, is_working_day, description}]
-        # Ensure is_working_day is bool and date is YYYY-MM-DD
-        for item in config:
-            item['is_working_day'] = bool(item['is_working_day'])
-            # Convert date to YYYY-MM-DD if needed
-            if item['date']:
-                if isinstance(item['date'], str) and len(item['date']) > 10:
-                    # Try to parse RFC 1123 or other formats
-                    from dateutil import parser
-                    try:
-                        dt = parser.parse(item['date'])
-                        item['date'] = dt.strftime('%Y-%m-%d')
-                    except Exception:
-                        pass
-                elif isinstance(item['date'], (str,)) and len(item['date']) == 10:
-                    # Already correct format
-                    pass
-                elif hasattr(item['date'], 'strftime'):
-                    item['date'] = item['date'].strftime('%Y-%m-%d')
         return jsonify(config)
     except Exception as e:
         return api_error('Erreur lors de la récupération des jours ouvrés', e)
@@ -1870,27 +2030,7 @@ def api_export_rooms_csv():
         ])
         
         # Données
-        for room in rooms:
-            # Compatibilité PostgreSQL/SQLite : transformer en dict si besoin
-            if isinstance(room, dict):
-                r = room
-            elif hasattr(room, '_fields'):
-                r = room._asdict()
-            else:
-                r = {
-                    'name': room[0],
-                    'type': room[1],
-                    'ordinateurs': room[2],
-                    'chaises': room[3],
-                    'eviers': room[4],
-                    'hotte': room[5],
-                    'bancs_optiques': room[6],
-                    'obscurite_totale': room[7],
-                    'becs_electriques': room[8],
-                    'support_filtration': room[9],
-                    'imprimante': room[10],
-                    'examen': room[11]
-                }
+        for r in rooms:
             writer.writerow([
                 r['name'], r['type'], r['ordinateurs'], r['chaises'],
                 r['eviers'], r['hotte'], r['bancs_optiques'], r['obscurite_totale'],
@@ -1965,11 +2105,40 @@ def api_delete_student(student_id):
         return api_error('Erreur lors de la suppression de l\'effectif', e)
 
 # Routes API pour l'éditeur de planning
+# Ordre des salles du fichier Excel et horaires de début de cours autorisés
+EDITOR_ROOM_ORDER = ['C23', 'C25', 'C27', 'C22', 'C24', 'C32', 'C33', 'C31', 'C21']
+EDITOR_TIME_SLOTS = ['9h00', '9h30', '10h00', '10h45', '11h15', '11h45', '12h15', '12h45',
+                     '13h15', '13h45', '14h15', '14h45', '15h15', '15h45', '16h15', '16h45', '17h15']
+
+
+def _editor_planning_data(target_date, incremental=False, profile=None, progression=None):
+    """Données de l'éditeur pour un jour (optimisation OR-Tools), salles dans
+    l'ordre du fichier Excel et horaires de début autorisés."""
+    # Utiliser la version V2 qui fait l'optimisation OR-Tools
+    planning_data = get_planning_data_for_editor_v2(target_date, incremental=incremental, profil=profile,
+                                                    progression=progression)
+
+    # Corriger l'ordre des salles pour correspondre au fichier Excel
+    if 'rooms' in planning_data and planning_data['rooms']:
+        # Réorganiser les salles selon l'ordre correct
+        rooms_dict = {room['name']: room for room in planning_data['rooms']}
+        planning_data['rooms'] = [rooms_dict[name] for name in EDITOR_ROOM_ORDER if name in rooms_dict]
+
+    # Utiliser seulement les horaires de début de cours autorisés
+    planning_data['time_slots'] = list(EDITOR_TIME_SLOTS)
+    return planning_data
+
+
 @app.route('/api/planning-editor/data', methods=['GET'])
 def api_get_planning_data():
-    """API endpoint pour récupérer les données du planning initial pour un jour donné"""
+    """API endpoint pour récupérer les données du planning initial pour un jour donné.
+    incremental=1 : re-planification à partir du planning enregistré (les cours
+    inchangés gardent leur salle, seuls les cours ajoutés ou déplacés sont placés).
+    profile : profil de l'optimiseur ; statistiques de la résolution sous 'solver'."""
     try:
         target_date = request.args.get('date')
+        incremental = request.args.get('incremental', '').lower() in ('1', 'true', 'yes')
+        profile = request.args.get('profile')
         
         if not target_date:
             return jsonify({'error': 'La date est requise'}), 400
@@ -1978,22 +2147,7 @@ def api_get_planning_data():
         print(f"🔍 API: Génération OR-Tools pour {target_date}")
         
         try:
-            # Utiliser la version V2 qui fait l'optimisation OR-Tools
-            planning_data = get_planning_data_for_editor_v2(target_date)
-            
-            # Corriger l'ordre des salles pour correspondre au fichier Excel
-            if 'rooms' in planning_data and planning_data['rooms']:
-                # Ordre correct du fichier Excel
-                correct_order = ['C23', 'C25', 'C27', 'C22', 'C24', 'C32', 'C33', 'C31', 'C21']
-                
-                # Réorganiser les salles selon l'ordre correct
-                rooms_dict = {room['name']: room for room in planning_data['rooms']}
-                planning_data['rooms'] = [rooms_dict[name] for name in correct_order if name in rooms_dict]
-            
-            # Utiliser seulement les horaires de début de cours autorisés
-            authorized_time_slots = ['9h00', '9h30', '10h00', '10h45', '11h15', '11h45', '12h15', '12h45',
-                                     '13h15', '13h45', '14h15', '14h45', '15h15', '15h45', '16h15', '16h45', '17h15']
-            planning_data['time_slots'] = authorized_time_slots
+            planning_data = _editor_planning_data(target_date, incremental=incremental, profile=profile)
             
             print(f"🔍 API: OR-Tools terminé - {len(planning_data.get('courses', []))} cours, {len(planning_data.get('rooms', []))} salles")
             return jsonify(planning_data)
@@ -2003,8 +2157,8 @@ def api_get_planning_data():
             # En cas d'erreur, retourner une structure vide
             return jsonify({
                 'courses': [],
-                'rooms': [{'name': name} for name in ['C23', 'C25', 'C27', 'C22', 'C24', 'C32', 'C33', 'C31', 'C21']],
-                'time_slots': ['9h00', '9h30', '10h00', '10h45', '11h15', '11h45', '12h15', '12h45', '13h15', '13h45', '14h15', '14h45', '15h15', '15h45', '16h15', '16h45', '17h15'],
+                'rooms': [{'name': name} for name in EDITOR_ROOM_ORDER],
+                'time_slots': list(EDITOR_TIME_SLOTS),
                 'room_assignments': {},
                 'days': [target_date],
                 'error': str(e)
@@ -2027,7 +2181,8 @@ def api_planning_editor_course(request_id):
 
 @app.route('/api/planning-editor/generate', methods=['POST'])
 def api_generate_planning_from_editor():
-    """API endpoint pour générer le planning Excel avec les assignations personnalisées"""
+    """API endpoint pour générer le planning Excel avec les assignations personnalisées
+    (412 si If-None-Match contient l'ETag du classeur, calculé avant toute résolution)"""
     try:
         data = request.get_json()
         assignments = data.get('assignments', {})
@@ -2038,33 +2193,20 @@ def api_generate_planning_from_editor():
             return jsonify({'error': 'La date est requise'}), 400
         
         print(f"🔍 Génération Excel avec room_assignments: {room_assignments}")
+        conditional = _conditional_response(lambda: empreinte_classeur_jour(target_date, room_assignments,
+                                                                            data.get('profile')))
+        if conditional is not None:
+            return conditional
         
         # Utiliser exactement la même logique que /api/generate-planning mais avec assignations custom
-        success, result = generer_planning_excel(target_date, custom_room_assignments=room_assignments)
+        solver_stats, artifact = {}, {}
+        success, result = generer_planning_excel(target_date, custom_room_assignments=room_assignments,
+                                                 profil=data.get('profile'), statistiques=solver_stats,
+                                                 artefact=artifact)
         
         if not success:
             return jsonify({'error': result}), 500
         
-        # Si result est un string (chemin de fichier), lire le fichier
-        if isinstance(result, str):
-            try:
-                with open(result, 'rb') as f:
-                    file_content = f.read()
-            except FileNotFoundError:
-                return jsonify({'error': f'Fichier généré non trouvé: {result}'}), 500
-                
-            # Nettoyer le fichier temporaire
-            import os
-            try:
-                os.remove(result)
-            except:
-                pass
-                
-            file_data = file_content
-        else:
-            # Si result est un BytesIO (buffer mémoire)
-            file_data = result.getvalue()
-        
         # Créer la réponse avec le même nommage que la page planning
         from datetime import datetime
         try:
@@ -2076,14 +2218,169 @@ def api_generate_planning_from_editor():
         except:
             filename = f"planning_{target_date}.xlsx"
         
-        response = make_response(file_data)
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response = _xlsx_response(result, filename, artifact)
+        _set_solver_headers(response, solver_stats)
         return response
             
     except Exception as e:
         return api_error('Erreur lors de la génération du planning depuis l\'éditeur', e)
 
+@app.route('/api/planning-editor/grid', methods=['POST'])
+def api_planning_editor_grid():
+    """Grille du planning telle qu'elle sera exportée (créneaux × salles, cours
+    placés avec leur durée en créneaux), avec les salles choisies dans l'éditeur.
+    JSON : {"date": "YYYY-MM-DD", "room_assignments": {...}, "profile": ...}."""
+    try:
+        data = request.get_json(silent=True) or {}
+        target_date = data.get('date')
+        if not target_date:
+            return jsonify({'error': 'La date est requise'}), 400
+
+        solver_stats = {}
+        success, result = generer_planning_excel(target_date, custom_room_assignments=data.get('room_assignments'),
+                                                 profil=data.get('profile'), statistiques=solver_stats,
+                                                 return_grid=True)
+        if not success:
+            return jsonify({'error': result}), 404
+        return jsonify(dict(result.to_dict(), solver=solver_stats))
+    except Exception as e:
+        return api_error('Erreur lors du calcul de la grille du planning', e)
+
+# Générations de planning en arrière-plan (planning_jobs.py) : la requête crée
+# une tâche et rend la main, le navigateur suit sa progression puis récupère
+# le résultat. Une demande identique à une tâche en cours la rejoint.
+def _job_planning_workbook(params, progression):
+    """Tâche 'planning' : classeur Excel du jour, avec les salles choisies
+    dans l'éditeur si room_assignments."""
+    solver_stats, artifact = {}, {}
+    success, result = generer_planning_excel(params['date'], custom_room_assignments=params.get('room_assignments'),
+                                             profil=params.get('profile'), statistiques=solver_stats,
+                                             progression=progression, artefact=artifact)
+    if not success:
+        raise PlanningJobError(result)
+    return {
+        'filename': _planning_filename(params['date']),
+        'workbook': base64.b64encode(result.getvalue()).decode('ascii'),
+        'solver': solver_stats,
+        'artifact': artifact,
+    }
+
+
+def _job_week_workbook(params, progression):
+    """Tâche 'week' : classeur de la semaine du jour params['date']."""
+    artifact = {}
+    days, buffer = generer_classeur_semaine(params['date'], profil=params.get('profile'), artefact=artifact)
+    if buffer is None:
+        raise PlanningJobError('Aucun jour planifié pour cette semaine')
+    return {
+        'filename': _week_filename(days),
+        'workbook': base64.b64encode(buffer.getvalue()).decode('ascii'),
+        'days': days,
+        'artifact': artifact,
+    }
+
+
+def _job_editor_data(params, progression):
+    """Tâche 'editor' : données de l'éditeur, comme /api/planning-editor/data."""
+    planning_data = _editor_planning_data(params['date'], incremental=params.get('incremental', False),
+                                          profile=params.get('profile'), progression=progression)
+    if planning_data.get('error'):
+        raise PlanningJobError(planning_data['error'])
+    return planning_data
+
+
+register_job_kind('planning', _job_planning_workbook)
+register_job_kind('editor', _job_editor_data)
+register_job_kind('week', _job_week_workbook)
+
+
+@app.route('/api/planning-jobs', methods=['POST'])
+def submit_planning_job():
+    """Lance une génération de planning en arrière-plan.
+
+    JSON : {"kind": "planning" (classeur Excel, défaut) | "editor" (données de
+    l'éditeur) | "week" (classeur de la semaine de date), "date": "YYYY-MM-DD", "profile": profil de l'optimiseur,
+    "incremental": re-planification (editor), "room_assignments": salles
+    choisies dans l'éditeur (planning)}.
+    Réponse 202 : {"job_id", "coalesced", "status_url", "result_url"} ;
+    coalesced=true si la demande a rejoint une tâche identique en cours.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        kind = data.get('kind') or 'planning'
+        date_str = data.get('date')
+        if kind not in ('planning', 'editor', 'week'):
+            return jsonify({'error': f'Type de tâche inconnu: {kind}'}), 400
+        if not date_str:
+            return jsonify({'error': 'Date manquante'}), 400
+        try:
+            datetime.strptime(date_str, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Format de date invalide (YYYY-MM-DD)'}), 400
+
+        params = {'date': date_str, 'profile': (data.get('profile') or '').strip().lower() or None}
+        if kind == 'editor':
+            params['incremental'] = bool(data.get('incremental'))
+        elif data.get('room_assignments'):
+            params['room_assignments'] = data['room_assignments']
+        job_id, created = get_job_queue().submit(kind, params)
+        return jsonify({
+            'job_id': job_id,
+            'coalesced': not created,
+            'status_url': url_for('planning_job_status', job_id=job_id),
+            'result_url': url_for('planning_job_result', job_id=job_id),
+        }), 202
+    except Exception as e:
+        logging.error(f"Erreur création tâche de planning: {e}")
+        return api_error('Erreur lors du lancement de la génération', e)
+
+
+@app.route('/api/planning-jobs/<job_id>', methods=['GET'])
+def planning_job_status(job_id):
+    """État d'une tâche : status (queued, running, done, failed), error et
+    progress (étape, dernière solution de l'optimiseur : objectif, borne,
+    room_assignments au format de l'éditeur)."""
+    try:
+        job = get_job_queue().get(job_id)
+        if job is None:
+            return jsonify({'error': 'Tâche non trouvée'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return api_error('Erreur lors du suivi de la génération', e)
+
+
+@app.route('/api/planning-jobs/<job_id>/result', methods=['GET'])
+def planning_job_result(job_id):
+    """Résultat d'une tâche terminée : classeur Excel (planning, statistiques
+    dans l'en-tête X-Planning-Solver ; week, en-têtes de generate_planning_week)
+    ou données de l'éditeur (editor).
+    409 tant que la tâche n'est pas terminée, 422 si elle a échoué."""
+    try:
+        job = get_job_queue().get(job_id, with_result=True)
+        if job is None:
+            return jsonify({'error': 'Tâche non trouvée'}), 404
+        if job['status'] == 'failed':
+            return jsonify({'error': job['error'], 'status': job['status']}), 422
+        if job['status'] != 'done':
+            return jsonify({'error': 'Génération en cours', 'status': job['status']}), 409
+
+        result = job['result']
+        if job['kind'] == 'editor':
+            return jsonify(result)
+        artifact = result.get('artifact')
+        if artifact:
+            conditional = _conditional_response(lambda: artifact['etag'], artifact['last_modified'])
+            if conditional is not None:
+                return conditional
+        response = _xlsx_response(base64.b64decode(result['workbook']), result['filename'], result.get('artifact'))
+        if job['kind'] == 'week':
+            _set_week_headers(response, result['days'])
+        _set_solver_headers(response, result.get('solver'))
+        return response
+    except Exception as e:
+        return api_error('Erreur lors de la récupération du planning', e)
+
+
 @app.route('/api/save-planning', methods=['POST'])
 def save_planning():
     """API endpoint to save planning data into the database"""
@@ -1,9 +1,17 @@
 import sqlite3
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import psycopg2.extras
 import os
+import json
 import logging
+import queue
+import threading
+import time
 import unicodedata
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 
 # Configuration des logs
@@ -12,21 +20,521 @@ logger = logging.getLogger(__name__)
 DATABASE_PATH = os.path.join('imagesDemandesMateriel', 'base', 'material_requests.db')
 SQLITE_ALT_PATH = 'demandeMateriel.db'
 
+# Taille du pool PostgreSQL *par worker gunicorn* (chaque worker est un processus
+# distinct avec son propre pool : total = workers x DB_POOL_MAX connexions).
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '4'))
+# Temps d'attente maximal (secondes) pour obtenir une connexion quand le pool est plein
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Une connexion inactive depuis plus longtemps que ce délai est vérifiée (SELECT 1) avant usage
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', '30'))
+
+# Mode SQLite (sans DATABASE_URL) :
+# - 'simple'     : une connexion par appel, journal par défaut (comportement historique)
+# - 'concurrent' : connexions persistantes par thread en WAL + file d'écriture unique
+SQLITE_MODE = os.getenv('SQLITE_MODE', 'simple').strip().lower()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '10000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+# Nombre maximal d'écritures regroupées dans une même transaction par le writer
+SQLITE_WRITE_BATCH = int(os.getenv('SQLITE_WRITE_BATCH', '64'))
+
+# Requêtes du registre exécutées en requêtes préparées côté serveur (PREPARE /
+# EXECUTE) sur PostgreSQL. À désactiver derrière un PgBouncer en mode transaction.
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+# Cache en mémoire des tables de référence : hors requête HTTP, les versions en
+# base sont relues au plus tard après ce délai (secondes). 0 = à chaque lecture.
+REFERENCE_CACHE_CHECK_INTERVAL = float(os.getenv('REFERENCE_CACHE_CHECK_INTERVAL', '1'))
+
+# Taille des lots lus par les exports en flux (iter_material_requests)
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '2000'))
+
+
+class PoolTimeoutError(Exception):
+    """Levée quand aucune connexion du pool ne se libère dans le délai imparti."""
+
+
+class PostgresConnectionPool:
+    """
+    Pool de connexions PostgreSQL thread-safe, propre à un processus.
+
+    - getconn() réutilise une connexion inactive (vérifiée si elle est restée
+      inactive trop longtemps), en ouvre une nouvelle tant que maxconn n'est pas
+      atteint, sinon attend qu'une connexion soit rendue (au plus `timeout` s).
+    - putconn() annule toute transaction en cours et remet la connexion en
+      autocommit avant de la rendre disponible.
+    - stats() renvoie les compteurs utilisés pour la supervision.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=4, timeout=10.0, healthcheck_idle=30.0):
+        self.dsn = dsn
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (connexion, instant de dernière utilisation)
+        self._open = 0
+        self._in_use = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'healthchecks': 0,
+        }
+        for _ in range(self.minconn):
+            conn = self._connect()
+            with self._cond:
+                self._open += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        logger.info("Ouverture d'une connexion PostgreSQL (pool)")
+        conn = psycopg2.connect(self.dsn, connection_factory=StatementConnection)
+        conn.autocommit = True
+        register_text_typecasters(conn)
+        with self._cond:
+            self._stats['connections_created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        with self._cond:
+            self._stats['healthchecks'] += 1
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Connexion PostgreSQL inutilisable, remplacée: {e}")
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._stats['connections_discarded'] += 1
+            self._cond.notify()
+
+    def getconn(self):
+        """Emprunte une connexion saine (bloque au plus `timeout` secondes)."""
+        started = time.monotonic()
+        waited = False
+        while True:
+            conn = None
+            last_used = None
+            with self._cond:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                elif self._open < self.maxconn:
+                    self._open += 1  # réserve la place avant de se connecter hors verrou
+                else:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"Aucune connexion PostgreSQL disponible après {self.timeout}s "
+                            f"({self.maxconn} connexions utilisées)"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._in_use += 1
+                self._stats['checkouts'] += 1
+                if waited:
+                    self._stats['waits'] += 1
+                    self._stats['wait_time_total'] += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn):
+        """Rend une connexion au pool (ou la ferme si elle est cassée)."""
+        with self._cond:
+            self._in_use -= 1
+        if conn.closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if not conn.autocommit:
+                conn.autocommit = True
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._cond:
+            result = dict(self._stats)
+            result.update({
+                'pid': self.pid,
+                'min_connections': self.minconn,
+                'max_connections': self.maxconn,
+                'open_connections': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            })
+        return result
+
+
+class PooledConnection:
+    """
+    Connexion empruntée au pool. S'utilise comme une connexion psycopg2, mais
+    close() la rend au pool au lieu de la fermer : les helpers existants
+    (conn.close() en fin de fonction) bénéficient du pool sans modification.
+    """
+
+    __slots__ = ('_conn', '_pool')
+
+    def __init__(self, conn, pool):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_pool', pool)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError('connection already returned to the pool')
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            self._pool.putconn(conn)
+
+    def __del__(self):
+        # Filet de sécurité pour les helpers qui oublient close() sur exception
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_pg_pool = None
+_pg_pool_lock = threading.Lock()
+# Pools hérités d'un processus parent (fork gunicorn --preload) : on garde une
+# référence pour ne jamais les finaliser, ce qui fermerait les sockets du parent.
+_inherited_pools = []
+
+
+def get_connection_pool():
+    """Retourne le pool PostgreSQL du processus courant (None sans DATABASE_URL)."""
+    global _pg_pool
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        return None
+    pool = _pg_pool
+    if pool is not None and pool.pid == os.getpid() and pool.dsn == database_url:
+        return pool
+    with _pg_pool_lock:
+        if _pg_pool is not None and (_pg_pool.pid != os.getpid() or _pg_pool.dsn != database_url):
+            if _pg_pool.pid != os.getpid():
+                _inherited_pools.append(_pg_pool)
+            else:
+                _pg_pool.closeall()
+            _pg_pool = None
+        if _pg_pool is None:
+            logger.info(f"Création du pool PostgreSQL (min={DB_POOL_MIN}, max={DB_POOL_MAX}, pid={os.getpid()})")
+            _pg_pool = PostgresConnectionPool(
+                database_url,
+                minconn=DB_POOL_MIN,
+                maxconn=DB_POOL_MAX,
+                timeout=DB_POOL_TIMEOUT,
+                healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE,
+            )
+        return _pg_pool
+
+
+def get_pool_stats():
+    """Statistiques du pool de connexions pour la supervision."""
+    pool = _pg_pool
+    if pool is None or pool.pid != os.getpid():
+        stats = {'backend': 'postgresql' if os.getenv('DATABASE_URL') else 'sqlite', 'pool': None}
+        if stats['backend'] == 'sqlite':
+            stats['sqlite_mode'] = SQLITE_MODE
+            writer = _sqlite_writer
+            if writer is not None and writer.pid == os.getpid():
+                stats['sqlite_writer'] = writer.stats()
+        return stats
+    return {'backend': 'postgresql', 'pool': pool.stats()}
+
+
+def _open_sqlite_connection(path, autocommit=False):
+    """Ouvre une connexion SQLite réglée pour l'accès concurrent (WAL, busy timeout, pragmas)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+        isolation_level=None if autocommit else '',
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+def _resolve_sqlite_path():
+    """Chemin SQLite utilisé par le mode concurrent (même ordre de repli que le mode simple)."""
+    try:
+        os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+        return DATABASE_PATH
+    except Exception:
+        return SQLITE_ALT_PATH
+
+
+class PersistentSQLiteConnection:
+    """
+    Connexion SQLite persistante du thread courant. close() ne ferme pas la
+    connexion : il annule seulement une éventuelle transaction non validée,
+    pour que l'appel suivant du même thread reparte d'un état propre.
+    """
+
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn):
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        return getattr(object.__getattribute__(self, '_conn'), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+
+_sqlite_local = threading.local()
+
+
+def _get_sqlite_thread_connection():
+    """Connexion SQLite longue durée propre au thread (et au processus) courant."""
+    state = getattr(_sqlite_local, 'state', None)
+    if state is None or state[0] != os.getpid():
+        path = _resolve_sqlite_path()
+        conn = _open_sqlite_connection(path)
+        logger.info(f"Connexion SQLite persistante (WAL) ouverte: {path} [{threading.current_thread().name}]")
+        state = (os.getpid(), PersistentSQLiteConnection(conn))
+        _sqlite_local.state = state
+    return state[1]
+
+
+class _WriteJob:
+    __slots__ = ('fn', 'done', 'result', 'error')
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SQLiteWriteQueue:
+    """
+    Chemin d'écriture unique du processus en mode SQLite concurrent.
+
+    Un thread dédié dépile les écritures soumises par les threads de requête et
+    les regroupe (jusqu'à SQLITE_WRITE_BATCH) dans une seule transaction
+    BEGIN IMMEDIATE. Chaque écriture s'exécute dans son propre SAVEPOINT : un
+    échec n'annule que l'écriture concernée. Entre workers gunicorn, BEGIN
+    IMMEDIATE + busy_timeout font attendre le verrou d'écriture au lieu de
+    lever « database is locked ».
+    """
+
+    def __init__(self, path, batch_size=64, lock_retries=5):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.lock_retries = lock_retries
+        self.pid = os.getpid()
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {'jobs': 0, 'batches': 0, 'max_batch': 0, 'failed_jobs': 0, 'lock_retries': 0}
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn):
+        """Exécute fn(cursor, 'sqlite') sur le writer et renvoie son résultat (ou relève son exception)."""
+        if threading.current_thread() is self._thread:
+            # Écriture imbriquée depuis un job : déjà dans la transaction du writer
+            return fn(self._conn.cursor(), 'sqlite')
+        job = _WriteJob(fn)
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stats(self):
+        with self._stats_lock:
+            result = dict(self._stats)
+        result['pending'] = self._queue.qsize()
+        result['pid'] = self.pid
+        return result
+
+    def _run(self):
+        self._conn = _open_sqlite_connection(self.path, autocommit=True)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._execute_batch(batch)
+
+    def _begin(self):
+        for attempt in range(self.lock_retries + 1):
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                if attempt == self.lock_retries:
+                    raise
+                with self._stats_lock:
+                    self._stats['lock_retries'] += 1
+                time.sleep(0.05 * (attempt + 1))
+
+    def _execute_batch(self, batch):
+        conn = self._conn
+        try:
+            self._begin()
+            for job in batch:
+                conn.execute('SAVEPOINT write_job')
+                try:
+                    job.result = job.fn(conn.cursor(), 'sqlite')
+                    conn.execute('RELEASE write_job')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                    job.error = e
+            conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Échec du lot d'écritures SQLite ({len(batch)} écriture(s)): {e}")
+            if conn.in_transaction:
+                try:
+                    conn.execute('ROLLBACK')
+                except Exception:
+                    pass
+            for job in batch:
+                if job.error is None:
+                    job.error = e
+                    job.result = None
+        with self._stats_lock:
+            self._stats['jobs'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['max_batch'] = max(self._stats['max_batch'], len(batch))
+            self._stats['failed_jobs'] += sum(1 for job in batch if job.error is not None)
+        for job in batch:
+            job.done.set()
+
+
+_sqlite_writer = None
+_sqlite_writer_lock = threading.Lock()
+
+
+def _get_sqlite_writer():
+    global _sqlite_writer
+    writer = _sqlite_writer
+    if writer is not None and writer.pid == os.getpid():
+        return writer
+    with _sqlite_writer_lock:
+        if _sqlite_writer is None or _sqlite_writer.pid != os.getpid():
+            _sqlite_writer = SQLiteWriteQueue(_resolve_sqlite_path(), batch_size=SQLITE_WRITE_BATCH)
+        return _sqlite_writer
+
+
+def _sqlite_concurrent_mode():
+    return SQLITE_MODE == 'concurrent' and not os.getenv('DATABASE_URL')
+
+
+def run_write(fn):
+    """
+    Exécute fn(cursor, db_type) comme une écriture atomique et renvoie son résultat.
+
+    - SQLite concurrent : sérialisée et regroupée par la file d'écriture du processus
+    - PostgreSQL / SQLite simple : transaction sur une connexion dédiée
+    """
+    if _sqlite_concurrent_mode():
+        return _get_sqlite_writer().submit(fn)
+    with db_connection() as (conn, db_type):
+        if db_type == 'postgresql':
+            conn.autocommit = False
+        try:
+            result = fn(conn.cursor(), db_type)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return result
+
+
 def get_db_connection():
     """Get database connection - PostgreSQL en priorité, SQLite en fallback"""
     
-    # Essayer PostgreSQL d'abord
-    database_url = os.getenv('DATABASE_URL')
-    if database_url:
+    # Essayer PostgreSQL d'abord (connexion empruntée au pool du worker)
+    if os.getenv('DATABASE_URL'):
         try:
-            logger.info("Tentative de connexion PostgreSQL")
-            conn = psycopg2.connect(database_url)
-            conn.autocommit = True
-            logger.info("Connexion PostgreSQL réussie")
-            return conn, 'postgresql'
+            pool = get_connection_pool()
+            return PooledConnection(pool.getconn(), pool), 'postgresql'
+        except PoolTimeoutError:
+            raise
         except Exception as e:
             logger.warning(f"Échec PostgreSQL: {e}")
     
+    if SQLITE_MODE == 'concurrent':
+        return _get_sqlite_thread_connection(), 'sqlite'
+
     # Fallback vers SQLite: try both paths
     try:
         os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
@@ -40,11 +548,678 @@ def get_db_connection():
         logger.info(f"Fallback vers SQLite: {SQLITE_ALT_PATH}")
         return conn, 'sqlite'
 
-def init_database():
-    """Initialize the database with required tables"""
+
+@contextmanager
+def db_connection():
+    """
+    Context manager autour de get_db_connection() : la connexion est toujours
+    rendue (pool PostgreSQL) ou fermée (SQLite), même en cas d'exception.
+
+        with db_connection() as (conn, db_type):
+            cursor = conn.cursor()
+            ...
+    """
     conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
+    try:
+        yield conn, db_type
+    finally:
+        conn.close()
+
+# === ADAPTATEUR DE LIGNES ===
+
+# Toutes les requêtes de lecture renvoient des dicts de même forme sur les deux
+# backends : PostgreSQL (tuples) et SQLite (sqlite3.Row, booléens 0/1). La
+# conversion est compilée une seule fois par liste de colonnes, sans test de
+# type ligne par ligne.
+
+# Colonnes stockées en BOOLEAN (PostgreSQL) ou INTEGER 0/1 (SQLite)
+BOOLEAN_COLUMNS = frozenset({'prepared', 'modified', 'exam', 'is_working_day'})
+
+# Valeurs par défaut quand la colonne est NULL ou vide
+COLUMN_DEFAULTS = {
+    'selected_materials': '',
+    'computers_needed': 0,
+    'group_count': 1,
+    'room_type': 'Mixte',
+}
+
+
+# Les dates et heures PostgreSQL sont décodées directement dans le format texte
+# stocké par SQLite ('YYYY-MM-DD', 'YYYY-MM-DD HH:MM:SS[.ffffff]', 'HH:MM'),
+# sans passer par des objets date/datetime à reformater ensuite.
+PG_DATE_AS_TEXT = psycopg2.extensions.new_type(
+    (1082, 1114, 1184), 'DATE_AS_TEXT', lambda value, cursor: value)
+PG_TIME_AS_TEXT = psycopg2.extensions.new_type(
+    (1083, 1266), 'TIME_AS_TEXT', lambda value, cursor: value[:5] if value is not None else None)
+
+
+def register_text_typecasters(conn):
+    psycopg2.extensions.register_type(PG_DATE_AS_TEXT, conn)
+    psycopg2.extensions.register_type(PG_TIME_AS_TEXT, conn)
+
+
+class RowAdapter:
+    """
+    Conversion ligne -> dict compilée pour une forme de résultat donnée.
+
+    Une fonction dédiée est générée une fois (comme collections.namedtuple) :
+    dépaquetage positionnel de la ligne et conversions écrites en ligne, sans
+    boucle ni test de type par colonne.
+    """
+
+    __slots__ = ('columns', 'convert_row')
+
+    def __init__(self, description):
+        self.columns = tuple(col[0] for col in description)
+        items = []
+        for idx, name in enumerate(self.columns):
+            value = f'c{idx}'
+            if name in BOOLEAN_COLUMNS:
+                value = f'bool({value})'
+            elif name in COLUMN_DEFAULTS:
+                value = f'({value} or {COLUMN_DEFAULTS[name]!r})'
+            items.append(f'{name!r}: {value}')
+        unpack = ''.join(f'c{idx}, ' for idx in range(len(self.columns)))
+        source = f"def convert_row(row):\n    {unpack}= row\n    return {{{', '.join(items)}}}\n"
+        namespace = {}
+        exec(source, namespace)
+        self.convert_row = namespace['convert_row']
+
+    def __call__(self, row):
+        return self.convert_row(row)
+
+    def adapt_all(self, rows):
+        return list(map(self.convert_row, rows))
+
+
+_row_adapters = {}
+
+
+def get_row_adapter(description):
+    """Adaptateur (mis en cache) correspondant à cursor.description."""
+    columns = tuple(col[0] for col in description)
+    adapter = _row_adapters.get(columns)
+    if adapter is None:
+        adapter = _row_adapters[columns] = RowAdapter(description)
+    return adapter
+
+
+def fetch_all(cursor):
+    """cursor.fetchall() sous forme de liste de dicts uniformes."""
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+    return get_row_adapter(cursor.description).adapt_all(rows)
+
+
+def fetch_one(cursor):
+    """cursor.fetchone() sous forme de dict uniforme (ou None)."""
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return get_row_adapter(cursor.description)(row)
+
+# === REGISTRE DE REQUÊTES ===
+
+# Les requêtes fixes des chemins de lecture fréquents sont déclarées ici, une
+# seule fois, avec {p} pour chaque paramètre et {true}/{false} pour les
+# littéraux booléens. Chaque requête est compilée une fois par dialecte :
+# - SQLite : texte constant, réutilisé tel quel par le cache de requêtes de sqlite3
+# - PostgreSQL : PREPARE à la première exécution sur une connexion du pool, puis
+#   EXECUTE nom(...) ; le plan est calculé une fois par connexion
+# Les requêtes construites dynamiquement (filtres de get_material_requests,
+# champs de validate_pending_modifications) restent écrites dans leur helper.
+
+MATERIAL_REQUEST_COLUMNS = '''mr.id, mr.teacher_id, mr.request_date, mr.horaire, mr.class_name,
+               mr.material_description, mr.quantity, mr.selected_materials, mr.computers_needed,
+               mr.notes, mr.prepared, mr.modified, mr.group_count, mr.material_prof,
+               mr.request_name, mr.room_type, mr.image_url, mr.exam, mr.created_at,
+               t.name as teacher_name, mr.custom_duration'''
+
+
+class StatementConnection(psycopg2.extensions.connection):
+    """Connexion psycopg2 qui mémorise les requêtes du registre déjà préparées (PREPARE)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+class Statement:
+    """Requête nommée du registre, compilée pour SQLite et PostgreSQL."""
+
+    __slots__ = ('name', 'sql', 'param_count', 'sqlite_sql', 'postgresql_sql', 'prepare_sql', 'execute_sql')
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        parts = sql.split('{p}')
+        self.param_count = len(parts) - 1
+
+        def compile_for(true_val, false_val, placeholders, escape_percent=False):
+            # psycopg2 interprète % dans le texte dès qu'il y a des paramètres
+            texts = [part.replace('%', '%%') for part in parts] if escape_percent else parts
+            text = texts[0]
+            for placeholder, part in zip(placeholders, texts[1:]):
+                text += placeholder + part
+            return text.replace('{true}', true_val).replace('{false}', false_val)
+
+        self.sqlite_sql = compile_for('1', '0', ['?'] * self.param_count)
+        self.postgresql_sql = compile_for('TRUE', 'FALSE', ['%s'] * self.param_count,
+                                          escape_percent=bool(self.param_count))
+        server_name = f'stmt_{name}'
+        self.prepare_sql = f"PREPARE {server_name} AS " + compile_for(
+            'TRUE', 'FALSE', [f'${idx}' for idx in range(1, self.param_count + 1)])
+        if self.param_count:
+            self.execute_sql = f"EXECUTE {server_name} ({', '.join(['%s'] * self.param_count)})"
+        else:
+            self.execute_sql = f'EXECUTE {server_name}'
+
+
+STATEMENTS = {}
+
+
+def register_statement(name, sql):
+    """Déclare une requête nommée (name doit être un identifiant SQL valide)."""
+    if name in STATEMENTS:
+        raise ValueError(f"Requête déjà enregistrée: {name}")
+    STATEMENTS[name] = Statement(name, sql)
+    return STATEMENTS[name]
+
+
+def execute_statement(cursor, db_type, name, params=()):
+    """Exécute la requête nommée `name` sur le curseur et renvoie le curseur."""
+    statement = STATEMENTS[name]
+    if db_type != 'postgresql':
+        cursor.execute(statement.sqlite_sql, params)
+        return cursor
+    prepared = getattr(cursor.connection, 'prepared_statements', None)
+    if not DB_PREPARED_STATEMENTS or prepared is None:
+        cursor.execute(statement.postgresql_sql, params or None)
+        return cursor
+    if name not in prepared:
+        # Une requête préparée survit aux rollbacks : on ne la prépare qu'une fois par connexion
+        cursor.execute(statement.prepare_sql)
+        prepared.add(name)
+    try:
+        cursor.execute(statement.execute_sql, params or None)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # Session réinitialisée (DISCARD ALL...) : elle sera préparée de nouveau au prochain appel
+        prepared.discard(name)
+        raise
+    return cursor
+
+
+register_statement('teachers_all', 'SELECT id, name FROM teachers ORDER BY name')
+register_statement('user_by_email', '''
+    SELECT u.id, u.google_sub, u.email, u.full_name, u.role, u.teacher_id, t.name AS teacher_name
+    FROM users u
+    LEFT JOIN teachers t ON t.id = u.teacher_id
+    WHERE u.email = {p}''')
+register_statement('material_request_by_id', f'''
+    SELECT {MATERIAL_REQUEST_COLUMNS}
+    FROM material_requests mr
+    JOIN teachers t ON mr.teacher_id = t.id
+    WHERE mr.id = {{p}}''')
+register_statement('material_request_update', '''
+    UPDATE material_requests
+    SET teacher_id = {p}, request_date = {p}, horaire = {p}, class_name = {p},
+        material_description = {p}, quantity = {p}, selected_materials = {p},
+        computers_needed = {p}, notes = {p}, group_count = {p}, material_prof = {p},
+        request_name = {p}, custom_duration = {p}, prepared = {false}, modified = {true}
+    WHERE id = {p}''')
+register_statement('material_request_prepared', 'SELECT prepared FROM material_requests WHERE id = {p}')
+register_statement('material_request_mark_prepared',
+                   'UPDATE material_requests SET prepared = {true}, modified = {false} WHERE id = {p}')
+register_statement('material_request_unmark_prepared',
+                   'UPDATE material_requests SET prepared = {false} WHERE id = {p}')
+register_statement('requests_for_calendar', '''
+    SELECT mr.id, mr.request_date, mr.class_name, mr.material_description,
+           mr.quantity, t.name as teacher_name
+    FROM material_requests mr
+    JOIN teachers t ON mr.teacher_id = t.id
+    ORDER BY mr.request_date''')
+register_statement('grouped_requests_by_name', '''
+    SELECT request_date, horaire, class_name
+    FROM material_requests
+    WHERE teacher_id = {p} AND request_name = {p}
+    ORDER BY request_date, horaire''')
+register_statement('planning_data_by_date', f'''
+    SELECT {MATERIAL_REQUEST_COLUMNS}
+    FROM material_requests mr
+    JOIN teachers t ON mr.teacher_id = t.id
+    WHERE mr.request_date = {{p}}
+    AND mr.selected_materials != 'Enseignant absent'
+    ORDER BY mr.horaire, mr.created_at''')
+register_statement('rooms_all', '''
+    SELECT id, name, type, ordinateurs, chaises, eviers, hotte, bancs_optiques,
+           obscurite_totale, becs_electriques, support_filtration, imprimante, examen
+    FROM rooms ORDER BY name''')
+register_statement('student_numbers_all',
+                   'SELECT id, teacher_name, student_count, level FROM student_numbers ORDER BY teacher_name')
+register_statement('working_days_all', '''
+    SELECT date, is_working_day, description
+    FROM working_days_config
+    ORDER BY date''')
+register_statement('c21_availability_all', '''
+    SELECT id, jour, heure_debut, heure_fin, created_at
+    FROM c21_availability
+    ORDER BY
+        CASE jour
+            WHEN 'lundi' THEN 1
+            WHEN 'mardi' THEN 2
+            WHEN 'mercredi' THEN 3
+            WHEN 'jeudi' THEN 4
+            WHEN 'vendredi' THEN 5
+            WHEN 'samedi' THEN 6
+            WHEN 'dimanche' THEN 7
+        END,
+        heure_debut''')
+register_statement('pending_modifications_by_request', '''
+    SELECT pm.id, pm.request_id, pm.field_name, pm.original_value, pm.new_value,
+           pm.created_at, pm.modified_by, mr.teacher_id, t.name as teacher_name, mr.request_name
+    FROM pending_modifications pm
+    JOIN material_requests mr ON pm.request_id = mr.id
+    JOIN teachers t ON mr.teacher_id = t.id
+    WHERE pm.request_id = {p}
+    ORDER BY pm.created_at DESC''')
+register_statement('pending_modifications_all', '''
+    SELECT pm.id, pm.request_id, pm.field_name, pm.original_value, pm.new_value,
+           pm.created_at, pm.modified_by, mr.teacher_id, t.name as teacher_name, mr.request_name
+    FROM pending_modifications pm
+    JOIN material_requests mr ON pm.request_id = mr.id
+    JOIN teachers t ON mr.teacher_id = t.id
+    ORDER BY pm.created_at DESC''')
+register_statement('pending_modification_request_ids', '''
+    SELECT DISTINCT request_id
+    FROM pending_modifications
+    ORDER BY request_id''')
+register_statement('tp_templates_by_level', '''
+    SELECT id, request_name, material_description, selected_materials,
+           material_prof, computers_needed, group_count, notes, image_url, room_type
+    FROM tp_templates
+    WHERE teacher_id = {p} AND level = {p}
+    ORDER BY request_name''')
+register_statement('tp_template_by_id', '''
+    SELECT id, teacher_id, level, request_name, material_description,
+           selected_materials, material_prof, computers_needed,
+           group_count, notes, image_url, room_type
+    FROM tp_templates
+    WHERE id = {p}''')
+
+# === CACHE DES TABLES DE RÉFÉRENCE ===
+
+# teachers, rooms, student_numbers, c21_availability et working_days_config
+# changent quelques fois par trimestre mais sont relues à chaque page et à
+# chaque planning. Chaque processus garde leur contenu en mémoire ; la table
+# cache_versions porte un compteur par table, incrémenté par chaque écriture.
+# Les versions sont relues (une requête pour toutes les tables) à la première
+# lecture en cache de chaque requête HTTP (expire_reference_cache), et hors
+# requête au plus tard après REFERENCE_CACHE_CHECK_INTERVAL secondes : une
+# modification faite par un worker est vue par les autres dès leur requête suivante.
+
+REFERENCE_TABLES = ('teachers', 'rooms', 'student_numbers', 'c21_availability', 'working_days_config')
+
+register_statement('cache_versions_all', 'SELECT table_name, version FROM cache_versions')
+register_statement('cache_version_bump',
+                   'UPDATE cache_versions SET version = version + 1 WHERE table_name = {p}')
+
+
+class ReferenceCache:
+    """
+    Cache lecture-seule par table, invalidé par les compteurs de cache_versions.
+
+    get(table, key, loader) renvoie la valeur mise en cache pour (table, key)
+    si la version de la table n'a pas changé, sinon appelle loader() et la
+    mémorise. Si les versions ne peuvent pas être lues (table absente avant
+    migration...), le cache est contourné.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._entries = {}   # (table, key) -> (version, valeur)
+        self._versions = {}  # table -> version lue en base
+        self._checked_at = None
+        self._stats = {table: {'hits': 0, 'misses': 0, 'invalidations': 0} for table in REFERENCE_TABLES}
+        self._version_checks = 0
+
+    def expire(self):
+        """Force la relecture des versions à la prochaine lecture."""
+        self._checked_at = None
+
+    def _refresh_versions(self):
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return True
+        with db_connection() as (conn, db_type):
+            cursor = execute_statement(conn.cursor(), db_type, 'cache_versions_all')
+            versions = {row[0]: row[1] for row in cursor.fetchall()}
+        with self._lock:
+            self._version_checks += 1
+            for table, version in versions.items():
+                if table in self._versions and self._versions[table] != version:
+                    self._drop(table)
+            self._versions = versions
+            self._checked_at = time.monotonic()
+        return True
+
+    def _drop(self, table):
+        stale = [entry for entry in self._entries if entry[0] == table]
+        for entry in stale:
+            del self._entries[entry]
+        if stale and table in self._stats:
+            self._stats[table]['invalidations'] += 1
+
+    def get(self, table, key, loader):
+        try:
+            self._refresh_versions()
+        except Exception as e:
+            logger.debug(f"Cache de référence contourné ({table}): {e}")
+            return loader()
+        with self._lock:
+            version = self._versions.get(table)
+            entry = self._entries.get((table, key))
+            if version is not None and entry is not None and entry[0] == version:
+                self._stats[table]['hits'] += 1
+                return entry[1]
+            self._stats[table]['misses'] += 1
+        value = loader()
+        if version is not None:
+            with self._lock:
+                # Une écriture pendant le chargement incrémente la version : la
+                # valeur, mémorisée sous l'ancienne, sera rechargée au prochain contrôle
+                self._entries[(table, key)] = (version, value)
+        return value
+
+    def invalidate(self, table):
+        """Après une écriture dans ce processus : vide la table et relit les versions."""
+        with self._lock:
+            self._drop(table)
+            self._checked_at = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions = {}
+            self._checked_at = None
+
+    def stats(self):
+        with self._lock:
+            tables = {table: dict(counters) for table, counters in self._stats.items()}
+            hits = sum(c['hits'] for c in tables.values())
+            misses = sum(c['misses'] for c in tables.values())
+            return {
+                'pid': self.pid,
+                'check_interval': self.check_interval,
+                'version_checks': self._version_checks,
+                'entries': len(self._entries),
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+                'versions': dict(self._versions),
+                'tables': tables,
+            }
+
+
+_reference_cache = None
+_reference_cache_lock = threading.Lock()
+
+
+def get_reference_cache():
+    """Cache de référence du processus courant (recréé après un fork)."""
+    global _reference_cache
+    cache = _reference_cache
+    if cache is not None and cache.pid == os.getpid():
+        return cache
+    with _reference_cache_lock:
+        if _reference_cache is None or _reference_cache.pid != os.getpid():
+            _reference_cache = ReferenceCache(REFERENCE_CACHE_CHECK_INTERVAL)
+        return _reference_cache
+
+
+def expire_reference_cache():
+    """À appeler en début de requête HTTP : les versions seront relues à la première lecture."""
+    cache = _reference_cache
+    if cache is not None and cache.pid == os.getpid():
+        cache.expire()
+
+
+def get_reference_cache_stats():
+    """Compteurs hits/misses du cache de référence du processus courant."""
+    return get_reference_cache().stats()
+
+
+def _cached_rows(table, key, loader):
+    """Lignes en cache, copiées pour que l'appelant puisse les modifier."""
+    return [dict(row) for row in get_reference_cache().get(table, key, loader)]
+
+
+def _bump_reference_version(cursor, db_type, table):
+    """Incrémente la version de `table` (dans la transaction de l'écriture)."""
+    execute_statement(cursor, db_type, 'cache_version_bump', (table,))
+
+
+def _reference_table_written(table):
+    """Invalide localement `table` une fois l'écriture validée."""
+    get_reference_cache().invalidate(table)
+
+# === MIGRATIONS DE SCHÉMA ===
+
+# Identifiant arbitraire du verrou consultatif PostgreSQL pris pendant init_database
+SCHEMA_LOCK_ID = 72310418
+
+
+def _column_exists(cursor, db_type, table, column):
+    if db_type == 'postgresql':
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name=%s AND column_name=%s
+        """, (table, column))
+        return cursor.fetchone() is not None
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(col[1] == column for col in cursor.fetchall())
+
+
+def _add_missing_columns(cursor, db_type, table, columns):
+    for column_name, column_type in columns:
+        if _column_exists(cursor, db_type, table, column_name):
+            continue
+        try:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column_name} {column_type}')
+        except (sqlite3.OperationalError, psycopg2.errors.DuplicateColumn):
+            pass  # Column already exists
+
+
+def _migration_material_requests_columns(cursor, db_type):
+    """Colonnes de material_requests ajoutées après la création initiale de la table."""
+    _add_missing_columns(cursor, db_type, 'material_requests', [
+        ('horaire', 'TEXT'),
+        ('selected_materials', 'TEXT'),
+        ('computers_needed', 'INTEGER DEFAULT 0'),
+        ('prepared', 'BOOLEAN DEFAULT FALSE'),
+        ('modified', 'BOOLEAN DEFAULT FALSE'),
+        ('room_type', "TEXT DEFAULT 'Mixte'"),
+        ('exam', 'BOOLEAN DEFAULT FALSE'),
+        ('group_count', 'INTEGER DEFAULT 1'),
+        ('material_prof', 'TEXT'),
+        ('request_name', 'TEXT'),
+        ('image_url', 'TEXT'),
+        ('custom_duration', 'INTEGER')
+    ])
+
+
+def _migration_users_columns(cursor, db_type):
+    """Colonnes de users ajoutées avec l'authentification Google."""
+    _add_missing_columns(cursor, db_type, 'users', [
+        ('google_sub', 'TEXT'),
+        ('email', 'TEXT'),
+        ('full_name', 'TEXT'),
+        ('role', "TEXT DEFAULT 'teacher'"),
+        ('teacher_id', 'INTEGER'),
+        ('updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+    ])
+
+
+def _migration_rooms_rename_oscilloscopes(cursor, db_type):
+    """Renomme la colonne oscilloscopes en obscurite_totale (matériel peu mobile)."""
+    if _column_exists(cursor, db_type, 'rooms', 'oscilloscopes'):
+        try:
+            cursor.execute('ALTER TABLE rooms RENAME COLUMN oscilloscopes TO obscurite_totale')
+        except (sqlite3.OperationalError, psycopg2.errors.DuplicateColumn):
+            pass
+
+
+def _migration_hot_query_indexes(cursor, db_type):
+    """Index secondaires des requêtes fréquentes (même syntaxe SQLite/PostgreSQL)."""
+    # get_material_requests / export : plage de dates triée par (request_date, created_at)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_material_requests_date '
+                   'ON material_requests (request_date, created_at)')
+    # get_planning_data : un jour donné, trié par horaire puis created_at
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_material_requests_date_horaire '
+                   'ON material_requests (request_date, horaire, created_at)')
+    # get_material_requests filtré par enseignant (+ plage de dates)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_material_requests_teacher_date '
+                   'ON material_requests (teacher_id, request_date, created_at)')
+    # get_grouped_requests_by_name (remplacé par la migration 10)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_material_requests_teacher_name '
+                   'ON material_requests (teacher_id, request_name)')
+    # pending_modifications par demande (validation, rejet, liste)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pending_modifications_request '
+                   'ON pending_modifications (request_id)')
+    # get_tp_templates : (teacher_id, level) trié par request_name est déjà servi par
+    # l'index de la contrainte UNIQUE (teacher_id, level, request_name)
+
+
+def _migration_requests_keyset_index(cursor, db_type):
+    """Pagination par clé (request_date, created_at, id) de /api/requests."""
+    # Une ligne sans created_at serait sautée par la comparaison de tuples (NULL)
+    cursor.execute('UPDATE material_requests SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_material_requests_keyset '
+                   'ON material_requests (request_date, created_at, id)')
+    # (request_date, created_at) est un préfixe du nouvel index
+    cursor.execute('DROP INDEX IF EXISTS idx_material_requests_date')
+
+
+def _migration_cache_versions(cursor, db_type):
+    """Compteurs de version des tables de référence (invalidation du cache entre workers)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    placeholder = '%s' if db_type == 'postgresql' else '?'
+    for table in REFERENCE_TABLES:
+        cursor.execute(f'''
+            INSERT INTO cache_versions (table_name, version) VALUES ({placeholder}, 0)
+            ON CONFLICT (table_name) DO NOTHING
+        ''', (table,))
+
+
+def _migration_planning_solutions(cursor, db_type):
+    """Solutions de l'optimiseur de planning, indexées par empreinte de leurs entrées."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS planning_solutions (
+            cache_key TEXT PRIMARY KEY,
+            solution TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Purge des plus anciennes (save_planning_solution)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_planning_solutions_created '
+                   'ON planning_solutions (created_at)')
+
+
+def _migration_planning_jobs(cursor, db_type):
+    """Générations de planning exécutées en arrière-plan (planning_jobs.py)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS planning_jobs (
+            job_id TEXT PRIMARY KEY,
+            job_key TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress TEXT,
+            result TEXT,
+            error TEXT,
+            created_at DOUBLE PRECISION NOT NULL,
+            updated_at DOUBLE PRECISION NOT NULL
+        )
+    ''')
+    # Une seule tâche en cours par clé : les demandes identiques la rejoignent
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_planning_jobs_active ON planning_jobs (job_key) "
+                   "WHERE status IN ('queued', 'running')")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_planning_jobs_created ON planning_jobs (created_at)')
+
+
+def _migration_planning_artifacts(cursor, db_type):
+    """Classeurs de planning déjà rendus, indexés par empreinte de leur contenu."""
+    contenu = 'BYTEA' if db_type == 'postgresql' else 'BLOB'
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS planning_artifacts (
+            cache_key TEXT PRIMARY KEY,
+            content {contenu} NOT NULL,
+            created_at DOUBLE PRECISION NOT NULL
+        )
+    ''')
+    # Purge des plus anciens (save_planning_artifact)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_planning_artifacts_created '
+                   'ON planning_artifacts (created_at)')
+
+
+def _migration_grouped_requests_index(cursor, db_type):
+    """get_grouped_requests_by_name : index couvrant aussi le tri (request_date, horaire)."""
+    # (teacher_id, request_name) seul n'était jamais choisi : l'index (teacher_id,
+    # request_date, created_at) plus un tri temporaire lui était préféré
+    cursor.execute('DROP INDEX IF EXISTS idx_material_requests_teacher_name')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_material_requests_teacher_name_date '
+                   'ON material_requests (teacher_id, request_name, request_date, horaire)')
+
+
+# (version, description, fonction) — ordre croissant, ne jamais renuméroter ni supprimer
+SCHEMA_MIGRATIONS = [
+    (1, 'material_requests: colonnes ajoutées', _migration_material_requests_columns),
+    (2, 'users: colonnes authentification Google', _migration_users_columns),
+    (3, 'rooms: oscilloscopes -> obscurite_totale', _migration_rooms_rename_oscilloscopes),
+    (4, 'index des requêtes fréquentes', _migration_hot_query_indexes),
+    (5, 'index de pagination des demandes', _migration_requests_keyset_index),
+    (6, 'versions du cache des tables de référence', _migration_cache_versions),
+    (7, "cache des solutions de l'optimiseur de planning", _migration_planning_solutions),
+    (8, 'générations de planning en arrière-plan', _migration_planning_jobs),
+    (9, 'cache des classeurs de planning rendus', _migration_planning_artifacts),
+    (10, 'index de get_grouped_requests_by_name', _migration_grouped_requests_index),
+]
+
+
+def apply_migrations(cursor, db_type):
+    """
+    Applique, dans l'ordre, les migrations pas encore enregistrées dans
+    schema_version. Une base déjà à jour ne fait qu'un SELECT.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('SELECT version FROM schema_version')
+    applied = {row[0] for row in cursor.fetchall()}
+    placeholder = '%s' if db_type == 'postgresql' else '?'
+    for version, description, migrate in SCHEMA_MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Migration de schéma {version}: {description}")
+        migrate(cursor, db_type)
+        cursor.execute(
+            f'INSERT INTO schema_version (version, description) VALUES ({placeholder}, {placeholder})',
+            (version, description)
+        )
+
+
+def _init_schema(cursor, db_type):
+    """Crée les tables, applique les migrations et insère les données d'exemple."""
     # Adapter la syntaxe selon le type de base de données
     if db_type == 'postgresql':
         auto_increment = 'SERIAL PRIMARY KEY'
@@ -106,61 +1281,6 @@ def init_database():
         )
     ''')
     
-    # Ajout des colonnes manquantes si elles n'existent pas (pour migration)
-    columns_to_add = [
-        ('horaire', 'TEXT'),
-        ('selected_materials', 'TEXT'),
-        ('computers_needed', 'INTEGER DEFAULT 0'),
-        ('prepared', 'BOOLEAN DEFAULT FALSE'),
-        ('modified', 'BOOLEAN DEFAULT FALSE'),
-        ('room_type', 'TEXT DEFAULT "Mixte"'),
-        ('exam', 'BOOLEAN DEFAULT FALSE'),
-        ('group_count', 'INTEGER DEFAULT 1'),
-        ('material_prof', 'TEXT'),
-        ('request_name', 'TEXT'),
-        ('image_url', 'TEXT'),
-        ('custom_duration', 'INTEGER')
-    ]
-    
-    for column_name, column_type in columns_to_add:
-        # Vérification préalable pour PostgreSQL
-        if db_type == 'postgresql':
-            cursor.execute("""
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name='material_requests' AND column_name=%s
-            """, (column_name,))
-            exists = cursor.fetchone() is not None
-            if exists:
-                continue
-        try:
-            cursor.execute(f'ALTER TABLE material_requests ADD COLUMN {column_name} {column_type}')
-        except (sqlite3.OperationalError, psycopg2.errors.DuplicateColumn):
-            pass  # Column already exists
-
-    user_columns_to_add = [
-        ('google_sub', 'TEXT'),
-        ('email', 'TEXT'),
-        ('full_name', 'TEXT'),
-        ('role', 'TEXT DEFAULT "teacher"'),
-        ('teacher_id', 'INTEGER'),
-        ('updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
-    ]
-
-    for column_name, column_type in user_columns_to_add:
-        if db_type == 'postgresql':
-            cursor.execute("""
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name='users' AND column_name=%s
-            """, (column_name,))
-            exists = cursor.fetchone() is not None
-            if exists:
-                continue
-        try:
-            cursor.execute(f'ALTER TABLE users ADD COLUMN {column_name} {column_type}')
-        except (sqlite3.OperationalError, psycopg2.errors.DuplicateColumn):
-            pass
-    
-    
     # Create rooms table for planning
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS rooms (
@@ -181,22 +1301,6 @@ def init_database():
         )
     ''')
 
-    # Migration : renommer la colonne oscilloscopes en obscurite_totale (matériel peu mobile)
-    if db_type == 'postgresql':
-        cursor.execute("""
-            SELECT 1 FROM information_schema.columns
-            WHERE table_name='rooms' AND column_name='oscilloscopes'
-        """)
-        has_old_column = cursor.fetchone() is not None
-    else:
-        cursor.execute("PRAGMA table_info(rooms)")
-        has_old_column = any(col[1] == 'oscilloscopes' for col in cursor.fetchall())
-    if has_old_column:
-        try:
-            cursor.execute('ALTER TABLE rooms RENAME COLUMN oscilloscopes TO obscurite_totale')
-        except (sqlite3.OperationalError, psycopg2.errors.DuplicateColumn):
-            pass
-
     # Create student numbers table for 2nd level classes
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS student_numbers (
@@ -276,6 +1380,9 @@ def init_database():
         )
     ''')
     
+    # Migrations ordonnées (colonnes ajoutées, renommages, index) : chacune ne s'exécute qu'une fois
+    apply_migrations(cursor, db_type)
+
     # Insert sample data if tables are empty
     cursor.execute('SELECT COUNT(*) FROM rooms')
     row = cursor.fetchone()
@@ -352,9 +1459,23 @@ def init_database():
         ]
         teacher_placeholder = '%s' if db_type == 'postgresql' else '?'
         cursor.executemany(f'INSERT INTO teachers (name) VALUES ({teacher_placeholder})', sample_teachers)
-    
-    conn.commit()
-    conn.close()
+
+
+def init_database():
+    """Initialize the database with required tables"""
+    conn, db_type = get_db_connection()
+    cursor = conn.cursor()
+
+    # Les workers gunicorn démarrent en parallèle : un seul initialise le schéma à la fois
+    if db_type == 'postgresql':
+        cursor.execute('SELECT pg_advisory_lock(%s)', (SCHEMA_LOCK_ID,))
+    try:
+        _init_schema(cursor, db_type)
+        conn.commit()
+    finally:
+        if db_type == 'postgresql':
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (SCHEMA_LOCK_ID,))
+        conn.close()
 
 # Fonctions de base de données SQLite
 
@@ -370,8 +1491,10 @@ def add_teacher(name):
     else:
         cursor.execute(f'INSERT INTO teachers (name) VALUES ({placeholder})', (name.strip(),))
         new_id = cursor.lastrowid
+    _bump_reference_version(cursor, db_type, 'teachers')
     conn.commit()
     conn.close()
+    _reference_table_written('teachers')
     return new_id
 
 
@@ -384,29 +1507,23 @@ def delete_teacher(teacher_id):
     row = cursor.fetchone()
     request_count = row[0] if row else 0
     cursor.execute(f'DELETE FROM teachers WHERE id = {placeholder}', (teacher_id,))
+    _bump_reference_version(cursor, db_type, 'teachers')
     conn.commit()
     conn.close()
+    _reference_table_written('teachers')
     return request_count
 
 
 def get_all_teachers():
-    """Get all teachers from the database"""
-    conn, db_type = get_db_connection()
-    if db_type == 'postgresql':
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM teachers ORDER BY name')
-        rows = cursor.fetchall()
-        # rows is a list of tuples (id, name)
-        teachers = [{'id': row[0], 'name': row[1]} for row in rows]
-    else:
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM teachers ORDER BY name')
-        rows = cursor.fetchall()
-        # rows is a list of sqlite3.Row or tuples
-        teachers = [{'id': row['id'], 'name': row['name']} if isinstance(row, sqlite3.Row) else {'id': row[0], 'name': row[1]} for row in rows]
-    print("DEBUG teachers:", teachers)
-    conn.close()
-    return teachers
+    """Get all teachers from the database (cache de référence)"""
+    def load():
+        conn, db_type = get_db_connection()
+        cursor = execute_statement(conn.cursor(), db_type, 'teachers_all')
+        teachers = fetch_all(cursor)
+        conn.close()
+        return teachers
+
+    return _cached_rows('teachers', 'all', load)
 
 
 def _normalize_name(s):
@@ -418,45 +1535,21 @@ def find_teacher_id_by_name(teacher_name):
     """Find teacher ID by name (case and accent insensitive)."""
     if not teacher_name:
         return None
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, name FROM teachers')
-    rows = cursor.fetchall()
-    conn.close()
+    rows = get_all_teachers()
     target = _normalize_name(teacher_name)
     for row in rows:
-        db_name = row['name'] if isinstance(row, dict) else row[1]
-        if _normalize_name(db_name) == target:
-            return row['id'] if isinstance(row, dict) else row[0]
+        if _normalize_name(row['name']) == target:
+            return row['id']
     return None
 
 
 def get_user_by_email(email):
     """Get user by email address."""
     conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    cursor.execute(f'''
-        SELECT u.id, u.google_sub, u.email, u.full_name, u.role, u.teacher_id, t.name AS teacher_name
-        FROM users u
-        LEFT JOIN teachers t ON t.id = u.teacher_id
-        WHERE u.email = {placeholder}
-    ''', (email,))
-    row = cursor.fetchone()
+    cursor = execute_statement(conn.cursor(), db_type, 'user_by_email', (email,))
+    user = fetch_one(cursor)
     conn.close()
-    if not row:
-        return None
-    if isinstance(row, dict):
-        return row
-    return {
-        'id': row[0],
-        'google_sub': row[1],
-        'email': row[2],
-        'full_name': row[3],
-        'role': row[4],
-        'teacher_id': row[5],
-        'teacher_name': row[6]
-    }
+    return user
 
 
 def upsert_user(google_sub, email, full_name, role='teacher', teacher_id=None):
@@ -540,231 +1633,326 @@ def get_all_users():
         LEFT JOIN teachers t ON t.id = u.teacher_id
         ORDER BY u.email
     ''')
-    rows = cursor.fetchall()
+    users = fetch_all(cursor)
     conn.close()
-    result = []
-    for row in rows:
-        if isinstance(row, dict):
-            result.append(dict(row))
-        else:
-            result.append({
-                'id': row[0], 'email': row[1], 'full_name': row[2],
-                'role': row[3], 'teacher_id': row[4], 'teacher_name': row[5]
-            })
-    return result
+    return users
+
+
+MATERIAL_REQUEST_INSERT_COLUMNS = (
+    'teacher_id', 'request_date', 'horaire', 'class_name', 'material_description', 'quantity',
+    'selected_materials', 'computers_needed', 'notes', 'exam', 'group_count', 'material_prof',
+    'request_name', 'image_url', 'custom_duration'
+)
+
+
+def _coerce_group_count(group_count):
+    """Nombre de groupes entier >= 1 (1 par défaut)."""
+    try:
+        group_count = int(group_count) if group_count is not None else 1
+        return group_count if group_count >= 1 else 1
+    except Exception:
+        return 1
 
 
 def add_material_request(teacher_id, request_date, class_name, material_description,
                         horaire=None, quantity=1, selected_materials='', computers_needed=0,
                         notes='', exam=False, group_count=1, material_prof='', request_name='', image_url='', custom_duration=None):
     """Add a new material request"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    # Coerce group_count to an integer with a safe default
-    try:
-        group_count = int(group_count) if group_count is not None else 1
-        if group_count < 1:
-            group_count = 1
-    except Exception:
-        group_count = 1
+    group_count = _coerce_group_count(group_count)
 
-    placeholders = ', '.join(['%s' if db_type == 'postgresql' else '?'] * 15)
-    cursor.execute(f'''
-        INSERT INTO material_requests
+    def write(cursor, db_type):
+        placeholders = ', '.join(['%s' if db_type == 'postgresql' else '?'] * len(MATERIAL_REQUEST_INSERT_COLUMNS))
+        query = f'''
+            INSERT INTO material_requests ({', '.join(MATERIAL_REQUEST_INSERT_COLUMNS)})
+            VALUES ({placeholders})
+        '''
+        params = (teacher_id, request_date, horaire, class_name, material_description, quantity,
+                  selected_materials, computers_needed, notes, exam, group_count, material_prof,
+                  request_name, image_url, custom_duration)
+        if db_type == 'postgresql':
+            # lastrowid vaut 0 avec psycopg2 : l'id vient de RETURNING
+            cursor.execute(query + ' RETURNING id', params)
+            return cursor.fetchone()[0]
+        cursor.execute(query, params)
+        return cursor.lastrowid
+
+    return run_write(write)
+
+
+def add_material_requests_bulk(teacher_id, slots, class_name, material_description,
+                               quantity=1, selected_materials='', computers_needed=0, notes='',
+                               exam=False, group_count=1, material_prof='', request_name='',
+                               image_url='', custom_duration=None, template=None):
+    """
+    Crée une demande par créneau (date, horaire) de `slots` en une seule transaction.
+
+    - PostgreSQL : un seul INSERT multi-lignes (execute_values) ... RETURNING id
+    - SQLite : executemany n'expose pas les ids, les lignes sont insérées une à une
+      dans la même transaction (pas d'aller-retour réseau)
+
+    `template` (dict des champs de TP_TEMPLATE_FIELDS) est enregistré une seule fois
+    dans la même transaction ; un échec du template ne bloque pas la création.
+
+    Returns:
+        list: ids des demandes créées, dans l'ordre de `slots`
+    """
+    slots = list(slots)
+    if not slots:
+        return []
+    group_count = _coerce_group_count(group_count)
+    rows = [
         (teacher_id, request_date, horaire, class_name, material_description, quantity,
-         selected_materials, computers_needed, notes, exam, group_count, material_prof, request_name, image_url, custom_duration)
-        VALUES ({placeholders})
-    ''', (teacher_id, request_date, horaire, class_name, material_description, quantity,
-          selected_materials, computers_needed, notes, exam, group_count, material_prof, request_name, image_url, custom_duration))
-    conn.commit()
-    request_id = cursor.lastrowid
-    conn.close()
-    return request_id
+         selected_materials, computers_needed, notes, exam, group_count, material_prof,
+         request_name, image_url, custom_duration)
+        for request_date, horaire in slots
+    ]
+    template_values = tuple(template[field] for field in TP_TEMPLATE_FIELDS) if template else None
 
-def get_material_requests(start_date=None, end_date=None, teacher_id=None):
-    """Get material requests with optional filters"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
+    def write(cursor, db_type):
+        columns = ', '.join(MATERIAL_REQUEST_INSERT_COLUMNS)
+        if db_type == 'postgresql':
+            ids = [row[0] for row in psycopg2.extras.execute_values(
+                cursor,
+                f'INSERT INTO material_requests ({columns}) VALUES %s RETURNING id',
+                rows, page_size=len(rows), fetch=True
+            )]
+        else:
+            placeholders = ', '.join(['?'] * len(MATERIAL_REQUEST_INSERT_COLUMNS))
+            ids = []
+            for row in rows:
+                cursor.execute(f'INSERT INTO material_requests ({columns}) VALUES ({placeholders})', row)
+                ids.append(cursor.lastrowid)
+
+        if template_values:
+            cursor.execute('SAVEPOINT tp_template')
+            try:
+                _upsert_tp_template(cursor, db_type, template_values)
+                cursor.execute('RELEASE SAVEPOINT tp_template')
+            except Exception as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT tp_template')
+                logger.error(f"Erreur upsert_tp_template: {e}")
+        return ids
+
+    return run_write(write)
+
+# Valeurs de selected_materials qui définissent le "type" d'une demande
+ABSENT_MATERIALS = 'Absent'
+NO_MATERIAL_MATERIALS = 'Pas besoin de matériel'
+
+
+def _material_requests_filters(db_type, start_date=None, end_date=None, teacher_id=None,
+                               status=None, request_type=None, prepared=None):
+    """
+    Clauses WHERE (et paramètres) communes à la liste et au comptage des demandes.
+
+    status: 'prepared', 'not-prepared' ou 'modified' (filtre "Statut" de l'interface)
+    request_type: 'absent', 'no-material' ou 'normal' (filtre "Type" du calendrier)
+    prepared: True/False, équivalent booléen de status='prepared'/'not-prepared'
+    """
     placeholder = '%s' if db_type == 'postgresql' else '?'
-    query = '''
-        SELECT mr.id, mr.teacher_id, mr.request_date, mr.horaire, mr.class_name,
-               mr.material_description, mr.quantity, mr.selected_materials, mr.computers_needed,
-               mr.notes, mr.prepared, mr.modified, mr.group_count, mr.material_prof,
-               mr.request_name, mr.room_type, mr.image_url, mr.exam, mr.created_at,
-               t.name as teacher_name, mr.custom_duration
-        FROM material_requests mr
-        JOIN teachers t ON mr.teacher_id = t.id
-        WHERE 1=1
-    '''
+    true_val = 'TRUE' if db_type == 'postgresql' else '1'
+    false_val = 'FALSE' if db_type == 'postgresql' else '0'
+    clauses = []
     params = []
-    
+
     if start_date:
-        query += f' AND mr.request_date >= {placeholder}'
+        clauses.append(f'mr.request_date >= {placeholder}')
         params.append(start_date)
-    
     if end_date:
-        query += f' AND mr.request_date <= {placeholder}'
+        clauses.append(f'mr.request_date <= {placeholder}')
         params.append(end_date)
-    
     if teacher_id:
-        query += f' AND mr.teacher_id = {placeholder}'
+        clauses.append(f'mr.teacher_id = {placeholder}')
         params.append(teacher_id)
-    
-    query += ' ORDER BY mr.request_date, mr.created_at'
-    
+
+    if status == 'prepared':
+        prepared = True
+    elif status == 'not-prepared':
+        prepared = False
+    elif status == 'modified':
+        clauses.append(f'mr.modified = {true_val}')
+    if prepared is True:
+        clauses.append(f'mr.prepared = {true_val}')
+    elif prepared is False:
+        clauses.append(f'(mr.prepared = {false_val} OR mr.prepared IS NULL)')
+
+    if request_type == 'absent':
+        clauses.append(f'mr.selected_materials = {placeholder}')
+        params.append(ABSENT_MATERIALS)
+    elif request_type == 'no-material':
+        clauses.append(f'mr.selected_materials = {placeholder}')
+        params.append(NO_MATERIAL_MATERIALS)
+    elif request_type == 'normal':
+        clauses.append(f'(mr.selected_materials NOT IN ({placeholder}, {placeholder}) OR mr.selected_materials IS NULL)')
+        params.extend([ABSENT_MATERIALS, NO_MATERIAL_MATERIALS])
+
+    return clauses, params
+
+
+def _material_requests_query(db_type, start_date=None, end_date=None, teacher_id=None, status=None,
+                             request_type=None, prepared=None, limit=None, after=None):
+    """Requête (et paramètres) de get_material_requests / iter_material_requests."""
+    placeholder = '%s' if db_type == 'postgresql' else '?'
+    clauses, params = _material_requests_filters(db_type, start_date, end_date, teacher_id,
+                                                 status, request_type, prepared)
+    if after:
+        # Comparaison de tuples : servie par l'index (request_date, created_at, id)
+        clauses.append(f'(mr.request_date, mr.created_at, mr.id) > ({placeholder}, {placeholder}, {placeholder})')
+        params.extend(after)
+
+    query = f'''
+        SELECT {MATERIAL_REQUEST_COLUMNS}
+        FROM material_requests mr
+        JOIN teachers t ON mr.teacher_id = t.id
+        WHERE 1=1
+    '''
+    for clause in clauses:
+        query += f' AND {clause}'
+    query += ' ORDER BY mr.request_date, mr.created_at, mr.id'
+    if limit:
+        query += f' LIMIT {int(limit)}'
+    return query, params
+
+
+def get_material_requests(start_date=None, end_date=None, teacher_id=None, status=None,
+                          request_type=None, prepared=None, limit=None, after=None):
+    """
+    Get material requests with optional filters, ordered by (request_date, created_at, id).
+
+    Pagination par clé : `after` est la clé (request_date, created_at, id) de la
+    dernière demande de la page précédente et `limit` la taille de la page.
+    Sans `limit`, toutes les demandes correspondantes sont renvoyées.
+    """
+    conn, db_type = get_db_connection()
+    cursor = conn.cursor()
+    query, params = _material_requests_query(db_type, start_date, end_date, teacher_id, status,
+                                             request_type, prepared, limit, after)
     cursor.execute(query, params)
-    requests = cursor.fetchall()
+    requests = fetch_all(cursor)
     conn.close()
     return requests
 
-def get_requests_for_calendar():
-    """Get all requests formatted for calendar display"""
-    conn, _ = get_db_connection()
+def iter_material_requests(start_date=None, end_date=None, teacher_id=None, status=None,
+                           request_type=None, prepared=None, batch_size=None):
+    """
+    Générateur sur les mêmes demandes que get_material_requests, lues par lots
+    de `batch_size` lignes : curseur nommé (côté serveur) sur PostgreSQL,
+    fetchmany() sur SQLite. La mémoire utilisée ne dépend pas du nombre de lignes.
+
+    La connexion reste ouverte tant que le générateur n'est pas épuisé ou fermé.
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    conn, db_type = get_db_connection()
+    cursor = None
+    try:
+        query, params = _material_requests_query(db_type, start_date, end_date, teacher_id, status,
+                                                 request_type, prepared)
+        if db_type == 'postgresql':
+            # Un curseur nommé vit dans une transaction ; le pool la termine au retour
+            conn.autocommit = False
+            cursor = conn.cursor(name='iter_material_requests')
+            cursor.itersize = batch_size
+        else:
+            cursor = conn.cursor()
+        cursor.execute(query, params)
+        adapter = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if adapter is None:
+                adapter = get_row_adapter(cursor.description)
+            for row in rows:
+                yield adapter(row)
+    finally:
+        # Fermé aussi quand le client abandonne le téléchargement (GeneratorExit)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        conn.close()
+
+def count_material_requests(start_date=None, end_date=None, teacher_id=None, status=None,
+                            request_type=None, prepared=None):
+    """Nombre de demandes correspondant aux mêmes filtres que get_material_requests."""
+    conn, db_type = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mr.id, mr.request_date, mr.class_name, mr.material_description, 
-               mr.quantity, t.name as teacher_name
+    clauses, params = _material_requests_filters(db_type, start_date, end_date, teacher_id,
+                                                 status, request_type, prepared)
+    query = '''
+        SELECT COUNT(*)
         FROM material_requests mr
         JOIN teachers t ON mr.teacher_id = t.id
-        ORDER BY mr.request_date
-    ''')
-    requests = cursor.fetchall()
+        WHERE 1=1
+    '''
+    for clause in clauses:
+        query += f' AND {clause}'
+    cursor.execute(query, params)
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def get_requests_for_calendar():
+    """Get all requests formatted for calendar display"""
+    conn, db_type = get_db_connection()
+    cursor = execute_statement(conn.cursor(), db_type, 'requests_for_calendar')
+    requests = fetch_all(cursor)
     conn.close()
     return requests
 
 def get_material_request_by_id(request_id):
     """Get a specific material request by ID"""
     conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    cursor.execute(f'''
-        SELECT mr.id, mr.teacher_id, mr.request_date, mr.horaire, mr.class_name,
-               mr.material_description, mr.quantity, mr.selected_materials, mr.computers_needed,
-               mr.notes, mr.prepared, mr.modified, mr.group_count, mr.material_prof,
-               mr.request_name, mr.room_type, mr.image_url, mr.exam, mr.created_at,
-               t.name as teacher_name, mr.custom_duration
-        FROM material_requests mr
-        JOIN teachers t ON mr.teacher_id = t.id
-        WHERE mr.id = {placeholder}
-    ''', (request_id,))
-    request = cursor.fetchone()
+    cursor = execute_statement(conn.cursor(), db_type, 'material_request_by_id', (request_id,))
+    request = fetch_one(cursor)
     conn.close()
-    
-    if not request:
-        return None
-    
-    # Normaliser en dictionnaire pour compatibilité PostgreSQL/SQLite
-    if isinstance(request, dict):
-        return request
-    elif hasattr(request, '_asdict') and callable(getattr(request, '_asdict', None)):
-        return request._asdict()  # type: ignore[union-attr]
-    else:
-        # Tuple classique - mapping manuel selon l'ordre des colonnes SELECT
-        return {
-            'id': request[0],
-            'teacher_id': request[1],
-            'request_date': request[2],
-            'horaire': request[3],
-            'class_name': request[4],
-            'material_description': request[5],
-            'quantity': request[6],
-            'selected_materials': request[7],
-            'computers_needed': request[8],
-            'notes': request[9],
-            'prepared': request[10],
-            'modified': request[11],
-            'group_count': request[12],
-            'material_prof': request[13],
-            'request_name': request[14],
-            'room_type': request[15],
-            'image_url': request[16],
-            'exam': request[17],
-            'created_at': request[18],
-            'teacher_name': request[19],
-            'custom_duration': request[20] if len(request) > 20 else None
-        }
+    return request
 
 def update_material_request(request_id, teacher_id, request_date, class_name, material_description,
                            horaire=None, quantity=1, selected_materials='', computers_needed=0,
                            notes='', group_count=1, material_prof='', request_name='', custom_duration=None):
     """Update an existing material request and mark it as modified"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    # Coerce group_count to an integer with a safe default
-    try:
-        group_count = int(group_count) if group_count is not None else 1
-        if group_count < 1:
-            group_count = 1
-    except Exception:
-        group_count = 1
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    # Utiliser TRUE/FALSE pour PostgreSQL, 1/0 pour SQLite
-    false_val = 'FALSE' if db_type == 'postgresql' else '0'
-    true_val = 'TRUE' if db_type == 'postgresql' else '1'
-    
-    cursor.execute(f'''
-        UPDATE material_requests
-        SET teacher_id={placeholder}, request_date={placeholder}, horaire={placeholder},
-            class_name={placeholder}, material_description={placeholder}, quantity={placeholder},
-            selected_materials={placeholder}, computers_needed={placeholder}, notes={placeholder},
-            group_count={placeholder}, material_prof={placeholder}, request_name={placeholder}, custom_duration={placeholder}, prepared={false_val}, modified={true_val}
-        WHERE id={placeholder}
-    ''', (teacher_id, request_date, horaire, class_name, material_description, quantity,
-          selected_materials, computers_needed, notes, group_count, material_prof, request_name, custom_duration, request_id))
-    conn.commit()
-    conn.close()
-    return cursor.rowcount > 0
+    group_count = _coerce_group_count(group_count)
+
+    def write(cursor, db_type):
+        # La demande repasse à "non préparée" et est marquée modifiée
+        execute_statement(cursor, db_type, 'material_request_update', (
+            teacher_id, request_date, horaire, class_name, material_description, quantity,
+            selected_materials, computers_needed, notes, group_count, material_prof, request_name,
+            custom_duration, request_id))
+        return cursor.rowcount > 0
+
+    return run_write(write)
 
 def toggle_prepared_status(request_id):
     """Toggle the prepared status of a request"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    # Get current status
-    cursor.execute(f'SELECT prepared FROM material_requests WHERE id = {placeholder}', (request_id,))
-    current = cursor.fetchone()
-    if not current:
-        conn.close()
-        return False
-    
-    # Gérer l'accès selon le type de retour (tuple ou dict)
-    if isinstance(current, dict):
-        current_prepared = current['prepared']
-    else:
-        current_prepared = current[0]
-    
-    new_prepared = not current_prepared
-    
-    # Utiliser TRUE/FALSE pour PostgreSQL, 1/0 pour SQLite
-    true_val = 'TRUE' if db_type == 'postgresql' else '1'
-    false_val = 'FALSE' if db_type == 'postgresql' else '0'
-    
-    # When marking as prepared, remove modified flag
-    # When unmarking prepared, keep modified flag as is
-    if new_prepared:
-        cursor.execute(f'UPDATE material_requests SET prepared={true_val}, modified={false_val} WHERE id={placeholder}', (request_id,))
-    else:
-        cursor.execute(f'UPDATE material_requests SET prepared={false_val} WHERE id={placeholder}', (request_id,))
-    
-    conn.commit()
-    conn.close()
-    return True
+    def write(cursor, db_type):
+        # Get current status
+        current = execute_statement(cursor, db_type, 'material_request_prepared', (request_id,)).fetchone()
+        if not current:
+            return False
+
+        new_prepared = not current[0]
+
+        # When marking as prepared, remove modified flag
+        # When unmarking prepared, keep modified flag as is
+        if new_prepared:
+            execute_statement(cursor, db_type, 'material_request_mark_prepared', (request_id,))
+        else:
+            execute_statement(cursor, db_type, 'material_request_unmark_prepared', (request_id,))
+        return True
+
+    return run_write(write)
 
 def delete_material_request(request_id):
     """Delete a material request"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    cursor.execute(f'DELETE FROM material_requests WHERE id = {placeholder}', (request_id,))
-    conn.commit()
-    deleted = cursor.rowcount > 0
-    conn.close()
-    return deleted
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor.execute(f'DELETE FROM material_requests WHERE id = {placeholder}', (request_id,))
+        return cursor.rowcount > 0
+
+    return run_write(write)
 
 def get_grouped_requests_by_name(teacher_id, request_name):
     """Get all requests with the same name from the same teacher, grouped by date/time"""
@@ -772,65 +1960,32 @@ def get_grouped_requests_by_name(teacher_id, request_name):
         return []
         
     conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    cursor.execute(f'''
-        SELECT request_date, horaire, class_name
-        FROM material_requests 
-        WHERE teacher_id = {placeholder} AND request_name = {placeholder}
-        ORDER BY request_date, horaire
-    ''', (teacher_id, request_name.strip()))
-    
-    results = cursor.fetchall()
+    cursor = execute_statement(conn.cursor(), db_type, 'grouped_requests_by_name',
+                               (teacher_id, request_name.strip()))
+
+    results = fetch_all(cursor)
     conn.close()
-    
-    if db_type == 'postgresql':
-        return [dict(row) for row in results]
-    else:
-        columns = [description[0] for description in (cursor.description or [])]
-        return [dict(zip(columns, row)) for row in results]
+    return results
 
 def update_room_type(request_id, room_type):
     """Update the room type of a material request"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    cursor.execute(f'UPDATE material_requests SET room_type = {placeholder} WHERE id = {placeholder}', (room_type, request_id))
-    conn.commit()
-    updated = cursor.rowcount > 0
-    conn.close()
-    return updated
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor.execute(f'UPDATE material_requests SET room_type = {placeholder} WHERE id = {placeholder}', (room_type, request_id))
+        return cursor.rowcount > 0
+
+    return run_write(write)
 
 def get_all_rooms():
-    """Get all rooms from the database"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM rooms ORDER BY name')
-    rooms = cursor.fetchall()
-    conn.close()
-    
-    # Convert rows to dictionaries
-    rooms_list = []
-    for room in rooms:
-        rooms_list.append({
-            'id': room[0],
-            'name': room[1],
-            'type': room[2],
-            'ordinateurs': room[3],
-            'chaises': room[4],
-            'eviers': room[5],
-            'hotte': room[6],
-            'bancs_optiques': room[7],
-            'obscurite_totale': room[8],
-            'becs_electriques': room[9],
-            'support_filtration': room[10],
-            'imprimante': room[11],
-            'examen': room[12]
-        })
-    
-    return rooms_list
+    """Get all rooms from the database (cache de référence)"""
+    def load():
+        conn, db_type = get_db_connection()
+        cursor = execute_statement(conn.cursor(), db_type, 'rooms_all')
+        rooms = fetch_all(cursor)
+        conn.close()
+        return rooms
+
+    return _cached_rows('rooms', 'all', load)
 
 def update_room(room_id, room_data):
     """Update a room in the database"""
@@ -864,8 +2019,10 @@ def update_room(room_id, room_data):
             room_data.get('examen', 0),
             room_id
         ))
+        _bump_reference_version(cursor, db_type, 'rooms')
         conn.commit()
         conn.close()
+        _reference_table_written('rooms')
         return True
     except Exception as e:
         conn.close()
@@ -921,33 +2078,26 @@ def import_rooms_from_csv_content(csv_content):
                 VALUES ({placeholders})
             ''', room_data)
         
+        _bump_reference_version(cursor, db_type, 'rooms')
         conn.commit()
         conn.close()
+        _reference_table_written('rooms')
         return True
     except Exception as e:
         conn.close()
         logger.error(f"Erreur lors de l'import CSV: {e}")
         raise e
 
-def get_all_student_numbers():
-    """Get all student numbers from the database"""
+def _load_student_numbers():
     conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM student_numbers ORDER BY teacher_name')
-    students = cursor.fetchall()
+    cursor = execute_statement(conn.cursor(), db_type, 'student_numbers_all')
+    students = fetch_all(cursor)
     conn.close()
-    
-    # Convert rows to dictionaries
-    students_list = []
-    for student in students:
-        students_list.append({
-            'id': student[0],
-            'teacher_name': student[1],
-            'student_count': student[2],
-            'level': student[3]
-        })
-    
-    return students_list
+    return students
+
+def get_all_student_numbers():
+    """Get all student numbers from the database (cache de référence)"""
+    return _cached_rows('student_numbers', 'all', _load_student_numbers)
 
 def update_student_number(student_id, student_data):
     """Update student number in the database"""
@@ -967,8 +2117,10 @@ def update_student_number(student_id, student_data):
             student_data.get('level', '2nde'),
             student_id
         ))
+        _bump_reference_version(cursor, db_type, 'student_numbers')
         conn.commit()
         conn.close()
+        _reference_table_written('student_numbers')
         return True
     except Exception as e:
         conn.close()
@@ -984,13 +2136,20 @@ def add_student_number(teacher_name, student_count, level='2nde'):
     placeholders = ', '.join([placeholder] * 3)
     
     try:
-        cursor.execute(f'''
+        query = f'''
             INSERT INTO student_numbers (teacher_name, student_count, level) 
             VALUES ({placeholders})
-        ''', (teacher_name, student_count, level))
+        '''
+        if db_type == 'postgresql':
+            cursor.execute(query + ' RETURNING id', (teacher_name, student_count, level))
+            student_id = cursor.fetchone()[0]
+        else:
+            cursor.execute(query, (teacher_name, student_count, level))
+            student_id = cursor.lastrowid
+        _bump_reference_version(cursor, db_type, 'student_numbers')
         conn.commit()
-        student_id = cursor.lastrowid
         conn.close()
+        _reference_table_written('student_numbers')
         return student_id
     except Exception as e:
         conn.close()
@@ -1006,8 +2165,10 @@ def delete_student_number(student_id):
     
     try:
         cursor.execute(f'DELETE FROM student_numbers WHERE id = {placeholder}', (student_id,))
+        _bump_reference_version(cursor, db_type, 'student_numbers')
         conn.commit()
         conn.close()
+        _reference_table_written('student_numbers')
         return True
     except Exception as e:
         conn.close()
@@ -1016,44 +2177,200 @@ def delete_student_number(student_id):
 
 def get_student_count_for_teacher(teacher_name, level):
     """Get student count for a specific teacher and level"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    
-    cursor.execute(f'''
-        SELECT student_count FROM student_numbers 
-        WHERE teacher_name = {placeholder} AND level = {placeholder}
-    ''', (teacher_name, level))
-    result = cursor.fetchone()
-    conn.close()
-    return result['student_count'] if result else 20  # Default fallback
+    def load():
+        counts = {}
+        for row in get_reference_cache().get('student_numbers', 'all', _load_student_numbers):
+            counts.setdefault((row['teacher_name'], row['level']), row['student_count'])
+        return counts
+
+    counts = get_reference_cache().get('student_numbers', 'count_by_teacher_level', load)
+    return counts.get((teacher_name, level), 20)  # Default fallback
 
 def get_planning_data(date_str):
     """Get all material requests for planning generation on a specific date"""
     conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    
-    cursor.execute(f'''
-        SELECT mr.id, mr.teacher_id, mr.request_date, mr.horaire, mr.class_name,
-               mr.material_description, mr.quantity, mr.selected_materials, mr.computers_needed,
-               mr.notes, mr.prepared, mr.modified, mr.group_count, mr.material_prof,
-               mr.request_name, mr.room_type, mr.image_url, mr.exam, mr.created_at,
-               t.name as teacher_name, mr.custom_duration
-        FROM material_requests mr
-        JOIN teachers t ON mr.teacher_id = t.id
-        WHERE mr.request_date = {placeholder}
-        AND mr.selected_materials != 'Enseignant absent'
-        ORDER BY mr.horaire, mr.created_at
-    ''', (date_str,))
-    requests = cursor.fetchall()
+    cursor = execute_statement(conn.cursor(), db_type, 'planning_data_by_date', (date_str,))
+    requests = fetch_all(cursor)
     conn.close()
     return requests
 
+
+register_statement('saved_planning_by_date', 'SELECT data FROM plannings WHERE date = {p}')
+
+
+def get_saved_planning(date_str):
+    """Planning enregistré par l'éditeur pour cette date (dict), ou None."""
+    with db_connection() as (conn, db_type):
+        cursor = execute_statement(conn.cursor(), db_type, 'saved_planning_by_date', (date_str,))
+        row = cursor.fetchone()
+    if not row or not row[0]:
+        return None
+    try:
+        return json.loads(row[0])
+    except (TypeError, ValueError):
+        return None
+
+# === CACHE DES SOLUTIONS DU PLANNING ===
+
+# Stockage partagé entre workers du cache de solutions de planning_generator :
+# une ligne par empreinte des entrées du modèle, solution sérialisée en JSON.
+# Une empreinte ne change jamais de sens : toute modification des demandes,
+# des salles ou des créneaux C21 produit une autre clé.
+
+register_statement('planning_solution_by_key',
+                   'SELECT solution FROM planning_solutions WHERE cache_key = {p}')
+
+
+def get_planning_solution(cache_key):
+    """Solution enregistrée (texte JSON) pour cette empreinte, ou None."""
+    with db_connection() as (conn, db_type):
+        cursor = execute_statement(conn.cursor(), db_type, 'planning_solution_by_key', (cache_key,))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def save_planning_solution(cache_key, solution, keep=200):
+    """Enregistre une solution (texte JSON) et ne garde que les `keep` plus récentes."""
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor.execute(f'''
+            INSERT INTO planning_solutions (cache_key, solution) VALUES ({placeholder}, {placeholder})
+            ON CONFLICT (cache_key) DO UPDATE SET solution = excluded.solution, created_at = CURRENT_TIMESTAMP
+        ''', (cache_key, solution))
+        cursor.execute(f'''
+            DELETE FROM planning_solutions WHERE cache_key NOT IN (
+                SELECT cache_key FROM planning_solutions ORDER BY created_at DESC LIMIT {placeholder}
+            )
+        ''', (keep,))
+
+    run_write(write)
+
+
+def clear_planning_solutions():
+    """Vide le cache partagé des solutions de planning."""
+    def write(cursor, db_type):
+        cursor.execute('DELETE FROM planning_solutions')
+
+    run_write(write)
+
+
+# === CACHE DES CLASSEURS DE PLANNING ===
+
+# Classeurs Excel rendus par planning_generator, partagés entre workers : une
+# ligne par empreinte du contenu (grille du jour et version du rendu),
+# horodatage en secondes (time.time()) servant de Last-Modified.
+
+register_statement('planning_artifact_by_key',
+                   'SELECT content, created_at FROM planning_artifacts WHERE cache_key = {p}')
+
+
+def get_planning_artifact(cache_key):
+    """(octets du classeur, created_at) enregistrés pour cette empreinte, ou None."""
+    with db_connection() as (conn, db_type):
+        cursor = execute_statement(conn.cursor(), db_type, 'planning_artifact_by_key', (cache_key,))
+        row = cursor.fetchone()
+    # PostgreSQL renvoie un memoryview pour une colonne BYTEA
+    return (bytes(row[0]), row[1]) if row else None
+
+
+def save_planning_artifact(cache_key, content, created_at, keep=50):
+    """Enregistre un classeur rendu (octets) et ne garde que les `keep` plus récents."""
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor.execute(f'''
+            INSERT INTO planning_artifacts (cache_key, content, created_at)
+            VALUES ({placeholder}, {placeholder}, {placeholder})
+            ON CONFLICT (cache_key) DO NOTHING
+        ''', (cache_key, content, created_at))
+        cursor.execute(f'''
+            DELETE FROM planning_artifacts WHERE cache_key NOT IN (
+                SELECT cache_key FROM planning_artifacts ORDER BY created_at DESC LIMIT {placeholder}
+            )
+        ''', (keep,))
+
+    run_write(write)
+
+
+def clear_planning_artifacts():
+    """Vide le cache partagé des classeurs de planning."""
+    def write(cursor, db_type):
+        cursor.execute('DELETE FROM planning_artifacts')
+
+    run_write(write)
+
+
+# === GÉNÉRATIONS DE PLANNING EN ARRIÈRE-PLAN ===
+
+# Tâches de planning_jobs.py : état, progression et résultat (textes JSON)
+# partagés entre workers, horodatages en secondes (time.time()).
+register_statement('planning_job_by_id',
+                   'SELECT job_id, kind, params, status, progress, result, error, created_at, updated_at '
+                   'FROM planning_jobs WHERE job_id = {p}')
+
+
+def create_planning_job(job_id, job_key, kind, params, now, stale_before, keep=200):
+    """
+    Crée la tâche job_id, sauf si une tâche de même clé est déjà en attente ou
+    en cours : retourne (identifiant de la tâche à suivre, True si créée).
+    Les tâches sans nouvelles depuis stale_before (worker arrêté) sont
+    marquées en échec et ne bloquent plus la clé. Ne garde que les `keep`
+    tâches les plus récentes.
+    """
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor.execute(f'''
+            UPDATE planning_jobs SET status = 'failed', error = {placeholder}, updated_at = {placeholder}
+            WHERE job_key = {placeholder} AND status IN ('queued', 'running') AND updated_at < {placeholder}
+        ''', ('Tâche interrompue', now, job_key, stale_before))
+        cursor.execute(f'''
+            INSERT INTO planning_jobs (job_id, job_key, kind, params, status, created_at, updated_at)
+            VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, 'queued', {placeholder}, {placeholder})
+            ON CONFLICT (job_key) WHERE status IN ('queued', 'running') DO NOTHING
+        ''', (job_id, job_key, kind, params, now, now))
+        cursor.execute(f'''
+            SELECT job_id FROM planning_jobs WHERE job_key = {placeholder} AND status IN ('queued', 'running')
+        ''', (job_key,))
+        active = cursor.fetchone()[0]
+        cursor.execute(f'''
+            DELETE FROM planning_jobs WHERE status NOT IN ('queued', 'running') AND job_id NOT IN (
+                SELECT job_id FROM planning_jobs ORDER BY created_at DESC LIMIT {placeholder}
+            )
+        ''', (keep,))
+        return active, active == job_id
+
+    return run_write(write)
+
+
+def update_planning_job(job_id, now, status=None, progress=None, result=None, error=None):
+    """Met à jour l'état d'une tâche (champs None inchangés) et son horodatage."""
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor.execute(f'''
+            UPDATE planning_jobs SET status = COALESCE({placeholder}, status),
+                progress = COALESCE({placeholder}, progress), result = COALESCE({placeholder}, result),
+                error = COALESCE({placeholder}, error), updated_at = {placeholder}
+            WHERE job_id = {placeholder}
+        ''', (status, progress, result, error, now, job_id))
+
+    run_write(write)
+
+
+def get_planning_job(job_id):
+    """Tâche (dict, textes JSON non décodés) ou None."""
+    with db_connection() as (conn, db_type):
+        cursor = execute_statement(conn.cursor(), db_type, 'planning_job_by_id', (job_id,))
+        return fetch_one(cursor)
+
+
 # === GESTION DES JOURS OUVRÉS ===
 
+def _load_working_days_config():
+    conn, db_type = get_db_connection()
+    cursor = execute_statement(conn.cursor(), db_type, 'working_days_all')
+    results = fetch_all(cursor)
+    conn.close()
+    return results
+
 def get_working_days_config(start_date=None, end_date=None):
     """
     Récupère la configuration des jours ouvrés pour une période donnée
@@ -1065,68 +2382,10 @@ def get_working_days_config(start_date=None, end_date=None):
     Returns:
         list: Liste des configurations [{date, is_working_day, description}]
     """
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    
+    results = _cached_rows('working_days_config', 'all', _load_working_days_config)
     if start_date and end_date:
-        cursor.execute(f'''
-            SELECT date, is_working_day, description 
-            FROM working_days_config 
-            WHERE date >= {placeholder} AND date <= {placeholder}
-            ORDER BY date
-        ''', (start_date, end_date))
-    else:
-        cursor.execute('''
-            SELECT date, is_working_day, description 
-            FROM working_days_config 
-            ORDER BY date
-        ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    # Always return list of dicts, compatible with SQLite, PostgreSQL, tuple, or Row
-    def row_to_dict(row):
-        if isinstance(row, dict):
-            return row
-        elif hasattr(row, '_asdict'):
-            return row._asdict()
-        elif isinstance(row, sqlite3.Row):
-            return {
-                'date': row['date'],
-                'is_working_day': row['is_working_day'],
-                'description': row['description']
-            }
-        elif isinstance(row, (list, tuple)):
-            # For PostgreSQL: (id, date, is_working_day, description, created_at, updated_at)
-            # For SQLite: (date, is_working_day, description)
-            if len(row) >= 6:
-                return {
-                    'date': row[1],
-                    'is_working_day': row[2],
-                    'description': row[3] if len(row) > 3 else ''
-                }
-            elif len(row) == 3:
-                return {
-                    'date': row[0],
-                    'is_working_day': row[1],
-                    'description': row[2]
-                }
-            else:
-                return {
-                    'date': row[0] if len(row) > 0 else None,
-                    'is_working_day': row[1] if len(row) > 1 else None,
-                    'description': row[2] if len(row) > 2 else ''
-                }
-        else:
-            # Fallback: try attribute access
-            return {
-                'date': getattr(row, 'date', None),
-                'is_working_day': getattr(row, 'is_working_day', None),
-                'description': getattr(row, 'description', '')
-            }
-    return [row_to_dict(row) for row in results]
+        results = [row for row in results if start_date <= row['date'] <= end_date]
+    return results
 
 def set_working_day_config(date, is_working_day, description=None):
     """
@@ -1164,8 +2423,10 @@ def set_working_day_config(date, is_working_day, description=None):
                 VALUES ({placeholder}, {placeholder}, {placeholder}, CURRENT_TIMESTAMP)
             ''', (date, is_working_day, description))
         
+        _bump_reference_version(cursor, db_type, 'working_days_config')
         conn.commit()
         conn.close()
+        _reference_table_written('working_days_config')
         return True
         
     except Exception as e:
@@ -1182,21 +2443,15 @@ def is_working_day_configured(date):
     Returns:
         bool: True si jour ouvré, False sinon (défaut basé sur weekday)
     """
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    
-    cursor.execute(f'''
-        SELECT is_working_day FROM working_days_config 
-        WHERE date = {placeholder}
-    ''', (date,))
-    
-    result = cursor.fetchone()
-    conn.close()
+    def load():
+        rows = get_reference_cache().get('working_days_config', 'all', _load_working_days_config)
+        return {row['date']: row['is_working_day'] for row in rows}
+
+    configured = get_reference_cache().get('working_days_config', 'by_date', load)
+    result = configured.get(date)
     
     if result is not None:
-        return bool(result[0])
+        return result
     else:
         # Défaut: lundi-vendredi sont ouvrés, samedi-dimanche non
         from datetime import datetime
@@ -1220,9 +2475,11 @@ def delete_working_day_config(date):
         placeholder = '%s' if db_type == 'postgresql' else '?'
         
         cursor.execute(f'DELETE FROM working_days_config WHERE date = {placeholder}', (date,))
+        _bump_reference_version(cursor, db_type, 'working_days_config')
         
         conn.commit()
         conn.close()
+        _reference_table_written('working_days_config')
         return True
         
     except Exception as e:
@@ -1238,40 +2495,15 @@ def get_c21_availability():
     Returns:
         list: Liste des créneaux avec jour, heure_debut, heure_fin, id
     """
-    try:
+    def load():
         conn, db_type = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, jour, heure_debut, heure_fin, created_at 
-            FROM c21_availability 
-            ORDER BY 
-                CASE jour 
-                    WHEN 'lundi' THEN 1
-                    WHEN 'mardi' THEN 2
-                    WHEN 'mercredi' THEN 3
-                    WHEN 'jeudi' THEN 4
-                    WHEN 'vendredi' THEN 5
-                    WHEN 'samedi' THEN 6
-                    WHEN 'dimanche' THEN 7
-                END,
-                heure_debut
-        ''')
-        
-        rows = cursor.fetchall()
+        cursor = execute_statement(conn.cursor(), db_type, 'c21_availability_all')
+        availability = fetch_all(cursor)
         conn.close()
-        
-        availability = []
-        for row in rows:
-            availability.append({
-                'id': row[0],
-                'jour': row[1],
-                'heure_debut': row[2],
-                'heure_fin': row[3],
-                'created_at': row[4]
-            })
-        
         return availability
+
+    try:
+        return _cached_rows('c21_availability', 'all', load)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des créneaux C21: {e}")
@@ -1299,9 +2531,11 @@ def add_c21_availability(jour, heure_debut, heure_fin):
             INSERT INTO c21_availability (jour, heure_debut, heure_fin) 
             VALUES ({placeholder}, {placeholder}, {placeholder})
         ''', (jour, heure_debut, heure_fin))
+        _bump_reference_version(cursor, db_type, 'c21_availability')
         
         conn.commit()
         conn.close()
+        _reference_table_written('c21_availability')
         return True
         
     except Exception as e:
@@ -1325,9 +2559,11 @@ def delete_c21_availability(availability_id):
         placeholder = '%s' if db_type == 'postgresql' else '?'
         
         cursor.execute(f'DELETE FROM c21_availability WHERE id = {placeholder}', (availability_id,))
+        _bump_reference_version(cursor, db_type, 'c21_availability')
         
         conn.commit()
         conn.close()
+        _reference_table_written('c21_availability')
         return True
         
     except Exception as e:
@@ -1388,34 +2624,26 @@ def is_c21_available_db(jour, heure_debut_minutes, heure_fin_minutes):
 
 def add_pending_modification(request_id, field_name, original_value, new_value, modified_by='System'):
     """Add a pending modification to the database"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    
-    try:
-        logger.info(f"💾 Tentative d'ajout modification: request_id={request_id}, field={field_name}, original='{original_value}', new='{new_value}'")
-        
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
         cursor.execute(f'''
             INSERT INTO pending_modifications 
             (request_id, field_name, original_value, new_value, modified_by) 
             VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
         ''', (request_id, field_name, original_value, new_value, modified_by))
-        
-        affected_rows = cursor.rowcount
+        return cursor.rowcount
+
+    try:
+        logger.info(f"💾 Tentative d'ajout modification: request_id={request_id}, field={field_name}, original='{original_value}', new='{new_value}'")
+        affected_rows = run_write(write)
         logger.info(f"✅ INSERT réussi - {affected_rows} ligne(s) insérée(s)")
-        
-        conn.commit()
         logger.info(f"✅ COMMIT réussi pour la modification de la demande {request_id}")
-        conn.close()
         return True
     except Exception as e:
         logger.error(f"❌ Erreur lors de l'ajout de la modification en attente: {e}")
-        logger.error(f"   request_id={request_id}, field={field_name}, db_type={db_type}")
+        logger.error(f"   request_id={request_id}, field={field_name}")
         import traceback
         logger.error(f"   Traceback: {traceback.format_exc()}")
-        conn.rollback()
-        conn.close()
         return False
 
 def get_pending_modifications(request_id=None):
@@ -1423,30 +2651,13 @@ def get_pending_modifications(request_id=None):
     conn, db_type = get_db_connection()
     cursor = conn.cursor()
     
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    
     try:
         if request_id:
-            cursor.execute(f'''
-                SELECT pm.id, pm.request_id, pm.field_name, pm.original_value, pm.new_value,
-                       pm.created_at, pm.modified_by, mr.teacher_id, t.name as teacher_name, mr.request_name
-                FROM pending_modifications pm
-                JOIN material_requests mr ON pm.request_id = mr.id
-                JOIN teachers t ON mr.teacher_id = t.id
-                WHERE pm.request_id = {placeholder}
-                ORDER BY pm.created_at DESC
-            ''', (request_id,))
+            execute_statement(cursor, db_type, 'pending_modifications_by_request', (request_id,))
         else:
-            cursor.execute('''
-                SELECT pm.id, pm.request_id, pm.field_name, pm.original_value, pm.new_value,
-                       pm.created_at, pm.modified_by, mr.teacher_id, t.name as teacher_name, mr.request_name
-                FROM pending_modifications pm
-                JOIN material_requests mr ON pm.request_id = mr.id
-                JOIN teachers t ON mr.teacher_id = t.id
-                ORDER BY pm.created_at DESC
-            ''')
+            execute_statement(cursor, db_type, 'pending_modifications_all')
         
-        modifications = cursor.fetchall()
+        modifications = fetch_all(cursor)
         conn.close()
         return modifications
     except Exception as e:
@@ -1460,11 +2671,7 @@ def get_requests_with_pending_modifications():
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            SELECT DISTINCT request_id 
-            FROM pending_modifications 
-            ORDER BY request_id
-        ''')
+        execute_statement(cursor, db_type, 'pending_modification_request_ids')
         
         request_ids = [row[0] for row in cursor.fetchall()]
         conn.close()
@@ -1476,9 +2683,6 @@ def get_requests_with_pending_modifications():
 
 def validate_pending_modifications(request_id):
     """Apply all pending modifications for a request and remove them from pending table"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-
     allowed_fields = {
         'request_date',
         'horaire',
@@ -1495,50 +2699,39 @@ def validate_pending_modifications(request_id):
         'image_url',
         'exam'
     }
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    # Utiliser TRUE/FALSE pour PostgreSQL, 1/0 pour SQLite
-    false_val = 'FALSE' if db_type == 'postgresql' else '0'
-    
-    try:
+
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        # Utiliser TRUE/FALSE pour PostgreSQL, 1/0 pour SQLite
+        false_val = 'FALSE' if db_type == 'postgresql' else '0'
+
         # Get all pending modifications for this request
         cursor.execute(f'''
             SELECT field_name, new_value 
             FROM pending_modifications 
             WHERE request_id = {placeholder}
         ''', (request_id,))
-        
-        modifications = cursor.fetchall()
-        
+
+        modifications = fetch_all(cursor)
+
         if not modifications:
-            conn.close()
             return False
-        
+
         # Apply each modification to the material_requests table
         for mod in modifications:
-            # Gérer tuple ou dict
-            if isinstance(mod, dict):
-                field_name = mod['field_name']
-                new_value = mod['new_value']
-            elif hasattr(mod, '_asdict'):
-                mod_dict = mod._asdict()
-                field_name = mod_dict['field_name']
-                new_value = mod_dict['new_value']
-            else:
-                # Tuple classique [field_name, new_value]
-                field_name = mod[0]
-                new_value = mod[1]
+            field_name = mod['field_name']
+            new_value = mod['new_value']
 
             if field_name not in allowed_fields:
                 logger.warning(f"Champ de modification non autorisé ignoré: {field_name}")
                 continue
-            
+
             cursor.execute(f'''
                 UPDATE material_requests 
                 SET {field_name} = {placeholder} 
                 WHERE id = {placeholder}
             ''', (new_value, request_id))
-        
+
         # Reset both modified and prepared flags to FALSE since modifications are now applied
         # Une demande modifiée doit être re-préparée
         cursor.execute(f'''
@@ -1546,123 +2739,88 @@ def validate_pending_modifications(request_id):
             SET modified = {false_val}, prepared = {false_val}
             WHERE id = {placeholder}
         ''', (request_id,))
-        
+
         # Remove the pending modifications
         cursor.execute(f'''
             DELETE FROM pending_modifications 
             WHERE request_id = {placeholder}
         ''', (request_id,))
-        
-        conn.commit()
-        conn.close()
         return True
+
+    try:
+        return run_write(write)
     except Exception as e:
         logger.error(f"Erreur lors de la validation des modifications: {e}")
-        conn.rollback()
-        conn.close()
         return False
 
 def reject_pending_modifications(request_id):
     """Reject and remove all pending modifications for a request"""
-    conn, db_type = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if db_type == 'postgresql' else '?'
-    
-    try:
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
         cursor.execute(f'''
             DELETE FROM pending_modifications 
             WHERE request_id = {placeholder}
         ''', (request_id,))
-        
-        conn.commit()
-        conn.close()
         return True
+
+    try:
+        return run_write(write)
     except Exception as e:
         logger.error(f"Erreur lors du rejet des modifications: {e}")
-        conn.close()
         return False
 
 def get_tp_templates(teacher_id, level):
     """Retourne les templates TP d'un enseignant pour un niveau donné, triés par nom."""
     try:
         conn, db_type = get_db_connection()
-        cursor = conn.cursor()
-        placeholder = '%s' if db_type == 'postgresql' else '?'
-        cursor.execute(f'''
-            SELECT id, request_name, material_description, selected_materials,
-                   material_prof, computers_needed, group_count, notes, image_url, room_type
-            FROM tp_templates
-            WHERE teacher_id = {placeholder} AND level = {placeholder}
-            ORDER BY request_name
-        ''', (teacher_id, level))
-        rows = cursor.fetchall()
+        cursor = execute_statement(conn.cursor(), db_type, 'tp_templates_by_level', (teacher_id, level))
+        templates = fetch_all(cursor)
         conn.close()
-        result = []
-        for row in rows:
-            if isinstance(row, dict):
-                result.append(row)
-            else:
-                result.append({
-                    'id': row[0], 'request_name': row[1], 'material_description': row[2],
-                    'selected_materials': row[3], 'material_prof': row[4],
-                    'computers_needed': row[5], 'group_count': row[6],
-                    'notes': row[7], 'image_url': row[8], 'room_type': row[9]
-                })
-        return result
+        return templates
     except Exception as e:
         logger.error(f"Erreur get_tp_templates: {e}")
         return []
 
 
+TP_TEMPLATE_FIELDS = ('teacher_id', 'level', 'request_name', 'material_description', 'selected_materials',
+                      'material_prof', 'computers_needed', 'group_count', 'notes', 'image_url', 'room_type')
+
+
+def _upsert_tp_template(cursor, db_type, values):
+    """Upsert d'un template TP sur un curseur déjà en transaction (values dans l'ordre de TP_TEMPLATE_FIELDS)."""
+    placeholders = ','.join(['%s' if db_type == 'postgresql' else '?'] * len(TP_TEMPLATE_FIELDS))
+    cursor.execute(f'''
+        INSERT INTO tp_templates
+            (teacher_id, level, request_name, material_description, selected_materials,
+             material_prof, computers_needed, group_count, notes, image_url, room_type)
+        VALUES ({placeholders})
+        ON CONFLICT (teacher_id, level, request_name)
+        DO UPDATE SET
+            material_description = excluded.material_description,
+            selected_materials   = excluded.selected_materials,
+            material_prof        = excluded.material_prof,
+            computers_needed     = excluded.computers_needed,
+            group_count          = excluded.group_count,
+            notes                = excluded.notes,
+            image_url            = excluded.image_url,
+            room_type            = excluded.room_type,
+            updated_at           = CURRENT_TIMESTAMP
+    ''', tuple(values))
+
+
 def upsert_tp_template(teacher_id, level, request_name, material_description,
                        selected_materials, material_prof, computers_needed,
                        group_count, notes, image_url, room_type):
     """Insère ou met à jour un template TP (clé unique: teacher_id + level + request_name)."""
-    try:
-        conn, db_type = get_db_connection()
-        cursor = conn.cursor()
-        if db_type == 'postgresql':
-            cursor.execute('''
-                INSERT INTO tp_templates
-                    (teacher_id, level, request_name, material_description, selected_materials,
-                     material_prof, computers_needed, group_count, notes, image_url, room_type)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON CONFLICT (teacher_id, level, request_name)
-                DO UPDATE SET
-                    material_description = EXCLUDED.material_description,
-                    selected_materials   = EXCLUDED.selected_materials,
-                    material_prof        = EXCLUDED.material_prof,
-                    computers_needed     = EXCLUDED.computers_needed,
-                    group_count          = EXCLUDED.group_count,
-                    notes                = EXCLUDED.notes,
-                    image_url            = EXCLUDED.image_url,
-                    room_type            = EXCLUDED.room_type,
-                    updated_at           = CURRENT_TIMESTAMP
-            ''', (teacher_id, level, request_name, material_description, selected_materials,
-                  material_prof, computers_needed, group_count, notes, image_url, room_type))
-        else:
-            cursor.execute('''
-                INSERT INTO tp_templates
-                    (teacher_id, level, request_name, material_description, selected_materials,
-                     material_prof, computers_needed, group_count, notes, image_url, room_type)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?)
-                ON CONFLICT(teacher_id, level, request_name)
-                DO UPDATE SET
-                    material_description = excluded.material_description,
-                    selected_materials   = excluded.selected_materials,
-                    material_prof        = excluded.material_prof,
-                    computers_needed     = excluded.computers_needed,
-                    group_count          = excluded.group_count,
-                    notes                = excluded.notes,
-                    image_url            = excluded.image_url,
-                    room_type            = excluded.room_type,
-                    updated_at           = CURRENT_TIMESTAMP
-            ''', (teacher_id, level, request_name, material_description, selected_materials,
-                  material_prof, computers_needed, group_count, notes, image_url, room_type))
-        conn.commit()
-        conn.close()
+    values = (teacher_id, level, request_name, material_description, selected_materials,
+              material_prof, computers_needed, group_count, notes, image_url, room_type)
+
+    def write(cursor, db_type):
+        _upsert_tp_template(cursor, db_type, values)
         return True
+
+    try:
+        return run_write(write)
     except Exception as e:
         logger.error(f"Erreur upsert_tp_template: {e}")
         return False
@@ -1670,28 +2828,10 @@ def upsert_tp_template(teacher_id, level, request_name, material_description,
 def get_tp_template_by_id(template_id):
     try:
         conn, db_type = get_db_connection()
-        cursor = conn.cursor()
-        placeholder = '%s' if db_type == 'postgresql' else '?'
-        cursor.execute(f'''
-            SELECT id, teacher_id, level, request_name, material_description,
-                   selected_materials, material_prof, computers_needed,
-                   group_count, notes, image_url, room_type
-            FROM tp_templates
-            WHERE id = {placeholder}
-        ''', (template_id,))
-        row = cursor.fetchone()
+        cursor = execute_statement(conn.cursor(), db_type, 'tp_template_by_id', (template_id,))
+        template = fetch_one(cursor)
         conn.close()
-        if not row:
-            return None
-        if isinstance(row, dict):
-            return row
-        return {
-            'id': row[0], 'teacher_id': row[1], 'level': row[2], 'request_name': row[3],
-            'material_description': row[4], 'selected_materials': row[5],
-            'material_prof': row[6], 'computers_needed': row[7],
-            'group_count': row[8], 'notes': row[9], 'image_url': row[10],
-            'room_type': row[11]
-        }
+        return template
     except Exception as e:
         logger.error(f"Erreur get_tp_template_by_id: {e}")
         return None
@@ -4,7 +4,9 @@ Utilitaires pour la gestion des délais de demandes de matériel
 Règle: 48h ouvrées avant les cours pour nouvelles demandes et modifications
 """
 
-from datetime import datetime, timedelta, time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, time
+from itertools import accumulate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -94,10 +96,104 @@ def add_working_hours(start_datetime, hours_to_add):
     
     return current
 
+# Le calendrier des jours ouvrés est chargé par années scolaires complètes
+# (1er septembre -> 31 août)
+SCHOOL_YEAR_START_MONTH = 9
+
+class WorkingDayCalendar:
+    """
+    Jours ouvrés précalculés sur une période [first_day, last_day]
+
+    - working : bytearray, 1 par jour ouvré (configuration des jours ouvrés,
+      sinon lundi-vendredi)
+    - cumulative : cumulative[i] = nombre de jours ouvrés avant first_day + i
+
+    Compter les jours ouvrés entre deux dates est en O(1), trouver le n-ième
+    jour ouvré en O(log n) (bisect), sans accès à la base.
+    """
+
+    def __init__(self, first_day, last_day, configured=None):
+        configured = configured or {}
+        self.first_day = first_day
+        self.last_day = last_day
+        size = (last_day - first_day).days + 1
+        self.working = bytearray(size)
+        day = first_day
+        for index in range(size):
+            self.working[index] = configured.get(day.isoformat(), day.weekday() < 5)
+            day += timedelta(days=1)
+        self.cumulative = [0] + list(accumulate(self.working))
+
+    def _index(self, day):
+        return min(max((day - self.first_day).days, 0), len(self.working))
+
+    def covers(self, first_day, last_day):
+        return self.first_day <= first_day and last_day <= self.last_day
+
+    def is_working_day(self, day):
+        return bool(self.working[self._index(day)])
+
+    def count_between(self, first_day, end_day):
+        """Nombre de jours ouvrés dans [first_day, end_day["""
+        return max(0, self.cumulative[self._index(end_day)] - self.cumulative[self._index(first_day)])
+
+    def nth_working_day_end(self, first_day, n):
+        """
+        Premier jour d tel que [first_day, d[ contienne n jours ouvrés
+        (None si le calendrier ne va pas assez loin)
+        """
+        target = self.cumulative[self._index(first_day)] + n
+        index = bisect_left(self.cumulative, target)
+        if index >= len(self.cumulative):
+            return None
+        return self.first_day + timedelta(days=index)
+
+def _school_year(day):
+    return day.year if day.month >= SCHOOL_YEAR_START_MONTH else day.year - 1
+
+def get_working_day_calendar(first_day, last_day):
+    """
+    Calendrier couvrant au moins [first_day, last_day]
+
+    Il est construit par années scolaires complètes à partir de
+    working_days_config (une seule lecture) et gardé dans le cache des tables
+    de référence : il est reconstruit dès que la configuration change.
+    """
+    first_year, last_year = _school_year(first_day), _school_year(last_day)
+    start = date(first_year, SCHOOL_YEAR_START_MONTH, 1)
+    end = date(last_year + 1, SCHOOL_YEAR_START_MONTH, 1) - timedelta(days=1)
+
+    # Import ici pour éviter les dépendances circulaires
+    try:
+        from database import get_reference_cache, get_working_days_config
+    except ImportError:
+        # Fallback vers la logique par défaut si la base n'est pas disponible
+        logger.warning("Base de données non disponible, utilisation logique par défaut")
+        return WorkingDayCalendar(start, end)
+
+    def load():
+        configured = {
+            str(row['date'])[:10]: bool(row['is_working_day'])
+            for row in get_working_days_config(start.isoformat(), end.isoformat())
+        }
+        return WorkingDayCalendar(start, end, configured)
+
+    return get_reference_cache().get('working_days_config', ('calendar', first_year, last_year), load)
+
+def _first_counted_day(start_datetime):
+    """
+    Premier jour compté pour le délai
+
+    RÈGLE SPÉCIALE : Si l'heure actuelle est >= 17h, on considère que le lendemain
+    est "perdu" et on commence à compter à partir de J+2 (sinon J+1)
+    """
+    offset = 2 if start_datetime.hour >= 17 else 1
+    return (start_datetime + timedelta(days=offset)).date()
+
 def count_working_days_between(start_datetime, end_date):
     """
     Compte les jours ouvrés complets entre maintenant et une date cible
-    Utilise la configuration personnalisée des jours ouvrés
+    Utilise la configuration personnalisée des jours ouvrés (calendrier précalculé)
     Exclut le jour de départ et le jour d'arrivée
     
     RÈGLE SPÉCIALE : Si l'heure actuelle est >= 17h, on considère que le lendemain
@@ -110,50 +206,11 @@ def count_working_days_between(start_datetime, end_date):
     Returns:
         int: Nombre de jours ouvrés complets entre les deux
     """
-    # Import ici pour éviter les dépendances circulaires
-    try:
-        from database import is_working_day_configured
-    except ImportError:
-        # Fallback vers la logique par défaut si la base n'est pas disponible
-        logger.warning("Base de données non disponible, utilisation logique par défaut")
-        
-        # Appliquer la règle de 17h
-        if start_datetime.hour >= 17:
-            # Après 17h, on commence à compter à partir de J+2
-            current = (start_datetime + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
-        else:
-            # Avant 17h, on commence à compter à partir de J+1
-            current = (start_datetime + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        end = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        working_days = 0
-        while current < end:
-            if current.weekday() < 5:  # Lundi à vendredi par défaut
-                working_days += 1
-            current += timedelta(days=1)
-        
-        return working_days
-    
-    # Appliquer la règle de 17h
-    if start_datetime.hour >= 17:
-        # Après 17h, on commence à compter à partir de J+2
-        current = (start_datetime + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
-    else:
-        # Avant 17h, on commence à compter à partir de J+1
-        current = (start_datetime + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    end = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    working_days = 0
-    while current < end:
-        # Utiliser la configuration personnalisée
-        date_str = current.strftime('%Y-%m-%d')
-        if is_working_day_configured(date_str):
-            working_days += 1
-        current += timedelta(days=1)
-    
-    return working_days
+    first_day = _first_counted_day(start_datetime)
+    end_day = end_date.date()
+    if end_day <= first_day:
+        return 0
+    return get_working_day_calendar(first_day, end_day).count_between(first_day, end_day)
 
 def is_request_deadline_respected(request_date_str, current_datetime=None):
     """
@@ -182,34 +239,10 @@ def is_request_deadline_respected(request_date_str, current_datetime=None):
     if current_datetime is None:
         current_datetime = datetime.utcnow()
 
-
-    # Si déjà un objet date ou datetime, utiliser directement
-    from datetime import date, datetime as dt
-    if isinstance(request_date_str, dt):
-        request_date = request_date_str
-    elif isinstance(request_date_str, date):
-        request_date = dt.combine(request_date_str, dt.min.time())
-    else:
-        # Essayer plusieurs formats de date
-        parsed = False
-        for fmt in ('%Y-%m-%d', '%d-%m-%Y', '%a, %d %b %Y %H:%M:%S GMT'):
-            try:
-                request_date = dt.strptime(request_date_str, fmt)
-                if fmt == '%d-%m-%Y':
-                    logger.warning(f"Date reçue au format français: {request_date_str} → {request_date.strftime('%Y-%m-%d')}")
-                parsed = True
-                break
-            except ValueError:
-                continue
-        if not parsed:
-            logger.error(f"Erreur parsing date (formats attendus YYYY-MM-DD, DD-MM-YYYY ou RFC1123): {request_date_str}")
-            print(f"[DEBUG deadline_utils] Erreur parsing date: {request_date_str}", file=sys.stderr)
-            return {
-                'valid': False,
-                'working_days': 0,
-                'message': f"❌ Format de date invalide: {request_date_str}",
-                'request_datetime': None
-            }
+    request_date = _parse_request_date(request_date_str)
+    if request_date is None:
+        print(f"[DEBUG deadline_utils] Erreur parsing date: {request_date_str}", file=sys.stderr)
+        return _invalid_date_result(request_date_str)
 
     request_datetime = request_date.replace(hour=8, minute=0, second=0)
 
@@ -222,6 +255,54 @@ def is_request_deadline_respected(request_date_str, current_datetime=None):
     # Log du nombre de jours ouvrés
     print(f"[DEBUG deadline_utils] Jours ouvrés calculés: {working_days}", file=sys.stderr)
 
+    result = _deadline_result(working_days, request_datetime)
+
+    # Log du résultat final
+    print(f"[DEBUG deadline_utils] Résultat: valid={result['valid']} | message={result['message']}", file=sys.stderr)
+
+    return result
+
+def _parse_request_date(request_date_str):
+    """
+    Convertit une date de demande (str, date ou datetime) en datetime
+
+    Returns:
+        datetime ou None si le format n'est pas reconnu
+    """
+    # Si déjà un objet date ou datetime, utiliser directement
+    from datetime import date, datetime as dt
+    if isinstance(request_date_str, dt):
+        return request_date_str
+    if isinstance(request_date_str, date):
+        return dt.combine(request_date_str, dt.min.time())
+    # Format courant YYYY-MM-DD : fromisoformat, bien plus rapide que strptime
+    if isinstance(request_date_str, str) and len(request_date_str) == 10 and request_date_str[4] == request_date_str[7] == '-':
+        try:
+            return dt.fromisoformat(request_date_str)
+        except ValueError:
+            pass
+    # Essayer plusieurs formats de date
+    for fmt in ('%Y-%m-%d', '%d-%m-%Y', '%a, %d %b %Y %H:%M:%S GMT'):
+        try:
+            request_date = dt.strptime(request_date_str, fmt)
+        except (TypeError, ValueError):
+            continue
+        if fmt == '%d-%m-%Y':
+            logger.warning(f"Date reçue au format français: {request_date_str} → {request_date.strftime('%Y-%m-%d')}")
+        return request_date
+    logger.error(f"Erreur parsing date (formats attendus YYYY-MM-DD, DD-MM-YYYY ou RFC1123): {request_date_str}")
+    return None
+
+def _invalid_date_result(request_date_str):
+    return {
+        'valid': False,
+        'working_days': 0,
+        'message': f"❌ Format de date invalide: {request_date_str}",
+        'request_datetime': None
+    }
+
+def _deadline_result(working_days, request_datetime):
+    """Résultat de validation pour un nombre de jours ouvrés d'avance"""
     # Vérifier si on a au moins 2 jours ouvrés complets
     is_valid = working_days >= 2
 
@@ -232,9 +313,6 @@ def is_request_deadline_respected(request_date_str, current_datetime=None):
         missing = 2 - working_days
         message = f"❌ Délai insuffisant - manque {missing} jour(s) ouvré(s)"
 
-    # Log du résultat final
-    print(f"[DEBUG deadline_utils] Résultat: valid={is_valid} | message={message}", file=sys.stderr)
-
     return {
         'valid': is_valid,
         'working_days': working_days,
@@ -242,6 +320,46 @@ def is_request_deadline_respected(request_date_str, current_datetime=None):
         'request_datetime': request_datetime
     }
 
+def check_request_deadlines(request_dates, current_datetime=None):
+    """
+    Vérifie le délai de 2 jours ouvrés pour plusieurs dates en une seule passe
+
+    Même règle que is_request_deadline_respected, avec un seul calendrier des
+    jours ouvrés pour toute la période.
+
+    Args:
+        request_dates (iterable): Dates des demandes (YYYY-MM-DD, date ou datetime)
+        current_datetime (datetime, optional): Date/heure actuelle (pour les tests)
+
+    Returns:
+        dict: {date demandée: résultat de is_request_deadline_respected}
+    """
+    if current_datetime is None:
+        current_datetime = datetime.utcnow()
+
+    results = {}
+    targets = {}
+    for request_date_str in request_dates:
+        if request_date_str in results or request_date_str in targets:
+            continue
+        request_date = _parse_request_date(request_date_str)
+        if request_date is None:
+            results[request_date_str] = _invalid_date_result(request_date_str)
+        else:
+            targets[request_date_str] = request_date.replace(hour=8, minute=0, second=0)
+    if not targets:
+        return results
+
+    # Un seul calendrier pour toutes les dates (règle de 17h incluse)
+    first_day = _first_counted_day(current_datetime)
+    last_day = max(max(targets.values()).date(), first_day)
+    calendar = get_working_day_calendar(first_day, last_day)
+
+    for request_date_str, request_datetime in targets.items():
+        working_days = calendar.count_between(first_day, request_datetime.date())
+        results[request_date_str] = _deadline_result(working_days, request_datetime)
+    return results
+
 def get_earliest_valid_date(current_datetime=None):
     """
     Retourne la première date valide pour une nouvelle demande (2 jours ouvrés)
@@ -257,21 +375,17 @@ def get_earliest_valid_date(current_datetime=None):
         current_datetime = datetime.now()
     
     # Appliquer la règle de 17h pour déterminer le point de départ
-    if current_datetime.hour >= 17:
-        # Après 17h, commencer à chercher à partir de J+2
-        candidate_date = current_datetime + timedelta(days=2)
-    else:
-        # Avant 17h, commencer à chercher à partir de J+1
-        candidate_date = current_datetime + timedelta(days=1)
-    
-    # Chercher la première date avec au moins 2 jours ouvrés
-    while True:
-        # Important: considérer le cours à 8h00 pour le calcul
-        candidate_datetime = candidate_date.replace(hour=8, minute=0, second=0, microsecond=0)
-        working_days = count_working_days_between(current_datetime, candidate_datetime)
-        if working_days >= 2:
-            return candidate_date.strftime('%Y-%m-%d')
-        candidate_date += timedelta(days=1)
+    first_day = _first_counted_day(current_datetime)
+
+    # Premier jour précédé d'au moins 2 jours ouvrés ; le calendrier est étendu
+    # si la période chargée n'en contient pas assez (vacances configurées)
+    for horizon in (62, 366, 3 * 366):
+        calendar = get_working_day_calendar(first_day, first_day + timedelta(days=horizon))
+        earliest = calendar.nth_working_day_end(first_day, 2)
+        if earliest is not None:
+            return earliest.strftime('%Y-%m-%d')
+    logger.error(f"Aucun jour ouvré configuré dans les 3 ans suivant le {first_day.isoformat()}")
+    return first_day.strftime('%Y-%m-%d')
 
 if __name__ == "__main__":
     # Tests de la logique
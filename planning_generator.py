@@ -1,44 +1,110 @@
-def to_dict_request(req):
-    # Compatibilité tuple/dict/sqlite3.Row pour les demandes
-    if isinstance(req, dict):
-        return req
-    elif hasattr(req, '_fields'):
-        return req._asdict()
-    elif hasattr(req, 'keys'):
-        return dict(req)
-    else:
-        # Ordre des colonnes : adapter selon la structure de la table
-        return {
-            'id': req[0],
-            'teacher_id': req[1],
-            'request_date': req[2],
-            'horaire': req[3],
-            'class_name': req[4],
-            'material_description': req[5],
-            'quantity': req[6],
-            'selected_materials': req[7] if len(req) > 7 and req[7] else '',
-            'computers_needed': req[8] if len(req) > 8 and req[8] else 0,
-            'notes': req[9] if len(req) > 9 else '',
-            'prepared': req[10] if len(req) > 10 and req[10] else False,
-            'modified': req[11] if len(req) > 11 and req[11] else False,
-            'group_count': req[12] if len(req) > 12 else 1,
-            'material_prof': req[13] if len(req) > 13 else '',
-            'request_name': req[14] if len(req) > 14 else '',
-            'room_type': req[15] if len(req) > 15 and req[15] else 'Mixte',
-            'image_url': req[16] if len(req) > 16 else None,
-            'exam': req[17] if len(req) > 17 else False,
-            'created_at': req[18] if len(req) > 18 else None,
-            'teacher_name': req[19] if len(req) > 19 else '',
-            'custom_duration': req[20] if len(req) > 20 else None
-        }
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import bisect
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import database
+import numpy as np
 from datetime import datetime, timedelta
 from ortools.sat.python import cp_model
 
 
+# Équipements comparés entre les besoins d'un cours et une salle (ordre des colonnes des matrices)
+EQUIPMENT_FIELDS = ("ordinateurs", "eviers", "hotte", "bancs_optiques", "obscurite_totale",
+                    "becs_electriques", "support_filtration", "imprimante", "examen")
+# Équipements réels qui font d'une salle une salle de chimie / de physique
+CHEMISTRY_EQUIPMENT = ("eviers", "hotte", "becs_electriques", "support_filtration")
+PHYSICS_EQUIPMENT = ("obscurite_totale", "bancs_optiques")
+
+# Préférence "même enseignant, même salle" dans l'objectif du planning :
+# - 'salles' : pénalise le nombre de salles distinctes de chaque enseignant (taille linéaire)
+# - 'paires' : bonus par couple de cours d'un enseignant dans la même salle (historique, quadratique)
+PLANNING_TEACHER_STABILITY = os.getenv('PLANNING_TEACHER_STABILITY', 'salles').strip().lower()
+
+# Profils de l'optimiseur : workers (8 au moins, même sur peu de cœurs : avec moins de workers
+# CP-SAT ne lance pas les sous-solveurs qui resserrent la borne et ne prouve presque jamais
+# l'optimum ; 0 = un par cœur), limite de temps selon la taille du problème (temps_base + temps_par_cours x nombre de cours, plafonnée à temps_max), graine
+# fixe, et arrêt dès que l'écart relatif entre la solution et la borne atteint ecart_relatif.
+# - 'interactif' : éditeur, réponse en quelques secondes
+# - 'equilibre'  : défaut
+# - 'exhaustif'  : recherche de l'optimum prouvé (exports hors des heures d'affluence)
+SOLVER_PROFILES = {
+    'interactif': {'workers': 8, 'temps_base': 2, 'temps_par_cours': 0.05, 'temps_max': 10,
+                   'ecart_relatif': 0.02, 'graine': 0},
+    'equilibre': {'workers': 8, 'temps_base': 5, 'temps_par_cours': 0.25, 'temps_max': 60,
+                  'ecart_relatif': 0.005, 'graine': 0},
+    'exhaustif': {'workers': 16, 'temps_base': 60, 'temps_par_cours': 1, 'temps_max': 300,
+                  'ecart_relatif': 0, 'graine': 0},
+}
+PLANNING_SOLVER_PROFILE = os.getenv('PLANNING_SOLVER_PROFILE', 'equilibre').strip().lower()
+# Voie rapide : affectation par couplages successifs (quelques millisecondes), retenue si
+# son écart à une borne supérieure de l'objectif ne dépasse pas l'écart toléré du profil ;
+# sinon l'optimiseur CP-SAT part de cette affectation. 'on' (défaut) ou 'off'
+PLANNING_FAST_PATH = os.getenv('PLANNING_FAST_PATH', 'on').strip().lower()
+# Résolution par blocs : les cours d'une journée forment des blocs qui ne se chevauchent pas
+# dans le temps (matin, après-midi...), liés seulement par l'objectif. Utilisée seulement
+# quand la voie rapide n'a pas fourni d'affectation de départ (PLANNING_FAST_PATH=off,
+# stabilité 'paires' exclue, couplages sans solution) : parti de cette affectation, le
+# modèle unique est plus rapide et au moins aussi bon (tools/bench_planner_decomposition.py)
+# - 'blocs' : un petit modèle par bloc, puis ajustement bloc par bloc (défaut)
+# - 'off'   : un seul modèle pour la journée
+PLANNING_DECOMPOSITION = os.getenv('PLANNING_DECOMPOSITION', 'blocs').strip().lower()
+# Premier passage : blocs résolus en parallèle (threads) au lieu de l'un après l'autre
+# (1 : l'un après l'autre, chaque bloc tenant compte des salles choisies dans les précédents)
+PLANNING_DECOMPOSITION_THREADS = int(os.getenv('PLANNING_DECOMPOSITION_THREADS', '1'))
+# Nombre maximal de passages d'ajustement après le premier
+PLANNING_DECOMPOSITION_PASSES = 3
+# Plafond du nombre de workers de l'optimiseur (0 : celui du profil). Réduit dans les
+# processus du planning de plusieurs jours pour partager les cœurs.
+SOLVER_NUM_WORKERS = 0
+# Version de la formulation du modèle (contraintes, poids, objectif) : à incrémenter
+# à chaque changement pour que les solutions déjà en cache ne soient plus réutilisées
+SOLVER_MODEL_VERSION = 1
+
+# Cache des solutions de l'optimiseur, indexées par empreinte des entrées du modèle :
+# - 'database' : table planning_solutions partagée par les workers + copie en mémoire (défaut)
+# - 'memory'   : en mémoire, propre à chaque processus
+# - 'off'      : l'optimiseur est relancé à chaque génération
+PLANNING_SOLUTION_CACHE = os.getenv('PLANNING_SOLUTION_CACHE', 'database').strip().lower()
+# Nombre de solutions conservées (en mémoire par processus, et dans la table)
+PLANNING_SOLUTION_CACHE_SIZE = int(os.getenv('PLANNING_SOLUTION_CACHE_SIZE', '200'))
+
+# Version du rendu Excel (feuilles, styles, mise en page) : à incrémenter à chaque
+# changement pour que les classeurs déjà en cache ne soient plus servis
+PLANNING_RENDER_VERSION = 1
+# Cache des classeurs rendus, indexés par empreinte de leurs entrées (empreinte_jour ;
+# mêmes backends que PLANNING_SOLUTION_CACHE, table planning_artifacts)
+PLANNING_ARTIFACT_CACHE = os.getenv('PLANNING_ARTIFACT_CACHE', 'database').strip().lower()
+# Nombre de classeurs conservés (en mémoire par processus, et dans la table)
+PLANNING_ARTIFACT_CACHE_SIZE = int(os.getenv('PLANNING_ARTIFACT_CACHE_SIZE', '50'))
+
+# Re-planification incrémentale (éditeur) : sort des cours inchangés depuis le planning enregistré
+# - 'fixer'     : ils restent dans leur salle, seuls les cours ajoutés/déplacés sont placés (défaut ;
+#                 repli sur 'penaliser' si le planning n'a plus de solution)
+# - 'penaliser' : ils peuvent changer de salle, chaque changement coûte PLANNING_INCREMENTAL_MOVE_COST
+PLANNING_INCREMENTAL_MODE = os.getenv('PLANNING_INCREMENTAL_MODE', 'fixer').strip().lower()
+# Coût d'un changement de salle : supérieur à l'écart maximal de poids salle/matière (10)
+PLANNING_INCREMENTAL_MOVE_COST = int(os.getenv('PLANNING_INCREMENTAL_MOVE_COST', '20'))
+
+# Planning de plusieurs jours : jours résolus en parallèle (processus ; 0 = un par cœur)
+PLANNING_BATCH_WORKERS = int(os.getenv('PLANNING_BATCH_WORKERS', '0'))
+# Nombre maximal de jours calendaires d'une période demandée en une fois
+PLANNING_BATCH_MAX_DAYS = 31
+
+# Champs d'un cours lus par le modèle (les autres, comme 'prepared' ou le
+# libellé de la demande, ne changent pas la solution)
+SOLVER_COURSE_FIELDS = ("enseignant", "jour", "horaire", "duree", "matiere", "chaises") + EQUIPMENT_FIELDS
+
+
 def duree_par_niveau(niveau):
     """Get duration by level"""
     if niveau in ("Terminale Spécialité", "SI", "Terminale ES", "1ère Spécialité", "AP 2nd"):
@@ -74,9 +140,8 @@ def calculer_score_salle(besoins, equipements_salle, type_salle, matiere):
         if not isinstance(equipements_salle, dict):
             equipements_salle = dict(equipements_salle) if hasattr(equipements_salle, 'items') else {}
         # Analyser les équipements réels de la salle
-        room_has_chemistry_equipment = (equipements_salle.get("eviers", 0) > 0 or equipements_salle.get("hotte", 0) > 0 or 
-                                       equipements_salle.get("becs_electriques", 0) > 0 or equipements_salle.get("support_filtration", 0) > 0)
-        room_has_physics_equipment = (equipements_salle.get("obscurite_totale", 0) > 0 or equipements_salle.get("bancs_optiques", 0) > 0)
+        room_has_chemistry_equipment = any(equipements_salle.get(f, 0) > 0 for f in CHEMISTRY_EQUIPMENT)
+        room_has_physics_equipment = any(equipements_salle.get(f, 0) > 0 for f in PHYSICS_EQUIPMENT)
 
         # Vérifier si le cours a des besoins spécifiques
         has_equipment_needs = (besoins.get("ordinateurs", 0) > 0 or besoins.get("eviers", 0) > 0 or
@@ -207,10 +272,9 @@ def build_course_data_entry(request_id):
     Permet de rafraîchir une carte de cours après modification/suppression
     sans déplacer les autres cours déjà placés.
     """
-    raw_req = database.get_material_request_by_id(request_id)
-    if not raw_req:
+    req = database.get_material_request_by_id(request_id)
+    if not req:
         return None
-    req = to_dict_request(raw_req)
 
     material_needs = extract_material_needs(req.get('selected_materials', ''))
     matiere = "mixte"
@@ -340,6 +404,279 @@ def compatible(salle, besoin, c21_slots=None):
     return True
 
 
+def _equipment_array(items):
+    """Quantités d'équipement (besoins ou dotation), une ligne par élément, colonnes EQUIPMENT_FIELDS."""
+    return np.array([[item.get(f, 0) or 0 for f in EQUIPMENT_FIELDS] for item in items],
+                    dtype=np.int64).reshape(len(items), len(EQUIPMENT_FIELDS))
+
+
+def _c21_disponibilites(cours, c21_slots):
+    """Version vectorisée de est_C21_disponible : un booléen par cours."""
+    if not c21_slots:
+        return np.ones(len(cours), dtype=bool)
+
+    debut = np.array([h_to_min(c.get('horaire', '8:00')) for c in cours], dtype=np.int64)
+    fin = debut + np.array([c.get('duree', 110) for c in cours], dtype=np.int64)
+    jours = np.array([c.get('jour', 'lundi').lower() for c in cours], dtype=object)
+
+    jours_dispo = np.array([slot['jour'].lower() for slot in c21_slots], dtype=object)
+    debut_dispo = np.array([h_to_min(slot['heure_debut']) for slot in c21_slots], dtype=np.int64)
+    fin_dispo = np.array([h_to_min(slot['heure_fin']) for slot in c21_slots], dtype=np.int64)
+
+    # Le cours doit être entièrement dans au moins une plage du même jour
+    tient = ((jours[:, None] == jours_dispo[None, :])
+             & (debut[:, None] >= debut_dispo[None, :])
+             & (fin[:, None] <= fin_dispo[None, :]))
+    return tient.any(axis=1)
+
+
+def matrices_affectation(cours, salles, c21_slots=None):
+    """
+    Calcule en une passe les entrées du modèle d'affectation cours × salles
+    (salles dans l'ordre de list(salles)) :
+    - compatibilite[i, j] : mêmes règles que compatible(salles[j], cours[i], c21_slots) ;
+    - poids[i, j] : préférence de la salle j pour le cours i (0 si incompatible).
+    """
+    noms = list(salles)
+    besoins = _equipment_array(cours)
+    dotations = _equipment_array([salles[s] for s in noms])
+    chaises_cours = np.array([c["chaises"] for c in cours], dtype=np.int64)
+    chaises_salles = np.array([salles[s]["chaises"] for s in noms], dtype=np.int64)
+    types = np.array([str(salles[s].get("type", "mixte") or "mixte").strip().lower() for s in noms], dtype=object)
+    matieres = np.array([c["matiere"] for c in cours], dtype=object)
+
+    # Colonnes (salles) et lignes (cours) sous forme de vecteurs diffusables
+    salle_chimie = (types == "chimie")[None, :]
+    salle_physique = (types == "physique")[None, :]
+    salle_mixte = (types == "mixte")[None, :]
+    cours_chimie = (matieres == "chimie")[:, None]
+    cours_physique = (matieres == "physique")[:, None]
+    a_besoins = (besoins > 0).any(axis=1)[:, None]
+
+    # Compatibilité : capacité pour tous ; matière et équipements si le cours a des besoins
+    capacite_ok = chaises_cours[:, None] <= chaises_salles[None, :]
+    equipements_ok = (besoins[:, None, :] <= dotations[None, :, :]).all(axis=2)
+    type_ok = np.where(cours_chimie, salle_chimie | salle_mixte,
+                       np.where(cours_physique, salle_physique | salle_mixte, True))
+    compatibilite = capacite_ok & (~a_besoins | (type_ok & equipements_ok))
+
+    if c21_slots is not None:
+        colonnes_c21 = [j for j, s in enumerate(noms) if salles[s].get("nom") == "C21"]
+        if colonnes_c21:
+            compatibilite[:, colonnes_c21] &= _c21_disponibilites(cours, c21_slots)[:, None]
+
+    # Pondération selon la matière et les équipements réels de la salle
+    colonnes = {f: k for k, f in enumerate(EQUIPMENT_FIELDS)}
+    equipe_chimie = (dotations[:, [colonnes[f] for f in CHEMISTRY_EQUIPMENT]] > 0).any(axis=1)[None, :]
+    equipe_physique = (dotations[:, [colonnes[f] for f in PHYSICS_EQUIPMENT]] > 0).any(axis=1)[None, :]
+    forme = compatibilite.shape
+
+    def echelle(conditions, valeurs, defaut):
+        return np.select([np.broadcast_to(c, forme) for c in conditions],
+                         [np.broadcast_to(v, forme) for v in valeurs], defaut)
+
+    poids_chimie = echelle(
+        [equipe_chimie, salle_chimie, salle_mixte & ~equipe_physique, equipe_physique | salle_physique],
+        [np.where(a_besoins, 10, 9), np.where(a_besoins, 8, 7), 6, 2], 4)
+    poids_physique = echelle(
+        [equipe_physique, salle_physique, salle_mixte & ~equipe_chimie, equipe_chimie | salle_chimie],
+        [np.where(a_besoins, 10, 9), np.where(a_besoins, 8, 7), 6, 2], 4)
+    poids_mixte = echelle([salle_mixte, ~equipe_chimie & ~equipe_physique], [7, 6], 4)
+
+    poids = np.where(cours_chimie, poids_chimie, np.where(cours_physique, poids_physique, poids_mixte))
+    poids = np.where(compatibilite, poids, 0).astype(np.int64)
+    return compatibilite, poids
+
+
+def ajouter_non_chevauchement(model, cours, salles, x):
+    """
+    Interdit à deux cours qui se chevauchent d'occuper la même salle.
+    Les horaires sont fixes : le graphe des chevauchements est un graphe
+    d'intervalles, dont les cliques maximales sont les cours en train de se
+    dérouler à chaque début de cours. Un AddAtMostOne par salle et par clique
+    remplace la contrainte x[i,s] + x[j,s] <= 1 posée pour chaque couple de
+    cours qui se chevauchent et chaque salle.
+    Deux cours qui se touchent (fin == début) peuvent partager la salle.
+    """
+    intervalles = [interval_cours(c) for c in cours]
+    cliques = []
+    for instant in sorted({debut for debut, _ in intervalles}):
+        clique = [i for i, (debut, fin) in enumerate(intervalles) if debut <= instant < fin]
+        if len(clique) > 1:
+            cliques.append(clique)
+
+    for s in salles:
+        deja_posees = set()
+        for clique in cliques:
+            candidats = tuple(i for i in clique if (i, s) in x)
+            if len(candidats) > 1 and candidats not in deja_posees:
+                deja_posees.add(candidats)
+                model.AddAtMostOne([x[(i, s)] for i in candidats])
+
+
+def stabilite_par_paires(model, cours, salles, x):
+    """
+    Formulation historique : un booléen pref_i_j_s par couple de cours (i, j)
+    d'un même enseignant et par salle compatible avec les deux, vrai si les
+    deux cours y sont placés. Retourne les termes à ajouter à l'objectif.
+    """
+    # Get list of teachers
+    enseignants = list(set(c["enseignant"] for c in cours))
+
+    objectif_pref = []
+    for enseignant in enseignants:
+        cours_ens = [i for i, c in enumerate(cours) if c["enseignant"] == enseignant]
+        for idx1 in range(len(cours_ens)):
+            for idx2 in range(idx1 + 1, len(cours_ens)):
+                i, j = cours_ens[idx1], cours_ens[idx2]
+                for s in salles:
+                    if (i, s) in x and (j, s) in x:
+                        pref = model.NewBoolVar(f"pref_{i}_{j}_{s}")
+                        model.AddBoolAnd([x[(i, s)], x[(j, s)]]).OnlyEnforceIf(pref)
+                        model.AddBoolOr([x[(i, s)].Not(), x[(j, s)].Not()]).OnlyEnforceIf(pref.Not())
+                        objectif_pref.append(pref)
+    return objectif_pref
+
+
+def stabilite_par_salles(model, cours, salles, x, salles_acquises=None):
+    """
+    Un booléen par enseignant et par salle, vrai dès qu'un de ses cours y est
+    placé (une implication par variable x) : l'objectif pénalise le nombre de
+    salles distinctes utilisées par chaque enseignant. Taille linéaire en
+    nombre de variables x, au lieu d'un booléen par couple de cours et par salle.
+    salles_acquises : {enseignant: salles} déjà occupées par ses cours hors de
+    ce modèle (résolution par blocs), qui ne coûtent plus rien.
+    Retourne les termes à ajouter à l'objectif.
+    """
+    cours_par_enseignant = {}
+    for i, c in enumerate(cours):
+        cours_par_enseignant.setdefault(c["enseignant"], []).append(i)
+    salles_acquises = salles_acquises or {}
+
+    objectif_pref = []
+    for k, (enseignant, indices) in enumerate(cours_par_enseignant.items()):
+        acquises = salles_acquises.get(enseignant)
+        if len(indices) < 2 and acquises is None:
+            continue  # Une seule salle possible : terme constant
+        for s in salles:
+            if acquises and s in acquises:
+                continue  # Salle déjà comptée pour cet enseignant
+            places = [x[(i, s)] for i in indices if (i, s) in x]
+            if not places:
+                continue
+            if len(places) == 1:
+                # Un seul cours possible dans cette salle : x sert d'indicateur
+                objectif_pref.append(-places[0])
+                continue
+            salle_occupee = model.NewBoolVar(f"salle_enseignant_{k}_{s}")
+            for place in places:
+                model.AddImplication(place, salle_occupee)
+            objectif_pref.append(-salle_occupee)
+    return objectif_pref
+
+
+def construire_modele_affectation(cours, salles, c21_slots=None, stabilite=None,
+                                 precedente=None, mode_incremental=None, contexte=None):
+    """
+    Construit le modèle CP-SAT d'affectation des cours aux salles.
+    Retourne (model, x) où x[(i, s)] vaut 1 si le cours i est placé dans la salle s.
+    stabilite : formulation de la préférence "même enseignant, même salle"
+    ('salles' ou 'paires', PLANNING_TEACHER_STABILITY par défaut).
+    precedente : {i: salle} des cours inchangés depuis le planning précédent,
+    donnée comme indication de départ au solveur et, selon mode_incremental
+    ('fixer' ou 'penaliser', PLANNING_INCREMENTAL_MODE par défaut), imposée
+    ou pénalisée si elle change.
+    contexte : pour un bloc de cours résolu séparément (resoudre_par_blocs),
+    {'salles_enseignants': {enseignant: salles}, 'salles_occupees': salles}
+    des cours placés hors du bloc, déjà comptés dans l'objectif.
+    """
+    contexte = contexte or {}
+    model = cp_model.CpModel()
+    x = {}
+    poids_salle = {}
+
+    # Variables for room assignment: compatibilité et poids calculés en une passe
+    # (mêmes règles que compatible() et la pondération salle/matière historique)
+    compatibilite, poids = matrices_affectation(cours, salles, c21_slots)
+    noms_salles = list(salles)
+    for i, j in np.argwhere(compatibilite).tolist():
+        s = noms_salles[j]
+        x[(i, s)] = model.NewBoolVar(f"x_{i}_{s}")
+        poids_salle[(i, s)] = int(poids[i, j])
+
+    # Constraints: each course with compatible rooms must have exactly one room
+    for i in range(len(cours)):
+        compatible_rooms = [x[(i,s)] for s in salles if (i,s) in x]
+        if compatible_rooms:
+            model.Add(sum(compatible_rooms) == 1)
+        else:
+            print(f"⚠️ ATTENTION: Cours {i} ({cours[i]['enseignant']} - {cours[i]['niveau']}) n'a AUCUNE salle compatible!")
+            print(f"   Matière: {cours[i]['matiere']}, Horaire: {cours[i]['horaire']}")
+            print(f"   Besoins: ordinateurs={cours[i]['ordinateurs']}, eviers={cours[i]['eviers']}, hotte={cours[i]['hotte']}")
+
+    # Constraints: no room conflicts (time overlap)
+    ajouter_non_chevauchement(model, cours, salles, x)
+
+    # Preference for same teacher to use same room
+    if (stabilite or PLANNING_TEACHER_STABILITY) == 'paires':
+        objectif_pref = stabilite_par_paires(model, cours, salles, x)
+    else:
+        objectif_pref = stabilite_par_salles(model, cours, salles, x, contexte.get('salles_enseignants'))
+
+    # Variables for room usage
+    salle_utilisee = {}
+    for s in salles:
+        if s in contexte.get('salles_occupees', ()):
+            continue  # Déjà utilisée hors du bloc
+        salle_utilisee[s] = model.NewBoolVar(f"salle_utilisee_{s}")
+        vars_for_salle = [x[(i,s)] for i in range(len(cours)) if (i,s) in x]
+        if vars_for_salle:
+            model.AddMaxEquality(salle_utilisee[s], vars_for_salle)
+        else:
+            # Aucune variable pour cette salle -> elle n'est pas utilisée
+            model.Add(salle_utilisee[s] == 0)
+
+    # Re-planification incrémentale : maintien des cours inchangés dans leur salle
+    maintiens = ajouter_affectation_precedente(model, x, precedente or {},
+                                               mode_incremental or PLANNING_INCREMENTAL_MODE)
+
+    # Objective: maximize room specialization + teacher preference + room usage
+    model.Maximize(
+        sum(x[k] * poids_salle[k] for k in x) +  # room specialization
+        sum(objectif_pref) +  # same room for same teacher
+        0.1 * sum(salle_utilisee.values()) +  # encourage room usage diversity
+        PLANNING_INCREMENTAL_MOVE_COST * sum(maintiens)  # keep untouched courses in place
+    )
+
+    return model, x
+
+
+def ajouter_affectation_precedente(model, x, precedente, mode):
+    """
+    Indique au solveur l'affectation précédente des cours inchangés
+    (precedente = {i: salle}) comme solution de départ. En mode 'fixer', ces
+    cours restent dans leur salle : il ne reste à placer que les cours ajoutés
+    ou déplacés. En mode 'penaliser', retourne les variables de maintien à
+    récompenser dans l'objectif (un changement de salle coûte alors
+    PLANNING_INCREMENTAL_MOVE_COST).
+    """
+    maintiens = []
+    variables_cours = {}
+    for (i, s), var in x.items():
+        if i in precedente:
+            variables_cours.setdefault(i, []).append((s, var))
+    for i, salle in precedente.items():
+        if (i, salle) not in x:
+            continue  # salle devenue incompatible : le cours est replacé librement
+        for s, var in variables_cours[i]:
+            model.AddHint(var, s == salle)
+        if mode == 'fixer':
+            model.Add(x[(i, salle)] == 1)
+        else:
+            maintiens.append(x[(i, salle)])
+    return maintiens
+
+
 
 
 def h_to_min(hstr):
@@ -356,816 +693,1607 @@ def h_to_min(hstr):
     except:
         return 8 * 60  # Défaut 8h00
 
-def generer_excel_optimise(cours, salles, x, solver, unassigned_courses, date_param=None, custom_room_assignments=None):
-    """Génération Excel optimisée avec le solveur CP - Style grille horaire."""
+# === VOIE RAPIDE : COUPLAGES ===
+
+def couplage_maximal(scores):
+    """
+    Couplage de poids maximal lignes → colonnes (algorithme hongrois,
+    O(n² m)) d'une matrice n × m (n <= m), -inf pour une paire interdite.
+    Retourne la colonne de chaque ligne, ou None si une ligne ne peut pas
+    être couplée.
+    """
+    n, m = scores.shape
+    if n == 0:
+        return []
+    if n > m:
+        return None
+    interdit = ~np.isfinite(scores)
+    cout = np.where(interdit, 0.0, -scores)
+    cout[interdit] = np.abs(cout).sum() * (n + 1) + 1
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    ligne_de = np.zeros(m + 1, dtype=np.int64)  # colonne j (1..m) -> ligne couplée (0 : libre)
+    precedent = np.zeros(m + 1, dtype=np.int64)
+    for ligne in range(1, n + 1):
+        ligne_de[0] = ligne
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        vues = np.zeros(m + 1, dtype=bool)
+        while True:
+            vues[j0] = True
+            i0 = ligne_de[j0]
+            reduits = cout[i0 - 1] - u[i0] - v[1:]
+            ameliores = ~vues[1:] & (reduits < minv[1:])
+            minv[1:][ameliores] = reduits[ameliores]
+            precedent[1:][ameliores] = j0
+            libres = np.flatnonzero(~vues[1:]) + 1
+            j1 = libres[np.argmin(minv[libres])]
+            delta = minv[j1]
+            u[ligne_de[vues]] += delta
+            v[vues] -= delta
+            minv[~vues] -= delta
+            j0 = j1
+            if ligne_de[j0] == 0:
+                break
+        while j0:
+            j1 = precedent[j0]
+            ligne_de[j0] = ligne_de[j1]
+            j0 = j1
+    colonnes = [0] * n
+    for j in range(1, m + 1):
+        if ligne_de[j]:
+            colonnes[ligne_de[j] - 1] = j - 1
+    if any(interdit[i, j] for i, j in enumerate(colonnes)):
+        return None
+    return colonnes
+
+
+def cliques_successives(cours, indices):
+    """
+    Partition des cours indices en groupes de cours qui se chevauchent tous
+    deux à deux, en nombre minimal (graphe d'intervalles) : le cours qui se
+    termine le plus tôt et tous ceux qui commencent avant sa fin, etc.
+    Groupes dans l'ordre chronologique.
+    """
+    intervalles = {i: interval_cours(cours[i]) for i in indices}
+    restants = sorted(indices, key=lambda i: intervalles[i][1])
+    cliques = []
+    while restants:
+        fin = intervalles[restants[0]][1]
+        clique = [i for i in restants if intervalles[i][0] < fin]
+        cliques.append(clique)
+        restants = [i for i in restants if intervalles[i][0] >= fin]
+    return cliques
+
+
+def meilleur_cas_enseignant(gains, penalite):
+    """
+    Meilleure valeur des cours d'un enseignant pris seuls (lignes de gains,
+    -inf si incompatible) : somme des gains - penalite × salles distinctes
+    (penalite <= 1). Seules les salles à moins de penalite du meilleur gain de
+    chaque cours sont envisagées : une salle moins bonne ne compense jamais
+    une salle de plus. Retourne None si l'énumération serait trop longue.
+    """
+    meilleurs = gains.max(axis=1)
+    candidats = [np.flatnonzero(ligne >= m - penalite) for ligne, m in zip(gains, meilleurs)]
+    if np.prod([len(c) for c in candidats], dtype=float) > 20000:
+        return None
+    # Tous les choix à la fois : une ligne par combinaison de salles
+    choix = np.stack([g.ravel() for g in np.meshgrid(*candidats, indexing='ij')], axis=1)
+    valeurs = gains[np.arange(len(candidats)), choix].sum(axis=1)
+    distinctes = 1 + (np.diff(np.sort(choix, axis=1), axis=1) != 0).sum(axis=1)
+    return float((valeurs - penalite * distinctes).max())
+
+
+def affectation_par_couplages(cours, salles, c21_slots=None, precedente=None, mode_incremental=None):
+    """
+    Voie rapide pour la préférence 'salles' : les cours sont placés groupe
+    par groupe (cliques_successives) par un couplage de poids maximal entre
+    les cours du groupe et les salles libres, le poids étant la variation
+    exacte de l'objectif de construire_modele_affectation (poids de la salle,
+    salle nouvelle pour l'enseignant, salle encore inutilisée, maintien du
+    planning précédent).
+    Calcule aussi une borne supérieure de l'objectif : couplage de chaque
+    groupe sans tenir compte des autres, plus le meilleur cas des termes
+    "salles par enseignant" et "salles utilisées".
+    Retourne (affectation {i: salle} ou None si un cours n'a pas pu être
+    placé, valeur, borne).
+    """
+    precedente = precedente or {}
+    mode = mode_incremental or PLANNING_INCREMENTAL_MODE
+    noms = list(salles)
+    compatibilite, poids = matrices_affectation(cours, salles, c21_slots)
+    compatibilite = compatibilite.copy()
+    index_salles = {s: j for j, s in enumerate(noms)}
+    bonus = np.zeros(compatibilite.shape)
+    for i, salle in precedente.items():
+        j = index_salles.get(salle)
+        if j is None or not compatibilite[i, j]:
+            continue  # salle devenue incompatible : le cours est replacé librement
+        if mode == 'fixer':
+            compatibilite[i, :] = False
+            compatibilite[i, j] = True
+        else:
+            bonus[i, j] = PLANNING_INCREMENTAL_MOVE_COST
+    gains = np.where(compatibilite, poids + bonus, -np.inf)
+
+    places = [i for i in range(len(cours)) if compatibilite[i].any()]
+    cliques = cliques_successives(cours, places)
+    cours_par_enseignant = {}
+    for i, c in enumerate(cours):
+        cours_par_enseignant.setdefault(c['enseignant'], []).append(i)
+
+    # Première borne : groupes indépendants ; chaque enseignant occupe au moins
+    # autant de salles que son plus grand groupe de cours simultanés
+    borne_poids = 0.0
+    for clique in cliques:
+        colonnes = couplage_maximal(gains[clique])
+        if colonnes is None:
+            return None, None, None  # plus de cours simultanés que de salles
+        borne_poids += sum(gains[i, j] for i, j in zip(clique, colonnes))
+    places_set = set(places)
+    salles_min = {}
+    for enseignant, indices in cours_par_enseignant.items():
+        cliques_enseignant = cliques_successives(cours, [i for i in indices if i in places_set])
+        salles_min[enseignant] = max((len(c) for c in cliques_enseignant), default=0)
+    nb_salles = int(compatibilite.any(axis=0).sum())
+    borne = (borne_poids - sum(n for e, n in salles_min.items() if len(cours_par_enseignant[e]) >= 2)
+             + 0.1 * min(nb_salles, sum(salles_min.values())))
+    # Seconde borne : enseignants indépendants (les salles utilisées sont au plus
+    # la somme des salles de chaque enseignant)
+    borne_enseignants = 0.0
+    for enseignant, indices in cours_par_enseignant.items():
+        indices = [i for i in indices if i in places_set]
+        if not indices:
+            continue
+        if len(cours_par_enseignant[enseignant]) < 2:
+            borne_enseignants += gains[indices[0]].max() + 0.1
+            continue
+        meilleur = meilleur_cas_enseignant(gains[indices], 0.9)
+        if meilleur is None:
+            borne_enseignants = np.inf
+            break
+        borne_enseignants += meilleur
+    borne = min(borne, borne_enseignants)
+
+    # Affectation groupe par groupe, salles occupées par les cours déjà placés exclues
+    affectation = {}
+    intervalles = [interval_cours(c) for c in cours]
+    salles_enseignant = {}
+    utilisees = np.zeros(len(noms), dtype=bool)
+    for clique in cliques:
+        scores = gains[clique].copy()
+        for k, i in enumerate(clique):
+            debut, fin = intervalles[i]
+            for autre, salle in affectation.items():
+                if intervalles[autre][0] < fin and debut < intervalles[autre][1]:
+                    scores[k, index_salles[salle]] = -np.inf
+            enseignant = cours[i]['enseignant']
+            if len(cours_par_enseignant[enseignant]) >= 2:
+                nouvelles = np.ones(len(noms), dtype=bool)
+                nouvelles[[index_salles[s] for s in salles_enseignant.get(enseignant, ())]] = False
+                scores[k] -= nouvelles
+            scores[k] += 0.1 * ~utilisees
+        colonnes = couplage_maximal(scores)
+        if colonnes is None:
+            return None, None, borne
+        for i, j in zip(clique, colonnes):
+            affectation[i] = noms[j]
+            salles_enseignant.setdefault(cours[i]['enseignant'], set()).add(noms[j])
+            utilisees[j] = True
+    suivis = {e for e, indices in cours_par_enseignant.items() if len(indices) >= 2}
+    colonnes = ameliorer_affectation(cours, gains, {i: index_salles[s] for i, s in affectation.items()}, suivis)
+    affectation = {i: noms[j] for i, j in colonnes.items()}
+    return affectation, valeur_objectif(cours, salles, affectation, poids, precedente, mode_incremental), borne
+
+
+def ameliorer_affectation(cours, gains, affectation, enseignants_suivis):
+    """
+    Recherche locale sur une affectation {i: colonne de salle} : un cours
+    passe dans une salle libre sur son horaire, ou deux cours échangent leur
+    salle, tant que l'objectif augmente (gains, -1 par salle distincte d'un
+    enseignant de enseignants_suivis, +0.1 par salle utilisée).
+    """
+    intervalles = [interval_cours(c) for c in cours]
+    occupants = {}
+    par_enseignant = {}
+    for i, j in affectation.items():
+        occupants.setdefault(j, set()).add(i)
+        cle = (cours[i]['enseignant'], j)
+        par_enseignant[cle] = par_enseignant.get(cle, 0) + 1
+
+    def chevauche(i, k):
+        return intervalles[i][0] < intervalles[k][1] and intervalles[k][0] < intervalles[i][1]
+
+    def libre(i, j, sauf=None):
+        return all(k in (i, sauf) or not chevauche(i, k) for k in occupants.get(j, ()))
+
+    def variation(sorties, entrees):
+        """Variation de l'objectif si les couples (cours, salle) sorties sont remplacés par entrees."""
+        delta = sum(gains[i, j] for i, j in entrees) - sum(gains[i, j] for i, j in sorties)
+        comptes_e, comptes_s = dict(), dict()
+        for signe, couples in ((-1, sorties), (1, entrees)):
+            for i, j in couples:
+                cle = (cours[i]['enseignant'], j)
+                comptes_e[cle] = comptes_e.get(cle, 0) + signe
+                comptes_s[j] = comptes_s.get(j, 0) + signe
+        for (enseignant, j), d in comptes_e.items():
+            if enseignant in enseignants_suivis:
+                avant = par_enseignant.get((enseignant, j), 0)
+                delta -= (avant + d > 0) - (avant > 0)
+        for j, d in comptes_s.items():
+            avant = len(occupants.get(j, ()))
+            delta += 0.1 * ((avant + d > 0) - (avant > 0))
+        return delta
+
+    def appliquer(sorties, entrees):
+        for signe, couples in ((-1, sorties), (1, entrees)):
+            for i, j in couples:
+                cle = (cours[i]['enseignant'], j)
+                par_enseignant[cle] = par_enseignant.get(cle, 0) + signe
+                if signe > 0:
+                    occupants.setdefault(j, set()).add(i)
+                    affectation[i] = j
+                else:
+                    occupants[j].discard(i)
+
+    ameliore = True
+    while ameliore:
+        ameliore = False
+        for i in list(affectation):
+            courante = affectation[i]
+            for j in np.flatnonzero(np.isfinite(gains[i])).tolist():
+                if j != courante and libre(i, j) and variation([(i, courante)], [(i, j)]) > 1e-9:
+                    appliquer([(i, courante)], [(i, j)])
+                    courante, ameliore = j, True
+        for i in list(affectation):
+            for k in list(affectation):
+                a, b = affectation[i], affectation[k]
+                if k <= i or a == b or not (np.isfinite(gains[i, b]) and np.isfinite(gains[k, a])):
+                    continue
+                if libre(i, b, sauf=k) and libre(k, a, sauf=i) \
+                        and variation([(i, a), (k, b)], [(i, b), (k, a)]) > 1e-9:
+                    appliquer([(i, a), (k, b)], [(i, b), (k, a)])
+                    ameliore = True
+    return affectation
+
+
+def resoudre_par_couplages(cours, salles, c21_slots, precedente=None, mode_incremental=None, profil=None):
+    """
+    Voie rapide de _resoudre. Retourne (status, affectation, statistiques)
+    si l'affectation par couplages est à moins de l'écart toléré du profil de
+    la borne (OPTIMAL si elle l'atteint), sinon (None, affectation ou None,
+    statistiques) pour que l'optimiseur prenne le relais.
+    """
+    debut = time.perf_counter()
+    profil = profil_solveur(profil)
+    affectation, valeur, borne = affectation_par_couplages(cours, salles, c21_slots, precedente, mode_incremental)
+    ecart = None
+    if affectation is not None:
+        ecart = round(max(0.0, borne - valeur) / max(1.0, abs(valeur)), 6)
+    stats = {
+        'status': None,
+        'profile': profil,
+        'time_limit': None,
+        'wall_time': round(time.perf_counter() - debut, 3),
+        'objective': valeur,
+        'best_bound': borne,
+        'gap': ecart,
+        'branches': 0,
+        'conflicts': 0,
+        'variables': 0,
+        'constraints': 0,
+        'source': 'solveur',
+        'engine': 'couplages',
+    }
+    if ecart is None or ecart > SOLVER_PROFILES[profil]['ecart_relatif']:
+        return None, affectation, stats
+    status = cp_model.OPTIMAL if ecart < 1e-9 else cp_model.FEASIBLE
+    stats['status'] = cp_model.cp_model_pb2.CpSolverStatus.Name(status)
+    return status, affectation, stats
+
+
+# === RÉSOLUTION PAR BLOCS ===
+
+def blocs_temporels(cours):
+    """
+    Composantes connexes du graphe des chevauchements : groupes de cours dont
+    les horaires se chevauchent de proche en proche, dans l'ordre
+    chronologique (listes d'indices). Deux blocs ne partagent aucune
+    contrainte de salle ; seul l'objectif les lie (salles de chaque
+    enseignant, salles utilisées).
+    """
+    intervalles = [interval_cours(c) for c in cours]
+    blocs = []
+    fin_bloc = None
+    for i in sorted(range(len(cours)), key=lambda i: intervalles[i]):
+        debut, fin = intervalles[i]
+        if blocs and debut < fin_bloc:
+            blocs[-1].append(i)
+            fin_bloc = max(fin_bloc, fin)
+        else:
+            blocs.append([i])
+            fin_bloc = fin
+    return blocs
+
+
+def valeur_objectif(cours, salles, affectation, poids, precedente=None, mode_incremental=None):
+    """
+    Valeur de l'objectif de construire_modele_affectation (préférence
+    'salles') pour une affectation {i: salle} ; poids : matrice de
+    matrices_affectation.
+    """
+    index_salles = {s: j for j, s in enumerate(salles)}
+    valeur = sum(int(poids[i, index_salles[s]]) for i, s in affectation.items())
+    cours_par_enseignant = {}
+    for c in cours:
+        cours_par_enseignant[c['enseignant']] = cours_par_enseignant.get(c['enseignant'], 0) + 1
+    salles_par_enseignant = {}
+    for i, s in affectation.items():
+        salles_par_enseignant.setdefault(cours[i]['enseignant'], set()).add(s)
+    valeur -= sum(len(v) for e, v in salles_par_enseignant.items() if cours_par_enseignant[e] >= 2)
+    valeur += 0.1 * len(set(affectation.values()))
+    if precedente and (mode_incremental or PLANNING_INCREMENTAL_MODE) == 'penaliser':
+        valeur += PLANNING_INCREMENTAL_MOVE_COST * sum(1 for i, s in precedente.items() if affectation.get(i) == s)
+    return valeur
+
+
+def resoudre_par_blocs(cours, salles, c21_slots, blocs, precedente=None, mode_incremental=None, profil=None,
+                       depart=None, progression=None):
+    """
+    Résout chaque bloc de blocs_temporels comme un modèle séparé et fusionne
+    les affectations. Un bloc est résolu en tenant compte des salles déjà
+    choisies dans les autres (une salle déjà occupée par l'enseignant, ou
+    déjà utilisée, ne coûte ni ne rapporte plus rien) : c'est la meilleure
+    réponse exacte du bloc, les autres étant fixés. Après le premier passage,
+    les blocs dont le contexte a changé sont re-résolus tour à tour tant que
+    l'objectif de la journée s'améliore (PLANNING_DECOMPOSITION_PASSES).
+    Les contraintes étant indépendantes d'un bloc à l'autre, un bloc sans
+    solution rend la journée impossible.
+    depart : affectation {i: salle} donnée comme point de départ au premier passage.
+    progression : appelée avec chaque affectation complète de la journée (signaler_solution).
+    Retourne (status, affectation, statistiques) comme _resoudre.
+    """
+    debut = time.perf_counter()
+    precedente = precedente or {}
+    depart = depart or {}
+    _, poids = matrices_affectation(cours, salles, c21_slots)
+    indices_blocs = [set(bloc) for bloc in blocs]
+    enseignants_blocs = [{cours[i]['enseignant'] for i in bloc} for bloc in blocs]
+    affectation = {}
+    totaux = {'solves': 0, 'branches': 0, 'conflicts': 0, 'variables': 0, 'constraints': 0, 'time_limit': 0,
+              'optimaux': True}
+    contextes = {}
+
+    def contexte_bloc(b):
+        salles_enseignants = {}
+        for i, c in enumerate(cours):
+            if i not in indices_blocs[b] and c['enseignant'] in enseignants_blocs[b]:
+                salles_e = salles_enseignants.setdefault(c['enseignant'], set())
+                if i in affectation:
+                    salles_e.add(affectation[i])
+        salles_occupees = {s for i, s in affectation.items() if i not in indices_blocs[b]}
+        signature = (frozenset((e, frozenset(v)) for e, v in salles_enseignants.items()), frozenset(salles_occupees))
+        return {'salles_enseignants': salles_enseignants, 'salles_occupees': salles_occupees}, signature
+
+    def resoudre_bloc(b, contexte):
+        bloc = blocs[b]
+        sous_cours = [cours[i] for i in bloc]
+        sous_precedente = {j: precedente[i] for j, i in enumerate(bloc) if i in precedente}
+        model, x = construire_modele_affectation(sous_cours, salles, c21_slots, precedente=sous_precedente,
+                                                 mode_incremental=mode_incremental, contexte=contexte)
+        # Affectation courante du bloc (ou celle de départ) comme point de départ
+        for (j, s), var in x.items():
+            salle = affectation.get(bloc[j], depart.get(bloc[j]))
+            if salle is not None and j not in sous_precedente:
+                model.AddHint(var, salle == s)
+        solver = cp_model.CpSolver()
+        nom, temps = parametrer_solveur(solver, len(sous_cours), profil)
+        status = solver.Solve(model)
+        stats = statistiques_resolution(solver, status, model, nom, temps)
+        sous_affectation = {}
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            sous_affectation = {bloc[j]: s for (j, s), var in x.items() if solver.Value(var) == 1}
+        return status, sous_affectation, stats
+
+    def compter(stats):
+        totaux['solves'] += 1
+        totaux['optimaux'] &= stats['status'] == cp_model.cp_model_pb2.CpSolverStatus.Name(cp_model.OPTIMAL)
+        for cle in ('branches', 'conflicts', 'variables', 'constraints'):
+            totaux[cle] += stats[cle]
+        totaux['time_limit'] = max(totaux['time_limit'], stats['time_limit'])
+
+    # Premier passage
+    if PLANNING_DECOMPOSITION_THREADS > 1:
+        with ThreadPoolExecutor(max_workers=PLANNING_DECOMPOSITION_THREADS) as pool:
+            resultats = list(pool.map(lambda b: resoudre_bloc(b, None), range(len(blocs))))
+    else:
+        resultats = []
+        for b in range(len(blocs)):
+            contexte, contextes[b] = contexte_bloc(b)
+            resultats.append(resoudre_bloc(b, contexte))
+            affectation.update(resultats[-1][1])
+    for status, sous_affectation, stats in resultats:
+        compter(stats)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return status, {}, dict(stats, wall_time=round(time.perf_counter() - debut, 3),
+                                    decomposition={'blocks': len(blocs), 'solves': totaux['solves'], 'passes': 0})
+        affectation.update(sous_affectation)
+    valeur = valeur_objectif(cours, salles, affectation, poids, precedente, mode_incremental)
+    signaler_solution(progression, cours, salles, affectation, engine='cp-sat-blocs', objective=valeur,
+                      wall_time=round(time.perf_counter() - debut, 3))
+
+    # Ajustement : chaque bloc re-résolu, les autres fixés, si son contexte a changé
+    passages, stable = 0, PLANNING_DECOMPOSITION_PASSES == 0
+    for _ in range(PLANNING_DECOMPOSITION_PASSES):
+        passages += 1
+        ameliore = False
+        for b in range(len(blocs)):
+            contexte, signature = contexte_bloc(b)
+            if contextes.get(b) == signature:
+                continue
+            contextes[b] = signature
+            status, sous_affectation, stats = resoudre_bloc(b, contexte)
+            compter(stats)
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                continue
+            candidate = {i: s for i, s in affectation.items() if i not in indices_blocs[b]}
+            candidate.update(sous_affectation)
+            valeur_candidate = valeur_objectif(cours, salles, candidate, poids, precedente, mode_incremental)
+            if valeur_candidate > valeur + 1e-6:
+                affectation, valeur, ameliore = candidate, valeur_candidate, True
+                signaler_solution(progression, cours, salles, affectation, engine='cp-sat-blocs', objective=valeur,
+                                  wall_time=round(time.perf_counter() - debut, 3))
+        if not ameliore:
+            stable = True
+            break
+
+    # OPTIMAL quand chaque bloc est optimal, les autres fixés, et que le dernier passage
+    # n'a plus rien changé ; FEASIBLE si une résolution a été interrompue ou si les
+    # passages ont été épuisés avant stabilisation
+    status = cp_model.OPTIMAL if totaux['optimaux'] and stable else cp_model.FEASIBLE
+    stats = {
+        'status': cp_model.cp_model_pb2.CpSolverStatus.Name(status),
+        'profile': profil_solveur(profil),
+        'time_limit': totaux['time_limit'],
+        'wall_time': round(time.perf_counter() - debut, 3),
+        'objective': valeur,
+        'best_bound': None,
+        'gap': None,
+        'branches': totaux['branches'],
+        'conflicts': totaux['conflicts'],
+        'variables': totaux['variables'],
+        'constraints': totaux['constraints'],
+        'source': 'solveur',
+        'engine': 'cp-sat-blocs',
+        'decomposition': {'blocks': len(blocs), 'solves': totaux['solves'], 'passes': passages},
+    }
+    return status, affectation, stats
+
+
+# === SUIVI DES SOLUTIONS INTERMÉDIAIRES ===
+
+def signaler_solution(progression, cours, salles, affectation, **infos):
+    """
+    Transmet une affectation (intermédiaire ou finale) à progression, au
+    format de l'éditeur : {'stage': 'resolution', 'room_assignments':
+    {id du cours: nom de la salle}, ...infos}. Sans effet si progression est None.
+    """
+    if progression is None:
+        return
+    progression(dict(infos, stage='resolution',
+                     room_assignments={cours[i]['id']: salles[s]['nom'] for i, s in affectation.items()}))
+
+
+class SuiviSolutions(cp_model.CpSolverSolutionCallback):
+    """Rappel de l'optimiseur : chaque solution trouvée est transmise à signaler_solution."""
+
+    def __init__(self, cours, salles, x, progression):
+        super().__init__()
+        self.cours = cours
+        self.salles = salles
+        self.x = x
+        self.progression = progression
+        self.solutions = 0
+
+    def on_solution_callback(self):
+        self.solutions += 1
+        affectation = {i: s for (i, s), var in self.x.items() if self.Value(var)}
+        signaler_solution(self.progression, self.cours, self.salles, affectation, engine='cp-sat',
+                          solutions=self.solutions, objective=self.ObjectiveValue(),
+                          best_bound=self.BestObjectiveBound(), wall_time=round(self.WallTime(), 3))
+
+
+# === CACHE DES SOLUTIONS ===
+
+def empreinte_entrees(cours, salles, c21_slots=None, stabilite=None, precedente=None, mode_incremental=None,
+                      profil=None):
+    """
+    Empreinte SHA-256 canonique des entrées du modèle d'affectation : champs
+    des cours lus par le modèle (dans l'ordre des cours), salles, créneaux C21,
+    formulation de l'objectif, affectation précédente imposée, profil de
+    l'optimiseur et version du modèle. Deux générations de même empreinte
+    construisent et résolvent exactement le même modèle.
+    """
+    profil = profil_solveur(profil)
+    entrees = {
+        'version': SOLVER_MODEL_VERSION,
+        'stabilite': stabilite or PLANNING_TEACHER_STABILITY,
+        'profil': [profil, SOLVER_PROFILES[profil]],
+        'decomposition': PLANNING_DECOMPOSITION,
+        'voie_rapide': PLANNING_FAST_PATH,
+        'cours': [[c.get(f) for f in SOLVER_COURSE_FIELDS] for c in cours],
+        'salles': [[s, salles[s]] for s in salles],
+        'c21': sorted([str(slot.get('jour', '')).lower(), str(slot.get('heure_debut', '')),
+                       str(slot.get('heure_fin', ''))] for slot in (c21_slots or [])),
+    }
+    if precedente:
+        entrees['precedente'] = sorted([i, s] for i, s in precedente.items())
+        entrees['mode_incremental'] = mode_incremental or PLANNING_INCREMENTAL_MODE
+    texte = json.dumps(entrees, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+class SolutionCache:
+    """
+    Solutions de l'optimiseur indexées par empreinte_entrees : LRU en mémoire
+    devant, avec le backend 'database', la table planning_solutions.
+    Une solution est {'status': statut CP-SAT, 'salles': [salle ou None, par cours]}.
+
+    Les entrées ne sont jamais invalidées : une écriture qui change le
+    modèle (demande, salle, créneau C21...) change l'empreinte, et les
+    anciennes solutions sortent par la limite de taille.
+    """
+
+    def __init__(self, backend='database', size=200):
+        self.pid = os.getpid()
+        self.backend = backend
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._plannings = OrderedDict()
+        self._stats = {'hits': 0, 'database_hits': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+    def _remember(self, cle, solution):
+        with self._lock:
+            self._entries[cle] = solution
+            self._entries.move_to_end(cle)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def get(self, cle):
+        if self.backend == 'off':
+            return None
+        with self._lock:
+            solution = self._entries.get(cle)
+            if solution is not None:
+                self._entries.move_to_end(cle)
+                self._stats['hits'] += 1
+                return solution
+        if self.backend == 'database':
+            try:
+                texte = database.get_planning_solution(cle)
+            except Exception as e:
+                print(f"⚠️ Cache de solutions indisponible: {e}")
+                texte = None
+                self._stats['errors'] += 1
+            if texte:
+                solution = json.loads(texte)
+                self._remember(cle, solution)
+                with self._lock:
+                    self._stats['database_hits'] += 1
+                return solution
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, cle, solution):
+        if self.backend == 'off':
+            return
+        self._remember(cle, solution)
+        with self._lock:
+            self._stats['stores'] += 1
+        if self.backend == 'database':
+            try:
+                database.save_planning_solution(cle, json.dumps(solution), keep=self.size)
+            except Exception as e:
+                print(f"⚠️ Solution non enregistrée dans le cache partagé: {e}")
+                self._stats['errors'] += 1
+
+    def memoriser_planning(self, date_str, salles_par_demande):
+        """Retient la dernière affectation calculée pour une date ({request_id: salle})."""
+        if self.backend == 'off' or not date_str:
+            return
+        with self._lock:
+            self._plannings[date_str] = dict(salles_par_demande)
+            self._plannings.move_to_end(date_str)
+            while len(self._plannings) > self.size:
+                self._plannings.popitem(last=False)
+
+    def dernier_planning(self, date_str):
+        """Dernière affectation calculée par ce processus pour la date, ou None."""
+        with self._lock:
+            return self._plannings.get(date_str)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plannings.clear()
+        if self.backend == 'database':
+            database.clear_planning_solutions()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, backend=self.backend, size=self.size, entries=len(self._entries))
+        lookups = stats['hits'] + stats['database_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['database_hits']) / lookups, 3) if lookups else None
+        return stats
+
+
+_solution_cache = None
+_solution_cache_lock = threading.Lock()
+
+
+def get_solution_cache():
+    """Cache de solutions du processus courant (backend PLANNING_SOLUTION_CACHE, recréé après un fork)."""
+    global _solution_cache
+    cache = _solution_cache
+    if cache is not None and cache.pid == os.getpid():
+        return cache
+    with _solution_cache_lock:
+        if _solution_cache is None or _solution_cache.pid != os.getpid():
+            _solution_cache = SolutionCache(PLANNING_SOLUTION_CACHE, PLANNING_SOLUTION_CACHE_SIZE)
+        return _solution_cache
+
+
+def affectation_precedente(date_str, cours, salles):
+    """
+    Affectation {i: salle} des cours inchangés depuis le planning précédent de
+    la date : planning enregistré par l'éditeur (déplacements manuels compris)
+    ou, à défaut, dernière solution calculée par ce processus. Un cours est
+    inchangé si sa demande y figure avec le même horaire et la même durée,
+    dans une salle qui existe encore.
+    """
+    salles_par_demande = _salles_planning_enregistre(date_str, salles)
+    if salles_par_demande is None:
+        dernier = get_solution_cache().dernier_planning(date_str) or {}
+        salles_par_demande = {rid: tuple(v) for rid, v in dernier.items() if v[0] in salles}
+    return _cours_inchanges(cours, salles_par_demande)
+
+
+def affectation_enregistree(date_str, cours, salles):
+    """
+    Affectation {i: salle} du planning enregistré par l'éditeur, si elle
+    place encore chacun des cours de la date (aucune demande ajoutée ou
+    modifiée depuis), sinon None.
+    """
+    salles_par_demande = _salles_planning_enregistre(date_str, salles)
+    if not salles_par_demande:
+        return None
+    affectation = _cours_inchanges(cours, salles_par_demande)
+    return affectation if len(affectation) == len(cours) else None
+
+
+def _salles_planning_enregistre(date_str, salles):
+    """{request_id: (salle, horaire, durée)} du planning enregistré pour la date, None sans planning."""
     try:
-        print(f"🔧 [Excel] Début génération Excel avec custom_room_assignments type: {type(custom_room_assignments)}")
-        print(f"🔧 [Excel] custom_room_assignments value: {custom_room_assignments}")
-        
-        from openpyxl import Workbook
-        from openpyxl.styles import Alignment, PatternFill, Border, Side, Font
-        
-        wb = Workbook()
-        
-        # Créneaux horaires personnalisés (comme dans main.py)
-        horaires_str = [
-            "9h00", "9h30", "10h00", "10h45", "11h15", "11h45", "12h15", "12h45",
-            "13h15", "13h45", "14h15", "14h45", "15h15", "15h45", "16h15", "16h45",
-            "17h15", "17h45", "18h15"
-        ]
-        horaires = [h_to_min(h) for h in horaires_str]
-        
-        # Définition de l'ordre personnalisé des salles
-        physique_salles = ["C23", "C25", "C27", "C22", "C24"]
-        chimie_salles = ["C32", "C33", "C31"]
-        
-        # Liste des salles dans l'ordre demandé: PHYSIQUE puis CHIMIE puis C21
-        ordered_rooms = physique_salles + chimie_salles + ["C21"]
-        
-        # Filtrer pour ne garder que les salles qui existent
-        salle_list = [room for room in ordered_rooms if room in salles.keys()]
-        
-        # Ajouter les salles restantes qui ne sont pas dans l'ordre personnalisé (au cas où)
-        remaining_rooms = [room for room in salles.keys() if room not in salle_list]
-        salle_list.extend(sorted(remaining_rooms))
-        
-        # Feuille 1: Planning détaillé (techniciens)
-        ws1 = wb.active
-        ws1.title = "Planning_Techniciens"
-        
-        # Styles
-        bold_font = Font(bold=True, size=16)
-        header_font = Font(bold=True, size=36)
-        border = Border(left=Side(style='thick'), right=Side(style='thick'), 
-                       top=Side(style='thick'), bottom=Side(style='thick'))
-        
-        # En-tête principal (ligne 1)
-        ws1.cell(row=1, column=1, value="Planning")
-        ws1.cell(row=1, column=1).alignment = Alignment(horizontal="center", vertical="center")
-        ws1.column_dimensions['A'].width = 12
-        
-        # Encadrés Physique et Chimie
-        col_physique = [2 + salle_list.index(s) for s in physique_salles if s in salle_list]
-        col_chimie = [2 + salle_list.index(s) for s in chimie_salles if s in salle_list]
-        
-        if col_physique and len(col_physique) > 0:
-            # Ne fusionner que s'il y a plusieurs colonnes
-            if len(col_physique) > 1 and col_physique[-1] > col_physique[0]:
-                ws1.merge_cells(start_row=1, start_column=col_physique[0], end_row=1, end_column=col_physique[-1])
-            for col in range(col_physique[0], col_physique[-1]+1):
-                cell_phys = ws1.cell(row=1, column=col, value="Physique" if col==col_physique[0] else None)
-                cell_phys.font = header_font
-                cell_phys.alignment = Alignment(horizontal="center", vertical="center")
-                cell_phys.border = border
-        
-        if col_chimie and len(col_chimie) > 0:
-            # Ne fusionner que s'il y a plusieurs colonnes
-            if len(col_chimie) > 1 and col_chimie[-1] > col_chimie[0]:
-                ws1.merge_cells(start_row=1, start_column=col_chimie[0], end_row=1, end_column=col_chimie[-1])
-            for col in range(col_chimie[0], col_chimie[-1]+1):
-                cell_chim = ws1.cell(row=1, column=col, value="Chimie" if col==col_chimie[0] else None)
-                cell_chim.font = header_font
-                cell_chim.alignment = Alignment(horizontal="center", vertical="center")
-                cell_chim.border = border
-        
-        # Noms des salles (ligne 2)
-        for idx_s, s in enumerate(salle_list):
-            col_letter = ws1.cell(row=2, column=2+idx_s).column_letter
-            cell = ws1.cell(row=2, column=2+idx_s, value=s)
-            ws1.column_dimensions[col_letter].width = 20
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = border
-        
-        # Date (ligne 2, colonne 1) - Utiliser la date du planning, pas la date actuelle
-        from datetime import datetime
-        # Si date_param n'est pas fournie, utiliser la date actuelle
+        planning = database.get_saved_planning(date_str)
+    except Exception as e:
+        print(f"⚠️ Planning enregistré illisible: {e}")
+        planning = None
+    if not planning:
+        return None
+    salles_par_demande = {}
+    room_assignments = planning.get('room_assignments') or {}
+    for c in planning.get('courses') or []:
+        salle = room_assignments.get(c.get('id'))
+        if c.get('request_id') is not None and salle in salles:
+            salles_par_demande[c['request_id']] = (salle, c.get('time'), c.get('duration'))
+    return salles_par_demande
+
+
+def _cours_inchanges(cours, salles_par_demande):
+    """Affectation {i: salle} des cours dont la demande a gardé son horaire et sa durée."""
+    precedente = {}
+    for i, c in enumerate(cours):
+        salle, horaire, duree = salles_par_demande.get(c.get('request_id'), (None, None, None))
+        if salle and horaire == c['horaire'] and duree == c['duree']:
+            precedente[i] = salle
+    return precedente
+
+
+def profil_solveur(profil=None):
+    """Nom du profil de l'optimiseur à utiliser (PLANNING_SOLVER_PROFILE par défaut)."""
+    profil = (profil or PLANNING_SOLVER_PROFILE).strip().lower()
+    if profil not in SOLVER_PROFILES:
+        print(f"⚠️ Profil d'optimiseur inconnu '{profil}', profil 'equilibre' utilisé")
+        profil = 'equilibre'
+    return profil
+
+
+def parametrer_solveur(solver, nb_cours, profil=None):
+    """
+    Applique un profil de SOLVER_PROFILES au solveur pour un problème de
+    nb_cours cours. Retourne (nom du profil, limite de temps en secondes).
+    """
+    profil = profil_solveur(profil)
+    parametres = SOLVER_PROFILES[profil]
+    temps = min(parametres['temps_max'], parametres['temps_base'] + parametres['temps_par_cours'] * nb_cours)
+    solver.parameters.max_time_in_seconds = temps
+    workers = parametres['workers']
+    if SOLVER_NUM_WORKERS:
+        workers = min(workers, SOLVER_NUM_WORKERS) if workers else SOLVER_NUM_WORKERS
+    if workers:
+        solver.parameters.num_workers = workers
+    solver.parameters.random_seed = parametres['graine']
+    if parametres['ecart_relatif']:
+        solver.parameters.relative_gap_limit = parametres['ecart_relatif']
+    return profil, temps
+
+
+def statistiques_resolution(solver, status, model, profil, temps_limite):
+    """Statistiques d'une résolution, jointes aux réponses du planning et aux logs."""
+    proto = model.Proto()
+    resolu = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    objectif = solver.ObjectiveValue() if resolu else None
+    borne = solver.BestObjectiveBound() if resolu else None
+    return {
+        'status': cp_model.cp_model_pb2.CpSolverStatus.Name(status),
+        'profile': profil,
+        'time_limit': temps_limite,
+        'wall_time': round(solver.WallTime(), 3),
+        'objective': objectif,
+        'best_bound': borne,
+        'gap': round(abs(borne - objectif) / max(1.0, abs(objectif)), 6) if resolu else None,
+        'branches': solver.NumBranches(),
+        'conflicts': solver.NumConflicts(),
+        'variables': len(proto.variables),
+        'constraints': len(proto.constraints),
+        'source': 'solveur',
+        'engine': 'cp-sat',
+    }
+
+
+def resoudre_affectation(cours, salles, c21_slots=None, precedente=None, date_str=None, profil=None,
+                         progression=None):
+    """
+    Affectation des cours aux salles, depuis le cache de solutions ou par
+    l'optimiseur. Retourne (status, affectation, statistiques) où
+    affectation[i] est la salle du cours i (cours non placés absents) et
+    statistiques celles de statistiques_resolution (source 'cache' si la
+    solution a été réutilisée).
+    precedente : {i: salle} des cours à maintenir (re-planification
+    incrémentale, voir affectation_precedente). Si le mode 'fixer' n'a pas de
+    solution, le calcul est refait en mode 'penaliser'.
+    profil : profil de l'optimiseur (SOLVER_PROFILES, PLANNING_SOLVER_PROFILE par défaut).
+    progression : appelée avec les solutions intermédiaires (signaler_solution).
+    """
+    mode = PLANNING_INCREMENTAL_MODE if precedente else None
+    status, affectation, stats = _resoudre(cours, salles, c21_slots, precedente, mode, profil, progression)
+    if precedente and mode == 'fixer' and status == cp_model.INFEASIBLE:
+        print("⚠️ Planning précédent incompatible avec les changements : cours inchangés seulement pénalisés")
+        status, affectation, stats = _resoudre(cours, salles, c21_slots, precedente, 'penaliser', profil,
+                                               progression)
+    if precedente and status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        deplaces = sum(1 for i, s in precedente.items() if affectation.get(i) != s)
+        print(f"🔁 Re-planification incrémentale: {len(precedente) - deplaces} cours maintenus, "
+              f"{deplaces} déplacés, {len(cours) - len(precedente)} à placer")
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        get_solution_cache().memoriser_planning(date_str, {
+            c['request_id']: (affectation[i], c['horaire'], c['duree'])
+            for i, c in enumerate(cours) if i in affectation and c.get('request_id') is not None})
+    print(f"📊 Résolution{f' du {date_str}' if date_str else ''}: " +
+          ", ".join(f"{k}={v}" for k, v in stats.items()))
+    return status, affectation, stats
+
+
+def solution_en_cache(cours, salles, c21_slots=None, precedente=None, mode=None, profil=None):
+    """
+    Solution déjà calculée pour ces entrées : (cle, (status, affectation,
+    statistiques)), ou (cle, None) s'il faut lancer l'optimiseur.
+    """
+    cle = empreinte_entrees(cours, salles, c21_slots, precedente=precedente, mode_incremental=mode, profil=profil)
+    solution = get_solution_cache().get(cle)
+    if solution is None:
+        return cle, None
+    print(f"♻️ Solution réutilisée depuis le cache ({cle[:12]})")
+    stats = dict(solution.get('stats') or {'status': cp_model.cp_model_pb2.CpSolverStatus.Name(solution['status'])},
+                 source='cache')
+    affectation = {i: s for i, s in enumerate(solution['salles']) if s is not None}
+    return cle, (solution['status'], affectation, stats)
+
+
+def _resoudre(cours, salles, c21_slots, precedente, mode, profil, progression=None):
+    """Une résolution pour un mode incrémental donné : cache, sinon optimiseur."""
+    cache = get_solution_cache()
+    cle, resultat = solution_en_cache(cours, salles, c21_slots, precedente, mode, profil)
+    if resultat is not None:
+        status, affectation, stats = resultat
+        signaler_solution(progression, cours, salles, affectation, engine=stats.get('engine'), source='cache',
+                          objective=stats.get('objective'))
+        return resultat
+
+    # Voie rapide, puis optimiseur CP-SAT : modèle unique parti de son affectation, ou par blocs sans elle
+    depart, rapide = {}, None
+    if PLANNING_FAST_PATH == 'on' and PLANNING_TEACHER_STABILITY != 'paires':
+        status, depart, rapide = resoudre_par_couplages(cours, salles, c21_slots, precedente, mode, profil)
+        if status is not None:
+            print(f"⚡ Affectation par couplages retenue (écart {rapide['gap']:.2%}, {rapide['wall_time']} s)")
+            cache.put(cle, {'status': status, 'salles': [depart.get(i) for i in range(len(cours))], 'stats': rapide})
+            signaler_solution(progression, cours, salles, depart, engine='couplages', objective=rapide['objective'],
+                              best_bound=rapide['best_bound'], wall_time=rapide['wall_time'])
+            return status, depart, rapide
+        depart = depart or {}
+        rapide = {'objective': rapide['objective'], 'best_bound': rapide['best_bound'], 'gap': rapide['gap'],
+                  'wall_time': rapide['wall_time']}
+
+    # Par blocs seulement sans affectation de départ (voir PLANNING_DECOMPOSITION)
+    blocs = []
+    if PLANNING_DECOMPOSITION == 'blocs' and PLANNING_TEACHER_STABILITY != 'paires' and not depart:
+        blocs = blocs_temporels(cours)
+    if len(blocs) > 1:
+        print(f"🧩 Résolution par blocs: {len(blocs)} blocs de {[len(b) for b in blocs]} cours")
+        status, affectation, stats = resoudre_par_blocs(cours, salles, c21_slots, blocs, precedente, mode, profil,
+                                                        progression=progression)
+        if rapide:
+            stats['fast_path'] = rapide
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE, cp_model.INFEASIBLE):
+            cache.put(cle, {'status': status, 'salles': [affectation.get(i) for i in range(len(cours))], 'stats': stats})
+        return status, affectation, stats
+
+    model, x = construire_modele_affectation(cours, salles, c21_slots,
+                                             precedente=precedente, mode_incremental=mode)
+    for (i, s), var in x.items():
+        if i in depart and i not in (precedente or {}):
+            model.AddHint(var, depart[i] == s)
+
+    # Solve the model
+    solver = cp_model.CpSolver()
+    profil, temps_limite = parametrer_solveur(solver, len(cours), profil)
+    status = solver.Solve(model, SuiviSolutions(cours, salles, x, progression) if progression else None)
+    stats = statistiques_resolution(solver, status, model, profil, temps_limite)
+    if rapide:
+        stats['fast_path'] = rapide
+
+    print(f"Statut de la résolution: {status}")
+    print(f"Nombre de cours: {len(cours)}")
+    print(f"Nombre de salles disponibles: {len(salles)}")
+    print(f"Salles: {list(salles.keys())}")
+    print(f"Variables x créées: {len(x)}")
+
+    # Debug: afficher les cours et leurs salles compatibles
+    for i, c in enumerate(cours):
+        compatible_rooms_list = [s for s in salles if (i,s) in x]
+        print(f"Cours {i} ({c['enseignant']} - {c['niveau']} à {c['horaire']}): {len(compatible_rooms_list)} salles compatibles - {compatible_rooms_list}")
+
+    affectation = {}
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        affectation = {i: s for (i, s), var in x.items() if solver.Value(var) == 1}
+    # UNKNOWN / MODEL_INVALID : rien à réutiliser, on relancera l'optimiseur
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE, cp_model.INFEASIBLE):
+        cache.put(cle, {'status': status, 'salles': [affectation.get(i) for i in range(len(cours))], 'stats': stats})
+    return status, affectation, stats
+
+
+# === RENDU EXCEL ===
+
+# Couleurs des cours dans les feuilles de planning
+PLANNING_FILL_CHIMIE = "B2F2E9"
+PLANNING_FILL_PHYSIQUE = "FFD580"
+PLANNING_FILL_COURS = "D3D3D3"
+
+
+def styles_planning(wb):
+    """
+    Enregistre dans le classeur les styles nommés des feuilles de planning
+    (une seule fois par classeur) : les cellules y font référence par leur
+    nom au lieu de recevoir chacune leurs objets Font/Alignment/Border/PatternFill.
+    """
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+    from openpyxl.styles.borders import DEFAULT_BORDER
+    from openpyxl.styles.fills import DEFAULT_EMPTY_FILL
+    from openpyxl.styles.fonts import DEFAULT_FONT
+
+    if 'planning_case' in wb.named_styles:
+        return
+    bordure = Border(left=Side(style='thick'), right=Side(style='thick'),
+                     top=Side(style='thick'), bottom=Side(style='thick'))
+    centre = Alignment(horizontal="center", vertical="center")
+    case = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+    def style(nom, font=DEFAULT_FONT, fill=DEFAULT_EMPTY_FILL, border=DEFAULT_BORDER, alignment=None, couleur=None):
+        # Propriétés non précisées : celles d'une cellule sans style
+        if couleur:
+            fill = PatternFill(start_color=couleur, end_color=couleur, fill_type="solid")
+        return NamedStyle(nom, font=font, fill=fill, border=border, alignment=alignment or Alignment())
+
+    for named_style in (
+        style('planning_titre', alignment=centre),
+        style('planning_entete', font=Font(bold=True, size=36), alignment=centre, border=bordure),
+        style('planning_date', font=Font(bold=True, size=16), alignment=centre, border=bordure),
+        style('planning_horaire', alignment=centre, border=bordure),
+        style('planning_case', alignment=case, border=bordure),
+        style('planning_case_fusionnee', border=bordure),
+        style('planning_cours', alignment=case, border=bordure, couleur=PLANNING_FILL_COURS),
+        style('planning_cours_chimie', alignment=case, border=bordure, couleur=PLANNING_FILL_CHIMIE),
+        style('planning_cours_physique', alignment=case, border=bordure, couleur=PLANNING_FILL_PHYSIQUE),
+        style('planning_non_assignes_titre', font=Font(bold=True, color='FF0000', size=14)),
+        style('planning_non_assigne', font=Font(color='FF0000')),
+    ):
+        wb.add_named_style(named_style)
+
+
+# Créneaux des lignes des feuilles de planning
+PLANNING_HORAIRES = ("9h00", "9h30", "10h00", "10h45", "11h15", "11h45", "12h15", "12h45",
+                     "13h15", "13h45", "14h15", "14h45", "15h15", "15h45", "16h15", "16h45",
+                     "17h15", "17h45", "18h15")
+# Ordre des colonnes : salles de physique, de chimie, C21 puis les autres salles (ordre alphabétique)
+PLANNING_SALLES_PHYSIQUE = ("C23", "C25", "C27", "C22", "C24")
+PLANNING_SALLES_CHIMIE = ("C32", "C33", "C31")
+# Libellés des équipements de salle rappelés aux techniciens
+PLANNING_LIBELLES_EQUIPEMENTS = (
+    ('eviers', "Éviers"), ('hotte', "Hotte"), ('bancs_optiques', "Bancs optiques"),
+    ('obscurite_totale', "Obscurité totale"), ('becs_electriques', "Becs électriques"),
+    ('support_filtration', "Support de filtration"), ('imprimante', "Imprimante"),
+)
+
+
+class GrillePlanning:
+    """
+    Grille d'un jour (créneaux × salles), calculée une fois et rendue dans
+    autant de feuilles que nécessaire (rendre_feuille_planning) ou en JSON
+    (to_dict) pour l'éditeur et les autres exports.
+
+    cases[h][s] vaut None (salle libre) ou le dict du cours qui occupe la
+    case : la même référence sur toutes les cases de sa durée, avec debut
+    (créneau de la première case) et span (nombre de créneaux). Une case est
+    secondaire (fusionnée avec la case de début) si case['debut'] != h.
+    """
+
+    def __init__(self, cours, salles, affectation, unassigned_courses=None, date_param=None,
+                 custom_room_assignments=None):
+        self.horaires = list(PLANNING_HORAIRES)
+        self.minutes = [h_to_min(h) for h in self.horaires]
+
+        self.salles = [s for s in PLANNING_SALLES_PHYSIQUE + PLANNING_SALLES_CHIMIE + ("C21",) if s in salles]
+        self.salles.extend(sorted(s for s in salles if s not in self.salles))
+        self.noms = [salles[s].get('nom', s) for s in self.salles]
+        colonne = {s: idx for idx, s in enumerate(self.salles)}
+        # En-têtes "Physique" et "Chimie" : colonnes (première, dernière) de chaque groupe
+        self.groupes = []
+        for libelle, groupe in (("Physique", PLANNING_SALLES_PHYSIQUE), ("Chimie", PLANNING_SALLES_CHIMIE)):
+            colonnes = [colonne[s] for s in groupe if s in colonne]
+            if colonnes:
+                self.groupes.append((libelle, colonnes[0], colonnes[-1]))
+
         if date_param:
-            if isinstance(date_param, str):
-                planning_date = datetime.strptime(date_param, '%Y-%m-%d')
-            else:
-                planning_date = date_param
-            formatted_date = planning_date.strftime('%d/%m')
+            planning_date = datetime.strptime(date_param, '%Y-%m-%d') if isinstance(date_param, str) else date_param
         else:
-            formatted_date = datetime.now().strftime('%d/%m')
-        ws1.cell(row=2, column=1, value=formatted_date)
-        ws1.cell(row=2, column=1).font = bold_font
-        ws1.cell(row=2, column=1).alignment = Alignment(horizontal="center", vertical="center")
-        ws1.cell(row=2, column=1).border = border
-        
-        # Préparation matrice pour fusion de cellules
-        cell_matrix = [[{"content": "", "content_techniciens": "", "content_affichage": "", "merge": False, "merge_len": 1, "matiere": ""} for _ in salle_list] for _ in horaires]
-        
-        # Remplir la matrice avec les cours assignés
-        for i, c in enumerate(cours):
-            # Find assigned room
-            salle_assignee = None
-            
-            # Vérifier si on a une assignation personnalisée pour ce cours
-            course_id = c.get('id')
-            if custom_room_assignments and course_id:
-                try:
-                    # S'assurer que custom_room_assignments est un dictionnaire
-                    if isinstance(custom_room_assignments, str):
-                        import json
-                        custom_room_assignments = json.loads(custom_room_assignments)
-                    
-                    if isinstance(custom_room_assignments, dict):
-                        assigned_room_name = custom_room_assignments.get(str(course_id))
-                        if assigned_room_name:
-                            # Trouver la clé de la salle à partir du nom
-                            for room_key, room_data in salles.items():
-                                if room_data.get('nom') == assigned_room_name or room_key == assigned_room_name:
-                                    salle_assignee = room_key
-                                    print(f"🎯 Assignation personnalisée: cours {course_id} -> salle {room_key}")
-                                    break
-                except Exception as e:
-                    print(f"⚠️ Erreur traitement assignations personnalisées: {e}")
-                    # En cas d'erreur, continuer avec l'assignation normale
-            
-            # Si pas d'assignation personnalisée, utiliser l'assignation du solver
-            if not salle_assignee:
-                for s in salle_list:
-                    if (i, s) in x and solver.Value(x[(i, s)]) == 1:
-                        salle_assignee = s
-                        break
-            
-            if salle_assignee:
-                # Parse course time
-                horaire_debut = c.get('horaire', '8:00')
-                start_time = h_to_min(horaire_debut)
-                duree = c.get('duree', 110)  # Durée par défaut
-                
-                # Find start and end indices in horaires
-                idx_start = 0
-                idx_end = 1
-                
-                # Find the closest start time
-                for idx, h in enumerate(horaires):
-                    if h <= start_time:
-                        idx_start = idx
-                    if h >= start_time + duree and idx_end == 1:
-                        idx_end = idx
-                        break
-                else:
-                    # Si on n'a pas trouvé de fin, utiliser la fin du tableau
-                    idx_end = len(horaires)
-                
-                # S'assurer que idx_end > idx_start
-                if idx_end <= idx_start:
-                    idx_end = idx_start + 1
-                
-                merge_len = idx_end - idx_start
-                
-                # Extraire les équipements de salle demandés depuis selected_materials
-                besoins_equipements = extract_material_needs(c.get('selected_materials', ''))
-                
-                # Build course content for Planning_Techniciens (équipements de salle + titre TP)
-                besoins_txt_techniciens = []
-                
-                # Ajouter seulement les équipements de salle qui sont réellement demandés
-                if besoins_equipements.get('eviers', 0) > 0:
-                    besoins_txt_techniciens.append("Éviers")
-                if besoins_equipements.get('hotte', 0) > 0:
-                    besoins_txt_techniciens.append("Hotte")
-                if besoins_equipements.get('bancs_optiques', 0) > 0:
-                    besoins_txt_techniciens.append("Bancs optiques")
-                if besoins_equipements.get('obscurite_totale', 0) > 0:
-                    besoins_txt_techniciens.append("Obscurité totale")
-                if besoins_equipements.get('becs_electriques', 0) > 0:
-                    besoins_txt_techniciens.append("Becs électriques")
-                if besoins_equipements.get('support_filtration', 0) > 0:
-                    besoins_txt_techniciens.append("Support de filtration")
-                if besoins_equipements.get('imprimante', 0) > 0:
-                    besoins_txt_techniciens.append("Imprimante")
-                
-                # Ajouter le titre du TP (request_name) s'il existe
-                titre_tp = c.get('request_name', '')
-                if titre_tp and titre_tp.strip():
-                    besoins_txt_techniciens.append(titre_tp.strip())
-                
-                content_techniciens = f"{c.get('enseignant', '')}\n{c.get('niveau', '')}"
-                if besoins_txt_techniciens:
-                    content_techniciens += "\n" + ", ".join(besoins_txt_techniciens)
-                
-                # Build course content for Affichage (seulement enseignant + niveau)
-                content_affichage = f"{c.get('enseignant', '')}\n{c.get('niveau', '')}"
-                
-                # Fill matrix avec vérifications d'indices
-                try:
-                    salle_idx = salle_list.index(salle_assignee)
-                except ValueError:
-                    continue  # Salle non trouvée, ignorer
-                
-                # Vérifier que les indices sont dans les limites
-                if (idx_start >= 0 and idx_start < len(cell_matrix) and 
-                    salle_idx >= 0 and salle_idx < len(salle_list)):
-                    
-                    # Remplir seulement la première cellule pour éviter les conflits avec les cellules fusionnées
-                    if idx_start < len(cell_matrix) and salle_idx < len(cell_matrix[idx_start]):
-                        cell_matrix[idx_start][salle_idx]["content_techniciens"] = content_techniciens
-                        cell_matrix[idx_start][salle_idx]["content_affichage"] = content_affichage
-                        cell_matrix[idx_start][salle_idx]["content"] = content_techniciens  # Par défaut, pour compatibilité
-                        cell_matrix[idx_start][salle_idx]["matiere"] = c.get('matiere', 'mixte')
-                        
-                        # Marquer les autres cellules comme "occupées" mais sans contenu
-                        for idx in range(idx_start + 1, min(idx_end, len(cell_matrix))):
-                            if idx < len(cell_matrix) and salle_idx < len(cell_matrix[idx]):
-                                cell_matrix[idx][salle_idx]["content_techniciens"] = ""  # Cellule occupée mais vide
-                                cell_matrix[idx][salle_idx]["content_affichage"] = ""
-                                cell_matrix[idx][salle_idx]["content"] = ""  # Cellule occupée mais vide
-                                cell_matrix[idx][salle_idx]["matiere"] = c.get('matiere', 'mixte')
-                    
-                    # Marquer pour fusion seulement si valide
-                    if merge_len > 1 and idx_start < len(cell_matrix):
-                        cell_matrix[idx_start][salle_idx]["merge"] = True
-                        cell_matrix[idx_start][salle_idx]["merge_len"] = merge_len
-        
-                # Remplissage du tableau avec fusion verticale
-        # D'abord, faire toutes les fusions
-        merged_ranges = set()
-        for idx_h, h in enumerate(horaires):
-            for idx_s, s in enumerate(salle_list):
-                cell = cell_matrix[idx_h][idx_s]
-                excel_row = 3 + idx_h
-                excel_col = 2 + idx_s
-                
-                # Fusion des cellules - seulement pour les cellules de début avec contenu
-                if cell["merge"] and cell["content"] and cell["merge_len"] > 1:
-                    end_row = excel_row + cell["merge_len"] - 1
-                    merge_key = (excel_row, excel_col, end_row)
-                    
-                    # Vérifier que la fusion est valide et pas déjà faite
-                    if (end_row > excel_row and 
-                        end_row <= 3 + len(horaires) - 1 and 
-                        merge_key not in merged_ranges):
-                        
-                        try:
-                            ws1.merge_cells(
-                                start_row=excel_row, start_column=excel_col,
-                                end_row=end_row, end_column=excel_col
-                            )
-                            merged_ranges.add(merge_key)
-                        except Exception as e:
-                            print(f"Erreur fusion: start_row={excel_row}, end_row={end_row}, col={excel_col}: {e}")
-        
-        # Ensuite, remplir le contenu
-        for idx_h, h in enumerate(horaires):
-            # Horaires (colonne 1)
-            ws1.cell(row=3+idx_h, column=1, value=horaires_str[idx_h])
-            ws1.cell(row=3+idx_h, column=1).alignment = Alignment(horizontal="center", vertical="center")
-            ws1.cell(row=3+idx_h, column=1).border = border
-            
-            # Salles
-            for idx_s, s in enumerate(salle_list):
-                cell = cell_matrix[idx_h][idx_s]
-                excel_row = 3 + idx_h
-                excel_col = 2 + idx_s
-                
-                # Vérifier si cette cellule est une cellule fusionnée secondaire
-                is_merged_secondary = False
-                for merge_key in merged_ranges:
-                    start_row, start_col, end_row = merge_key
-                    if (start_col == excel_col and 
-                        start_row < excel_row <= end_row):
-                        is_merged_secondary = True
-                        break
-                
-                # Appliquer les bordures à toutes les cellules (y compris fusionnées)
-                try:
-                    ws1.cell(row=excel_row, column=excel_col).border = border
-                except Exception:
-                    pass
-                
-                # Remplir seulement les cellules principales (pas les secondaires)
-                if not is_merged_secondary:
-                    try:
-                        # Utiliser le contenu techniciens pour la feuille Planning_Techniciens
-                        ws1.cell(row=excel_row, column=excel_col, value=cell["content_techniciens"])
-                        ws1.cell(row=excel_row, column=excel_col).alignment = Alignment(
-                            horizontal="center", vertical="center", wrap_text=True
-                        )
-                        
-                        # Couleurs seulement si contenu
-                        if cell["content"]:
-                            matiere = cell["matiere"].lower() if cell["matiere"] else ""
-                            if "chimie" in matiere:
-                                ws1.cell(row=excel_row, column=excel_col).fill = PatternFill(
-                                    start_color="B2F2E9", end_color="B2F2E9", fill_type="solid"
-                                )
-                            elif "physique" in matiere:
-                                ws1.cell(row=excel_row, column=excel_col).fill = PatternFill(
-                                    start_color="FFD580", end_color="FFD580", fill_type="solid"
-                                )
-                            else:
-                                ws1.cell(row=excel_row, column=excel_col).fill = PatternFill(
-                                    start_color="D3D3D3", end_color="D3D3D3", fill_type="solid"
-                                )
-                    except Exception as e:
-                        # Ignorer les erreurs sur les cellules fusionnées
-                        print(f"Ignoring cell write error at ({excel_row}, {excel_col}): {e}")
-                        pass        # Hauteur des lignes
-        for idx_h in range(len(horaires)):
-            ws1.row_dimensions[3 + idx_h].height = 20
-        
-        # Feuille 2: Affichage simplifié
-        ws2 = wb.create_sheet(title="Affichage")
-        
-        # Même structure mais contenu simplifié
-        ws2.cell(row=1, column=1, value="Planning")
-        ws2.cell(row=1, column=1).alignment = Alignment(horizontal="center", vertical="center")
-        ws2.column_dimensions['A'].width = 12
-        
-        # Répliquer les en-têtes
-        if col_physique and len(col_physique) > 0:
-            # Ne fusionner que s'il y a plusieurs colonnes
-            if len(col_physique) > 1 and col_physique[-1] > col_physique[0]:
-                ws2.merge_cells(start_row=1, start_column=col_physique[0], end_row=1, end_column=col_physique[-1])
-            for col in range(col_physique[0], col_physique[-1]+1):
-                cell_phys = ws2.cell(row=1, column=col, value="Physique" if col==col_physique[0] else None)
-                cell_phys.font = header_font
-                cell_phys.alignment = Alignment(horizontal="center", vertical="center")
-                cell_phys.border = border
-        
-        if col_chimie and len(col_chimie) > 0:
-            # Ne fusionner que s'il y a plusieurs colonnes
-            if len(col_chimie) > 1 and col_chimie[-1] > col_chimie[0]:
-                ws2.merge_cells(start_row=1, start_column=col_chimie[0], end_row=1, end_column=col_chimie[-1])
-            for col in range(col_chimie[0], col_chimie[-1]+1):
-                cell_chim = ws2.cell(row=1, column=col, value="Chimie" if col==col_chimie[0] else None)
-                cell_chim.font = header_font
-                cell_chim.alignment = Alignment(horizontal="center", vertical="center")
-                cell_chim.border = border
-        
-        # Noms des salles (ligne 2)
-        for idx_s, s in enumerate(salle_list):
-            col_letter = ws2.cell(row=2, column=2+idx_s).column_letter
-            cell = ws2.cell(row=2, column=2+idx_s, value=s)
-            ws2.column_dimensions[col_letter].width = 20
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = border
-        
-        # Date (ligne 2, colonne 1)
-        ws2.cell(row=2, column=1, value=formatted_date)
-        ws2.cell(row=2, column=1).font = bold_font
-        ws2.cell(row=2, column=1).alignment = Alignment(horizontal="center", vertical="center")
-        ws2.cell(row=2, column=1).border = border
-        
-        # Version simplifiée pour l'affichage (seulement enseignants)
-        cell_matrix2 = [[{"content": "", "merge": False, "merge_len": 1, "matiere": ""} for _ in salle_list] for _ in horaires]
-        
+            planning_date = datetime.now()
+        self.date = planning_date.strftime('%d/%m')
+        self.unassigned = list(unassigned_courses or [])
+
+        self.cases = [[None] * len(self.salles) for _ in self.horaires]
+        salles_choisies = self._salles_personnalisees(cours, salles, custom_room_assignments)
         for i, c in enumerate(cours):
-            # Find assigned room
-            salle_assignee = None
-            
-            # Vérifier si on a une assignation personnalisée pour ce cours (même logique que Planning_Techniciens)
-            course_id = c.get('id')
-            if custom_room_assignments and course_id:
-                try:
-                    # S'assurer que custom_room_assignments est un dictionnaire
-                    if isinstance(custom_room_assignments, str):
-                        import json
-                        custom_room_assignments = json.loads(custom_room_assignments)
-                    
-                    if isinstance(custom_room_assignments, dict):
-                        assigned_room_name = custom_room_assignments.get(str(course_id))
-                        if assigned_room_name:
-                            # Trouver la clé de la salle à partir du nom
-                            for room_key, room_data in salles.items():
-                                if room_data.get('nom') == assigned_room_name or room_key == assigned_room_name:
-                                    salle_assignee = room_key
-                                    print(f"🎯 [Affichage] Assignation personnalisée: cours {course_id} -> salle {room_key}")
-                                    break
-                except Exception as e:
-                    print(f"⚠️ [Affichage] Erreur traitement assignations personnalisées: {e}")
-                    # En cas d'erreur, continuer avec l'assignation normale
-            
-            # Si pas d'assignation personnalisée, utiliser l'assignation du solver
-            if not salle_assignee:
-                for s in salle_list:
-                    if (i, s) in x and solver.Value(x[(i, s)]) == 1:
-                        salle_assignee = s
-                        break
-            
-            if salle_assignee:
-                horaire_debut = c.get('horaire', '8:00')
-                start_time = h_to_min(horaire_debut)
-                duree = c.get('duree', 110)
-                
-                # Find start and end indices in horaires (même logique)
-                idx_start = 0
-                idx_end = 1
-                
-                for idx, h in enumerate(horaires):
-                    if h <= start_time:
-                        idx_start = idx
-                    if h >= start_time + duree and idx_end == 1:
-                        idx_end = idx
-                        break
+            salle = salles_choisies.get(i) or affectation.get(i)
+            if salle in colonne:
+                self._placer(i, c, colonne[salle])
+
+    @staticmethod
+    def _salles_personnalisees(cours, salles, custom_room_assignments):
+        """Salles choisies dans l'éditeur ({id du cours: nom ou clé de salle}), par indice de cours."""
+        if not custom_room_assignments:
+            return {}
+        try:
+            if isinstance(custom_room_assignments, str):
+                custom_room_assignments = json.loads(custom_room_assignments)
+            if not isinstance(custom_room_assignments, dict):
+                return {}
+            # Première salle dont le nom ou la clé correspond
+            par_nom = {}
+            for room_key, room_data in salles.items():
+                par_nom.setdefault(room_data.get('nom'), room_key)
+                par_nom.setdefault(room_key, room_key)
+            choisies = {}
+            for i, c in enumerate(cours):
+                course_id = c.get('id')
+                assigned_room_name = custom_room_assignments.get(str(course_id)) if course_id else None
+                room_key = par_nom.get(assigned_room_name) if assigned_room_name else None
+                if room_key:
+                    choisies[i] = room_key
+                    print(f"🎯 Assignation personnalisée: cours {course_id} -> salle {room_key}")
+            return choisies
+        except Exception as e:
+            # En cas d'erreur, continuer avec l'assignation de l'optimiseur
+            print(f"⚠️ Erreur traitement assignations personnalisées: {e}")
+            return {}
+
+    def creneaux(self, c):
+        """Créneaux [debut, fin) occupés par un cours : dernier créneau commençant
+        avant le cours (le premier à défaut), premier créneau atteignant sa fin."""
+        debut_min = h_to_min(c.get('horaire', '8:00'))
+        fin_min = debut_min + c.get('duree', 110)
+        debut = max(bisect.bisect_right(self.minutes, debut_min) - 1, 0)
+        fin = max(bisect.bisect_left(self.minutes, fin_min), debut + 1)
+        return debut, fin
+
+    def _placer(self, i, c, s):
+        debut, fin = self.creneaux(c)
+        existant = self.cases[debut][s]
+        if existant is not None and existant['debut'] == debut and fin - debut == 1:
+            # Même case de début (cours commençant avant le premier créneau) : le
+            # dernier cours l'emporte et garde la durée du précédent
+            fin = debut + existant['span']
+        # Chevauchement (salles choisies à la main) : le dernier cours placé l'emporte
+        for h in range(debut, fin):
+            if self.cases[h][s] is not None:
+                self._retirer(self.cases[h][s])
+        besoins = extract_material_needs(c.get('selected_materials', ''))
+        details = [libelle for champ, libelle in PLANNING_LIBELLES_EQUIPEMENTS if besoins.get(champ, 0) > 0]
+        titre_tp = (c.get('request_name') or '').strip()
+        if titre_tp:
+            details.append(titre_tp)
+        affichage = f"{c.get('enseignant', '')}\n{c.get('niveau', '')}"
+        case = {
+            'cours': i,
+            'course_id': c.get('id'),
+            'matiere': c.get('matiere', 'mixte'),
+            'salle': s,
+            'debut': debut,
+            'span': fin - debut,
+            'affichage': affichage,
+            'techniciens': affichage + "\n" + ", ".join(details) if details else affichage,
+        }
+        for h in range(debut, fin):
+            self.cases[h][s] = case
+
+    def _retirer(self, case):
+        for h in range(case['debut'], case['debut'] + case['span']):
+            self.cases[h][case['salle']] = None
+
+    def cours_places(self):
+        """Cases de début des cours placés, créneau par créneau puis salle par salle."""
+        return [case for h, ligne in enumerate(self.cases) for case in ligne
+                if case is not None and case['debut'] == h]
+
+    def to_dict(self):
+        """Grille en JSON : créneaux, salles, cours placés (créneau et salle de début, span) et non placés."""
+        groupe_salle = {}
+        for libelle, premiere, derniere in self.groupes:
+            for s in range(premiere, derniere + 1):
+                groupe_salle[s] = libelle.lower()
+        return {
+            'date': self.date,
+            'time_slots': self.horaires,
+            'rooms': [{'id': s, 'name': nom, 'group': groupe_salle.get(idx)}
+                      for idx, (s, nom) in enumerate(zip(self.salles, self.noms))],
+            'cells': [{
+                'slot': case['debut'],
+                'room': case['salle'],
+                'span': case['span'],
+                'course_id': case['course_id'],
+                'subject': case['matiere'],
+                'technicians': case['techniciens'],
+                'display': case['affichage'],
+            } for case in self.cours_places()],
+            'unassigned': self.unassigned,
+        }
+
+
+def lignes_feuille_planning(grille, vue='techniciens'):
+    """
+    Lignes d'une feuille de planning, de haut en bas : liste de (valeur,
+    style) par colonne, None pour une cellule absente (valeur None : style
+    seul, cas des cellules fusionnées secondaires).
+    - 'techniciens' : enseignant, niveau, équipements et titre du TP, couleur
+      par matière, cours non placés en bas ;
+    - 'affichage' : enseignant et niveau seulement.
+    """
+    # Encadrés Physique et Chimie (ligne 1)
+    entetes = [None] * len(grille.salles)
+    for libelle, premiere, derniere in grille.groupes:
+        for s in range(premiere, derniere + 1):
+            entetes[s] = (libelle if s == premiere else None, 'planning_entete')
+    yield [("Planning", 'planning_titre')] + entetes
+
+    # Date et noms des salles (ligne 2)
+    yield [(grille.date, 'planning_date')] + [(s, 'planning_entete') for s in grille.salles]
+
+    for idx_h, ligne in enumerate(grille.cases):
+        cellules = [(grille.horaires[idx_h], 'planning_horaire')]
+        for case in ligne:
+            if case is None:
+                cellules.append(("", 'planning_case'))
+            elif case['debut'] != idx_h:
+                # Case fusionnée secondaire : bordure seule
+                cellules.append((None, 'planning_case_fusionnee'))
+            elif vue == 'techniciens':
+                matiere = (case['matiere'] or "").lower()
+                if "chimie" in matiere:
+                    style = 'planning_cours_chimie'
+                elif "physique" in matiere:
+                    style = 'planning_cours_physique'
                 else:
-                    idx_end = len(horaires)
-                
-                if idx_end <= idx_start:
-                    idx_end = idx_start + 1
-                
-                merge_len = idx_end - idx_start
-                
-                # Build course content for Affichage (seulement enseignant + niveau) 
-                content_affichage = f"{c.get('enseignant', '')}\n{c.get('niveau', '')}"
-                
-                # Fill matrix avec vérifications d'indices
-                try:
-                    salle_idx = salle_list.index(salle_assignee)
-                except ValueError:
-                    continue  # Salle non trouvée, ignorer
-                
-                # Vérifier que les indices sont dans les limites
-                if (idx_start >= 0 and idx_start < len(cell_matrix2) and 
-                    salle_idx >= 0 and salle_idx < len(salle_list)):
-                    
-                    # Remplir seulement la première cellule pour éviter les conflits avec les cellules fusionnées
-                    if idx_start < len(cell_matrix2) and salle_idx < len(cell_matrix2[idx_start]):
-                        # Utiliser le contenu d'affichage (seulement enseignant + niveau)
-                        cell_matrix2[idx_start][salle_idx]["content"] = content_affichage
-                        cell_matrix2[idx_start][salle_idx]["matiere"] = c.get('matiere', 'mixte')
-                        
-                        # Marquer les autres cellules comme "occupées" mais sans contenu
-                        for idx in range(idx_start + 1, min(idx_end, len(cell_matrix2))):
-                            if idx < len(cell_matrix2) and salle_idx < len(cell_matrix2[idx]):
-                                cell_matrix2[idx][salle_idx]["content"] = ""  # Cellule occupée mais vide
-                                cell_matrix2[idx][salle_idx]["matiere"] = c.get('matiere', 'mixte')
-                    
-                    # Marquer pour fusion seulement si valide
-                    if merge_len > 1 and idx_start < len(cell_matrix2):
-                        cell_matrix2[idx_start][salle_idx]["merge"] = True
-                        cell_matrix2[idx_start][salle_idx]["merge_len"] = merge_len
-        
-        # Remplissage feuille 2 - même logique séparée
-        # D'abord, faire toutes les fusions
-        merged_ranges2 = set()
-        for idx_h, h in enumerate(horaires):
-            for idx_s, s in enumerate(salle_list):
-                cell = cell_matrix2[idx_h][idx_s]
-                excel_row = 3 + idx_h
-                excel_col = 2 + idx_s
-                
-                # Fusion des cellules - seulement pour les cellules de début avec contenu
-                if cell["merge"] and cell["content"] and cell["merge_len"] > 1:
-                    end_row = excel_row + cell["merge_len"] - 1
-                    merge_key = (excel_row, excel_col, end_row)
-                    
-                    # Vérifier que la fusion est valide et pas déjà faite
-                    if (end_row > excel_row and 
-                        end_row <= 3 + len(horaires) - 1 and 
-                        merge_key not in merged_ranges2):
-                        
-                        try:
-                            ws2.merge_cells(
-                                start_row=excel_row, start_column=excel_col,
-                                end_row=end_row, end_column=excel_col
-                            )
-                            merged_ranges2.add(merge_key)
-                        except Exception as e:
-                            print(f"Erreur fusion feuille 2: start_row={excel_row}, end_row={end_row}, col={excel_col}: {e}")
-        
-        # Ensuite, remplir le contenu
-        for idx_h, h in enumerate(horaires):
-            ws2.cell(row=3+idx_h, column=1, value=horaires_str[idx_h])
-            ws2.cell(row=3+idx_h, column=1).alignment = Alignment(horizontal="center", vertical="center")
-            ws2.cell(row=3+idx_h, column=1).border = border
-            
-            for idx_s, s in enumerate(salle_list):
-                cell = cell_matrix2[idx_h][idx_s]
-                excel_row = 3 + idx_h
-                excel_col = 2 + idx_s
-                
-                # Vérifier si cette cellule est une cellule fusionnée secondaire
-                is_merged_secondary = False
-                for merge_key in merged_ranges2:
-                    start_row, start_col, end_row = merge_key
-                    if (start_col == excel_col and 
-                        start_row < excel_row <= end_row):
-                        is_merged_secondary = True
-                        break
-                
-                # Appliquer les bordures à toutes les cellules (y compris fusionnées)
-                try:
-                    ws2.cell(row=excel_row, column=excel_col).border = border
-                except Exception:
-                    pass
-                
-                # Remplir seulement les cellules principales (pas les secondaires)
-                if not is_merged_secondary:
-                    try:
-                        ws2.cell(row=excel_row, column=excel_col, value=cell["content"])
-                        ws2.cell(row=excel_row, column=excel_col).alignment = Alignment(
-                            horizontal="center", vertical="center", wrap_text=True
-                        )
-                        
-                        if cell["content"]:
-                            ws2.cell(row=excel_row, column=excel_col).fill = PatternFill(
-                                start_color="D3D3D3", end_color="D3D3D3", fill_type="solid"
-                            )
-                    except Exception as e:
-                        # Ignorer les erreurs sur les cellules fusionnées
-                        print(f"Ignoring cell write error feuille 2 at ({excel_row}, {excel_col}): {e}")
-                        pass
+                    style = 'planning_cours'
+                cellules.append((case['techniciens'], style))
+            else:
+                cellules.append((case['affichage'], 'planning_cours'))
+        yield cellules
+
+    # Cours non assignés en bas de la feuille des techniciens, après une ligne vide
+    if vue == 'techniciens' and grille.unassigned:
+        yield []
+        yield [("COURS NON ASSIGNÉS", 'planning_non_assignes_titre')]
+        for course_info in grille.unassigned:
+            yield [(course_info, 'planning_non_assigne')]
+
+
+def fusions_feuille_planning(grille):
+    """Plages fusionnées d'une feuille : encadrés Physique/Chimie et cases de chaque cours."""
+    from openpyxl.utils import get_column_letter
+
+    plages = [f"{get_column_letter(2 + premiere)}1:{get_column_letter(2 + derniere)}1"
+              for _, premiere, derniere in grille.groupes if derniere > premiere]
+    for case in grille.cours_places():
+        if case['span'] > 1:
+            colonne = get_column_letter(2 + case['salle'])
+            plages.append(f"{colonne}{3 + case['debut']}:{colonne}{2 + case['debut'] + case['span']}")
+    return plages
+
+
+def rendre_feuille_planning(ws, grille, vue='techniciens'):
+    """
+    Écrit la grille dans la feuille ws (styles de styles_planning, déjà
+    enregistrés dans le classeur), vue 'techniciens' ou 'affichage' (voir
+    lignes_feuille_planning). ws peut être une feuille d'un classeur
+    write_only : les lignes sont alors écrites au fil de l'eau.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+    # Dimensions et fusions d'abord : une feuille write_only les écrit avec sa première ligne
+    ws.column_dimensions['A'].width = 12
+    for idx_s in range(len(grille.salles)):
+        ws.column_dimensions[get_column_letter(2 + idx_s)].width = 20
+    for idx_h in range(len(grille.horaires)):
+        ws.row_dimensions[3 + idx_h].height = 20
+
+    flux = isinstance(ws, WriteOnlyWorksheet)
+    for plage in fusions_feuille_planning(grille):
+        if flux:
+            ws.merged_cells.add(plage)
+        else:
+            ws.merge_cells(plage)
+
+    for row, ligne in enumerate(lignes_feuille_planning(grille, vue), 1):
+        if flux:
+            cellules = []
+            for entree in ligne:
+                cell = None
+                if entree is not None:
+                    cell = WriteOnlyCell(ws, value=entree[0])
+                    cell.style = entree[1]
+                cellules.append(cell)
+            ws.append(cellules)
+            continue
+        for column, entree in enumerate(ligne, 1):
+            if entree is None:
+                continue
+            cell = ws.cell(row=row, column=column)
+            if entree[0] is not None:
+                cell.value = entree[0]
+            cell.style = entree[1]
+
+
+def empreinte_classeur(feuilles):
+    """
+    Empreinte SHA-256 du contenu d'un classeur de planning : version du rendu
+    et, pour chaque jour (suffixe des feuilles, grille), la grille telle
+    qu'exportée (to_dict : salles, cours placés et leur texte, non placés).
+    Deux classeurs de même empreinte sont identiques à l'ouverture. Clé du
+    cache des classeurs quand celle des entrées (empreinte_jour) n'est pas
+    fournie.
+    """
+    contenu = [PLANNING_RENDER_VERSION, [[suffixe, grille.to_dict()] for suffixe, grille in feuilles]]
+    texte = json.dumps(contenu, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+def empreinte_jour(date_str, cours, salles, c21_slots=None, profil=None, custom_room_assignments=None,
+                   affectation=None):
+    """
+    Empreinte SHA-256 du classeur d'un jour calculée depuis ses entrées, avant
+    toute résolution : version du rendu, date, cours (texte affiché compris),
+    salles, assignations choisies dans l'éditeur et affectation imposée
+    (planning enregistré) ou, à défaut, empreinte des entrées de l'optimiseur
+    (empreinte_entrees : sa solution est celle du cache).
+    Clé du cache des classeurs et ETag des téléchargements, vérifiable sans
+    résoudre ni rendre. L'ETag est faible : un classeur recalculé après
+    éviction des caches est équivalent mais pas forcément identique octet
+    par octet.
+    """
+    contenu = [PLANNING_RENDER_VERSION, date_str, cours, [[s, salles[s]] for s in salles],
+               sorted([str(k), v] for k, v in (custom_room_assignments or {}).items()),
+               sorted([i, s] for i, s in affectation.items()) if affectation is not None
+               else empreinte_entrees(cours, salles, c21_slots, profil=profil)]
+    texte = json.dumps(contenu, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+def empreinte_semaine(empreintes):
+    """Empreinte du classeur d'une semaine : [[jour, empreinte_jour ou None si
+    le jour n'a pas pu être chargé]] dans l'ordre des jours."""
+    texte = json.dumps([PLANNING_RENDER_VERSION, 'semaine', empreintes], separators=(',', ':'))
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Classeurs rendus indexés par empreinte (empreinte_jour, empreinte_semaine
+    ou empreinte_classeur) : LRU en mémoire devant,
+    avec le backend 'database', la table planning_artifacts. Une entrée est
+    (octets du classeur, created_at en secondes), created_at servant de
+    Last-Modified. Comme pour SolutionCache, rien n'est invalidé : un
+    changement de contenu change l'empreinte.
+    """
+
+    def __init__(self, backend='database', size=50):
+        self.pid = os.getpid()
+        self.backend = backend
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'database_hits': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+    def _remember(self, cle, entree):
+        with self._lock:
+            self._entries[cle] = entree
+            self._entries.move_to_end(cle)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def get(self, cle):
+        if self.backend == 'off':
+            return None
+        with self._lock:
+            entree = self._entries.get(cle)
+            if entree is not None:
+                self._entries.move_to_end(cle)
+                self._stats['hits'] += 1
+                return entree
+        if self.backend == 'database':
+            try:
+                entree = database.get_planning_artifact(cle)
+            except Exception as e:
+                print(f"⚠️ Cache des classeurs indisponible: {e}")
+                entree = None
+                self._stats['errors'] += 1
+            if entree:
+                self._remember(cle, entree)
+                with self._lock:
+                    self._stats['database_hits'] += 1
+                return entree
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, cle, contenu):
+        """Enregistre un classeur et retourne son entrée (contenu, created_at)."""
+        entree = (contenu, time.time())
+        if self.backend == 'off':
+            return entree
+        self._remember(cle, entree)
+        with self._lock:
+            self._stats['stores'] += 1
+        if self.backend == 'database':
+            try:
+                database.save_planning_artifact(cle, contenu, entree[1], keep=self.size)
+            except Exception as e:
+                print(f"⚠️ Classeur non enregistré dans le cache partagé: {e}")
+                self._stats['errors'] += 1
+        return entree
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend == 'database':
+            database.clear_planning_artifacts()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, backend=self.backend, size=self.size, entries=len(self._entries),
+                         bytes=sum(len(contenu) for contenu, _ in self._entries.values()))
+        lookups = stats['hits'] + stats['database_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['database_hits']) / lookups, 3) if lookups else None
+        return stats
+
+
+_artifact_cache = None
+_artifact_cache_lock = threading.Lock()
+
+
+def get_artifact_cache():
+    """Cache des classeurs rendus du processus courant (backend PLANNING_ARTIFACT_CACHE, recréé après un fork)."""
+    global _artifact_cache
+    cache = _artifact_cache
+    if cache is not None and cache.pid == os.getpid():
+        return cache
+    with _artifact_cache_lock:
+        if _artifact_cache is None or _artifact_cache.pid != os.getpid():
+            _artifact_cache = ArtifactCache(PLANNING_ARTIFACT_CACHE, PLANNING_ARTIFACT_CACHE_SIZE)
+        return _artifact_cache
+
+
+def classeur_planning(feuilles, rendre, artefact=None, cle=None):
+    """
+    Classeur des feuilles [(suffixe, grille)] dans un io.BytesIO : depuis le
+    cache des classeurs si le même contenu a déjà été rendu, sinon rendre()
+    (qui retourne le buffer) puis mise en cache.
+    cle : empreinte des entrées (empreinte_jour, empreinte_semaine), à défaut
+    empreinte_classeur(feuilles).
+    artefact : dict complété avec 'etag' (la clé), 'last_modified'
+    (secondes) et 'source' ('cache' ou 'rendu').
+    """
+    cle = cle or empreinte_classeur(feuilles)
+    cache = get_artifact_cache()
+    entree = cache.get(cle)
+    source = 'cache'
+    if entree is None:
+        entree = cache.put(cle, rendre().getvalue())
+        source = 'rendu'
+    if artefact is not None:
+        artefact.update(etag=cle, last_modified=entree[1], source=source)
+    return io.BytesIO(entree[0])
+
+
+def generer_excel_optimise(cours, salles, affectation, unassigned_courses, date_param=None, custom_room_assignments=None,
+                           wb=None, suffixe_feuilles="", artefact=None, cle=None):
+    """
+    Génération Excel optimisée avec le solveur CP - Style grille horaire.
+    Retourne (True, buffer) : classeur enregistré dans un io.BytesIO (aucun
+    fichier écrit, deux générations simultanées ne partagent rien), repris
+    du cache des classeurs s'il a déjà été rendu (classeur_planning, sous
+    cle ; artefact reçoit son ETag et sa date).
+    wb : classeur à compléter (planning de plusieurs jours) ; les deux feuilles
+    y sont ajoutées, suffixées par suffixe_feuilles, et le classeur est
+    retourné au lieu d'être enregistré.
+    """
+    try:
+        print(f"🔧 [Excel] Début génération Excel avec custom_room_assignments type: {type(custom_room_assignments)}")
         
-        # Hauteur des lignes feuille 2
-        for idx_h in range(len(horaires)):
-            ws2.row_dimensions[3 + idx_h].height = 20
+        from openpyxl import Workbook
         
-        # Ajout des cours non assignés en bas
-        if unassigned_courses:
-            # Ligne vide
-            ws1.cell(row=3 + len(horaires) + 1, column=1, value="COURS NON ASSIGNÉS")
-            ws1.cell(row=3 + len(horaires) + 1, column=1).font = Font(bold=True, color='FF0000', size=14)
-            
-            row_start = 3 + len(horaires) + 2
-            for i, course_info in enumerate(unassigned_courses):
-                ws1.cell(row=row_start + i, column=1, value=course_info)
-                ws1.cell(row=row_start + i, column=1).font = Font(color='FF0000')
+        # Une seule grille pour les deux feuilles
+        grille = GrillePlanning(cours, salles, affectation, unassigned_courses, date_param, custom_room_assignments)
         
-        # Sauvegarde du fichier
-        from datetime import datetime
-        filename = f"planning_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        wb.save(filename)
+        if wb is not None:
+            styles_planning(wb)
+            # Feuille 1: Planning détaillé (techniciens), feuille 2: Affichage simplifié
+            rendre_feuille_planning(wb.create_sheet(f"Planning_Techniciens{suffixe_feuilles}"), grille, 'techniciens')
+            rendre_feuille_planning(wb.create_sheet(f"Affichage{suffixe_feuilles}"), grille, 'affichage')
+            return True, wb
+
+        def rendre():
+            # Classeur en mémoire : rien n'est écrit sur le disque
+            classeur = Workbook()
+            styles_planning(classeur)
+            ws1 = classeur.active
+            ws1.title = "Planning_Techniciens"
+            rendre_feuille_planning(ws1, grille, 'techniciens')
+            rendre_feuille_planning(classeur.create_sheet(title="Affichage"), grille, 'affichage')
+            buffer = io.BytesIO()
+            classeur.save(buffer)
+            return buffer
+
+        buffer = classeur_planning([("", grille)], rendre, artefact, cle)
         
         assigned_count = len(cours) - len(unassigned_courses)
-        print(f"Planning généré: {filename} ({assigned_count}/{len(cours)} cours assignés)")
-        return True, filename
+        print(f"Planning généré: {buffer.getbuffer().nbytes} octets ({assigned_count}/{len(cours)} cours assignés)")
+        return True, buffer
         
     except Exception as e:
         return False, f"Erreur lors de la génération Excel: {str(e)}"
 
-def generer_planning_excel(date, end_date=None, return_data_only=False, custom_room_assignments=None):
-    """Generate planning Excel file for a specific date or date range"""
+
+# Message de charger_entrees_planning pour un jour sans demande : ce jour n'est pas
+# un échec du planning (résultats des plannings de plusieurs jours : 'empty')
+AUCUNE_DEMANDE = "Aucune demande trouvée pour cette date"
+
+
+def jour_non_planifie(date_str, erreur):
+    """Résultat d'un jour sans planning : 'empty' distingue un jour sans demande d'un échec."""
+    return {'date': date_str, 'success': False, 'empty': erreur == AUCUNE_DEMANDE, 'error': erreur}
+
+
+def charger_entrees_planning(date_str):
+    """
+    Lit en base les entrées du modèle pour une date : cours (une entrée par
+    demande), salles et créneaux C21. Retourne (True, (cours, salles, c21_slots))
+    ou (False, message) s'il n'y a rien à planifier.
+    """
+    requests = database.get_planning_data(date_str)
+    rooms = database.get_all_rooms()
+    
+    # Récupérer les disponibilités C21
+    c21_slots = database.get_c21_availability()
+    
+    if not requests:
+        return False, AUCUNE_DEMANDE
+    
+    if not rooms:
+        return False, "Aucune salle trouvée dans la base de données"
+    
+    # Convert rooms to dict format
+    salles = {}
+    salle_list = []
+    for room in rooms:
+        room_name = room.get('name', f'Room_{len(salle_list)}')
+        salle_list.append(room_name)
+        salles[room_name] = {
+            "nom": room_name,
+            "type": str(room.get('type', 'mixte') or 'mixte').strip().lower(),
+            "ordinateurs": room.get('ordinateurs', 0) or 0,
+            "chaises": room.get('chaises', 20) or 20,
+            "eviers": room.get('eviers', 0) or 0,
+            "hotte": room.get('hotte', 0) or 0,
+            "bancs_optiques": room.get('bancs_optiques', 0) or 0,
+            "obscurite_totale": room.get('obscurite_totale', 0) or 0,
+            "becs_electriques": room.get('becs_electriques', 0) or 0,
+            "support_filtration": room.get('support_filtration', 0) or 0,
+            "imprimante": room.get('imprimante', 0) or 0,
+            "examen": room.get('examen', 0) or 0
+        }
+    
+    # Déterminer le jour de la semaine à partir de la date
+    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+    
+    jours_semaine = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+    jour_planning = jours_semaine[date_obj.weekday()]
+    
+    # Convert requests to course format
+    cours = []
+    for i, req in enumerate(requests):
+        material_needs = extract_material_needs(req.get('selected_materials', ''))
+        matiere = "mixte"
+        if req.get('room_type') == 'Physique':
+            matiere = "physique"
+        elif req.get('room_type') == 'Chimie':
+            matiere = "chimie"
+        elif req.get('room_type') == 'Mixte':
+            materials_text = str(req.get('selected_materials', '')).lower()
+            description_text = str(req.get('material_description', '')).lower()
+            combined_text = f"{materials_text} {description_text}"
+            physics_keywords = ['oscilloscope', 'générateur', 'signal', 'optique', 'laser', 'prisme', 'lentille', 'physique', 'électricité', 'mécanique', 'ondes']
+            chemistry_keywords = ['burette', 'erlenmeyer', 'bécher', 'pipette', 'solution', 'naoh', 'hcl', 'acide', 'base', 'dosage', 'titrage', 'chimie', 'réaction', 'molécule', 'ion', 'ph']
+            physics_score = sum(1 for kw in physics_keywords if kw in combined_text)
+            chemistry_score = sum(1 for kw in chemistry_keywords if kw in combined_text)
+            if physics_score > chemistry_score and physics_score > 0:
+                matiere = "physique"
+            elif chemistry_score > physics_score and chemistry_score > 0:
+                matiere = "chimie"
+        computers_needed = req.get('computers_needed', 0)
+        if computers_needed and computers_needed > 0:
+            material_needs["ordinateurs"] = max(material_needs["ordinateurs"], computers_needed)
+        cours.append({
+            "id": f"{req.get('teacher_name', 'Unknown')}_{i}",
+            "request_id": req.get('id'),
+            "prepared": bool(req.get('prepared', False)),
+            "enseignant": req.get('teacher_name', 'Unknown'),
+            "horaire": req.get('horaire', '9h00') or '9h00',
+            "niveau": req.get('class_name', ''),
+            "matiere": matiere,
+            "jour": jour_planning,
+            "ordinateurs": material_needs["ordinateurs"],
+            "eviers": material_needs["eviers"],
+            "hotte": material_needs["hotte"],
+            "bancs_optiques": material_needs["bancs_optiques"],
+            "obscurite_totale": material_needs["obscurite_totale"],
+            "becs_electriques": material_needs["becs_electriques"],
+            "support_filtration": material_needs["support_filtration"],
+            "imprimante": material_needs["imprimante"],
+            "examen": material_needs["examen"],
+            "duree": req.get('custom_duration') or duree_par_niveau(req.get('class_name', '')),
+            "chaises": eleves_par_niveau(req.get('class_name', ''), req.get('teacher_name', 'Unknown')),
+            "materiel_demande": req.get('material_description', 'N/A'),
+            "selected_materials": req.get('selected_materials', ''),
+            "request_name": req.get('request_name', '')
+        })
+
+    if not cours:
+        return False, "Aucun cours valide à planifier"
+    return True, (cours, salles, c21_slots)
+
+
+def empreinte_classeur_jour(date_str, custom_room_assignments=None, profil=None):
+    """ETag (empreinte_jour) du classeur que generer_planning_excel produirait
+    pour ces paramètres, d'après les entrées lues en base, sans résolution ni
+    rendu ; None s'il n'y a rien à planifier."""
+    ok, entrees = charger_entrees_planning(date_str)
+    if not ok:
+        return None
+    cours, salles, c21_slots = entrees
+    return empreinte_jour(date_str, cours, salles, c21_slots, profil, custom_room_assignments)
+
+
+def empreinte_classeur_semaine(date_str, profil=None):
+    """ETag (empreinte_semaine) du classeur de generer_classeur_semaine, calculé
+    de même sans résolution ni rendu ; None si aucun jour n'a de demande."""
+    empreintes = []
+    for jour in jours_semaine(date_str):
+        ok, entrees = charger_entrees_planning(jour)
+        if not ok:
+            empreintes.append([jour, None])
+            continue
+        cours, salles, c21_slots = entrees
+        affectation = affectation_enregistree(jour, cours, salles)
+        empreintes.append([jour, empreinte_jour(jour, cours, salles, c21_slots, profil, affectation=affectation)])
+    if all(empreinte is None for _, empreinte in empreintes):
+        return None
+    return empreinte_semaine(empreintes)
+
+
+def generer_planning_excel(date, end_date=None, return_data_only=False, custom_room_assignments=None,
+                           incremental=False, profil=None, statistiques=None, progression=None, return_grid=False,
+                           artefact=None):
+    """
+    Generate planning Excel file for a specific date or date range.
+    return_grid : retourne la GrillePlanning du jour au lieu du classeur.
+    artefact : dict complété avec l'ETag, la date et l'origine du classeur
+    (classeur_planning). Le classeur déjà rendu pour les mêmes entrées
+    (empreinte_jour) est repris du cache sitôt les entrées lues, sans
+    résolution ni grille.
+    incremental : re-planification à partir du planning précédent de la date
+    (voir affectation_precedente) au lieu d'un calcul complet.
+    profil : profil de l'optimiseur (SOLVER_PROFILES).
+    statistiques : dict complété avec les statistiques de la résolution
+    (également jointes aux données de l'éditeur sous 'solver').
+    progression : appelée avec l'étape en cours ({'stage': 'chargement' |
+    'resolution' | 'rendu'}) et les solutions intermédiaires de l'optimiseur.
+    """
     try:
         # Get data from database  
         date_str = date if isinstance(date, str) else date.strftime('%Y-%m-%d')
-        raw_requests = database.get_planning_data(date_str)
-        raw_rooms = database.get_all_rooms()
-        
         # Si on a des assignations personnalisées, modifier les données avant génération
         if custom_room_assignments:
             print(f"📝 Génération avec assignations personnalisées: {custom_room_assignments}")
             # On va continuer la génération normale mais modifier les assignations à la fin
         
-        # Récupérer les disponibilités C21
-        c21_slots = database.get_c21_availability()
-        
-        if not raw_requests:
-            return False, "Aucune demande trouvée pour cette date"
-        
-        if not raw_rooms:
-            return False, "Aucune salle trouvée dans la base de données"
-        
-        # Convert rooms to dict format
-        salles = {}
-        salle_list = []
-        for raw_room in raw_rooms:
-            # Convert sqlite3.Row to dict
-            room = dict(raw_room) if hasattr(raw_room, 'keys') else raw_room
-            
-            room_name = room.get('name', f'Room_{len(salle_list)}')
-            salle_list.append(room_name)
-            salles[room_name] = {
-                "nom": room_name,
-                "type": str(room.get('type', 'mixte') or 'mixte').strip().lower(),
-                "ordinateurs": room.get('ordinateurs', 0) or 0,
-                "chaises": room.get('chaises', 20) or 20,
-                "eviers": room.get('eviers', 0) or 0,
-                "hotte": room.get('hotte', 0) or 0,
-                "bancs_optiques": room.get('bancs_optiques', 0) or 0,
-                "obscurite_totale": room.get('obscurite_totale', 0) or 0,
-                "becs_electriques": room.get('becs_electriques', 0) or 0,
-                "support_filtration": room.get('support_filtration', 0) or 0,
-                "imprimante": room.get('imprimante', 0) or 0,
-                "examen": room.get('examen', 0) or 0
-            }
-        
-        # Déterminer le jour de la semaine à partir de la date
-        from datetime import datetime
-        if isinstance(date, str):
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-        else:
-            date_obj = date
-        
-        jours_semaine = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
-        jour_planning = jours_semaine[date_obj.weekday()]
-        
-        # Convert requests to course format
-        cours = []
-        for i, raw_req in enumerate(raw_requests):
-            req = to_dict_request(raw_req)
-            material_needs = extract_material_needs(req.get('selected_materials', ''))
-            matiere = "mixte"
-            if req.get('room_type') == 'Physique':
-                matiere = "physique"
-            elif req.get('room_type') == 'Chimie':
-                matiere = "chimie"
-            elif req.get('room_type') == 'Mixte':
-                materials_text = str(req.get('selected_materials', '')).lower()
-                description_text = str(req.get('material_description', '')).lower()
-                combined_text = f"{materials_text} {description_text}"
-                physics_keywords = ['oscilloscope', 'générateur', 'signal', 'optique', 'laser', 'prisme', 'lentille', 'physique', 'électricité', 'mécanique', 'ondes']
-                chemistry_keywords = ['burette', 'erlenmeyer', 'bécher', 'pipette', 'solution', 'naoh', 'hcl', 'acide', 'base', 'dosage', 'titrage', 'chimie', 'réaction', 'molécule', 'ion', 'ph']
-                physics_score = sum(1 for kw in physics_keywords if kw in combined_text)
-                chemistry_score = sum(1 for kw in chemistry_keywords if kw in combined_text)
-                if physics_score > chemistry_score and physics_score > 0:
-                    matiere = "physique"
-                elif chemistry_score > physics_score and chemistry_score > 0:
-                    matiere = "chimie"
-            computers_needed = req.get('computers_needed', 0)
-            if computers_needed and computers_needed > 0:
-                material_needs["ordinateurs"] = max(material_needs["ordinateurs"], computers_needed)
-            cours.append({
-                "id": f"{req.get('teacher_name', 'Unknown')}_{i}",
-                "request_id": req.get('id'),
-                "prepared": bool(req.get('prepared', False)),
-                "enseignant": req.get('teacher_name', 'Unknown'),
-                "horaire": req.get('horaire', '9h00') or '9h00',
-                "niveau": req.get('class_name', ''),
-                "matiere": matiere,
-                "jour": jour_planning,
-                "ordinateurs": material_needs["ordinateurs"],
-                "eviers": material_needs["eviers"],
-                "hotte": material_needs["hotte"],
-                "bancs_optiques": material_needs["bancs_optiques"],
-                "obscurite_totale": material_needs["obscurite_totale"],
-                "becs_electriques": material_needs["becs_electriques"],
-                "support_filtration": material_needs["support_filtration"],
-                "imprimante": material_needs["imprimante"],
-                "examen": material_needs["examen"],
-                "duree": req.get('custom_duration') or duree_par_niveau(req.get('class_name', '')),
-                "chaises": eleves_par_niveau(req.get('class_name', ''), req.get('teacher_name', 'Unknown')),
-                "materiel_demande": req.get('material_description', 'N/A'),
-                "selected_materials": req.get('selected_materials', ''),
-                "request_name": req.get('request_name', '')
-            })
-
-        if not cours:
-            return False, "Aucun cours valide à planifier"
-        
-        # OR-Tools optimization model
-        model = cp_model.CpModel()
-        x = {}
-        poids_salle = {}
-        
-        # Variables for room assignment
-        for i, c in enumerate(cours):
-            poids_salle[i] = {}
-            for s in salles:
-                if compatible(salles[s], c, c21_slots):
-                    x[(i,s)] = model.NewBoolVar(f"x_{i}_{s}")
-                    
-                    # Check if this is a theoretical course (no specific equipment needs)
-                    has_equipment_needs = (c["ordinateurs"] > 0 or c["eviers"] > 0 or
-                                          c["hotte"] > 0 or c["bancs_optiques"] > 0 or
-                                          c["obscurite_totale"] > 0 or c["becs_electriques"] > 0 or
-                                          c["support_filtration"] > 0 or c["imprimante"] > 0 or
-                                          c["examen"] > 0)
-                    
-                    # Weight based on room specialization and REAL EQUIPMENT
-                    # AMÉLIORATION: Priorité basée sur les équipements réels, pas seulement le type déclaré
-                    
-                    # Analyser les équipements réels de la salle
-                    room_has_chemistry_equipment = (salles[s]["eviers"] > 0 or salles[s]["hotte"] > 0 or 
-                                                   salles[s]["becs_electriques"] > 0 or salles[s]["support_filtration"] > 0)
-                    room_has_physics_equipment = (salles[s]["obscurite_totale"] > 0 or salles[s]["bancs_optiques"] > 0)
-                    
-                    # Pondération intelligente basée sur matière + équipements réels
-                    if c["matiere"] == "chimie":
-                        if room_has_chemistry_equipment:
-                            # Salle avec équipements de chimie (C22, C24, C31-33) - PRIORITÉ MAXIMALE
-                            poids_salle[i][s] = 10 if has_equipment_needs else 9
-                        elif salles[s]["type"] == "chimie":
-                            # Salle déclarée chimie mais sans équipements - BONNE
-                            poids_salle[i][s] = 8 if has_equipment_needs else 7
-                        elif salles[s]["type"] == "mixte" and not room_has_physics_equipment:
-                            # Salle mixte sans équipements physique - ACCEPTABLE
-                            poids_salle[i][s] = 6
-                        elif room_has_physics_equipment or salles[s]["type"] == "physique":
-                            # Salle avec équipements physique - À ÉVITER
-                            poids_salle[i][s] = 2
-                        else:
-                            # Dernière option
-                            poids_salle[i][s] = 4
-                            
-                    elif c["matiere"] == "physique":
-                        if room_has_physics_equipment:
-                            # Salle avec équipements de physique (C25, C27) - PRIORITÉ MAXIMALE
-                            poids_salle[i][s] = 10 if has_equipment_needs else 9
-                        elif salles[s]["type"] == "physique":
-                            # Salle déclarée physique mais sans équipements - BONNE
-                            poids_salle[i][s] = 8 if has_equipment_needs else 7
-                        elif salles[s]["type"] == "mixte" and not room_has_chemistry_equipment:
-                            # Salle mixte sans équipements chimie - ACCEPTABLE
-                            poids_salle[i][s] = 6
-                        elif room_has_chemistry_equipment or salles[s]["type"] == "chimie":
-                            # Salle avec équipements chimie - À ÉVITER
-                            poids_salle[i][s] = 2
-                        else:
-                            # Dernière option
-                            poids_salle[i][s] = 4
-                            
-                    else:  # matiere == "mixte" ou autres
-                        if salles[s]["type"] == "mixte":
-                            poids_salle[i][s] = 7  # Parfait pour cours mixtes
-                        elif not room_has_chemistry_equipment and not room_has_physics_equipment:
-                            poids_salle[i][s] = 6  # Salles théoriques sont bien
-                        else:
-                            poids_salle[i][s] = 4  # Éviter les salles spécialisées pour cours mixtes
-                else:
-                    poids_salle[i][s] = 0
+        if progression:
+            progression({'stage': 'chargement'})
+        ok, entrees = charger_entrees_planning(date_str)
+        if not ok:
+            return False, entrees
+        cours, salles, c21_slots = entrees
 
-        # Constraints: each course with compatible rooms must have exactly one room
-        for i in range(len(cours)):
-            compatible_rooms = [x[(i,s)] for s in salles if (i,s) in x]
-            if compatible_rooms:
-                model.Add(sum(compatible_rooms) == 1)
-            else:
-                print(f"⚠️ ATTENTION: Cours {i} ({cours[i]['enseignant']} - {cours[i]['niveau']}) n'a AUCUNE salle compatible!")
-                print(f"   Matière: {cours[i]['matiere']}, Horaire: {cours[i]['horaire']}")
-                print(f"   Besoins: ordinateurs={cours[i]['ordinateurs']}, eviers={cours[i]['eviers']}, hotte={cours[i]['hotte']}")
-
-        # Constraints: no room conflicts (time overlap)
-        for i in range(len(cours)):
-            for j in range(i + 1, len(cours)):
-                start1, end1 = interval_cours(cours[i])
-                start2, end2 = interval_cours(cours[j])
-                
-                # Check if courses overlap in time
-                if not (end1 <= start2 or end2 <= start1):
-                    # They overlap, so they can't use the same room
-                    for s in salles:
-                        if (i,s) in x and (j,s) in x:
-                            model.Add(x[(i,s)] + x[(j,s)] <= 1)
-
-        # Get list of teachers
-        enseignants = list(set(c["enseignant"] for c in cours))
-        
-        # Preference for same teacher to use same room
-        objectif_pref = []
-        for enseignant in enseignants:
-            cours_ens = [i for i, c in enumerate(cours) if c["enseignant"] == enseignant]
-            for idx1 in range(len(cours_ens)):
-                for idx2 in range(idx1 + 1, len(cours_ens)):
-                    i, j = cours_ens[idx1], cours_ens[idx2]
-                    for s in salle_list:
-                        if (i, s) in x and (j, s) in x:
-                            pref = model.NewBoolVar(f"pref_{i}_{j}_{s}")
-                            model.AddBoolAnd([x[(i, s)], x[(j, s)]]).OnlyEnforceIf(pref)
-                            model.AddBoolOr([x[(i, s)].Not(), x[(j, s)].Not()]).OnlyEnforceIf(pref.Not())
-                            objectif_pref.append(pref)
-
-        # Variables for room usage
-        salle_utilisee = {}
-        for s in salles:
-            salle_utilisee[s] = model.NewBoolVar(f"salle_utilisee_{s}")
-            vars_for_salle = [x[(i,s)] for i in range(len(cours)) if (i,s) in x]
-            if vars_for_salle:
-                model.AddMaxEquality(salle_utilisee[s], vars_for_salle)
-            else:
-                # Aucune variable pour cette salle -> elle n'est pas utilisée
-                model.Add(salle_utilisee[s] == 0)
-
-        # Objective: maximize room specialization + teacher preference + room usage
-        model.Maximize(
-            sum(x[(i,s)] * poids_salle[i][s] for (i,s) in x) +  # room specialization
-            sum(objectif_pref) +  # same room for same teacher
-            0.1 * sum(salle_utilisee.values())  # encourage room usage diversity
-        )
+        cle = None
+        if not (return_data_only or return_grid or incremental):
+            cle = empreinte_jour(date_str, cours, salles, c21_slots, profil, custom_room_assignments)
+            entree = get_artifact_cache().get(cle)
+            if entree is not None:
+                print(f"♻️ Classeur du {date_str} repris du cache ({cle[:12]})")
+                if artefact is not None:
+                    artefact.update(etag=cle, last_modified=entree[1], source='cache')
+                return True, io.BytesIO(entree[0])
         
-        # Solve the model
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 60
-        status = solver.Solve(model)
+        # OR-Tools optimization model (ou solution déjà calculée pour les mêmes entrées)
+        precedente = affectation_precedente(date_str, cours, salles) if incremental else None
+        status, affectation, stats = resoudre_affectation(cours, salles, c21_slots, precedente, date_str, profil,
+                                                          progression)
+        if statistiques is not None:
+            statistiques.update(stats)
+        if progression:
+            progression({'stage': 'rendu', 'solver': stats})
 
-        print(f"Statut de la résolution: {status}")
-        print(f"Nombre de cours: {len(cours)}")
-        print(f"Nombre de salles disponibles: {len(salles)}")
-        print(f"Salles: {list(salles.keys())}")
-        print(f"Variables x créées: {len(x)}")
-        
-        # Debug: afficher les cours et leurs salles compatibles
-        for i, c in enumerate(cours):
-            compatible_rooms_list = [s for s in salles if (i,s) in x]
-            print(f"Cours {i} ({c['enseignant']} - {c['niveau']} à {c['horaire']}): {len(compatible_rooms_list)} salles compatibles - {compatible_rooms_list}")
-        
         if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
             # Count assignments
             assignments = 0
             unassigned_courses = []
             for i, c in enumerate(cours):
-                assigned = False
-                for s in salles:
-                    if (i, s) in x and solver.Value(x[(i, s)]) == 1:
-                        assignments += 1
-                        assigned = True
-                        break
-                if not assigned:
+                if i in affectation:
+                    assignments += 1
+                else:
                     unassigned_courses.append(f"{c['enseignant']} - {c['niveau']} à {c['horaire']}")
             
             print(f"Cours assignés: {assignments}/{len(cours)}")
@@ -1208,17 +2336,15 @@ def generer_planning_excel(date, end_date=None, return_data_only=False, custom_r
                     })
                     
                     # Trouver l'assignation de salle
-                    assigned_room = None
-                    for s in salles:
-                        if (i, s) in x and solver.Value(x[(i, s)]) == 1:
-                            assigned_room = s
-                            course_id = course['id']
-                            print(f"Cours {course_id} ({course['enseignant']} - {course['niveau']}) assigné à {s} ({salles[s]['nom']})")
-                            slot_key = f"{date_str}_{course['horaire']}"
-                            if slot_key not in assignments_data:
-                                assignments_data[slot_key] = []
-                            assignments_data[slot_key].append(course_id)
-                            break
+                    assigned_room = affectation.get(i)
+                    if assigned_room:
+                        s = assigned_room
+                        course_id = course['id']
+                        print(f"Cours {course_id} ({course['enseignant']} - {course['niveau']}) assigné à {s} ({salles[s]['nom']})")
+                        slot_key = f"{date_str}_{course['horaire']}"
+                        if slot_key not in assignments_data:
+                            assignments_data[slot_key] = []
+                        assignments_data[slot_key].append(course_id)
                     
                     # Ajouter l'assignation de salle pour l'interface
                     course_id = course['id']
@@ -1253,16 +2379,29 @@ def generer_planning_excel(date, end_date=None, return_data_only=False, custom_r
                 print(f"📍 Rooms list pour l'API: {rooms_list}")
                 print(f"📍 Room assignments: {dict(list(room_assignments.items())[:5])}")  # Premiers 5 pour debug
                 
-                return True, {
+                result = {
                     'courses': courses_data,
                     'days': days,
                     'time_slots': time_slots,
                     'assignments': assignments_data,
                     'room_assignments': room_assignments,
-                    'rooms': rooms_list
+                    'rooms': rooms_list,
+                    'solver': stats
                 }
+                if incremental:
+                    maintenus = sum(1 for i, s in (precedente or {}).items() if affectation.get(i) == s)
+                    result['incremental'] = {
+                        'maintained': maintenus,
+                        'moved': len(precedente or {}) - maintenus,
+                        'placed': len(cours) - len(precedente or {}),
+                    }
+                return True, result
+            elif return_grid:
+                return True, GrillePlanning(cours, salles, affectation, unassigned_courses, date_str,
+                                            custom_room_assignments)
             else:
-                return generer_excel_optimise(cours, salles, x, solver, unassigned_courses, date_str, custom_room_assignments)
+                return generer_excel_optimise(cours, salles, affectation, unassigned_courses, date_str, custom_room_assignments,
+                                              artefact=artefact, cle=cle)
         
         elif status == cp_model.INFEASIBLE:
             return False, "ERREUR: Il y a plus de cours simultanés que de salles disponibles! Impossible de générer le planning."
@@ -1275,6 +2414,276 @@ def generer_planning_excel(date, end_date=None, return_data_only=False, custom_r
         return False, f"Erreur lors de la génération du planning: {str(e)}\n{traceback.format_exc()}"
 
 
+# === PLANNING DE PLUSIEURS JOURS ===
+
+def jours_periode(date_debut, date_fin=None):
+    """Dates (YYYY-MM-DD) du lundi au vendredi de date_debut à date_fin incluses."""
+    debut = datetime.strptime(date_debut, '%Y-%m-%d').date()
+    fin = datetime.strptime(date_fin, '%Y-%m-%d').date() if date_fin else debut
+    jours = []
+    while debut <= fin:
+        if debut.weekday() < 5:
+            jours.append(debut.strftime('%Y-%m-%d'))
+        debut += timedelta(days=1)
+    return jours
+
+
+def _initialiser_processus(database_path, solver_workers):
+    """Initialisation d'un processus de calcul (lancé par spawn : rien n'est hérité du parent)."""
+    global SOLVER_NUM_WORKERS
+    database.DATABASE_PATH = database_path
+    SOLVER_NUM_WORKERS = solver_workers
+
+
+def planifier_jour(date_str, profil=None):
+    """
+    Résout le planning d'un jour (exécuté dans un processus de calcul).
+    Retourne un dict picklable : entrées et affectation, ou l'erreur du jour.
+    """
+    try:
+        ok, entrees = charger_entrees_planning(date_str)
+        if not ok:
+            return jour_non_planifie(date_str, entrees)
+        cours, salles, c21_slots = entrees
+        status, affectation, stats = resoudre_affectation(cours, salles, c21_slots, date_str=date_str, profil=profil)
+        if status == cp_model.INFEASIBLE:
+            return {'date': date_str, 'success': False, 'status': stats['status'], 'solver': stats,
+                    'error': "Il y a plus de cours simultanés que de salles disponibles"}
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return {'date': date_str, 'success': False, 'status': stats['status'], 'solver': stats,
+                    'error': f"Résolution échouée avec le statut: {status}"}
+        return {'date': date_str, 'success': True, 'status': stats['status'], 'solver': stats,
+                'cours': cours, 'salles': salles, 'affectation': affectation}
+    except Exception as e:
+        return {'date': date_str, 'success': False, 'error': f"Erreur lors de la génération du planning: {e}"}
+
+
+def _planifier_jours(jours, workers=None, profil=None):
+    """planifier_jour pour chaque jour, en parallèle dans des processus si workers > 1."""
+    cpus = os.cpu_count() or 1
+    workers = min(len(jours), workers or PLANNING_BATCH_WORKERS or cpus)
+    print(f"📅 Planning de {len(jours)} jour(s) du {jours[0]} au {jours[-1]} ({workers} processus)")
+    if workers <= 1:
+        return [planifier_jour(jour, profil) for jour in jours]
+    bruts = []
+    # Processus lancés par 'spawn' : un fork depuis un thread de requête ou de tâche
+    # hériterait des verrous (caches, pool de connexions) tenus à cet instant par un
+    # autre thread. Les cœurs sont partagés entre les solveurs.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_initialiser_processus,
+                             initargs=(database.DATABASE_PATH, max(1, cpus // workers))) as pool:
+        futures = [(jour, pool.submit(planifier_jour, jour, profil)) for jour in jours]
+        for jour, future in futures:
+            try:
+                bruts.append(future.result())
+            except Exception as e:
+                # Processus de calcul interrompu : seul ce jour est en échec
+                bruts.append({'date': jour, 'success': False, 'error': f"Erreur lors de la génération du planning: {e}"})
+    return bruts
+
+
+def generer_plannings_periode(date_debut, date_fin=None, workers=None, avec_classeur=True, profil=None):
+    """
+    Planning de chaque jour ouvré (lundi à vendredi) de la période. Les jours
+    sont indépendants : ils sont résolus en parallèle dans des processus
+    (PLANNING_BATCH_WORKERS, un par cœur par défaut), les cœurs étant
+    partagés entre les solveurs. Un jour en échec (aucune demande, planning
+    impossible...) est signalé dans son résultat sans interrompre les autres.
+
+    Retourne (resultats, classeur) : une entrée par jour
+    {'date', 'success', 'status', 'solver', 'room_assignments', 'unassigned'}
+    ou {'date', 'success': False, 'error'} ('empty' vrai pour un jour sans
+    demande, jour_non_planifie), et un classeur openpyxl avec les
+    feuilles Planning_Techniciens / Affichage de chaque jour résolu (None si
+    aucun jour n'a pu être résolu ou si avec_classeur est faux).
+    """
+    jours = jours_periode(date_debut, date_fin)
+    if not jours:
+        return [], None
+
+    bruts = _planifier_jours(jours, workers, profil)
+
+    classeur = None
+    resultats = []
+    for brut in bruts:
+        if not brut['success']:
+            resultats.append(brut)
+            continue
+        cours, salles, affectation = brut['cours'], brut['salles'], brut['affectation']
+        unassigned_courses = cours_non_assignes(cours, affectation)
+        resultat = {
+            'date': brut['date'],
+            'success': True,
+            'status': brut['status'],
+            'solver': brut['solver'],
+            'room_assignments': {c['id']: salles[affectation[i]]['nom'] if i in affectation else 'Non assigné'
+                                 for i, c in enumerate(cours)},
+            'unassigned': unassigned_courses,
+        }
+        if avec_classeur:
+            if classeur is None:
+                from openpyxl import Workbook
+                classeur = Workbook()
+                classeur.remove(classeur.active)
+            suffixe = ' ' + datetime.strptime(brut['date'], '%Y-%m-%d').strftime('%d-%m')
+            ok, erreur = generer_excel_optimise(cours, salles, affectation, unassigned_courses, brut['date'],
+                                                wb=classeur, suffixe_feuilles=suffixe)
+            if not ok:
+                resultat = {'date': brut['date'], 'success': False, 'error': erreur}
+        resultats.append(resultat)
+
+    print(f"📅 Jours planifiés: {sum(1 for r in resultats if r['success'])}/{len(resultats)}")
+    return resultats, classeur
+
+
+def cours_non_assignes(cours, affectation):
+    """Libellés des cours sans salle, tels qu'affichés sous la grille."""
+    return [f"{c['enseignant']} - {c['niveau']} à {c['horaire']}" for i, c in enumerate(cours) if i not in affectation]
+
+
+# Message de grille_jour pour un jour ni enregistré ni en cache, consulté sans resoudre
+PLANNING_NON_CALCULE = "Le planning de cette date n'a pas encore été calculé"
+
+
+def grille_jour(date_str, profil=None, resoudre=False):
+    """
+    Grille d'un jour à consulter : affectation du planning enregistré par
+    l'éditeur s'il place encore tous les cours, sinon celle du cache de
+    solutions. L'optimiseur n'est lancé que si resoudre est vrai ; sinon
+    un jour ni enregistré ni en cache retourne PLANNING_NON_CALCULE.
+    Retourne (True, grille, source) avec source 'planning_enregistre',
+    'cache' ou 'solveur', ou (False, message d'erreur, None).
+    """
+    ok, entrees = charger_entrees_planning(date_str)
+    if not ok:
+        return False, entrees, None
+    cours, salles, c21_slots = entrees
+    affectation = affectation_enregistree(date_str, cours, salles)
+    source = 'planning_enregistre'
+    if affectation is None:
+        _, resultat = solution_en_cache(cours, salles, c21_slots, profil=profil)
+        if resultat is None and not resoudre:
+            return False, PLANNING_NON_CALCULE, None
+        status, affectation, stats = resultat or resoudre_affectation(cours, salles, c21_slots, date_str=date_str,
+                                                                      profil=profil)
+        if status == cp_model.INFEASIBLE:
+            return False, "Il y a plus de cours simultanés que de salles disponibles", None
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return False, f"Résolution échouée avec le statut: {stats['status']}", None
+        source = 'cache' if stats.get('source') == 'cache' else 'solveur'
+    return True, GrillePlanning(cours, salles, affectation, cours_non_assignes(cours, affectation), date_str), source
+
+
+def jours_semaine(date_str):
+    """Jours ouvrés de la semaine de date_str : lundi à vendredi, hors jours déclarés non ouvrés."""
+    jour = datetime.strptime(date_str, '%Y-%m-%d').date()
+    lundi = jour - timedelta(days=jour.weekday())
+    jours = jours_periode(lundi.strftime('%Y-%m-%d'), (lundi + timedelta(days=4)).strftime('%Y-%m-%d'))
+    try:
+        fermes = {str(row['date'])[:10] for row in database.get_working_days_config()
+                  if not row['is_working_day']}
+    except Exception as e:
+        print(f"⚠️ Configuration des jours ouvrés illisible: {e}")
+        fermes = set()
+    return [j for j in jours if j not in fermes]
+
+
+def generer_classeur_semaine(date_str, workers=None, profil=None, artefact=None):
+    """
+    Classeur de la semaine de date_str : feuilles Planning_Techniciens et
+    Affichage de chaque jour ouvré, suffixées par le jour (jj-mm).
+
+    L'affectation d'un jour vient du planning enregistré par l'éditeur s'il
+    place encore tous les cours, sinon du cache de solutions ; seuls les
+    jours restants passent par l'optimiseur, en parallèle dans des
+    processus (_planifier_jours). Le classeur est écrit en mode write_only,
+    un jour après l'autre : sa mémoire ne grandit pas avec la semaine ; il
+    est repris du cache des classeurs si aucun jour n'a changé
+    (empreinte_semaine, calculée avant la résolution ; artefact reçoit son
+    ETag et sa date).
+
+    Retourne (resultats, buffer) : une entrée par jour {'date', 'success',
+    'source' ('planning_enregistre', 'cache' ou 'solveur'), 'status',
+    'solver', 'room_assignments', 'unassigned'} ou {'date', 'success':
+    False, 'error'} ('empty' vrai pour un jour sans demande), et le classeur
+    dans un io.BytesIO (None si aucun jour n'a pu être planifié).
+    """
+    from openpyxl import Workbook
+
+    jours = jours_semaine(date_str)
+    bruts, cles, a_resoudre, empreintes = {}, {}, [], []
+    for jour in jours:
+        ok, entrees = charger_entrees_planning(jour)
+        if not ok:
+            bruts[jour] = jour_non_planifie(jour, entrees)
+            empreintes.append([jour, None])
+            continue
+        cours, salles, c21_slots = entrees
+        affectation = affectation_enregistree(jour, cours, salles)
+        empreintes.append([jour, empreinte_jour(jour, cours, salles, c21_slots, profil, affectation=affectation)])
+        if affectation is not None:
+            bruts[jour] = {'date': jour, 'success': True, 'source': 'planning_enregistre', 'status': None,
+                           'solver': {'source': 'planning_enregistre'},
+                           'cours': cours, 'salles': salles, 'affectation': affectation}
+            continue
+        cles[jour], resultat = solution_en_cache(cours, salles, c21_slots, profil=profil)
+        if resultat is not None and resultat[0] in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            status, affectation, stats = resultat
+            bruts[jour] = {'date': jour, 'success': True, 'source': 'cache', 'status': stats['status'],
+                           'solver': stats, 'cours': cours, 'salles': salles, 'affectation': affectation}
+        else:
+            a_resoudre.append(jour)
+
+    if a_resoudre:
+        cache = get_solution_cache()
+        for brut in _planifier_jours(a_resoudre, workers, profil):
+            brut['source'] = 'cache' if (brut.get('solver') or {}).get('source') == 'cache' else 'solveur'
+            bruts[brut['date']] = brut
+            # Cache en mémoire : les processus de calcul ne le partagent pas avec ce processus
+            if brut['success'] and brut['source'] == 'solveur' and cache.backend == 'memory':
+                cache.put(cles[brut['date']], {
+                    'status': cp_model.cp_model_pb2.CpSolverStatus.Value(brut['status']),
+                    'salles': [brut['affectation'].get(i) for i in range(len(brut['cours']))],
+                    'stats': brut['solver']})
+
+    feuilles, resultats = [], []
+    for jour in jours:
+        brut = bruts.pop(jour)
+        if not brut['success']:
+            resultats.append({k: v for k, v in brut.items() if k not in ('cours', 'salles', 'affectation')})
+            continue
+        cours, salles, affectation = brut['cours'], brut['salles'], brut['affectation']
+        unassigned_courses = cours_non_assignes(cours, affectation)
+        suffixe = ' ' + datetime.strptime(jour, '%Y-%m-%d').strftime('%d-%m')
+        feuilles.append((suffixe, GrillePlanning(cours, salles, affectation, unassigned_courses, jour)))
+        resultats.append({
+            'date': jour,
+            'success': True,
+            'source': brut['source'],
+            'status': brut['status'],
+            'solver': brut['solver'],
+            'room_assignments': {c['id']: salles[affectation[i]]['nom'] if i in affectation else 'Non assigné'
+                                 for i, c in enumerate(cours)},
+            'unassigned': unassigned_courses,
+        })
+
+    def rendre():
+        wb = Workbook(write_only=True)
+        styles_planning(wb)
+        for suffixe, grille in feuilles:
+            rendre_feuille_planning(wb.create_sheet(f"Planning_Techniciens{suffixe}"), grille, 'techniciens')
+            rendre_feuille_planning(wb.create_sheet(f"Affichage{suffixe}"), grille, 'affichage')
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer
+
+    buffer = classeur_planning(feuilles, rendre, artefact, empreinte_semaine(empreintes)) if feuilles else None
+    print(f"📅 Semaine du {jours[0] if jours else date_str}: " +
+          ", ".join(f"{r['date']} {r['source'] if r['success'] else 'sans demande' if r.get('empty') else 'échec'}"
+                    for r in resultats))
+    return resultats, buffer
+
+
 def get_planning_data_for_editor(target_date):
     """
     Appelle la nouvelle version qui fonctionne
@@ -1282,17 +2691,21 @@ def get_planning_data_for_editor(target_date):
     return get_planning_data_for_editor_v2(target_date)
 
 
-def get_planning_data_for_editor_v2(target_date):
+def get_planning_data_for_editor_v2(target_date, incremental=False, profil=None, progression=None):
     """
     Version qui utilise directement la génération normale avec return_data_only=True
     mais en corrigeant le problème de clés.
+    incremental : re-planification à partir du planning enregistré de la date.
+    profil : profil de l'optimiseur (SOLVER_PROFILES).
+    progression : suivi de la génération (voir generer_planning_excel).
     """
     try:
         print(f"🔧 [EDITOR] Début génération du planning - Date: {target_date}")
         
         # Retourner à la méthode return_data_only=True mais avec les corrections
         print(f"📞 [EDITOR] Appel de generer_planning_excel avec return_data_only=True")
-        success, result = generer_planning_excel(target_date, return_data_only=True)
+        success, result = generer_planning_excel(target_date, return_data_only=True, incremental=incremental,
+                                                 profil=profil, progression=progression)
         print(f"📋 [EDITOR] Retour de generer_planning_excel: success={success}")
         
         if not success:
@@ -1327,6 +2740,29 @@ def get_planning_data_for_editor_v2(target_date):
 
 
 if __name__ == "__main__":
-    # Test the function
-    success, message = generer_planning_excel("2024-09-29")
-    print(message)
\ No newline at end of file
+    # Génération en ligne de commande d'un jour ou d'une période :
+    #   python planning_generator.py 2024-09-30 2024-10-04 -o semaine.xlsx
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Génère le planning d'un jour ou d'une période (un classeur, deux feuilles par jour).")
+    parser.add_argument('date_debut', help='YYYY-MM-DD')
+    parser.add_argument('date_fin', nargs='?', help='YYYY-MM-DD (défaut : date_debut)')
+    parser.add_argument('-o', '--output', help='classeur à écrire (défaut : planning_<debut>_<fin>.xlsx)')
+    parser.add_argument('--workers', type=int, help='processus de calcul (défaut : PLANNING_BATCH_WORKERS ou un par cœur)')
+    parser.add_argument('--profile', choices=sorted(SOLVER_PROFILES), help="profil de l'optimiseur (défaut : PLANNING_SOLVER_PROFILE)")
+    args = parser.parse_args()
+
+    resultats, classeur = generer_plannings_periode(args.date_debut, args.date_fin, workers=args.workers,
+                                                    profil=args.profile)
+    for r in resultats:
+        if r['success']:
+            print(f"{r['date']}: {r['status']}, {len(r['room_assignments']) - len(r['unassigned'])}/{len(r['room_assignments'])} cours placés"
+                  f" en {r['solver'].get('wall_time')} s (écart {r['solver'].get('gap')}, {r['solver']['source']})")
+        else:
+            print(f"{r['date']}: ÉCHEC - {r['error']}")
+    if classeur is not None:
+        output = args.output or f"planning_{args.date_debut}_{args.date_fin or args.date_debut}.xlsx"
+        classeur.save(output)
+        print(f"Classeur: {output}")
+    sys.exit(0 if resultats and all(r['success'] for r in resultats) else 1)
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Générations de planning en arrière-plan.
+
+La résolution et le rendu d'un planning peuvent prendre une minute : au lieu
+d'occuper un worker gunicorn pendant toute la requête, la demande crée une
+tâche (table planning_jobs) exécutée par un petit pool de threads du worker
+qui l'a reçue, puis le navigateur suit son état (étape, solutions
+intermédiaires de l'optimiseur) et récupère le résultat. L'état étant en
+base, n'importe quel worker peut répondre aux demandes de suivi.
+
+Une demande identique (même type, mêmes paramètres) à une tâche en attente ou
+en cours rejoint cette tâche au lieu d'en lancer une seconde.
+
+Les types de tâche sont déclarés par register_job_kind(kind, handler) ;
+handler(params, progression) retourne un résultat sérialisable en JSON ou
+lève PlanningJobError avec le message à afficher.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# Tâches exécutées en même temps par chaque worker gunicorn (threads : l'optimiseur
+# relâche le GIL pendant la résolution)
+PLANNING_JOB_WORKERS = int(os.getenv('PLANNING_JOB_WORKERS', '1'))
+# Une tâche sans nouvelles depuis ce délai (worker redémarré) est considérée interrompue
+PLANNING_JOB_STALE_SECONDS = int(os.getenv('PLANNING_JOB_STALE_SECONDS', '900'))
+# Tâches terminées conservées en base
+PLANNING_JOB_KEEP = 200
+# Intervalle minimal entre deux enregistrements de la progression d'une même étape (secondes)
+PLANNING_JOB_PROGRESS_INTERVAL = 0.5
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_JOB_KINDS = {}
+
+
+class PlanningJobError(Exception):
+    """Échec attendu d'une tâche (message affiché tel quel à l'utilisateur)."""
+
+
+def register_job_kind(kind, handler):
+    """Déclare un type de tâche : handler(params, progression) -> résultat JSON."""
+    if kind in _JOB_KINDS:
+        raise ValueError(f"Type de tâche déjà enregistré: {kind}")
+    _JOB_KINDS[kind] = handler
+
+
+def job_key(kind, params):
+    """Clé de regroupement des demandes identiques."""
+    return hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SuiviTache:
+    """
+    Fonction progression passée au handler : fusionne chaque état reçu dans
+    la progression de la tâche et l'enregistre, au plus une fois par
+    PLANNING_JOB_PROGRESS_INTERVAL tant que l'étape ne change pas.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.etat = {}
+        self._dernier = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, etat):
+        with self._lock:
+            nouvelle_etape = etat.get('stage') != self.etat.get('stage')
+            self.etat.update(etat)
+            maintenant = time.time()
+            if not nouvelle_etape and maintenant - self._dernier < PLANNING_JOB_PROGRESS_INTERVAL:
+                return
+            self._dernier = maintenant
+            progression = json.dumps(self.etat, default=str)
+        try:
+            database.update_planning_job(self.job_id, maintenant, progress=progression)
+        except Exception as e:
+            logger.warning(f"Progression de la tâche {self.job_id} non enregistrée: {e}")
+
+
+class PlanningJobQueue:
+    """Pool de threads du processus courant (recréé après un fork) et accès aux tâches."""
+
+    def __init__(self, workers=None):
+        self.workers = max(1, workers or PLANNING_JOB_WORKERS)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='planning-job')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, kind, params):
+        """
+        Crée une tâche, ou rejoint la tâche identique en cours.
+        Retourne (job_id, True si une nouvelle tâche a été lancée).
+        """
+        if kind not in _JOB_KINDS:
+            raise ValueError(f"Type de tâche inconnu: {kind}")
+        maintenant = time.time()
+        job_id, cree = database.create_planning_job(
+            uuid.uuid4().hex, job_key(kind, params), kind, json.dumps(params, sort_keys=True),
+            maintenant, maintenant - PLANNING_JOB_STALE_SECONDS, keep=PLANNING_JOB_KEEP)
+        if cree:
+            self._pool().submit(self._executer, job_id, kind, params)
+        return job_id, cree
+
+    def _executer(self, job_id, kind, params):
+        suivi = SuiviTache(job_id)
+        database.update_planning_job(job_id, time.time(), status='running')
+        try:
+            resultat = _JOB_KINDS[kind](params, suivi)
+        except PlanningJobError as e:
+            database.update_planning_job(job_id, time.time(), status='failed', error=str(e))
+        except Exception as e:
+            logger.exception(f"Tâche de planning {job_id} ({kind}) en échec")
+            database.update_planning_job(job_id, time.time(), status='failed', error=f"Erreur interne: {e}")
+        else:
+            suivi.etat['stage'] = 'termine'
+            database.update_planning_job(job_id, time.time(), status='done',
+                                         progress=json.dumps(suivi.etat, default=str),
+                                         result=json.dumps(resultat, default=str))
+
+    def get(self, job_id, with_result=False):
+        """
+        État d'une tâche (dict : job_id, kind, params, status, progress, error,
+        created_at, updated_at et result si with_result), ou None. Une tâche
+        active sans nouvelles depuis PLANNING_JOB_STALE_SECONDS est signalée
+        en échec.
+        """
+        row = database.get_planning_job(job_id)
+        if row is None:
+            return None
+        job = {
+            'job_id': row['job_id'],
+            'kind': row['kind'],
+            'params': json.loads(row['params']),
+            'status': row['status'],
+            'progress': json.loads(row['progress']) if row['progress'] else {},
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+        if job['status'] in ACTIVE_STATUSES and time.time() - row['updated_at'] > PLANNING_JOB_STALE_SECONDS:
+            job['status'], job['error'] = 'failed', 'Tâche interrompue'
+        if with_result:
+            job['result'] = json.loads(row['result']) if row['result'] else None
+        return job
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """File des tâches de planning du processus."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PlanningJobQueue()
+        return _queue
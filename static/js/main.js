@@ -222,6 +222,56 @@ async function apiRequest(url, options = {}) {
     }
 }
 
+// Générations de planning en arrière-plan (/api/planning-jobs) : lance la tâche,
+// transmet son état à onProgress à chaque interrogation et retourne la réponse
+// du résultat (classeur Excel ou données de l'éditeur).
+async function runPlanningJob(payload, onProgress = null, intervalMs = 1000) {
+    const submitResponse = await fetch('/api/planning-jobs', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload)
+    });
+    const job = await submitResponse.json();
+    if (!submitResponse.ok) {
+        throw new Error(job.error || 'Erreur lors du lancement de la génération');
+    }
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        const statusResponse = await fetch(job.status_url);
+        const status = await statusResponse.json();
+        if (!statusResponse.ok) {
+            throw new Error(status.error || 'Erreur lors du suivi de la génération');
+        }
+        if (onProgress) onProgress(status);
+        if (status.status === 'failed') {
+            throw new Error(status.error || 'La génération a échoué');
+        }
+        if (status.status === 'done') {
+            return fetch(job.result_url);
+        }
+    }
+}
+
+// Texte court décrivant l'état d'une tâche de planning
+function describePlanningJob(status) {
+    const progress = status.progress || {};
+    if (status.status === 'queued') return 'En attente...';
+    switch (progress.stage) {
+        case 'chargement':
+            return 'Lecture des demandes...';
+        case 'resolution': {
+            const objective = typeof progress.objective === 'number' ? `, score ${progress.objective.toFixed(1)}` : '';
+            const solutions = progress.solutions ? `${progress.solutions} solution(s)` : 'solution trouvée';
+            return `Optimisation : ${solutions}${objective}`;
+        }
+        case 'rendu':
+        case 'termine':
+            return 'Création du planning...';
+        default:
+            return 'Optimisation...';
+    }
+}
+
 // Utility functions
 function debounce(func, wait) {
     let timeout;
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Compare la création d'une demande multi-jours (POST /api/requests) :
+ancienne boucle (add_material_request + upsert_tp_template par créneau)
+contre add_material_requests_bulk (une transaction, template enregistré une fois).
+
+    python tools/bench_bulk_insert.py                   # SQLite temporaire, 5 jours x 3 créneaux
+    DATABASE_URL=... python tools/bench_bulk_insert.py  # PostgreSQL (lignes supprimées à la fin)
+    python tools/bench_bulk_insert.py --days 10 --slots 4 --repeat 20
+
+Affiche le nombre de transactions (appels à run_write) et le temps par soumission.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEACHER_NAME = 'Création groupée (test)'
+HORAIRES = ['8h00', '9h00', '10h00', '11h00', '13h00', '14h00', '15h00', '16h00']
+
+
+def _setup_database():
+    import database
+    if not os.getenv('DATABASE_URL'):
+        tmpdir = tempfile.mkdtemp(prefix='bulk_insert_')
+        database.DATABASE_PATH = os.path.join(tmpdir, 'material_requests.db')
+    database.init_database()
+    return database
+
+
+def _teacher_id(database):
+    for teacher in database.get_all_teachers():
+        if teacher['name'] == TEACHER_NAME:
+            return teacher['id']
+    return database.add_teacher(TEACHER_NAME)
+
+
+def _template(teacher_id):
+    return {
+        'teacher_id': teacher_id, 'level': '2nde', 'request_name': 'TP titrage',
+        'material_description': 'burettes, béchers', 'selected_materials': 'burette',
+        'material_prof': '', 'computers_needed': 0, 'group_count': 2, 'notes': '',
+        'image_url': '', 'room_type': 'Mixte',
+    }
+
+
+def _legacy(database, teacher_id, slots):
+    """Ancienne boucle de api_add_request."""
+    template = _template(teacher_id)
+    ids = []
+    for date, horaire in slots:
+        ids.append(database.add_material_request(
+            teacher_id=teacher_id, request_date=date, horaire=horaire, class_name='2nde',
+            material_description='burettes, béchers', selected_materials='burette',
+            group_count=2, request_name='TP titrage'))
+        database.upsert_tp_template(**template)
+    return ids
+
+
+def _bulk(database, teacher_id, slots):
+    return database.add_material_requests_bulk(
+        teacher_id=teacher_id, slots=slots, class_name='2nde',
+        material_description='burettes, béchers', selected_materials='burette',
+        group_count=2, request_name='TP titrage', template=_template(teacher_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--slots', type=int, default=3, help="créneaux par jour")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    database = _setup_database()
+    teacher_id = _teacher_id(database)
+    slots = [(f'2030-01-{day + 1:02d}', HORAIRES[slot % len(HORAIRES)])
+             for day in range(args.days) for slot in range(args.slots)]
+
+    # Compte les transactions d'écriture
+    transactions = {'count': 0}
+    run_write = database.run_write
+
+    def counting_run_write(fn):
+        transactions['count'] += 1
+        return run_write(fn)
+
+    database.run_write = counting_run_write
+    results = {}
+    try:
+        for name, fn in (('legacy', _legacy), ('bulk', _bulk)):
+            best = float('inf')
+            for _ in range(args.repeat):
+                transactions['count'] = 0
+                started = time.perf_counter()
+                ids = fn(database, teacher_id, slots)
+                best = min(best, time.perf_counter() - started)
+                assert len(ids) == len(slots) and all(ids), ids
+            results[name] = (best, transactions['count'])
+    finally:
+        database.run_write = run_write
+        with database.db_connection() as (conn, db_type):
+            placeholder = '%s' if db_type == 'postgresql' else '?'
+            cursor = conn.cursor()
+            cursor.execute(f'DELETE FROM material_requests WHERE teacher_id = {placeholder}', (teacher_id,))
+            cursor.execute(f'DELETE FROM tp_templates WHERE teacher_id = {placeholder}', (teacher_id,))
+            conn.commit()
+        # Via database.py : incrémente la version du cache de référence des enseignants
+        database.delete_teacher(teacher_id)
+
+    print(f"Backend: {db_type} | {args.days} jours x {args.slots} créneaux = {len(slots)} demandes "
+          f"(meilleur de {args.repeat})")
+    for name, label in (('legacy', 'Boucle par créneau'), ('bulk', 'Création groupée')):
+        elapsed, count = results[name]
+        print(f"  {label:<20} | {count:3d} transaction(s) | {elapsed * 1000:8.1f} ms")
+    print(f"Gain: x{results['legacy'][0] / results['bulk'][0]:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Mesure la validation des délais (deadline_utils) avec le calendrier des jours
+ouvrés précalculé : temps par validation et accès base une fois le calendrier
+chargé (connexions empruntées au pool sur PostgreSQL, aucune attendue).
+
+    python tools/bench_deadlines.py                    # SQLite temporaire
+    DATABASE_URL=... python tools/bench_deadlines.py
+    python tools/bench_deadlines.py --dates 10 --repeat 2000
+
+Une validation = check_request_deadlines sur --dates dates + get_earliest_valid_date,
+comme POST /api/requests quand un délai n'est pas respecté.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _setup_database():
+    import database
+    if not os.getenv('DATABASE_URL'):
+        tmpdir = tempfile.mkdtemp(prefix='bench_deadlines_')
+        database.DATABASE_PATH = os.path.join(tmpdir, 'material_requests.db')
+    database.init_database()
+    return database
+
+
+def _checkouts(database):
+    pool = database.get_pool_stats().get('pool')
+    return pool['checkouts'] if pool else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dates', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    database = _setup_database()
+    import deadline_utils
+
+    now = datetime(2030, 1, 3, 16, 30)
+    dates = [(now + timedelta(days=7 + i)).strftime('%Y-%m-%d') for i in range(args.dates)]
+
+    def validate():
+        deadline_utils.check_request_deadlines(dates, now)
+        deadline_utils.get_earliest_valid_date(now)
+
+    started = time.perf_counter()
+    validate()  # chargement du calendrier
+    first_call = time.perf_counter() - started
+
+    # Les versions du cache sont relues au plus une fois par intervalle
+    database.get_reference_cache().check_interval = float('inf')
+    before = _checkouts(database)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        validate()
+    elapsed = time.perf_counter() - started
+    after = _checkouts(database)
+
+    print(f"{args.dates} dates + date au plus tôt | {args.repeat} validations")
+    print(f"  premier appel (chargement du calendrier) : {first_call * 1000:.1f} ms")
+    print(f"  ensuite : {elapsed / args.repeat * 1e6:.1f} µs par validation")
+    if before is not None:
+        print(f"  connexions empruntées au pool après chargement : {after - before}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
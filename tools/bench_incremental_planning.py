@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Mesure la re-planification incrémentale de l'éditeur (generer_planning_excel
+avec incremental=True) : planning complet enregistré comme le fait l'éditeur,
+puis une demande ajoutée et une demande déplacée, et comparaison d'un
+recalcul complet avec la mise à jour incrémentale (temps, cours changés de salle).
+
+    python tools/bench_incremental_planning.py                   # SQLite temporaire
+    DATABASE_URL=... python tools/bench_incremental_planning.py  # base de test : ajoute des demandes
+    PLANNING_INCREMENTAL_MODE=penaliser python tools/bench_incremental_planning.py
+
+Cache de solutions désactivé pour mesurer l'optimiseur. Code de retour 1 si
+la mise à jour incrémentale déplace un cours inchangé en mode 'fixer'.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PLANNING_SOLUTION_CACHE', 'off')
+
+from bench_solution_cache import HORAIRES, MATERIELS, _setup_database
+
+
+def _generer(pg, date, incremental):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok, data = pg.generer_planning_excel(date, return_data_only=True, incremental=incremental)
+    if not ok:
+        raise SystemExit(f"Génération impossible : {data}")
+    return time.perf_counter() - started, data
+
+
+def _salles_par_demande(data):
+    return {c['request_id']: data['room_assignments'][c['id']] for c in data['courses']}
+
+
+def _enregistrer(database, date, data):
+    """Même écriture que POST /api/save-planning."""
+    def write(cursor, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor.execute(f'DELETE FROM plannings WHERE date = {placeholder}', (date,))
+        cursor.execute(f'INSERT INTO plannings (date, data) VALUES ({placeholder}, {placeholder})',
+                       (date, json.dumps(data)))
+
+    database.run_write(write)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=16)
+    parser.add_argument('--teachers', type=int, default=8)
+    parser.add_argument('--date', default='2030-03-04')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    database, demandes = _setup_database(args, rng)
+    import planning_generator as pg
+
+    initial_time, initial = _generer(pg, args.date, incremental=False)
+    _enregistrer(database, args.date, initial)
+    avant = _salles_par_demande(initial)
+
+    # Une demande déplacée, une demande ajoutée
+    request_id, champs = demandes[0]
+    database.update_material_request(request_id, **dict(
+        champs, horaire=next(h for h in HORAIRES if h != champs['horaire'])))
+    nouvelle = database.add_material_request(**dict(demandes[1][1], horaire=rng.choice(HORAIRES),
+                                                    selected_materials=rng.choice(MATERIELS)))
+    touchees = {request_id, nouvelle}
+
+    complet_time, complet = _generer(pg, args.date, incremental=False)
+    incremental_time, incremental = _generer(pg, args.date, incremental=True)
+
+    def changes(data):
+        apres = _salles_par_demande(data)
+        return sum(1 for rid, salle in avant.items() if rid not in touchees and apres.get(rid) != salle)
+
+    print(f"{len(demandes) + 1} demandes | {args.rooms} salles | mode {pg.PLANNING_INCREMENTAL_MODE}")
+    print(f"  planning initial        : {initial_time * 1000:8.1f} ms")
+    print(f"  recalcul complet        : {complet_time * 1000:8.1f} ms | cours inchangés déplacés : {changes(complet)}")
+    print(f"  mise à jour incrémentale: {incremental_time * 1000:8.1f} ms | cours inchangés déplacés : {changes(incremental)}"
+          f" | {incremental.get('incremental')}")
+    return 1 if pg.PLANNING_INCREMENTAL_MODE == 'fixer' and changes(incremental) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Compare _resoudre avec PLANNING_DECOMPOSITION 'off' (modèle unique) et
+'blocs' (planning_generator.resoudre_par_blocs) sur des journées
+synthétiques de bench_planner_model en plusieurs créneaux séparés (matin,
+midi, après-midi) : temps, objectif de la journée (valeur_objectif),
+nombre de résolutions et statut. Voie rapide active par défaut, comme en
+production : 'blocs' ne découpe alors la journée que si les couplages
+n'ont pas fourni d'affectation de départ.
+
+    python tools/bench_planner_decomposition.py                  # 60 et 120 cours, 80 salles
+    python tools/bench_planner_decomposition.py --courses 120 200 --fast-path off
+    python tools/bench_planner_decomposition.py --courses 240 --rooms 80 --profile exhaustif
+
+Code de retour 1 si l'objectif de 'blocs' est inférieur à celui du modèle
+unique (au-delà de --tolerance, bruit des flottants).
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['PLANNING_SOLUTION_CACHE'] = 'off'
+
+import bench_planner_model
+import planning_generator as pg
+from bench_planner_model import C21_SLOTS, _instance
+
+# Créneaux séparés par une pause : les cours de deux créneaux ne se chevauchent pas
+CRENEAUX = [['8h00', '8h30', '9h00'], ['10h30', '11h00'], ['13h15', '13h45', '14h15'], ['16h00', '16h30']]
+
+
+def _journee(count, rooms, rng, teachers):
+    """Même enseignants sur toute la journée, cours répartis entre les créneaux."""
+    cours = []
+    for k, horaires in enumerate(CRENEAUX):
+        bench_planner_model.HORAIRES = horaires
+        part, salles = _instance(count // len(CRENEAUX), rooms, rng, teachers)
+        for c in part:
+            c['id'] = f"{c['id']}_{k}"
+            c['duree'] = min(c['duree'], 85)
+        cours.extend(part)
+    return cours, salles
+
+
+def _run(mode, cours, salles, profil):
+    pg.PLANNING_DECOMPOSITION = mode
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        status, affectation, stats = pg._resoudre(cours, salles, C21_SLOTS, None, None, profil)
+    elapsed = time.perf_counter() - started
+    _, poids = pg.matrices_affectation(cours, salles, C21_SLOTS)
+    return elapsed, pg.valeur_objectif(cours, salles, affectation, poids), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, nargs='+', default=[60, 120])
+    parser.add_argument('--rooms', type=int, default=80)
+    parser.add_argument('--profile', default=pg.PLANNING_SOLVER_PROFILE)
+    parser.add_argument('--fast-path', choices=['on', 'off'], default=pg.PLANNING_FAST_PATH)
+    parser.add_argument('--tolerance', type=float, default=1e-6, help='écart absolu toléré sur l\'objectif')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    pg.PLANNING_FAST_PATH = args.fast_path
+    failures = 0
+    print(f"{args.rooms} salles | profil {args.profile} | voie rapide {args.fast_path} | {os.cpu_count()} cœur(s)")
+    print(f"{'cours':>6} {'mode':<6} {'blocs':>5} {'résolutions':>11} {'temps':>8} {'objectif':>10} {'statut':>9}")
+    for count in args.courses:
+        cours, salles = _journee(count, args.rooms, random.Random(args.seed), max(1, count // 5))
+        objectifs = {}
+        for mode in ('off', 'blocs'):
+            elapsed, objectifs[mode], stats = _run(mode, cours, salles, args.profile)
+            decomposition = stats.get('decomposition') or {'blocks': 1, 'solves': 1}
+            print(f"{len(cours):>6} {mode:<6} {decomposition['blocks']:>5} {decomposition['solves']:>11} "
+                  f"{elapsed:>7.2f}s {objectifs[mode]:>10.1f} {stats['status']:>9}")
+        failures += objectifs['blocs'] < objectifs['off'] - args.tolerance
+    print(f"Écarts: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Mesure la voie rapide du planning (planning_generator.resoudre_par_couplages) :
+sur des journées synthétiques de bench_planner_model, temps et écart à la
+borne de l'affectation par couplages, moteur retenu par _resoudre (couplages
+ou CP-SAT en repli) et comparaison avec l'optimiseur seul (PLANNING_FAST_PATH=off).
+
+    python tools/bench_planner_fast_path.py                       # 8 à 60 cours, 5 journées chacune
+    python tools/bench_planner_fast_path.py --courses 16 --seeds 20 --profile interactif
+
+Code de retour 1 si l'objectif retenu est inférieur à celui de l'optimiseur
+seul de plus que l'écart toléré par le profil.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['PLANNING_SOLUTION_CACHE'] = 'off'
+
+import planning_generator as pg
+from bench_planner_model import C21_SLOTS, _instance
+
+
+def _run(voie_rapide, cours, salles, profil):
+    pg.PLANNING_FAST_PATH = voie_rapide
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, affectation, stats = pg._resoudre(cours, salles, C21_SLOTS, None, None, profil)
+    _, poids = pg.matrices_affectation(cours, salles, C21_SLOTS)
+    return time.perf_counter() - started, pg.valeur_objectif(cours, salles, affectation, poids), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, nargs='+', default=[8, 16, 30, 60])
+    parser.add_argument('--rooms', type=int, default=None, help='salles (défaut : autant que de cours, 16 au moins)')
+    parser.add_argument('--seeds', type=int, default=5, help='journées par taille')
+    parser.add_argument('--profile', default=pg.PLANNING_SOLVER_PROFILE)
+    args = parser.parse_args()
+
+    profil = pg.profil_solveur(args.profile)
+    tolerance = pg.SOLVER_PROFILES[profil]['ecart_relatif']
+    failures = 0
+    print(f"profil {profil} (écart toléré {tolerance:.1%}) | {os.cpu_count()} cœur(s)")
+    print(f"{'cours':>6} {'graine':>6} {'couplages':>10} {'écart':>7} {'moteur':<12} {'avec':>8} {'objectif':>9} "
+          f"{'sans':>8} {'objectif':>9}")
+    for count in args.courses:
+        rooms = args.rooms or max(16, count)
+        for seed in range(args.seeds):
+            cours, salles = _instance(count, rooms, random.Random(seed), max(1, count // 3))
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, rapide = pg.resoudre_par_couplages(cours, salles, C21_SLOTS, profil=profil)[::2]
+            avec, objectif, stats = _run('on', cours, salles, profil)
+            sans, reference, _ = _run('off', cours, salles, profil)
+            ecart = f"{rapide['gap']:.2%}" if rapide['gap'] is not None else '-'
+            print(f"{count:>6} {seed:>6} {rapide['wall_time'] * 1000:>8.1f}ms {ecart:>7} {stats['engine']:<12} "
+                  f"{avec:>7.2f}s {objectif:>9.1f} {sans:>7.2f}s {reference:>9.1f}")
+            failures += objectif < reference - max(tolerance, 1e-6) * abs(reference)
+    print(f"Écarts: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Compare la préparation des entrées du solveur de planning (compatibilité
+cours × salles et poids de préférence) : ancienne double boucle Python
+(compatible() + échelle de poids par paire) contre matrices_affectation
+(une passe NumPy).
+
+    python tools/bench_planner_inputs.py                      # 200 cours x 20 salles
+    python tools/bench_planner_inputs.py --courses 500 --rooms 30 --repeat 20
+
+Données synthétiques (graine fixe), salle C21 avec créneaux de disponibilité.
+Code de retour 1 si les deux versions ne donnent pas les mêmes matrices.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import planning_generator as pg
+
+HORAIRES = ['8h00', '9h00', '9h30', '10h00', '10h45', '11h15', '13h15', '14h15', '15h15', '16h15']
+JOURS = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi']
+C21_SLOTS = [
+    {'jour': 'Lundi', 'heure_debut': '08:00', 'heure_fin': '12:00'},
+    {'jour': 'mardi', 'heure_debut': '13:00', 'heure_fin': '18:00'},
+    {'jour': 'jeudi', 'heure_debut': '9h00', 'heure_fin': '11h00'},
+]
+
+
+def _rooms(count, rng):
+    salles = {}
+    for k in range(count):
+        nom = 'C21' if k == 0 else f'S{k:02d}'
+        salles[nom] = {
+            'nom': nom,
+            'type': rng.choice(['chimie', 'physique', 'mixte', 'Mixte ', None]),
+            'chaises': rng.choice([16, 20, 24, 30]),
+        }
+        for field in pg.EQUIPMENT_FIELDS:
+            salles[nom][field] = rng.choice([0, 0, 1, 2, 12]) if field == 'ordinateurs' else rng.choice([0, 0, 1])
+    return salles
+
+
+def _courses(count, rng):
+    cours = []
+    for i in range(count):
+        c = {
+            'id': f'prof{i % 15}_{i}',
+            'enseignant': f'prof{i % 15}',
+            'horaire': rng.choice(HORAIRES),
+            'jour': rng.choice(JOURS),
+            'duree': rng.choice([55, 85, 110]),
+            'matiere': rng.choice(['chimie', 'physique', 'mixte']),
+            'chaises': rng.choice([12, 20, 24]),
+        }
+        for field in pg.EQUIPMENT_FIELDS:
+            c[field] = 0
+        # Un tiers de cours "théoriques", les autres avec un ou deux besoins
+        if rng.random() > 0.33:
+            for field in rng.sample(pg.EQUIPMENT_FIELDS, rng.choice([1, 2])):
+                c[field] = rng.choice([1, 2, 10]) if field == 'ordinateurs' else 1
+        cours.append(c)
+    return cours
+
+
+def _legacy(cours, salles, c21_slots):
+    """Ancienne boucle de generer_planning_excel."""
+    compatibilite = {}
+    poids_salle = {}
+    for i, c in enumerate(cours):
+        for s in salles:
+            if not pg.compatible(salles[s], c, c21_slots):
+                compatibilite[(i, s)] = False
+                poids_salle[(i, s)] = 0
+                continue
+            compatibilite[(i, s)] = True
+            has_equipment_needs = any(c[f] > 0 for f in pg.EQUIPMENT_FIELDS)
+            room_has_chemistry_equipment = (salles[s]["eviers"] > 0 or salles[s]["hotte"] > 0 or
+                                            salles[s]["becs_electriques"] > 0 or salles[s]["support_filtration"] > 0)
+            room_has_physics_equipment = (salles[s]["obscurite_totale"] > 0 or salles[s]["bancs_optiques"] > 0)
+            room_type = salles[s]["type"]
+            if c["matiere"] == "chimie":
+                if room_has_chemistry_equipment:
+                    w = 10 if has_equipment_needs else 9
+                elif room_type == "chimie":
+                    w = 8 if has_equipment_needs else 7
+                elif room_type == "mixte" and not room_has_physics_equipment:
+                    w = 6
+                elif room_has_physics_equipment or room_type == "physique":
+                    w = 2
+                else:
+                    w = 4
+            elif c["matiere"] == "physique":
+                if room_has_physics_equipment:
+                    w = 10 if has_equipment_needs else 9
+                elif room_type == "physique":
+                    w = 8 if has_equipment_needs else 7
+                elif room_type == "mixte" and not room_has_chemistry_equipment:
+                    w = 6
+                elif room_has_chemistry_equipment or room_type == "chimie":
+                    w = 2
+                else:
+                    w = 4
+            else:
+                if room_type == "mixte":
+                    w = 7
+                elif not room_has_chemistry_equipment and not room_has_physics_equipment:
+                    w = 6
+                else:
+                    w = 4
+            poids_salle[(i, s)] = w
+    return compatibilite, poids_salle
+
+
+def _best(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    salles = _rooms(args.rooms, rng)
+    cours = _courses(args.courses, rng)
+    # generer_planning_excel normalise le type des salles avant la boucle
+    salles_normalisees = {s: dict(v, type=str(v['type'] or 'mixte').strip().lower()) for s, v in salles.items()}
+
+    legacy_time, (legacy_compat, legacy_poids) = _best(
+        args.repeat, lambda: _legacy(cours, salles_normalisees, C21_SLOTS))
+    vector_time, (compatibilite, poids) = _best(
+        args.repeat, lambda: pg.matrices_affectation(cours, salles, C21_SLOTS))
+
+    noms = list(salles)
+    expected_compat = np.array([[legacy_compat[(i, s)] for s in noms] for i in range(len(cours))])
+    expected_poids = np.array([[legacy_poids[(i, s)] for s in noms] for i in range(len(cours))])
+    mismatches = int((expected_compat != compatibilite).sum() + (expected_poids != poids).sum())
+
+    print(f"{args.courses} cours x {args.rooms} salles (meilleur de {args.repeat}) | "
+          f"{int(compatibilite.sum())} paires compatibles")
+    print(f"  Double boucle Python   | {legacy_time * 1000:8.2f} ms")
+    print(f"  matrices_affectation   | {vector_time * 1000:8.2f} ms")
+    print(f"Gain: x{legacy_time / vector_time:.1f} | écarts: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
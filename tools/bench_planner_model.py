@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Compare les formulations des conflits de salle du modèle CP-SAT
+(construire_modele_affectation) :
+- "paires" : ancienne formulation, x[i,s] + x[j,s] <= 1 pour chaque couple
+  de cours qui se chevauchent et chaque salle commune ;
+- "intervalles" : un intervalle optionnel par paire cours × salle et un
+  AddNoOverlap par salle ;
+- "cliques" : un AddAtMostOne par salle et par clique maximale du graphe
+  des chevauchements (ajouter_non_chevauchement, formulation retenue).
+
+    python tools/bench_planner_model.py                          # 60 et 120 cours, 40 salles
+    python tools/bench_planner_model.py --courses 240 --rooms 80 --time-limit 120
+
+Affiche le nombre de contraintes de conflit, la taille du modèle, le temps
+de construction, le temps de résolution et l'objectif. Code de retour 1 si les objectifs optimaux diffèrent.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ortools.sat.python import cp_model
+
+import planning_generator as pg
+
+C21_SLOTS = [{'jour': 'lundi', 'heure_debut': '08:00', 'heure_fin': '12:00'}]
+HORAIRES = ['8h00', '9h00', '9h30', '10h00', '10h45', '11h15', '11h45', '12h15', '12h45',
+            '13h15', '13h45', '14h15', '14h45', '15h15', '15h45', '16h15', '16h45']
+# Équipement des salles et besoins possibles des cours, par spécialité
+SPECIALITES = {
+    'chimie': ('eviers', 'hotte', 'becs_electriques', 'support_filtration'),
+    'physique': ('bancs_optiques', 'obscurite_totale'),
+    'mixte': ('ordinateurs', 'imprimante'),
+}
+
+
+def _paires(model, cours, salles, x):
+    """Ancienne boucle de generer_planning_excel."""
+    for i in range(len(cours)):
+        for j in range(i + 1, len(cours)):
+            start1, end1 = pg.interval_cours(cours[i])
+            start2, end2 = pg.interval_cours(cours[j])
+            if not (end1 <= start2 or end2 <= start1):
+                for s in salles:
+                    if (i, s) in x and (j, s) in x:
+                        model.Add(x[(i, s)] + x[(j, s)] <= 1)
+
+
+def _instance(count, rooms, rng, teachers=40):
+    """
+    Journée synthétique réalisable : salles spécialisées (un tiers par
+    spécialité) et cours placés de sorte qu'à tout instant au plus 70 % des
+    salles de la spécialité soient occupées.
+    """
+    specialites = list(SPECIALITES)
+    salles = {}
+    for k in range(rooms):
+        nom = 'C21' if k == 0 else f'S{k:02d}'
+        specialite = specialites[k % 3]
+        salles[nom] = {'nom': nom, 'type': specialite, 'chaises': 30, 'examen': 1}
+        for field in pg.EQUIPMENT_FIELDS:
+            salles[nom].setdefault(field, 0)
+        for field in SPECIALITES[specialite]:
+            salles[nom][field] = 15 if field == 'ordinateurs' else 1
+
+    capacite = {sp: 0.7 * sum(1 for s in salles.values() if s['type'] == sp) for sp in specialites}
+    occupation = {sp: [] for sp in specialites}
+    cours = []
+    for _ in range(count * 1000):
+        if len(cours) == count:
+            break
+        specialite = rng.choice(specialites)
+        horaire = rng.choice(HORAIRES)
+        duree = rng.choice([55, 85, 110])
+        debut = pg.h_to_min(horaire)
+        simultanes = sum(1 for d, f in occupation[specialite] if d < debut + duree and debut < f)
+        if simultanes + 1 > capacite[specialite]:
+            continue
+        occupation[specialite].append((debut, debut + duree))
+        i = len(cours)
+        c = {'id': f'prof{i % teachers}_{i}', 'enseignant': f'prof{i % teachers}', 'niveau': '2nde',
+             'horaire': horaire, 'jour': 'lundi', 'duree': duree, 'matiere': specialite, 'chaises': 20}
+        for field in pg.EQUIPMENT_FIELDS:
+            c[field] = 0
+        # Un tiers de cours "théoriques", les autres avec un besoin de leur spécialité
+        if rng.random() > 0.33:
+            c[rng.choice(SPECIALITES[specialite])] = 1
+        cours.append(c)
+    if len(cours) < count:
+        raise SystemExit(f"{count} cours ne tiennent pas dans {rooms} salles (--rooms)")
+    return cours, salles
+
+
+def _intervalles(model, cours, salles, x):
+    """Variante essayée : un intervalle optionnel par paire cours × salle, un AddNoOverlap par salle."""
+    intervalles_salle = {s: [] for s in salles}
+    for (i, s), present in x.items():
+        debut, fin = pg.interval_cours(cours[i])
+        intervalles_salle[s].append(
+            model.NewOptionalFixedSizeIntervalVar(debut, fin - debut, present, f"cours_{i}_{s}"))
+    for intervalles_s in intervalles_salle.values():
+        if len(intervalles_s) > 1:
+            model.AddNoOverlap(intervalles_s)
+
+
+FORMULATIONS = {'paires': _paires, 'intervalles': _intervalles, 'cliques': pg.ajouter_non_chevauchement}
+
+
+def _run(formulation, cours, salles, time_limit, workers):
+    original = pg.ajouter_non_chevauchement
+    conflits = {}
+
+    def formulation_comptee(model, *args):
+        avant = len(model.Proto().constraints)
+        FORMULATIONS[formulation](model, *args)
+        conflits['count'] = len(model.Proto().constraints) - avant
+
+    pg.ajouter_non_chevauchement = formulation_comptee
+    try:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            model, _ = pg.construire_modele_affectation(cours, salles, C21_SLOTS)
+        build = time.perf_counter() - started
+    finally:
+        pg.ajouter_non_chevauchement = original
+
+    proto = model.Proto()
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = workers
+    solver.parameters.random_seed = 0
+    status = solver.Solve(model)
+    return {
+        'conflicts': conflits['count'],
+        'constraints': len(proto.constraints),
+        'variables': len(proto.variables),
+        'build': build,
+        'solve': solver.WallTime(),
+        'status': solver.StatusName(status),
+        'objective': solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, nargs='+', default=[60, 120])
+    parser.add_argument('--rooms', type=int, default=40)
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    mismatches = 0
+    print(f"{args.rooms} salles | limite {args.time_limit:.0f}s | {args.workers} workers")
+    print(f"{'cours':>6} {'formulation':<12} {'conflits':>8} {'contraintes':>11} {'variables':>9} "
+          f"{'construction':>12} {'résolution':>10} {'statut':>9} {'objectif':>9}")
+    for count in args.courses:
+        cours, salles = _instance(count, args.rooms, random.Random(args.seed))
+        results = {name: _run(name, cours, salles, args.time_limit, args.workers) for name in FORMULATIONS}
+        for name, r in results.items():
+            objective = f"{r['objective']:.1f}" if r['objective'] is not None else '-'
+            print(f"{count:>6} {name:<12} {r['conflicts']:>8} {r['constraints']:>11} {r['variables']:>9} "
+                  f"{r['build'] * 1000:>10.0f}ms {r['solve']:>9.2f}s {r['status']:>9} {objective:>9}")
+        if all(r['status'] == 'OPTIMAL' for r in results.values()):
+            objectives = {round(r['objective'], 3) for r in results.values()}
+            mismatches += len(objectives) > 1
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compare les deux formulations de la préférence "même enseignant, même salle"
+du modèle CP-SAT (construire_modele_affectation, paramètre stabilite) :
+- "paires" : un booléen par couple de cours d'un enseignant et par salle ;
+- "salles" : un booléen par enseignant et par salle, nombre de salles
+  distinctes pénalisé (PLANNING_TEACHER_STABILITY par défaut).
+
+    python tools/bench_planner_stability.py                       # 60 et 120 cours, 40 salles
+    python tools/bench_planner_stability.py --courses 240 --rooms 80 --teachers 30
+
+Affiche la taille du modèle, le temps de résolution, et pour la solution
+trouvée : le score de spécialisation des salles, le nombre total de salles
+distinctes par enseignant et le nombre de couples de cours d'un même
+enseignant dans la même salle. Journées synthétiques de bench_planner_model.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ortools.sat.python import cp_model
+
+import planning_generator as pg
+from bench_planner_model import C21_SLOTS, _instance
+
+FORMULATIONS = ('paires', 'salles')
+
+
+def _stabilite(cours, affectation):
+    """(salles distinctes cumulées par enseignant, couples de cours d'un enseignant dans la même salle)."""
+    salles_par_enseignant = {}
+    for i, s in affectation.items():
+        salles_par_enseignant.setdefault(cours[i]['enseignant'], []).append(s)
+    distinctes = sum(len(set(s)) for s in salles_par_enseignant.values())
+    couples = sum(n * (n - 1) // 2
+                  for s in salles_par_enseignant.values() for n in (s.count(nom) for nom in set(s)))
+    return distinctes, couples
+
+
+def _run(stabilite, cours, salles, time_limit, workers):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model, x = pg.construire_modele_affectation(cours, salles, C21_SLOTS, stabilite=stabilite)
+    build = time.perf_counter() - started
+
+    proto = model.Proto()
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = workers
+    solver.parameters.random_seed = 0
+    status = solver.Solve(model)
+    result = {
+        'constraints': len(proto.constraints),
+        'variables': len(proto.variables),
+        'build': build,
+        'solve': solver.WallTime(),
+        'status': solver.StatusName(status),
+        'score': None, 'distinctes': None, 'couples': None,
+    }
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        affectation = {i: s for (i, s), var in x.items() if solver.Value(var)}
+        _, poids = pg.matrices_affectation(cours, salles, C21_SLOTS)
+        noms = list(salles)
+        result['score'] = sum(int(poids[i, noms.index(s)]) for i, s in affectation.items())
+        result['distinctes'], result['couples'] = _stabilite(cours, affectation)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, nargs='+', default=[60, 120])
+    parser.add_argument('--rooms', type=int, default=40)
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--teachers', type=int, help="nombre d'enseignants (défaut : un pour 5 cours)")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{args.rooms} salles | {f'{args.teachers} enseignants' if args.teachers else 'un enseignant pour 5 cours'} | limite {args.time_limit:.0f}s | {args.workers} workers")
+    print(f"{'cours':>6} {'stabilité':<9} {'contraintes':>11} {'variables':>9} {'construction':>12} "
+          f"{'résolution':>10} {'statut':>9} {'score':>6} {'salles/ens.':>11} {'couples':>8}")
+    for count in args.courses:
+        teachers = args.teachers or max(1, count // 5)
+        cours, salles = _instance(count, args.rooms, random.Random(args.seed), teachers)
+        for stabilite in FORMULATIONS:
+            r = _run(stabilite, cours, salles, args.time_limit, args.workers)
+            print(f"{count:>6} {stabilite:<9} {r['constraints']:>11} {r['variables']:>9} {r['build'] * 1000:>10.0f}ms "
+                  f"{r['solve']:>9.2f}s {r['status']:>9} {r['score'] if r['score'] is not None else '-':>6} "
+                  f"{r['distinctes'] if r['distinctes'] is not None else '-':>11} "
+                  f"{r['couples'] if r['couples'] is not None else '-':>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
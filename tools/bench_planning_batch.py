@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Mesure le planning d'une période (generer_plannings_periode) : jours résolus
+l'un après l'autre (--workers 1) puis en parallèle dans des processus.
+La période compte un jour sans demande, qui doit être signalé en échec sans
+interrompre les autres.
+
+    python tools/bench_planning_batch.py                      # SQLite temporaire, 5 jours
+    DATABASE_URL=... python tools/bench_planning_batch.py     # base de test : ajoute des demandes
+    python tools/bench_planning_batch.py --days 10 --teachers 6 --workers 4
+
+Cache de solutions désactivé pour mesurer l'optimiseur. Code de retour 1 si
+les deux exécutions ne planifient pas les mêmes jours.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PLANNING_SOLUTION_CACHE', 'off')
+
+from bench_solution_cache import HORAIRES, MATERIELS
+
+
+def _setup_database(args, rng, jours):
+    import database
+    if not os.getenv('DATABASE_URL'):
+        tmpdir = tempfile.mkdtemp(prefix='bench_planning_batch_')
+        database.DATABASE_PATH = os.path.join(tmpdir, 'material_requests.db')
+    database.init_database()
+
+    rows = []
+    for k in range(args.rooms):
+        nom = 'C21' if k == 0 else f'C{22 + k}'
+        equipement = [str(rng.choice([0, 1, 1])) for _ in range(8)]
+        rows.append(','.join([nom, rng.choice(['chimie', 'physique', 'mixte']), str(rng.choice([0, 15])),
+                              str(rng.choice([20, 24])), *equipement]))
+    database.import_rooms_from_csv_content('\n'.join(rows))
+
+    teachers = [database.add_teacher(f'Bench batch {t} {time.time_ns()}') for t in range(args.teachers)]
+    for jour in jours[:-1]:  # dernier jour sans demande
+        for teacher_id in teachers:
+            for _ in range(2):
+                database.add_material_request(
+                    teacher_id=teacher_id, request_date=jour, horaire=rng.choice(HORAIRES),
+                    class_name=rng.choice(['2nde', '1ère Spécialité']), material_description='bécher titrage',
+                    selected_materials=rng.choice(MATERIELS))
+    return database
+
+
+def _run(pg, jours, workers):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultats, classeur = pg.generer_plannings_periode(jours[0], jours[-1], workers=workers)
+    return time.perf_counter() - started, resultats, classeur
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=5, help='jours ouvrés de la période (dont un sans demande)')
+    parser.add_argument('--rooms', type=int, default=16)
+    parser.add_argument('--teachers', type=int, default=4, help='enseignants par jour (deux demandes chacun)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--start', default='2030-04-01')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    debut = datetime.strptime(args.start, '%Y-%m-%d')
+    jours = []
+    while len(jours) < args.days:
+        if debut.weekday() < 5:
+            jours.append(debut.strftime('%Y-%m-%d'))
+        debut += timedelta(days=1)
+
+    _setup_database(args, random.Random(args.seed), jours)
+    import planning_generator as pg
+
+    sequentiel, resultats_seq, _ = _run(pg, jours, 1)
+    parallele, resultats_par, classeur = _run(pg, jours, args.workers)
+
+    def resume(resultats):
+        return [(r['date'], r['success']) for r in resultats]
+
+    print(f"{len(jours)} jours ({args.teachers * 2} demandes par jour, dernier jour sans demande) | "
+          f"{os.cpu_count()} cœur(s)")
+    print(f"  un jour après l'autre   : {sequentiel:8.2f} s")
+    print(f"  {args.workers} processus{' ' * (13 - len(str(args.workers)))}: {parallele:8.2f} s")
+    for r in resultats_par:
+        etat = f"{r['status']}, {len(r['unassigned'])} non placé(s)" if r['success'] else f"échec : {r['error']}"
+        print(f"    {r['date']} {etat}")
+    print(f"  classeur : {classeur.sheetnames if classeur is not None else None}")
+    differences = resume(resultats_seq) != resume(resultats_par)
+    print(f"Écarts: {int(differences)}")
+    return 1 if differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
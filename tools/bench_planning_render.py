@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Mesure le rendu Excel d'un planning (generer_excel_optimise) :
+- "ancien" : objets Font/Alignment/Border/PatternFill créés pour chaque
+  cellule, classeur enregistré dans planning_<date>.xlsx puis relu et
+  supprimé par la route ;
+- "actuel" : grille calculée une fois pour les deux feuilles
+  (GrillePlanning), styles nommés enregistrés une fois par classeur
+  (styles_planning), classeur écrit dans un io.BytesIO.
+
+    python tools/bench_planning_render.py                     # 30 et 120 cours, 40 salles
+    python tools/bench_planning_render.py --courses 240 --rooms 80 --repeat 10
+
+Affiche le temps moyen, le nombre d'objets de style créés et le pic
+d'allocation (tracemalloc) de chaque rendu. L'ancien rendu reproduit ici ses
+matrices de cellules sous une forme réduite (une par feuille) : son pic
+mémoire réel était plus élevé.
+Code de retour 1 si les deux classeurs diffèrent (valeurs, fusions ou mise en forme).
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Chaque itération mesure un rendu complet, pas le cache des classeurs
+os.environ['PLANNING_ARTIFACT_CACHE'] = 'off'
+
+import openpyxl
+
+import planning_generator as pg
+from bench_planner_model import _instance
+
+HORAIRES = ["9h00", "9h30", "10h00", "10h45", "11h15", "11h45", "12h15", "12h45", "13h15", "13h45",
+            "14h15", "14h45", "15h15", "15h45", "16h15", "16h45", "17h15", "17h45", "18h15"]
+# Noms réels des premières salles : en-têtes Physique / Chimie fusionnés
+NOMS_SALLES = ["C23", "C25", "C27", "C22", "C24", "C32", "C33", "C31", "C21"]
+
+
+def _contenu_techniciens(c):
+    """Enseignant, niveau, équipements de salle demandés et titre du TP."""
+    besoins = pg.extract_material_needs(c.get('selected_materials', ''))
+    libelles = [libelle for champ, libelle in (
+        ('eviers', "Éviers"), ('hotte', "Hotte"), ('bancs_optiques', "Bancs optiques"),
+        ('obscurite_totale', "Obscurité totale"), ('becs_electriques', "Becs électriques"),
+        ('support_filtration', "Support de filtration"), ('imprimante', "Imprimante")) if besoins.get(champ, 0) > 0]
+    if (c.get('request_name') or '').strip():
+        libelles.append(c['request_name'].strip())
+    contenu = f"{c.get('enseignant', '')}\n{c.get('niveau', '')}"
+    return contenu + "\n" + ", ".join(libelles) if libelles else contenu
+
+
+def _grille(cours, salle_list, affectation, contenu):
+    """Ancienne matrice d'une feuille : contenu et fusion de la première case de chaque cours."""
+    horaires = [pg.h_to_min(h) for h in HORAIRES]
+    matrice = [[{"content": "", "merge_len": 1, "matiere": ""} for _ in salle_list] for _ in horaires]
+    for i, c in enumerate(cours):
+        salle = affectation.get(i)
+        if not salle:
+            continue
+        debut = pg.h_to_min(c['horaire'])
+        idx_start, idx_end = 0, 1
+        for idx, h in enumerate(horaires):
+            if h <= debut:
+                idx_start = idx
+            if h >= debut + c['duree'] and idx_end == 1:
+                idx_end = idx
+                break
+        else:
+            idx_end = len(horaires)
+        idx_end = max(idx_end, idx_start + 1)
+        case = matrice[idx_start][salle_list.index(salle)]
+        case.update(content=contenu(c), matiere=c['matiere'])
+        if idx_end - idx_start > 1:
+            case["merge_len"] = idx_end - idx_start
+    return matrice
+
+
+def _ancien_rendu(cours, salles, affectation, unassigned, date_str, dossier):
+    """Ancien rendu : mise en forme cellule par cellule et fichier temporaire."""
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    wb = openpyxl.Workbook()
+    salle_list = [s for s in NOMS_SALLES if s in salles] + sorted(s for s in salles if s not in NOMS_SALLES)
+    border = Border(left=Side(style='thick'), right=Side(style='thick'),
+                    top=Side(style='thick'), bottom=Side(style='thick'))
+    date = time.strftime('%d/%m', time.strptime(date_str, '%Y-%m-%d'))
+    feuilles = (
+        ("Planning_Techniciens", _contenu_techniciens, True),
+        ("Affichage", lambda c: f"{c.get('enseignant', '')}\n{c.get('niveau', '')}", False),
+    )
+    for numero, (titre, contenu, couleurs) in enumerate(feuilles):
+        ws = wb.active if numero == 0 else wb.create_sheet()
+        ws.title = titre
+        ws.cell(row=1, column=1, value="Planning").alignment = Alignment(horizontal="center", vertical="center")
+        ws.column_dimensions['A'].width = 12
+        for libelle, groupe in (("Physique", NOMS_SALLES[:5]), ("Chimie", NOMS_SALLES[5:8])):
+            cols = [2 + salle_list.index(s) for s in groupe if s in salle_list]
+            if len(cols) > 1:
+                ws.merge_cells(start_row=1, start_column=cols[0], end_row=1, end_column=cols[-1])
+            for col in range(cols[0], cols[-1] + 1) if cols else ():
+                cell = ws.cell(row=1, column=col, value=libelle if col == cols[0] else None)
+                cell.font = Font(bold=True, size=36)
+                cell.alignment = Alignment(horizontal="center", vertical="center")
+                cell.border = border
+        for idx_s, s in enumerate(salle_list):
+            cell = ws.cell(row=2, column=2 + idx_s, value=s)
+            ws.column_dimensions[cell.column_letter].width = 20
+            cell.font = Font(bold=True, size=36)
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+            cell.border = border
+        cell = ws.cell(row=2, column=1, value=date)
+        cell.font = Font(bold=True, size=16)
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.border = border
+
+        matrice = _grille(cours, salle_list, affectation, contenu)
+        merged_ranges = set()
+        for idx_h in range(len(HORAIRES)):
+            for idx_s in range(len(salle_list)):
+                case = matrice[idx_h][idx_s]
+                if case["content"] and case["merge_len"] > 1:
+                    fin = min(3 + idx_h + case["merge_len"] - 1, 2 + len(HORAIRES))
+                    ws.merge_cells(start_row=3 + idx_h, start_column=2 + idx_s, end_row=fin, end_column=2 + idx_s)
+                    merged_ranges.add((3 + idx_h, 2 + idx_s, fin))
+        for idx_h, horaire in enumerate(HORAIRES):
+            cell = ws.cell(row=3 + idx_h, column=1, value=horaire)
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+            cell.border = border
+            for idx_s in range(len(salle_list)):
+                row, col = 3 + idx_h, 2 + idx_s
+                secondaire = any(c == col and r < row <= fin for r, c, fin in merged_ranges)
+                ws.cell(row=row, column=col).border = border
+                if secondaire:
+                    continue
+                case = matrice[idx_h][idx_s]
+                cell = ws.cell(row=row, column=col, value=case["content"])
+                cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+                if case["content"]:
+                    couleur = pg.PLANNING_FILL_COURS
+                    if couleurs and "chimie" in case["matiere"]:
+                        couleur = pg.PLANNING_FILL_CHIMIE
+                    elif couleurs and "physique" in case["matiere"]:
+                        couleur = pg.PLANNING_FILL_PHYSIQUE
+                    cell.fill = PatternFill(start_color=couleur, end_color=couleur, fill_type="solid")
+        for idx_h in range(len(HORAIRES)):
+            ws.row_dimensions[3 + idx_h].height = 20
+
+    ws = wb.worksheets[0]
+    if unassigned:
+        ws.cell(row=4 + len(HORAIRES), column=1, value="COURS NON ASSIGNÉS").font = \
+            Font(bold=True, color='FF0000', size=14)
+        for i, texte in enumerate(unassigned):
+            ws.cell(row=5 + len(HORAIRES) + i, column=1, value=texte).font = Font(color='FF0000')
+
+    # Ancienne route : fichier dans le répertoire courant, relu puis supprimé
+    filename = os.path.join(dossier, f"planning_{time.strftime('%Y%m%d_%H%M')}.xlsx")
+    wb.save(filename)
+    with open(filename, 'rb') as f:
+        contenu = f.read()
+    os.remove(filename)
+    return contenu
+
+
+def _rendu_actuel(cours, salles, affectation, unassigned, date_str):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok, buffer = pg.generer_excel_optimise(cours, salles, affectation, unassigned, date_str)
+    if not ok:
+        raise SystemExit(buffer)
+    return buffer.getvalue()
+
+
+@contextlib.contextmanager
+def _compter_styles():
+    """Compte les objets Font/Alignment/Border/Side/PatternFill instanciés."""
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+    compteur = [0]
+    originaux = {}
+    for cls in (Alignment, Border, Font, PatternFill, Side):
+        originaux[cls] = cls.__init__
+
+        def init(self, *args, _init=cls.__init__, **kwargs):
+            compteur[0] += 1
+            _init(self, *args, **kwargs)
+        cls.__init__ = init
+    try:
+        yield compteur
+    finally:
+        for cls, init in originaux.items():
+            cls.__init__ = init
+
+
+def _mesurer(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        contenu = fn()
+    duree = (time.perf_counter() - started) / repeat
+    with _compter_styles() as compteur:
+        fn()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    pic = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duree, compteur[0], pic, contenu
+
+
+def _ecarts(ancien, actuel):
+    """Cellules dont la valeur ou la mise en forme diffère, fusions différentes."""
+    wb1, wb2 = openpyxl.load_workbook(io.BytesIO(ancien)), openpyxl.load_workbook(io.BytesIO(actuel))
+    ecarts = int(wb1.sheetnames != wb2.sheetnames)
+    for ws1, ws2 in zip(wb1.worksheets, wb2.worksheets):
+        ecarts += {str(r) for r in ws1.merged_cells.ranges} != {str(r) for r in ws2.merged_cells.ranges}
+        for row in range(1, max(ws1.max_row, ws2.max_row) + 1):
+            for col in range(1, max(ws1.max_column, ws2.max_column) + 1):
+                a, b = ws1.cell(row, col), ws2.cell(row, col)
+                ecarts += any(repr(getattr(a, attr)) != repr(getattr(b, attr))
+                              for attr in ('value', 'font', 'fill', 'border', 'alignment'))
+    return ecarts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, nargs='+', default=[30, 120])
+    parser.add_argument('--rooms', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    dossier = tempfile.mkdtemp(prefix='bench_planning_render_')
+    failures = 0
+    print(f"{args.rooms} salles | {args.repeat} rendus par mesure")
+    print(f"{'cours':>6} {'rendu':<8} {'temps':>10} {'styles':>7} {'pic mémoire':>12} {'taille':>9}")
+    for count in args.courses:
+        cours, salles = _instance(count, args.rooms, random.Random(args.seed), max(1, count // 5))
+        noms = dict(zip([s for s in salles if s != 'C21'], [n for n in NOMS_SALLES if n != 'C21']))
+        salles = {noms.get(s, s): dict(salle, nom=noms.get(s, s)) for s, salle in salles.items()}
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, affectation, _ = pg.resoudre_affectation(cours, salles, profil='interactif')
+        unassigned = [f"{c['enseignant']} - {c['niveau']} à {c['horaire']}"
+                      for i, c in enumerate(cours) if i not in affectation]
+        date_str = '2030-03-04'
+
+        resultats = {
+            'ancien': _mesurer(lambda: _ancien_rendu(cours, salles, affectation, unassigned, date_str, dossier),
+                               args.repeat),
+            'actuel': _mesurer(lambda: _rendu_actuel(cours, salles, affectation, unassigned, date_str), args.repeat),
+        }
+        for nom, (duree, styles, pic, contenu) in resultats.items():
+            print(f"{count:>6} {nom:<8} {duree * 1000:>8.1f}ms {styles:>7} {pic / 1024:>9.0f} Ko "
+                  f"{len(contenu) / 1024:>6.1f} Ko")
+        failures += _ecarts(resultats['ancien'][3], resultats['actuel'][3])
+    os.rmdir(dossier)
+    print(f"Écarts: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
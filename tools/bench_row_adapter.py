@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Mesure le coût de la conversion ligne -> dict des demandes de matériel :
+ancienne conversion ad hoc (tests isinstance/hasattr par ligne, mapping manuel
+des 21 colonnes) contre l'adaptateur compilé de database.py.
+
+    python tools/bench_row_adapter.py                 # 10 000 lignes, base configurée
+    python tools/bench_row_adapter.py --rows 50000 --repeat 10
+
+Les lignes sont générées par la requête elle-même (CTE récursive sur SQLite,
+generate_series sur PostgreSQL) : aucune donnée n'est écrite en base.
+Le fetchall() est fait une fois ; on chronomètre la conversion seule, puis
+conversion + sérialisation JSON par Flask (ce que fait GET /api/requests).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2.extensions
+from flask import Flask
+
+import database
+
+SQLITE_QUERY = '''
+    WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+    SELECT n AS id, 1 AS teacher_id, date('2025-09-01', '+' || (n % 60) || ' days') AS request_date,
+           '9h00' AS horaire, '2nde' AS class_name, 'Matériel ' || n AS material_description,
+           1 AS quantity, NULL AS selected_materials, n % 3 AS computers_needed, '' AS notes,
+           n % 2 AS prepared, 0 AS modified, NULL AS group_count, '' AS material_prof,
+           'TP ' || n AS request_name, NULL AS room_type, NULL AS image_url, 0 AS exam,
+           datetime('now') AS created_at, 'Enseignant' AS teacher_name, NULL AS custom_duration
+    FROM seq
+'''
+
+POSTGRESQL_QUERY = '''
+    SELECT n AS id, 1 AS teacher_id, DATE '2025-09-01' + (n %% 60) AS request_date,
+           '9h00' AS horaire, '2nde' AS class_name, 'Matériel ' || n AS material_description,
+           1 AS quantity, NULL::text AS selected_materials, n %% 3 AS computers_needed, '' AS notes,
+           (n %% 2 = 0) AS prepared, FALSE AS modified, NULL::integer AS group_count, '' AS material_prof,
+           'TP ' || n AS request_name, NULL::text AS room_type, NULL::text AS image_url, FALSE AS exam,
+           LOCALTIMESTAMP AS created_at, 'Enseignant' AS teacher_name, NULL::integer AS custom_duration
+    FROM generate_series(1, %s) AS n
+'''
+
+
+def legacy_to_dict(req):
+    """Copie de l'ancienne conversion (app.api_get_requests / to_dict_request)."""
+    if isinstance(req, dict):
+        return req
+    elif hasattr(req, '_fields'):
+        return req._asdict()
+    elif hasattr(req, 'keys'):
+        return dict(req)
+    return {
+        'id': req[0],
+        'teacher_id': req[1],
+        'request_date': req[2],
+        'horaire': req[3],
+        'class_name': req[4],
+        'material_description': req[5],
+        'quantity': req[6],
+        'selected_materials': req[7] if req[7] else '',
+        'computers_needed': req[8] if req[8] else 0,
+        'notes': req[9],
+        'prepared': req[10] if req[10] else False,
+        'modified': req[11] if req[11] else False,
+        'group_count': int(req[12]) if len(req) > 12 and req[12] is not None else 1,
+        'material_prof': req[13] if len(req) > 13 else '',
+        'request_name': req[14] if len(req) > 14 else '',
+        'room_type': req[15] if len(req) > 15 and req[15] else 'Mixte',
+        'image_url': req[16] if len(req) > 16 else None,
+        'exam': req[17] if len(req) > 17 else False,
+        'created_at': req[18] if len(req) > 18 else None,
+        'teacher_name': req[19] if len(req) > 19 else '',
+        'custom_duration': req[20] if len(req) > 20 else None
+    }
+
+
+def _best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with database.db_connection() as (conn, db_type):
+        query = POSTGRESQL_QUERY if db_type == 'postgresql' else SQLITE_QUERY
+        cursor = conn.cursor()
+        cursor.execute(query, (args.rows,))
+        rows = cursor.fetchall()
+        description = cursor.description
+        legacy_rows = rows
+        if db_type == 'postgresql':
+            # L'ancien code recevait des objets date/datetime (décodage psycopg2 par défaut)
+            legacy_cursor = conn.cursor()
+            for caster in (psycopg2.extensions.PYDATE, psycopg2.extensions.PYTIME,
+                           psycopg2.extensions.PYDATETIME, psycopg2.extensions.PYDATETIMETZ):
+                psycopg2.extensions.register_type(caster, legacy_cursor)
+            legacy_cursor.execute(query, (args.rows,))
+            legacy_rows = legacy_cursor.fetchall()
+
+    def legacy():
+        return [legacy_to_dict(row) for row in legacy_rows]
+
+    def adapted():
+        return database.get_row_adapter(description).adapt_all(rows)
+
+    flask_app = Flask(__name__)
+    with flask_app.app_context():
+        timings = {
+            'legacy': _best_of(args.repeat, legacy),
+            'adapted': _best_of(args.repeat, adapted),
+            'legacy_json': _best_of(args.repeat, lambda: flask_app.json.dumps(legacy())),
+            'adapted_json': _best_of(args.repeat, lambda: flask_app.json.dumps(adapted())),
+        }
+
+    sample = database.get_row_adapter(description)(rows[0])
+    print(f"Backend: {db_type} | {len(rows)} lignes x {len(description)} colonnes (meilleur de {args.repeat})")
+    print(f"{'':22}{'conversion':>12}{'+ JSON':>12}")
+    print(f"{'Conversion ad hoc':22}{timings['legacy'] * 1000:10.1f}ms{timings['legacy_json'] * 1000:10.1f}ms")
+    print(f"{'Adaptateur compilé':22}{timings['adapted'] * 1000:10.1f}ms{timings['adapted_json'] * 1000:10.1f}ms")
+    print(f"Gain: x{timings['legacy'] / timings['adapted']:.1f} (conversion), "
+          f"x{timings['legacy_json'] / timings['adapted_json']:.1f} (conversion + JSON)")
+    print(f"Exemple: prepared={sample['prepared']!r} request_date={sample['request_date']!r} "
+          f"created_at={sample['created_at']!r} room_type={sample['room_type']!r}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
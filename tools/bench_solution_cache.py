@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Mesure le cache des solutions du planning (planning_generator.SolutionCache) :
+première génération (optimiseur), deuxième génération (copie en mémoire),
+génération depuis la table planning_solutions seule (autre worker), puis
+génération après modification d'une demande (nouvelle empreinte, optimiseur).
+
+    python tools/bench_solution_cache.py                   # SQLite temporaire
+    DATABASE_URL=... python tools/bench_solution_cache.py  # base de test : ajoute des demandes
+    python tools/bench_solution_cache.py --teachers 20 --date 2030-03-05
+
+Code de retour 1 si une solution réutilisée diffère de celle de l'optimiseur
+ou si la modification d'une demande ne relance pas l'optimiseur.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HORAIRES = ['8h00', '9h00', '10h00', '11h15', '13h15', '14h15', '15h15', '16h15']
+MATERIELS = ['', '- Éviers', '- Hotte\n- Éviers', '- Bancs optiques', '- Imprimante', '- Obscurité totale']
+
+
+def _setup_database(args, rng):
+    import database
+    if not os.getenv('DATABASE_URL'):
+        tmpdir = tempfile.mkdtemp(prefix='bench_solution_cache_')
+        database.DATABASE_PATH = os.path.join(tmpdir, 'material_requests.db')
+    database.init_database()
+
+    rows = []
+    for k in range(args.rooms):
+        nom = 'C21' if k == 0 else f'C{22 + k}'
+        equipement = [str(rng.choice([0, 1, 1])) for _ in range(8)]
+        rows.append(','.join([nom, rng.choice(['chimie', 'physique', 'mixte']), str(rng.choice([0, 15])),
+                              str(rng.choice([20, 24])), *equipement]))
+    database.import_rooms_from_csv_content('\n'.join(rows))
+    database.add_c21_availability('lundi', '08:00', '12:00')
+
+    demandes = []
+    for t in range(args.teachers):
+        teacher_id = database.add_teacher(f'Bench cache {t} {time.time_ns()}')
+        for _ in range(2):
+            champs = {'teacher_id': teacher_id, 'request_date': args.date, 'horaire': rng.choice(HORAIRES),
+                      'class_name': rng.choice(['2nde', '1ère Spécialité']),
+                      'material_description': 'bécher titrage', 'selected_materials': rng.choice(MATERIELS)}
+            demandes.append((database.add_material_request(**champs), champs))
+    return database, demandes
+
+
+def _generer(pg, date):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok, data = pg.generer_planning_excel(date, return_data_only=True)
+    if not ok:
+        raise SystemExit(f"Génération impossible : {data}")
+    return time.perf_counter() - started, data['room_assignments']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=16)
+    parser.add_argument('--teachers', type=int, default=8)
+    parser.add_argument('--date', default='2030-03-04')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    database, demandes = _setup_database(args, rng)
+    import planning_generator as pg
+
+    cache = pg.get_solution_cache()
+    cache.clear()
+    failures = 0
+
+    solve_time, reference = _generer(pg, args.date)
+    memory_time, memoire = _generer(pg, args.date)
+    cache._entries.clear()  # autre worker : seule la table est partagée
+    table_time, table = _generer(pg, args.date)
+    failures += (memoire != reference) + (cache.backend == 'database' and table != reference)
+
+    request_id, champs = demandes[0]
+    champs = dict(champs, horaire=next(h for h in HORAIRES if h != champs['horaire']))
+    database.update_material_request(request_id, **champs)
+    misses = cache.stats()['misses']
+    modified_time, _ = _generer(pg, args.date)
+    failures += cache.stats()['misses'] != misses + 1
+
+    print(f"{len(demandes)} demandes | {args.rooms} salles | backend {cache.backend}")
+    print(f"  optimiseur                 : {solve_time * 1000:8.1f} ms")
+    print(f"  cache en mémoire           : {memory_time * 1000:8.1f} ms")
+    print(f"  table planning_solutions   : {table_time * 1000:8.1f} ms")
+    print(f"  après modification         : {modified_time * 1000:8.1f} ms (nouvelle empreinte)")
+    print(f"  statistiques : {cache.stats()}")
+    print(f"Écarts: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
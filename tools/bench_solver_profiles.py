@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Compare les profils de l'optimiseur (planning_generator.SOLVER_PROFILES) et
+l'ancien réglage (60 s, paramètres par défaut) sur les journées synthétiques
+de bench_planner_model : limite de temps appliquée, temps de résolution,
+statut, objectif, borne, écart et branches (statistiques_resolution).
+
+    python tools/bench_solver_profiles.py                     # 16, 60 et 120 cours, 40 salles
+    python tools/bench_solver_profiles.py --courses 240 --rooms 80 --profiles interactif equilibre
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ortools.sat.python import cp_model
+
+import planning_generator as pg
+from bench_planner_model import C21_SLOTS, _instance
+
+
+def _run(profil, cours, salles):
+    with contextlib.redirect_stdout(io.StringIO()):
+        model, _ = pg.construire_modele_affectation(cours, salles, C21_SLOTS)
+    solver = cp_model.CpSolver()
+    if profil == 'historique':
+        solver.parameters.max_time_in_seconds = 60
+        temps = 60
+    else:
+        profil, temps = pg.parametrer_solveur(solver, len(cours), profil)
+    status = solver.Solve(model)
+    return pg.statistiques_resolution(solver, status, model, profil, temps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, nargs='+', default=[16, 60, 120])
+    parser.add_argument('--rooms', type=int, default=40)
+    parser.add_argument('--profiles', nargs='+', default=['historique'] + list(pg.SOLVER_PROFILES))
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{args.rooms} salles | {os.cpu_count()} cœur(s)")
+    print(f"{'cours':>6} {'profil':<11} {'limite':>7} {'résolution':>10} {'statut':>9} {'objectif':>9} "
+          f"{'borne':>9} {'écart':>8} {'branches':>9}")
+    for count in args.courses:
+        cours, salles = _instance(count, args.rooms, random.Random(args.seed), max(1, count // 5))
+        for profil in args.profiles:
+            r = _run(profil, cours, salles)
+            objectif = f"{r['objective']:.1f}" if r['objective'] is not None else '-'
+            borne = f"{r['best_bound']:.1f}" if r['best_bound'] is not None else '-'
+            ecart = f"{r['gap']:.2%}" if r['gap'] is not None else '-'
+            print(f"{count:>6} {profil:<11} {r['time_limit']:>6.1f}s {r['wall_time']:>9.2f}s {r['status']:>9} "
+                  f"{objectif:>9} {borne:>9} {ecart:>8} {r['branches']:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
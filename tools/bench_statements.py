@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Mesure les lectures fréquentes exécutées via le registre de requêtes :
+requête texte (DB_PREPARED_STATEMENTS=0) contre requête préparée côté serveur
+(PREPARE une fois par connexion, puis EXECUTE).
+
+    DATABASE_URL=... python tools/bench_statements.py
+    DATABASE_URL=... python tools/bench_statements.py --calls 5000 --rows 40
+
+Sur SQLite il n'y a qu'un mode (texte constant, cache de requêtes de sqlite3) :
+le script affiche alors seulement les temps de référence.
+Les demandes de test sont supprimées à la fin.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEACHER_NAME = 'Registre de requêtes (test)'
+PLANNING_DATE = '2030-03-04'
+
+
+def _setup_database():
+    import database
+    if not os.getenv('DATABASE_URL'):
+        tmpdir = tempfile.mkdtemp(prefix='bench_statements_')
+        database.DATABASE_PATH = os.path.join(tmpdir, 'material_requests.db')
+    database.init_database()
+    return database
+
+
+def _teacher_id(database):
+    for teacher in database.get_all_teachers():
+        if teacher['name'] == TEACHER_NAME:
+            return teacher['id']
+    return database.add_teacher(TEACHER_NAME)
+
+
+def _measure(calls, fn):
+    """(temps réel, temps CPU du processus) pour `calls` appels."""
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(calls):
+        fn()
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=30, help="demandes sur la date du planning")
+    args = parser.parse_args()
+
+    database = _setup_database()
+    teacher_id = _teacher_id(database)
+    request_ids = database.add_material_requests_bulk(
+        teacher_id, [(PLANNING_DATE, f'{8 + i % 9}h00') for i in range(args.rows)],
+        '2nde', 'béchers, burettes')
+
+    reads = [
+        ('get_material_request_by_id', lambda: database.get_material_request_by_id(request_ids[0])),
+        ('get_planning_data', lambda: database.get_planning_data(PLANNING_DATE)),
+        ('get_grouped_requests_by_name', lambda: database.get_grouped_requests_by_name(teacher_id, 'TP')),
+        ('get_tp_templates', lambda: database.get_tp_templates(teacher_id, '2nde')),
+    ]
+    modes = [('texte', False), ('préparée', True)]
+    results = {}
+    try:
+        with database.db_connection() as (_, db_type):
+            pass
+        if db_type != 'postgresql':
+            modes = modes[:1]
+        for label, prepared in modes:
+            database.DB_PREPARED_STATEMENTS = prepared
+            for name, fn in reads:
+                fn()  # préchauffage : connexion du pool et PREPARE
+                results[(name, label)] = _measure(args.calls, fn)
+    finally:
+        database.DB_PREPARED_STATEMENTS = True
+        with database.db_connection() as (conn, db_type):
+            placeholder = '%s' if db_type == 'postgresql' else '?'
+            cursor = conn.cursor()
+            cursor.execute(f'DELETE FROM material_requests WHERE teacher_id = {placeholder}', (teacher_id,))
+            conn.commit()
+        # Via database.py : incrémente la version du cache de référence des enseignants
+        database.delete_teacher(teacher_id)
+
+    print(f"Backend: {db_type} | {args.calls} appels par lecture | {args.rows} demandes sur {PLANNING_DATE}")
+    print(f"{'':28}" + ''.join(f"{label:>24}" for label, _ in modes))
+    for name, _ in reads:
+        cells = ''
+        for label, _ in modes:
+            wall, cpu = results[(name, label)]
+            cells += f"{wall / args.calls * 1e6:11.0f}µs ({cpu / args.calls * 1e6:5.0f} CPU)"
+        print(f"{name:28}{cells}")
+    if len(modes) == 2:
+        total = {label: sum(results[(name, label)][0] for name, _ in reads) for label, _ in modes}
+        print(f"Gain (temps réel cumulé): x{total['texte'] / total['préparée']:.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
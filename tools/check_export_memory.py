@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Vérifie que l'export CSV en flux (/export/csv) garde une mémoire constante :
+le pic d'allocation (tracemalloc) pour 100 000 demandes doit rester du même
+ordre que pour 10 000, contrairement à l'ancien export (fetchall + StringIO).
+
+    python tools/check_export_memory.py                  # SQLite temporaire
+    DATABASE_URL=... python tools/check_export_memory.py # PostgreSQL (lignes supprimées à la fin)
+    python tools/check_export_memory.py --rows 200000 --gzip
+
+Code de retour 1 si le pic grossit avec le nombre de lignes.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEACHER_NAME = 'Export mémoire (test)'
+
+
+def _setup_database():
+    import database
+    if not os.getenv('DATABASE_URL'):
+        tmpdir = tempfile.mkdtemp(prefix='export_memory_')
+        database.DATABASE_PATH = os.path.join(tmpdir, 'material_requests.db')
+    database.init_database()
+    return database
+
+
+def _seed(database, teacher_id, count):
+    """Insère `count` demandes synthétiques pour l'enseignant de test."""
+    with database.db_connection() as (conn, db_type):
+        placeholder = '%s' if db_type == 'postgresql' else '?'
+        cursor = conn.cursor()
+        if db_type == 'postgresql':
+            conn.autocommit = False
+        cursor.execute(f'DELETE FROM material_requests WHERE teacher_id = {placeholder}', (teacher_id,))
+        rows = (
+            (teacher_id, f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}', '9h00', '2nde',
+             f'Demande synthétique n°{i} : béchers, burettes, solution de NaOH', 'x', 'Mixte')
+            for i in range(count)
+        )
+        cursor.executemany(f'''
+            INSERT INTO material_requests
+            (teacher_id, request_date, horaire, class_name, material_description, selected_materials, room_type)
+            VALUES ({', '.join([placeholder] * 7)})
+        ''', rows)
+        conn.commit()
+
+
+def _teacher_id(database):
+    for teacher in database.get_all_teachers():
+        if teacher['name'] == TEACHER_NAME:
+            return teacher['id']
+    return database.add_teacher(TEACHER_NAME)
+
+
+def _measure_streaming(client, teacher_id, use_gzip):
+    url = f'/export/csv?teacher_id={teacher_id}' + ('&gzip=1' if use_gzip else '')
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, size, elapsed
+
+
+def _measure_legacy(database, teacher_id):
+    """Ancien export : toutes les lignes puis tout le fichier en mémoire."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    requests = database.get_material_requests(teacher_id=teacher_id)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for r in requests:
+        writer.writerow([r['id'], r['teacher_name'], r['request_date'], r['horaire'], r['class_name'],
+                         r['selected_materials'], r['computers_needed'], r['material_description'],
+                         r['quantity'], r['room_type'], r['notes'], r['created_at']])
+    size = len(output.getvalue())
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--baseline-rows', type=int, default=10000)
+    parser.add_argument('--gzip', action='store_true', help="mesurer la variante compressée")
+    args = parser.parse_args()
+
+    database = _setup_database()
+    import app as app_module
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'export@test', 'role': 'admin', 'teacher_id': None}
+
+    teacher_id = _teacher_id(database)
+    results = {}
+    try:
+        for count in (args.baseline_rows, args.rows):
+            _seed(database, teacher_id, count)
+            results[count] = {
+                'stream': _measure_streaming(client, teacher_id, args.gzip),
+                'legacy': _measure_legacy(database, teacher_id),
+            }
+    finally:
+        with database.db_connection() as (conn, db_type):
+            placeholder = '%s' if db_type == 'postgresql' else '?'
+            cursor = conn.cursor()
+            cursor.execute(f'DELETE FROM material_requests WHERE teacher_id = {placeholder}', (teacher_id,))
+            conn.commit()
+        # Via database.py : incrémente la version du cache de référence des enseignants
+        database.delete_teacher(teacher_id)
+
+    print(f"Export {'CSV.gz' if args.gzip else 'CSV'} — pic mémoire (tracemalloc)")
+    for count, result in results.items():
+        for label, (peak, size, elapsed) in result.items():
+            name = 'flux' if label == 'stream' else 'ancien (fetchall)'
+            print(f"  {count:>7} lignes | {name:<18} | pic {peak / 1024 / 1024:7.2f} Mo"
+                  f" | {size / 1024 / 1024:6.1f} Mo produits | {elapsed:5.2f}s")
+
+    small = results[args.baseline_rows]['stream'][0]
+    large = results[args.rows]['stream'][0]
+    # Tolérance : 50 % + 1 Mo (fragmentation, caches de l'adaptateur, etc.)
+    flat = large <= small * 1.5 + 1024 * 1024
+    print(f"\nMémoire {'constante' if flat else 'PROPORTIONNELLE'} : "
+          f"{small / 1024:.0f} Ko -> {large / 1024:.0f} Ko pour x{args.rows // args.baseline_rows} lignes")
+    return 0 if flat else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Vérifie que les requêtes fréquentes utilisent un index (EXPLAIN sur la base
+configurée : PostgreSQL si DATABASE_URL, sinon SQLite). Les requêtes sont
+celles de database (registre STATEMENTS et filtres de get_material_requests) :
+une modification de leur texte est vérifiée telle quelle.
+
+    python tools/check_indexes.py
+
+Sur PostgreSQL, les parcours séquentiels sont désactivés le temps du EXPLAIN :
+avec peu de lignes le planificateur préfère un Seq Scan, on vérifie donc qu'un
+index *utilisable* existe. Code de retour 1 si une requête n'utilise aucun index.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Requêtes du registre database.STATEMENTS : (nom, paramètres, table qui doit passer par un index)
+HOT_STATEMENTS = [
+    ('planning_data_by_date', ('2025-10-06',), 'material_requests'),
+    ('grouped_requests_by_name', (1, 'TP'), 'material_requests'),
+    ('pending_modifications_by_request', (1,), 'pending_modifications'),
+    ('tp_templates_by_level', (1, '2nde'), 'tp_templates'),
+]
+
+# Requêtes construites par database._material_requests_query (filtres de
+# get_material_requests) : (nom, arguments, table)
+HOT_FILTERED_QUERIES = [
+    ('get_material_requests (dates)',
+     {'start_date': '2025-09-01', 'end_date': '2025-10-31'}, 'material_requests'),
+    ('get_material_requests (enseignant + dates)',
+     {'start_date': '2025-09-01', 'end_date': '2025-10-31', 'teacher_id': 1}, 'material_requests'),
+    ('get_material_requests (page suivante)',
+     {'start_date': '2025-09-01', 'limit': 101, 'after': ('2025-10-06', '2025-10-01 08:00:00', 42)},
+     'material_requests'),
+]
+
+
+def hot_queries(db_type):
+    """(nom, SQL, paramètres, table) des requêtes vérifiées, telles qu'exécutées par database."""
+    queries = []
+    for name, params, table in HOT_STATEMENTS:
+        statement = database.STATEMENTS[name]
+        sql = statement.postgresql_sql if db_type == 'postgresql' else statement.sqlite_sql
+        queries.append((name, sql, params, table))
+    for name, kwargs, table in HOT_FILTERED_QUERIES:
+        sql, params = database._material_requests_query(db_type, **kwargs)
+        queries.append((name, sql, tuple(params), table))
+    return queries
+
+
+def _uses_index_sqlite(plan_rows, table):
+    """Aucun 'SCAN <table>' : la table est lue via SEARCH ... USING INDEX."""
+    details = [row[3] for row in plan_rows]
+    aliases = {table, 'mr'} if table == 'material_requests' else {table}
+    for detail in details:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == 'SCAN' and words[1] in aliases and 'INDEX' not in detail:
+            return False
+    return any('INDEX' in d or 'PRIMARY KEY' in d for d in details)
+
+
+def _uses_index_postgresql(plan_lines, table):
+    text = '\n'.join(plan_lines)
+    return f'Seq Scan on {table}' not in text and 'Index' in text
+
+
+def main():
+    database.init_database()
+    failures = 0
+    with database.db_connection() as (conn, db_type):
+        cursor = conn.cursor()
+        queries = hot_queries(db_type)
+        if db_type == 'postgresql':
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            for name, sql, params, table in queries:
+                if db_type == 'postgresql':
+                    cursor.execute('EXPLAIN ' + sql, params)
+                    plan = [row[0] for row in cursor.fetchall()]
+                    ok = _uses_index_postgresql(plan, table)
+                else:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    rows = cursor.fetchall()
+                    plan = [row[3] for row in rows]
+                    ok = _uses_index_sqlite(rows, table)
+                print(f"{'OK ' if ok else 'KO '} {name}")
+                for line in plan:
+                    print(f"      {line}")
+                if not ok:
+                    failures += 1
+        finally:
+            if db_type == 'postgresql':
+                cursor.execute('RESET enable_seqscan')
+    print(f"\n{len(queries) - failures}/{len(queries)} requêtes utilisent un index ({db_type})")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Vérifie l'invalidation du cache des tables de référence entre processus :
+un processus "lecteur" (comme un worker gunicorn) garde teachers, rooms,
+jours ouvrés... en cache ; le processus principal les modifie ; le lecteur
+doit voir chaque modification dès sa requête suivante.
+
+    python tools/check_reference_cache.py                  # SQLite temporaire
+    DATABASE_URL=... python tools/check_reference_cache.py # PostgreSQL (données de test supprimées)
+
+Code de retour 1 si le lecteur sert une donnée périmée.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEACHER_NAME = 'Cache de référence (test)'
+TEST_DATE = '2030-06-15'  # un samedi
+
+
+def _setup_database(db_path):
+    import database
+    if not os.getenv('DATABASE_URL'):
+        database.DATABASE_PATH = db_path
+    return database
+
+
+def _snapshot(database):
+    """Ce que voit une requête HTTP du lecteur."""
+    database.expire_reference_cache()
+    return {
+        'teacher': any(t['name'] == TEACHER_NAME for t in database.get_all_teachers()),
+        'working_day': database.is_working_day_configured(TEST_DATE),
+        'students': database.get_student_count_for_teacher(TEACHER_NAME, '2nde'),
+    }
+
+
+def _reader(db_path, commands, answers):
+    database = _setup_database(db_path)
+    while commands.get() != 'stop':
+        # Deux lectures par "requête" : la seconde doit venir du cache
+        _snapshot(database)
+        answers.put(_snapshot(database))
+    answers.put(database.get_reference_cache_stats())
+
+
+def main():
+    db_path = os.path.join(tempfile.mkdtemp(prefix='reference_cache_'), 'material_requests.db')
+    database = _setup_database(db_path)
+    database.init_database()
+
+    ctx = multiprocessing.get_context('spawn')
+    commands, answers = ctx.Queue(), ctx.Queue()
+    reader = ctx.Process(target=_reader, args=(db_path, commands, answers))
+    reader.start()
+
+    def reader_view():
+        commands.put('read')
+        return answers.get(timeout=30)
+
+    failures = 0
+
+    def expect(label, view, **expected):
+        nonlocal failures
+        ok = all(view[key] == value for key, value in expected.items())
+        failures += not ok
+        print(f"{'OK ' if ok else 'KO '} {label}: {view}")
+
+    teacher_id = None
+    student_id = None
+    try:
+        expect('état initial', reader_view(), teacher=False, working_day=False, students=20)
+
+        teacher_id = database.add_teacher(TEACHER_NAME)
+        expect('enseignant ajouté', reader_view(), teacher=True)
+
+        database.set_working_day_config(TEST_DATE, True, 'Samedi travaillé (test)')
+        expect('samedi déclaré ouvré', reader_view(), working_day=True)
+
+        student_id = database.add_student_number(TEACHER_NAME, 31, '2nde')
+        expect('effectif ajouté', reader_view(), students=31)
+
+        database.update_student_number(student_id, {'teacher_name': TEACHER_NAME, 'student_count': 12, 'level': '2nde'})
+        expect('effectif modifié', reader_view(), students=12)
+
+        database.delete_working_day_config(TEST_DATE)
+        database.delete_student_number(student_id)
+        student_id = None
+        database.delete_teacher(teacher_id)
+        teacher_id = None
+        expect('données supprimées', reader_view(), teacher=False, working_day=False, students=20)
+
+        commands.put('stop')
+        stats = answers.get(timeout=30)
+    finally:
+        reader.join(timeout=30)
+        if reader.is_alive():
+            reader.terminate()
+        database.delete_working_day_config(TEST_DATE)
+        if student_id:
+            database.delete_student_number(student_id)
+        if teacher_id:
+            database.delete_teacher(teacher_id)
+
+    print(f"\nLecteur : {stats['hits']} hits / {stats['misses']} misses "
+          f"(ratio {stats['hit_ratio']}), {stats['version_checks']} lectures des versions")
+    for table, counters in stats['tables'].items():
+        print(f"  {table:<20} {counters}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
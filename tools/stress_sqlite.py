@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test de charge SQLite multi-processus : simule plusieurs workers gunicorn qui
+basculent le statut "préparé" en rafale pendant que d'autres créent des demandes.
+
+    python tools/stress_sqlite.py                      # mode concurrent (WAL + writer)
+    python tools/stress_sqlite.py --mode simple        # comportement historique
+
+Code de retour 1 si au moins une opération a échoué (ex: "database is locked").
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _setup_database_module(db_path, mode):
+    os.environ.pop('DATABASE_URL', None)
+    os.environ['SQLITE_MODE'] = mode
+    import database
+    database.SQLITE_MODE = mode
+    database.DATABASE_PATH = db_path
+    return database
+
+
+def _worker(db_path, mode, threads, ops, request_ids, results):
+    database = _setup_database_module(db_path, mode)
+    counters = {'ok': 0, 'errors': 0, 'locked': 0}
+    lock = threading.Lock()
+
+    def run():
+        rng = random.Random()
+        for _ in range(ops):
+            try:
+                roll = rng.random()
+                if roll < 0.7:
+                    database.toggle_prepared_status(rng.choice(request_ids))
+                elif roll < 0.9:
+                    database.add_material_request(1, '2025-10-06', '2nde', 'stress', horaire='9h00')
+                else:
+                    database.get_material_requests('2025-10-06', '2025-10-06')
+                with lock:
+                    counters['ok'] += 1
+            except Exception as e:
+                with lock:
+                    counters['errors'] += 1
+                    if 'locked' in str(e):
+                        counters['locked'] += 1
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put(counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['concurrent', 'simple'], default='concurrent')
+    parser.add_argument('--processes', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--ops', type=int, default=200, help="opérations par thread")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='stress_sqlite_')
+    db_path = os.path.join(tmpdir, 'material_requests.db')
+    database = _setup_database_module(db_path, args.mode)
+    database.init_database()
+    request_ids = [
+        database.add_material_request(1, '2025-10-06', '2nde', f'seed {i}', horaire='9h00')
+        for i in range(50)
+    ]
+
+    results = multiprocessing.Queue()
+    started = time.perf_counter()
+    procs = [
+        multiprocessing.Process(target=_worker, args=(db_path, args.mode, args.threads, args.ops, request_ids, results))
+        for _ in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    totals = {'ok': 0, 'errors': 0, 'locked': 0}
+    for _ in procs:
+        for key, value in results.get().items():
+            totals[key] += value
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    total_ops = totals['ok'] + totals['errors']
+    print(f"Mode: {args.mode} | {args.processes} processus x {args.threads} threads x {args.ops} opérations")
+    print(f"Opérations: {total_ops} en {elapsed:.2f}s ({total_ops / elapsed:.0f} op/s)")
+    print(f"Succès: {totals['ok']} | Échecs: {totals['errors']} (dont 'database is locked': {totals['locked']})")
+    return 1 if totals['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())